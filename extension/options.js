@@ -0,0 +1,14 @@
+// options.js
+// Store the URL of the Django backend the popup looks the job titles up on
+const input = document.getElementById("apiUrl");
+
+chrome.storage.sync.get({ apiUrl: "" }, ({ apiUrl }) => {
+  input.value = apiUrl;
+});
+
+document.getElementById("save").addEventListener("click", () => {
+  const apiUrl = input.value.trim().replace(/\/+$/, ""); // Without a trailing slash
+  chrome.storage.sync.set({ apiUrl }, () => {
+    document.getElementById("status").textContent = "Saved.";
+  });
+});
@@ -1,7 +1,38 @@
 // popup.js
+// Show the known job titles that best match the scraped posting title, as
+// found by the backend whose URL is set on the options page
+function showMatches(apiUrl, jobTitle) {
+  const list = document.getElementById("matches");
+  fetch(`${apiUrl}/service/job_titles/match/?title=${encodeURIComponent(jobTitle)}`)
+    .then((response) => response.json())
+    .then((data) => {
+      list.textContent = "";
+      if (!data.results || data.results.length === 0) {
+        list.textContent = "No reviews for this job yet.";
+        return;
+      }
+      data.results.forEach((match) => {
+        const item = document.createElement("li");
+        item.textContent = `${match.job_title} (${match.reviews} reviews)`;
+        list.appendChild(item);
+      });
+    })
+    .catch(() => {
+      list.textContent = "Could not load matching jobs.";
+    });
+}
+
 chrome.runtime.sendMessage({ action: "getJobTitle" }, (response) => {
   if (response && response.jobTitle) {
     document.getElementById("jobTitle").textContent = response.jobTitle;
+    chrome.storage.sync.get({ apiUrl: "" }, ({ apiUrl }) => {
+      if (apiUrl) {
+        showMatches(apiUrl, response.jobTitle);
+      } else {
+        document.getElementById("matches").textContent =
+          "Set the backend URL on the extension options page.";
+      }
+    });
   } else {
     document.getElementById("jobTitle").textContent = "Job title not found.";
   }
@@ -31,3 +31,13 @@ class AuthReviewConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField" # Set BigAutoField
     # as default for primary key fields
     name = "auth_review" # Define the name of the app as 'auth_review'
+
+    def ready(self):
+        """
+        Connect the signal handlers that invalidate the cached users of the
+        JWT authentication (see ``auth_review.authentication``), and check
+        that the OTP cache is shared by the workers (see ``auth_review.otp``).
+        """
+        from . import signals  # pylint: disable=C0415,W0611
+        from .otp import check_otp_cache  # pylint: disable=C0415
+        check_otp_cache()
@@ -0,0 +1,218 @@
+"""
+JWT authentication classes that avoid a user read per request.
+
+``JWTAuthentication`` reads the user of the token from the database on
+every authenticated request. Two replacements are offered, selected in
+``REST_FRAMEWORK["DEFAULT_AUTHENTICATION_CLASSES"]``:
+
+- ``CachedJWTAuthentication`` (the default) keeps the users it read in a
+  per-process cache keyed by the ``user_id`` claim, for
+  ``settings.JWT_USER_CACHE_TTL`` seconds. Saving or deleting a user drops
+  its entry in the process that wrote it (see ``auth_review.signals``), so
+  a profile update, a password change or a deactivation applies at once
+  there, and within the TTL in the other processes. Writes that bypass
+  ``save()``, such as ``QuerySet.update``, also wait for the TTL.
+- ``StatelessJWTAuthentication`` (``JWT_STATELESS_USER=true``) reads no
+  user at all: it builds an unsaved ``Client`` from the token claims. A
+  deactivation then only takes effect when the access token expires.
+  Views that need the stored profile, such as ``ProfileView``, keep
+  ``CachedJWTAuthentication``.
+
+Each request gets its own copy of a cached user, so a view that changes
+``request.user`` does not change the user other requests see.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings  # pylint: disable=E0401
+from django.contrib.auth import get_user_model  # pylint: disable=E0401
+from rest_framework.exceptions import AuthenticationFailed  # pylint: disable=E0401
+from rest_framework_simplejwt.authentication import JWTAuthentication  # pylint: disable=E0401
+from rest_framework_simplejwt.exceptions import InvalidToken  # pylint: disable=E0401
+from rest_framework_simplejwt.settings import api_settings  # pylint: disable=E0401
+from rest_framework_simplejwt.utils import get_md5_hash_password  # pylint: disable=E0401
+
+MAX_CACHED_USERS = 10_000 # Users kept per process, the least recently used go first
+
+
+class UserCache:
+    """
+    A thread-safe, size-bounded cache of users with an expiry time.
+
+    Attributes:
+        ttl (float): Seconds an entry is kept, 0 to disable the cache.
+        max_size (int): Most entries kept.
+    """
+
+    def __init__(self, ttl, max_size=MAX_CACHED_USERS):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict() # user id -> (expiry time, user)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """
+        Return a cached user.
+
+        Args:
+            user_id (str): The ``user_id`` claim.
+
+        Returns:
+            Client or None: The user, None if absent or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id, user):
+        """
+        Cache a user for ``ttl`` seconds.
+
+        Args:
+            user_id (str): The ``user_id`` claim.
+            user (Client): The user read from the database.
+        """
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def forget(self, user_id):
+        """
+        Drop the entry of a user.
+
+        Args:
+            user_id (str): The ``user_id`` claim.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+# The UserCache of this process, created on first use
+_user_cache = None # pylint: disable=C0103
+_user_cache_lock = threading.Lock()
+
+
+def get_user_cache():
+    """
+    Return the user cache of this process.
+
+    Returns:
+        UserCache: The cache, with the TTL of ``settings.JWT_USER_CACHE_TTL``.
+    """
+    global _user_cache # pylint: disable=W0603
+    if _user_cache is None:
+        with _user_cache_lock:
+            if _user_cache is None:
+                _user_cache = UserCache(settings.JWT_USER_CACHE_TTL)
+    return _user_cache
+
+
+def reset_user_cache():
+    """Forget the user cache of this process, e.g. after changing its TTL."""
+    global _user_cache # pylint: disable=W0603
+    with _user_cache_lock:
+        _user_cache = None
+
+
+def token_user_id(validated_token):
+    """
+    Read the user id claim of a token.
+
+    Args:
+        validated_token (Token): The validated access token.
+
+    Raises:
+        InvalidToken: If the token has no user id claim.
+
+    Returns:
+        str: The user id.
+    """
+    try:
+        return validated_token[api_settings.USER_ID_CLAIM]
+    except KeyError as e:
+        raise InvalidToken("Token contained no recognizable user identification") from e
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that reads each user at most once per TTL and process.
+
+    Methods:
+        get_user(validated_token): returns a copy of the cached or read user.
+    """
+
+    def get_user(self, validated_token):
+        """
+        Return the user of a token, from the cache when present.
+
+        Args:
+            validated_token (Token): The validated access token.
+
+        Raises:
+            InvalidToken: If the token has no user id claim.
+            AuthenticationFailed: If the user does not exist or is inactive,
+                or, with ``CHECK_REVOKE_TOKEN``, changed their password.
+
+        Returns:
+            Client: A copy of the user, owned by this request.
+        """
+        user_id = token_user_id(validated_token)
+        cache = get_user_cache()
+        user = cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token) # Checks is_active and revocation
+            cache.set(user_id, user)
+        elif api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.",
+                                       code="password_changed")
+        return copy.copy(user)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds the user from the token claims alone.
+
+    The user is an unsaved ``Client`` rather than simplejwt's ``TokenUser``,
+    so that views can still assign it to foreign keys, e.g. as the author of
+    a comment.
+
+    Methods:
+        get_user(validated_token): returns the user described by the claims.
+    """
+
+    def get_user(self, validated_token):
+        """
+        Build the user of a token without reading the database.
+
+        Args:
+            validated_token (Token): The validated access token.
+
+        Raises:
+            InvalidToken: If the token has no user id claim.
+
+        Returns:
+            Client: An unsaved user with the username, verification and staff
+            status of the claims.
+        """
+        user = get_user_model()(**{api_settings.USER_ID_FIELD: token_user_id(validated_token)})
+        user.is_verified = bool(validated_token.get("is_verified", False))
+        user.is_staff = bool(validated_token.get("is_staff", False))
+        user.is_active = True # Deactivation takes effect when the token expires
+        return user
@@ -0,0 +1,143 @@
+"""
+Login pipeline of the token endpoints.
+
+A login used to read the user three times: ``MyTokenObtainPairView`` looked
+it up to check ``is_verified``, ``authenticate`` loaded it again through
+the authentication backend, and the token serializer checked verification
+once more. ``login_user`` loads the user with one primary-key lookup,
+checks the password once and returns the user the tokens are issued for:
+
+- an unknown username, a wrong password or an inactive account fail with
+  401, as with ``authenticate``; the password of an unknown username is
+  still hashed, so that the response time does not tell which usernames
+  exist;
+- a correct password of an unverified account fails with 400 and the
+  message asking to verify the email.
+
+The password check is the cost of a login: the hash is computed with many
+iterations on purpose. ``alogin_user`` runs it on the thread pool of the
+event loop, so that an ASGI worker keeps serving other requests and
+several logins hash in parallel (the hashing releases the GIL).
+"""
+from asgiref.sync import sync_to_async  # pylint: disable=E0401
+from django.contrib.auth import get_user_model  # pylint: disable=E0401
+from rest_framework import status  # pylint: disable=E0401
+from rest_framework.exceptions import APIException, AuthenticationFailed  # pylint: disable=E0401
+
+User = get_user_model()
+
+
+class EmailNotVerified(APIException):
+    """The credentials are right but the account's email is not verified yet."""
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Please verify your email before logging in."
+    default_code = "email_not_verified"
+
+
+def invalid_credentials():
+    """
+    Return the error of a failed login.
+
+    Returns:
+        AuthenticationFailed: The 401 error ``TokenObtainPairView`` answers with.
+    """
+    return AuthenticationFailed("No active account found with the given credentials",
+                                code="no_active_account")
+
+
+def load_user(username):
+    """
+    Read a user with one primary-key lookup.
+
+    Args:
+        username (str): The username.
+
+    Returns:
+        Client or None: The user, None if the username is unknown.
+    """
+    return User.objects.filter(pk=username).first()
+
+
+def password_matches(user, password):
+    """
+    Check a password, spending the same time whether the user exists or not.
+
+    Args:
+        user (Client or None): The user, None for an unknown username.
+        password (str): The password sent.
+
+    Returns:
+        bool: True if the user exists and the password is theirs.
+    """
+    if user is None:
+        User().set_password(password) # Hash anyway, as ModelBackend does
+        return False
+    return user.check_password(password)
+
+
+def accept_login(user, matched):
+    """
+    Decide a login once the password was checked.
+
+    Args:
+        user (Client or None): The user, None for an unknown username.
+        matched (bool): Whether the password matched.
+
+    Raises:
+        AuthenticationFailed: If the credentials are wrong or the account
+            is inactive.
+        EmailNotVerified: If the account's email is not verified.
+
+    Returns:
+        Client: The user to issue tokens for.
+    """
+    if not matched or not user.is_active:
+        raise invalid_credentials()
+    if not user.is_verified:
+        raise EmailNotVerified()
+    return user
+
+
+def login_user(username, password):
+    """
+    Authenticate a login with one lookup and one password check.
+
+    Args:
+        username (str): The username sent.
+        password (str): The password sent.
+
+    Raises:
+        AuthenticationFailed: If the credentials are wrong or the account
+            is inactive.
+        EmailNotVerified: If the account's email is not verified.
+
+    Returns:
+        Client: The authenticated user.
+    """
+    user = load_user(username)
+    return accept_login(user, password_matches(user, password))
+
+
+async def alogin_user(username, password):
+    """
+    Authenticate a login like ``login_user``, hashing on the thread pool.
+
+    The lookup runs in the thread that owns the database connections, the
+    password check on the event loop's pool so that concurrent logins do
+    not wait for each other.
+
+    Args:
+        username (str): The username sent.
+        password (str): The password sent.
+
+    Raises:
+        AuthenticationFailed: If the credentials are wrong or the account
+            is inactive.
+        EmailNotVerified: If the account's email is not verified.
+
+    Returns:
+        Client: The authenticated user.
+    """
+    user = await sync_to_async(load_user)(username)
+    matched = await sync_to_async(password_matches, thread_sensitive=False)(user, password)
+    return accept_login(user, matched)
@@ -0,0 +1,149 @@
+"""
+This module contains a command for benchmarking the login pipeline.
+
+It creates a verified benchmark user, then runs logins through three paths:
+
+- the former path of ``MyTokenObtainPairView``: a lookup to check
+  ``is_verified``, ``authenticate`` and the token serializer;
+- ``login_user``, one lookup and one password check;
+- ``alogin_user`` with ``--concurrency`` logins in flight on one event loop,
+  the password checks running on the thread pool.
+
+For each path it prints the queries per login, the logins per second and
+the mean latency of a login.
+
+This is called from the command line manually, against a development
+database.
+"""
+import asyncio
+import time
+from django.contrib.auth import authenticate, get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from auth_review.login import alogin_user, login_user
+from auth_review.serializers import MyTokenObtainPairSerializer
+
+User = get_user_model()
+BENCHMARK_USER = "__benchmark__"
+BENCHMARK_PASSWORD = "benchmark-password-1"
+
+
+def former_login(username, password):
+    """
+    Log in the way ``MyTokenObtainPairView`` used to.
+
+    Args:
+        username (str): The username.
+        password (str): The password.
+
+    Returns:
+        dict: The tokens.
+    """
+    User.objects.get(username=username) # The is_verified check of the view
+    user = authenticate(username=username, password=password)
+    refresh = MyTokenObtainPairSerializer.get_token(user)
+    return {"refresh": str(refresh), "access": str(refresh.access_token)}
+
+
+def pipeline_login(username, password):
+    """
+    Log in with ``login_user``.
+
+    Args:
+        username (str): The username.
+        password (str): The password.
+
+    Returns:
+        dict: The tokens.
+    """
+    return MyTokenObtainPairSerializer.tokens_for(login_user(username, password))
+
+
+class Command(BaseCommand):
+    """
+    Command class to compare the login paths.
+
+    Methods:
+        add_arguments: declares the command line options
+        measure: times the sequential logins of a path
+        measure_async: times the concurrent asynchronous logins
+        handle: creates the user, runs the benchmark and cleans up
+    """
+    help = 'Benchmark the login pipeline against the former login path'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('--logins', type=int, default=40,
+                            help='Number of logins timed per path')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Asynchronous logins in flight at once')
+
+    @staticmethod
+    def measure(login, logins):
+        """
+        Time sequential logins.
+
+        Args:
+            login (callable): The login path.
+            logins (int): The number of logins.
+
+        Returns:
+            tuple: The queries per login and the total time in seconds.
+        """
+        login(BENCHMARK_USER, BENCHMARK_PASSWORD) # Warm up the connection
+        with CaptureQueriesContext(connection) as queries:
+            login(BENCHMARK_USER, BENCHMARK_PASSWORD)
+        start = time.perf_counter()
+        for _ in range(logins):
+            login(BENCHMARK_USER, BENCHMARK_PASSWORD)
+        return len(queries), time.perf_counter() - start
+
+    @staticmethod
+    def measure_async(logins, concurrency):
+        """
+        Time concurrent asynchronous logins.
+
+        Args:
+            logins (int): The number of logins.
+            concurrency (int): The logins in flight at once.
+
+        Returns:
+            float: The total time in seconds.
+        """
+        async def run():
+            limit = asyncio.Semaphore(concurrency)
+
+            async def one():
+                async with limit:
+                    await alogin_user(BENCHMARK_USER, BENCHMARK_PASSWORD)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(logins)))
+            return time.perf_counter() - start
+
+        return asyncio.run(run())
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Create the benchmark user, time every path and print one row per path.
+        """
+        logins = options['logins']
+        User.objects.filter(pk=BENCHMARK_USER).delete()
+        user = User.objects.create_user(BENCHMARK_USER, "benchmark@example.com",
+                                        BENCHMARK_PASSWORD)
+        user.is_verified = True
+        user.save()
+        try:
+            self.stdout.write(f'{"path":<28} {"queries":>7} {"logins/s":>9} {"ms/login":>9}')
+            rows = [(name, *self.measure(login, logins)) for name, login in
+                    (("former view", former_login), ("login_user", pipeline_login))]
+            rows.append((f'alogin_user x{options["concurrency"]}', 1,
+                         self.measure_async(logins, options['concurrency'])))
+            for name, queries, seconds in rows:
+                self.stdout.write(f'{name:<28} {queries:>7} {logins / seconds:>9.1f} '
+                                  f'{seconds / logins * 1000:>9.1f}')
+        finally:
+            User.objects.filter(pk=BENCHMARK_USER).delete()
+            self.stdout.write(self.style.SUCCESS('Removed the benchmark user'))
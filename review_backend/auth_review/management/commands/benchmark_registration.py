@@ -0,0 +1,174 @@
+"""
+This module contains a command for benchmarking registration and email
+lookups on a large user collection.
+
+It seeds ``--users`` accounts (one million by default), then times:
+
+- the former registration writes: the ``username OR email`` query of
+  ``RegisterView``, the ``UniqueValidator`` query, ``create`` and the second
+  ``save`` of ``RegisterSerializer.create``;
+- the single insert registration now does, for a new account and for a
+  taken email refused by the unique index;
+- a user lookup by email, as ``SendOtpView`` and ``UpdatePasswordView`` do,
+  and on MongoDB the same lookup forced to scan the collection, as it ran
+  before ``email`` was indexed.
+
+Passwords are hashed once for all accounts so that the timings show the
+database work rather than the password hashing.
+
+This is called from the command line manually, against a development
+database whose indexes were synced (``sync_indexes``).
+"""
+import random
+import time
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from service.mongo import atomic_unless_mongo, get_collection, is_duplicate_key, is_mongo
+
+User = get_user_model()
+PREFIX = "__benchmark__" # Username prefix of the accounts created by this command
+SEED_BATCH_SIZE = 10_000 # Accounts inserted per batch
+
+
+class Command(BaseCommand):
+    """
+    Command class to time registration and email lookups.
+
+    Methods:
+        add_arguments: declares the command line options
+        seed: inserts the benchmark accounts
+        former_register: registers the way RegisterView used to
+        register: registers with a single insert
+        measure: times one operation
+        handle: seeds, runs the benchmark and cleans up
+    """
+    help = 'Benchmark registration and email lookups on a large user collection'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('--users', type=int, default=1_000_000,
+                            help='Number of accounts to seed')
+        parser.add_argument('--repeat', type=int, default=200,
+                            help='Number of timed calls per operation')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded accounts for the next run')
+
+    def seed(self, users, password):
+        """
+        Insert the benchmark accounts that are missing.
+
+        Args:
+            users (int): The number of accounts wanted.
+            password (str): The hashed password of every account.
+        """
+        existing = User.objects.filter(pk__startswith=PREFIX).count()
+        for start in range(existing, users, SEED_BATCH_SIZE):
+            User.objects.bulk_create([
+                User(username=f"{PREFIX}{i}", email=f"benchmark{i}@example.com",
+                     password=password, is_verified=True)
+                for i in range(start, min(start + SEED_BATCH_SIZE, users))])
+            self.stdout.write(f'\rSeeded {min(start + SEED_BATCH_SIZE, users)} accounts',
+                              ending='')
+        self.stdout.write('')
+
+    @staticmethod
+    def former_register(username, email, password):
+        """
+        Register the way RegisterView and RegisterSerializer used to.
+
+        Args:
+            username (str): The new username.
+            email (str): The new email.
+            password (str): The hashed password.
+        """
+        len(User.objects.filter(Q(username=username) | Q(email=email)))
+        User.objects.filter(username=username).exists() # UniqueValidator
+        user = User.objects.create(username=username, email=email, is_verified=False)
+        user.is_active = True
+        user.password = password
+        user.save()
+
+    @staticmethod
+    def register(username, email, password):
+        """
+        Register with the single insert of RegisterSerializer.
+
+        Args:
+            username (str): The new username.
+            email (str): The new email.
+            password (str): The hashed password.
+
+        Returns:
+            bool: False if the unique indexes refused the account.
+        """
+        user = User(username=username, email=email, is_verified=False, password=password)
+        try:
+            with atomic_unless_mongo(User):
+                user.save(force_insert=True)
+        except DatabaseError as e:
+            if is_duplicate_key(e):
+                return False
+            raise
+        return True
+
+    @staticmethod
+    def measure(operation, repeat):
+        """
+        Time an operation.
+
+        Args:
+            operation (callable): Called with the index of the call.
+            repeat (int): The number of calls.
+
+        Returns:
+            tuple: The queries of one call and the mean time per call in
+            milliseconds.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            operation(-1)
+        start = time.perf_counter()
+        for i in range(repeat):
+            operation(i)
+        return len(queries), (time.perf_counter() - start) / repeat * 1000
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Seed the accounts, time every operation and print one row per operation.
+        """
+        users, repeat = options['users'], options['repeat']
+        password = make_password("benchmark-password-1")
+        self.seed(users, password)
+        emails = [f"benchmark{random.randrange(users)}@example.com" for _ in range(repeat + 1)]
+        operations = [
+            ("former registration", lambda i: self.former_register(
+                f"{PREFIX}old{i}", f"old{i}@example.com", password)),
+            ("registration", lambda i: self.register(
+                f"{PREFIX}new{i}", f"new{i}@example.com", password)),
+            ("taken email refused", lambda i: self.register(
+                f"{PREFIX}dup{i}", emails[i], password)),
+            ("user by email", lambda i: User.objects.get(email=emails[i])),
+        ]
+        if is_mongo(User):
+            collection = get_collection(User)
+            operations.append(("user by email, no index", lambda i: collection.find_one(
+                {"email": emails[i]}, hint=[("$natural", 1)])))
+        try:
+            self.stdout.write(f'{"operation":<26} {"queries":>7} {"ms":>9}')
+            for name, operation in operations:
+                queries, milliseconds = self.measure(operation, repeat)
+                self.stdout.write(f'{name:<26} {queries:>7} {milliseconds:>9.2f}')
+        finally:
+            registered = User.objects.filter(Q(pk__startswith=f"{PREFIX}old")
+                                              | Q(pk__startswith=f"{PREFIX}new"))
+            registered.delete()
+            if not options['keep']:
+                if is_mongo(User):
+                    get_collection(User).delete_many({"username": {"$regex": f"^{PREFIX}"}})
+                else:
+                    User.objects.filter(pk__startswith=PREFIX).delete()
+                self.stdout.write(self.style.SUCCESS('Removed the benchmark accounts'))
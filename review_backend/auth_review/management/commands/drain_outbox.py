@@ -0,0 +1,53 @@
+"""
+This module contains a command for sending the emails queued in the outbox.
+
+The registration and OTP views only queue their emails (see
+``auth_review/outbox.py``); this command sends the due ones with the
+transport of ``settings.EMAIL_OUTBOX_TRANSPORT`` and reschedules the failed
+ones with a backoff.
+
+Run it once from a scheduler (e.g. cron every minute), or as a long-running
+worker with ``--forever``. Several workers can drain the same outbox, an
+email is only sent by the worker that claimed it.
+"""
+import time
+from django.core.management.base import BaseCommand
+from auth_review.outbox import DRAIN_BATCH_SIZE, drain_outbox, get_transport
+
+
+class Command(BaseCommand):
+    """
+    Command class to send the queued emails.
+
+    Methods:
+        add_arguments: declares the command line options
+        handle: drains the outbox once or until interrupted
+    """
+    help = 'Send the due emails of the outbox, retrying the failed ones with a backoff'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('--limit', type=int, default=DRAIN_BATCH_SIZE,
+                            help='Most emails sent per drain')
+        parser.add_argument('--forever', action='store_true',
+                            help='Keep draining until interrupted')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to wait when the outbox has nothing due (with --forever)')
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Drain the outbox and print the number of emails sent, retried and
+        failed, once per drain that did something.
+        """
+        transport = get_transport()
+        while True:
+            counts = drain_outbox(transport, options['limit'])
+            if any(counts.values()) or not options['forever']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{counts["sent"]} sent, {counts["retried"]} to retry, '
+                    f'{counts["failed"]} failed'))
+            if not options['forever']:
+                return
+            if sum(counts.values()) < options['limit']:
+                time.sleep(options['interval']) # Nothing more is due yet
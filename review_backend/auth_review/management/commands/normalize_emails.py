@@ -0,0 +1,55 @@
+"""
+This module contains a command for normalizing the stored email addresses.
+
+Emails are stored lowercased and must be unique (see
+``ClientManager.normalize_email``). Accounts created before that may hold
+mixed-case addresses, or share an address, which would stop ``sync_indexes``
+from building the unique index on ``email``.
+
+This command lowercases the stored addresses and lists the addresses shared
+by several accounts, which have to be resolved by hand. Run it once, before
+``sync_indexes``.
+"""
+from collections import defaultdict
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Command class to lowercase the stored emails and report the shared ones.
+
+    Methods:
+        add_arguments: declares the command line options
+        handle: normalizes the emails and reports the duplicates
+    """
+    help = 'Lowercase the stored email addresses and list those used by several accounts'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the changes and the duplicates')
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Rewrite the addresses that are not normalized, then print the
+        addresses held by more than one account.
+        """
+        owners = defaultdict(list)
+        changed = 0
+        for username, email in User.objects.values_list("pk", "email").iterator():
+            normalized = User.objects.normalize_email(email)
+            owners[normalized].append(username)
+            if normalized != email:
+                changed += 1
+                if not options['dry_run']:
+                    User.objects.filter(pk=username).update(email=normalized)
+        verb = 'Would normalize' if options['dry_run'] else 'Normalized'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {changed} email addresses'))
+        for email, usernames in sorted(owners.items()):
+            if len(usernames) > 1:
+                self.stdout.write(self.style.WARNING(
+                    f'{email or "(empty)"} is used by: {", ".join(sorted(usernames))}'))
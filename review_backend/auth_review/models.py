@@ -25,11 +25,29 @@ class ClientManager(BaseUserManager):
     ensuring that necessary fields are validated and set during user creation.
 
     Methods:
+        normalize_email(email): Returns the form in which emails are stored.
         create_user(username, password=None): Creates a regular user.
         create_superuser(username, password=None): Creates a superuser with
             admin privileges.
     """
 
+    @classmethod
+    def normalize_email(cls, email):
+        """
+        Return the form in which an email address is stored and looked up.
+
+        The whole address is lowercased, not only the domain, so that the
+        unique index on ``email`` also refuses addresses that only differ
+        in case.
+
+        Args:
+            email (str): The email address as entered.
+
+        Returns:
+            str: The stripped, lowercased address.
+        """
+        return (email or "").strip().lower()
+
     # create a regular user with optional password?
 
     def create_user(self, username, email, password=None):
@@ -99,6 +117,7 @@ class Client(AbstractBaseUser, PermissionsMixin):
     objects: The custom manager for user creation.
 
     Methods:
+        save(): Normalizes the email address before saving.
         __str__(): Returns the username as the string representation of
                     the Client instance.
     """
@@ -107,7 +126,8 @@ class Client(AbstractBaseUser, PermissionsMixin):
     username = models.CharField(
         max_length=50, primary_key=True, unique=True, blank=False
     ) # Unique username, primary key
-    email = models.EmailField(unique=False, blank=False, null=False) # Email field
+    # Stored normalized (see ClientManager.normalize_email), one account per address
+    email = models.EmailField(unique=True, blank=False, null=False)
     is_verified = models.BooleanField(default=False) # Marks user as verified
     is_admin = models.BooleanField(default=False) # Marks user as admin
     is_staff = models.BooleanField(default=False) # Marks user as staff
@@ -124,6 +144,13 @@ class Client(AbstractBaseUser, PermissionsMixin):
                                               blank=True)
 
 
+    def save(self, *args, **kwargs):
+        """
+        Normalize the email address, then save the user.
+        """
+        self.email = ClientManager.normalize_email(self.email)
+        super().save(*args, **kwargs)
+
     # pylint: disable=E0307
     def __str__(self):
         """
@@ -133,3 +160,56 @@ class Client(AbstractBaseUser, PermissionsMixin):
             str: The username of the client.
         """
         return self.username
+
+
+# pylint: disable=R0903
+class OutboxEmail(models.Model):
+    """
+    An email waiting in the outbox to be sent.
+
+    Requests enqueue their emails here instead of calling the mail provider,
+    and ``drain_outbox`` sends them in the background (see
+    ``auth_review/outbox.py``).
+
+    Attributes:
+        to_email (str): The recipient.
+        subject (str): The subject line.
+        html_content (str): The HTML body.
+        status (str): ``pending`` until sent, then ``sent``; ``failed`` once
+            every attempt has failed.
+        attempts (int): The number of failed sends so far.
+        next_attempt_at (datetime): The earliest time of the next send.
+        last_error (str): The error of the last failed send.
+        created_at (datetime): When the email was enqueued.
+        sent_at (datetime): When the email was sent.
+    """
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUSES = [(PENDING, "Pending"), (SENT, "Sent"), (FAILED, "Failed")]
+
+    to_email = models.EmailField() # Recipient address
+    subject = models.CharField(max_length=200) # Subject line
+    html_content = models.TextField() # HTML body
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0) # Failed sends so far
+    next_attempt_at = models.DateTimeField() # Not sent before this time
+    last_error = models.TextField(blank=True, default="") # Error of the last failed send
+    created_at = models.DateTimeField(auto_now_add=True) # Time of enqueueing
+    sent_at = models.DateTimeField(null=True, blank=True) # Time of delivery
+
+    class Meta:
+        """Meta options for the OutboxEmail model."""
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]), # The due emails, oldest first
+        ]
+
+    # pylint: disable=E0307
+    def __str__(self):
+        """
+        Returns the string representation of the OutboxEmail instance.
+
+        Returns:
+            str: The recipient and subject of the email.
+        """
+        return f"{self.to_email}: {self.subject}"
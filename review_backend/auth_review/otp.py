@@ -0,0 +1,152 @@
+"""
+Server-side one-time passwords for the password reset.
+
+The reset flow used to trust the client: the browser generated the OTP,
+sent it to ``send-otp/`` to be emailed, and compared it locally. Now the
+server generates it (``issue_otp``), keeps only an HMAC of it and checks it
+(``check_otp``) before ``update-password/`` accepts a new password.
+
+An OTP is kept in the ``otp`` cache for ``settings.OTP_TTL_SECONDS`` and is
+dropped once used, once a newer one is issued for the same email, or after
+``settings.OTP_MAX_ATTEMPTS`` wrong guesses, so that the six digits cannot
+be brute-forced. The guesses are counted in a key of their own with the
+atomic ``cache.incr``, before the code is compared, so that concurrent
+guesses cannot share an attempt. The cache backend is set in
+``settings.CACHES``; a shared backend is required when running several
+workers, so that any worker can check an OTP issued by another and the
+guesses are counted once across workers; ``check_otp_cache`` refuses to
+start with the local-memory backend when ``settings.WEB_CONCURRENCY`` is
+above 1.
+"""
+import secrets
+import time
+from django.conf import settings  # pylint: disable=E0401
+from django.core.cache import caches  # pylint: disable=E0401
+from django.core.cache.backends.locmem import LocMemCache  # pylint: disable=E0401
+from django.core.exceptions import ImproperlyConfigured  # pylint: disable=E0401
+from django.utils.crypto import constant_time_compare, salted_hmac  # pylint: disable=E0401
+
+OTP_DIGITS = 6 # Length of the codes
+
+
+def check_otp_cache():
+    """
+    Refuse a cache local to each worker when several workers serve the API.
+
+    Each worker would then know only the OTPs it issued and count the
+    guesses at them on its own, multiplying ``settings.OTP_MAX_ATTEMPTS``.
+
+    Raises:
+        ImproperlyConfigured: If the ``otp`` cache is a ``LocMemCache`` and
+            ``settings.WEB_CONCURRENCY`` is above 1.
+    """
+    if settings.WEB_CONCURRENCY > 1 and isinstance(caches["otp"], LocMemCache):
+        raise ImproperlyConfigured("OTP_CACHE_BACKEND must be a shared cache, e.g. "
+                                   "django.core.cache.backends.redis.RedisCache, "
+                                   "when WEB_CONCURRENCY is above 1.")
+
+
+def otp_key(email):
+    """
+    Build the cache key of an email's OTP.
+
+    Args:
+        email (str): The normalized email address.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"otp:{email}"
+
+
+def attempts_key(email):
+    """
+    Build the cache key of the guesses made at an email's OTP.
+
+    Args:
+        email (str): The normalized email address.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"otp-attempts:{email}"
+
+
+def otp_digest(email, code):
+    """
+    Hash an OTP, so that the cache never holds a usable code.
+
+    Args:
+        email (str): The normalized email address.
+        code (str): The code.
+
+    Returns:
+        str: The HMAC of the code, salted with the email.
+    """
+    return salted_hmac("auth_review.otp", f"{email}:{code}").hexdigest()
+
+
+def issue_otp(email):
+    """
+    Generate a new OTP for an email, replacing any previous one.
+
+    Args:
+        email (str): The normalized email address.
+
+    Returns:
+        str: The code to send to the user.
+    """
+    code = f"{secrets.randbelow(10 ** OTP_DIGITS):0{OTP_DIGITS}d}"
+    ttl = settings.OTP_TTL_SECONDS
+    caches["otp"].set_many({
+        otp_key(email): {"digest": otp_digest(email, code), "expires": time.time() + ttl},
+        attempts_key(email): 0,
+    }, timeout=ttl)
+    return code
+
+
+def check_otp(email, code, consume=False):
+    """
+    Check an OTP entered by the user.
+
+    Every check counts as an attempt until the code turns out to be
+    right; the OTP is dropped after ``settings.OTP_MAX_ATTEMPTS`` wrong ones.
+
+    Args:
+        email (str): The normalized email address.
+        code (str): The code entered.
+        consume (bool): Drop the OTP if the code is right, so that it
+            cannot be used again.
+
+    Returns:
+        bool: True if the email has an unexpired OTP and the code is it.
+    """
+    cache = caches["otp"]
+    key, counter = otp_key(email), attempts_key(email)
+    record = cache.get(key)
+    if record is None or not code:
+        return False
+    remaining = record["expires"] - time.time()
+    if remaining <= 0:
+        cache.delete_many([key, counter])
+        return False
+    cache.add(counter, 0, timeout=remaining) # In case it was evicted
+    try:
+        attempts = cache.incr(counter)
+    except ValueError: # Expired since it was read
+        return False
+    if attempts > settings.OTP_MAX_ATTEMPTS:
+        cache.delete_many([key, counter])
+        return False
+    if constant_time_compare(record["digest"], otp_digest(email, str(code))):
+        if consume:
+            cache.delete_many([key, counter])
+        else: # A right code is not a guess; give the attempt back
+            try:
+                cache.decr(counter)
+            except ValueError: # Dropped by a concurrent check
+                pass
+        return True
+    if attempts == settings.OTP_MAX_ATTEMPTS:
+        cache.delete_many([key, counter])
+    return False
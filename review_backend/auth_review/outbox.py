@@ -0,0 +1,238 @@
+"""
+Asynchronous delivery of the emails sent by the views.
+
+Sending an email through SendGrid takes a network round trip that can last
+seconds, which used to hold the registration and OTP requests. The views now
+only store the email in the outbox (``enqueue_email``), a collection of
+``OutboxEmail`` documents, and return. ``drain_outbox``, run by the
+``drain_outbox`` management command as a background worker, sends the due
+emails, the longest waiting first.
+
+A failed send is retried with an exponential backoff: the n-th failure
+delays the email by ``BACKOFF_BASE_SECONDS * 2 ** (n - 1)`` seconds, up to
+``BACKOFF_MAX_SECONDS``, and after ``MAX_ATTEMPTS`` failures the email is
+marked ``failed`` and kept with its last error.
+
+Emails are handed to a transport, a class with a ``send(email)`` method
+that raises on failure. ``settings.EMAIL_OUTBOX_TRANSPORT`` names the one
+used: ``SendGridTransport`` in production, ``ConsoleTransport`` or
+``FileTransport`` to read the emails locally and in tests.
+"""
+import json
+import sys
+from datetime import timedelta
+from django.conf import settings  # pylint: disable=E0401
+from django.utils import timezone  # pylint: disable=E0401
+from django.utils.module_loading import import_string  # pylint: disable=E0401
+from sendgrid import SendGridAPIClient
+from sendgrid.helpers.mail import Mail
+from .models import OutboxEmail
+
+MAX_ATTEMPTS = 8 # Failed sends before an email is given up
+BACKOFF_BASE_SECONDS = 30 # Delay after the first failed send
+BACKOFF_MAX_SECONDS = 3600 # Longest delay between two sends
+CLAIM_SECONDS = 300 # Time a worker has to send an email it claimed
+DRAIN_BATCH_SIZE = 100 # Emails read by one drain
+
+
+# pylint: disable=R0903
+class SendGridTransport:
+    """
+    Send the emails with the SendGrid API.
+
+    Methods:
+        send(email): sends one email, raising on an error response.
+    """
+
+    def __init__(self):
+        self.client = SendGridAPIClient(settings.SENDGRID_API_KEY)
+
+    def send(self, email):
+        """
+        Send an email.
+
+        Args:
+            email (OutboxEmail): The email to send.
+
+        Raises:
+            Exception: The SendGrid client raises on an error response.
+        """
+        self.client.send(Mail(
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to_emails=email.to_email,
+            subject=email.subject,
+            html_content=email.html_content,
+        ))
+
+
+# pylint: disable=R0903
+class ConsoleTransport:
+    """
+    Write the emails to a stream, the standard output by default.
+
+    Methods:
+        send(email): writes one email.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send(self, email):
+        """
+        Write an email.
+
+        Args:
+            email (OutboxEmail): The email to write.
+        """
+        self.stream.write(f"To: {email.to_email}\nSubject: {email.subject}\n\n"
+                          f"{email.html_content}\n{'-' * 79}\n")
+        self.stream.flush()
+
+
+# pylint: disable=R0903
+class FileTransport:
+    """
+    Append the emails to a file, one JSON object per line.
+
+    Methods:
+        send(email): appends one email.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or settings.EMAIL_OUTBOX_FILE
+
+    def send(self, email):
+        """
+        Append an email to the file.
+
+        Args:
+            email (OutboxEmail): The email to append.
+        """
+        line = json.dumps({"to": email.to_email, "subject": email.subject,
+                           "html": email.html_content})
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+
+def get_transport():
+    """
+    Return the transport named by ``settings.EMAIL_OUTBOX_TRANSPORT``.
+
+    Returns:
+        object: A new instance of the transport class.
+    """
+    return import_string(settings.EMAIL_OUTBOX_TRANSPORT)()
+
+
+def enqueue_email(to_email, subject, html_content):
+    """
+    Store an email in the outbox, due immediately.
+
+    Args:
+        to_email (str): The recipient.
+        subject (str): The subject line.
+        html_content (str): The HTML body.
+
+    Returns:
+        OutboxEmail: The stored email.
+    """
+    return OutboxEmail.objects.create( # pylint: disable=E1101
+        to_email=to_email, subject=subject, html_content=html_content,
+        next_attempt_at=timezone.now())
+
+
+def enqueue_emails(messages):
+    """
+    Store several emails in the outbox with one insert, all due immediately.
+
+    Args:
+        messages (list): ``(to_email, subject, html_content)`` tuples.
+
+    Returns:
+        int: The number of emails stored.
+    """
+    now = timezone.now()
+    OutboxEmail.objects.bulk_create([ # pylint: disable=E1101
+        OutboxEmail(to_email=to_email, subject=subject, html_content=html_content,
+                    next_attempt_at=now)
+        for to_email, subject, html_content in messages])
+    return len(messages)
+
+
+def backoff(attempts):
+    """
+    Return the delay before the next send of an email.
+
+    Args:
+        attempts (int): The number of failed sends so far, at least 1.
+
+    Returns:
+        timedelta: The delay.
+    """
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1),
+                                 BACKOFF_MAX_SECONDS))
+
+
+def claim(email, now):
+    """
+    Reserve a due email for the calling worker.
+
+    The email is pushed ``CLAIM_SECONDS`` into the future with an update
+    conditioned on its current due time, so that when several workers read
+    the same email only one of them sends it. An email whose worker died is
+    due again once the claim expires.
+
+    Args:
+        email (OutboxEmail): The due email, as read.
+        now (datetime): The current time.
+
+    Returns:
+        bool: True if this worker got the email.
+    """
+    # pylint: disable=E1101
+    return OutboxEmail.objects.filter(
+        pk=email.pk, status=OutboxEmail.PENDING, next_attempt_at=email.next_attempt_at,
+    ).update(next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS)) == 1
+
+
+def drain_outbox(transport=None, limit=DRAIN_BATCH_SIZE):
+    """
+    Send the due emails of the outbox, oldest first.
+
+    Args:
+        transport (object, optional): The transport, by default the one of
+            the settings.
+        limit (int): The most emails sent.
+
+    Returns:
+        dict: The number of emails ``sent``, ``retried`` later and
+        ``failed`` for good.
+    """
+    transport = transport or get_transport()
+    counts = {"sent": 0, "retried": 0, "failed": 0}
+    now = timezone.now()
+    # pylint: disable=E1101
+    due = (OutboxEmail.objects.filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+           .order_by("next_attempt_at", "id")[:limit])
+    for email in list(due):
+        if not claim(email, now):
+            continue
+        try:
+            transport.send(email)
+        except Exception as e: # pylint: disable=W0718
+            email.attempts += 1
+            email.last_error = str(e)[:1000]
+            if email.attempts >= MAX_ATTEMPTS:
+                email.status = OutboxEmail.FAILED
+                counts["failed"] += 1
+            else:
+                email.next_attempt_at = timezone.now() + backoff(email.attempts)
+                counts["retried"] += 1
+            OutboxEmail.objects.filter(pk=email.pk).update(
+                status=email.status, attempts=email.attempts,
+                last_error=email.last_error, next_attempt_at=email.next_attempt_at)
+            continue
+        OutboxEmail.objects.filter(pk=email.pk).update(
+            status=OutboxEmail.SENT, sent_at=timezone.now())
+        counts["sent"] += 1
+    return counts
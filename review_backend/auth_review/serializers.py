@@ -6,14 +6,18 @@ user authentication and the registration of new users, including custom
 validation and user attribute management.
 """
 from rest_framework import serializers  # pylint: disable=E0401
-from rest_framework.validators import UniqueValidator  # pylint: disable=E0401
 from rest_framework.exceptions import ValidationError  # Use this for consistency
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer  # pylint: disable=E0401
+from rest_framework_simplejwt.settings import api_settings  # pylint: disable=E0401
+from django.contrib.auth.models import update_last_login  # pylint: disable=E0401
 
 # Import for enforcing strong passwords
 from django.contrib.auth.password_validation import validate_password  # pylint: disable=E0401
 # Get user model dynamically
 from django.contrib.auth import get_user_model
+from service.mongo import atomic_unless_mongo # Insert without a transaction on Djongo
+from service.timing import TimedSerializerMixin # Serializer time of the timed requests
+from .login import login_user # Single-lookup authentication of a login
 
 # Third-party imports
 # from rest_framework import serializers  # pylint: disable=E0401
@@ -33,8 +37,46 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     custom claims to the JWT, such as the username.
 
     Methods:
+        validate(attrs): Authenticates the credentials and issues the tokens.
+        tokens_for(user): Issues the refresh and access tokens of a user.
         get_token(user): Generates a JWT for the given user, adding custom claims.
     """
+    def validate(self, attrs):
+        """
+        Authenticate the credentials with ``login_user`` and issue the tokens.
+
+        Args:
+            attrs (dict): The validated username and password.
+
+        Raises:
+            AuthenticationFailed: If the credentials are wrong or the account
+                is inactive.
+            EmailNotVerified: If the account's email is not verified.
+
+        Returns:
+            dict: The ``refresh`` and ``access`` tokens.
+        """
+        user = login_user(attrs[self.username_field], attrs["password"])
+        # Exposed like simplejwt's TokenObtainSerializer.validate does
+        self.user = user # pylint: disable=W0201
+        return self.tokens_for(user)
+
+    @classmethod
+    def tokens_for(cls, user):
+        """
+        Issue the refresh and access tokens of an authenticated user.
+
+        Args:
+            user: The authenticated user.
+
+        Returns:
+            dict: The ``refresh`` and ``access`` tokens.
+        """
+        refresh = cls.get_token(user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
+        return {"refresh": str(refresh), "access": str(refresh.access_token)}
+
     @classmethod
     def get_token(cls, user):
         """
@@ -59,6 +101,7 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         token = super(MyTokenObtainPairSerializer, cls).get_token(user) # Generate token
         token["username"] = user.username  # Add custom claim for username
         token["is_verified"] = user.is_verified
+        token["is_staff"] = user.is_staff # Read by StatelessJWTAuthentication
         return token
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -75,10 +118,9 @@ class RegisterSerializer(serializers.ModelSerializer):
     Methods:
         create(validated_data): Creates a new user instance with the validated data.
     """
-    username = serializers.CharField(
-        required=True,
-        validators=[UniqueValidator(queryset=User.objects.all())] # Ensures unique usernames
-    )
+    # Uniqueness of the username and email is left to the unique indexes, see
+    # RegisterView, so that registering costs a single insert
+    username = serializers.CharField(required=True)
 
     email = serializers.EmailField(
         required=True,
@@ -101,17 +143,21 @@ class RegisterSerializer(serializers.ModelSerializer):
         Args:
             validated_data (dict): The validated data containing username and password.
 
+        Raises:
+            DatabaseError: If the username or email is taken, see ``is_duplicate_key``.
+
         Returns:
             User: The created user instance.
         """
-        # Create user with username
-        user = User.objects.create(username=validated_data["username"],
-                                   email=validated_data['email'],
-                                   is_verified=False)
+        # Build the user with all its fields, then insert it with one write
+        user = User(username=validated_data["username"],
+                    email=validated_data['email'],
+                    is_verified=False)
         user.is_active = True # Set user to active state
         user.is_admin = True # Grant admin privileges
         user.set_password(validated_data["password"]) # Securely hash the password
-        user.save() # Save the user instance to the database
+        with atomic_unless_mongo(User): # Keeps the request usable if the insert is refused
+            user.save(force_insert=True) # Insert; a duplicate raises instead of updating
 
         return user
 
@@ -127,7 +173,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         model = User # Link serializer to the User model
         fields = ["username", "password", "email"] # Specify fields to include in output
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
         Serializer for user's profile info.
     """
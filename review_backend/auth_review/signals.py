@@ -0,0 +1,20 @@
+"""
+Signal handlers for the 'auth_review' application.
+
+They drop a user from the per-process user cache of
+``CachedJWTAuthentication`` when it is saved or deleted, so that a profile
+update, a password change or a deactivation is seen by the next request of
+the user in this process.
+"""
+from django.db.models.signals import post_delete, post_save  # pylint: disable=E0401
+from django.dispatch import receiver  # pylint: disable=E0401
+from .authentication import get_user_cache
+from .models import Client
+
+
+# pylint: disable=W0613
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def forget_cached_user(sender, instance, **kwargs):
+    """Drop a saved or deleted user from the user cache."""
+    get_user_cache().forget(instance.pk)
@@ -9,14 +9,38 @@ of the authentication process, ensuring that the implementation
 meets the expected behavior.
 """
 
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import timedelta
 from unittest.mock import patch
 from django.contrib.auth import get_user_model  # pylint: disable=E0401
+from django.core.cache import caches  # pylint: disable=E0401
+from django.core.exceptions import ImproperlyConfigured  # pylint: disable=E0401
 from django.urls import reverse  # pylint: disable=E0401
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.contrib.auth.tokens import default_token_generator
+from django.test import override_settings  # pylint: disable=E0401
+from django.utils import timezone  # pylint: disable=E0401
+from django.core.management import call_command  # pylint: disable=E0401
+from django.db import connection  # pylint: disable=E0401
+from django.test.utils import CaptureQueriesContext  # pylint: disable=E0401
 from rest_framework import status  # pylint: disable=E0401
-from rest_framework.test import APITestCase  # pylint: disable=E0401
+from rest_framework.test import APIRequestFactory, APITestCase  # pylint: disable=E0401
+from rest_framework.exceptions import AuthenticationFailed  # pylint: disable=E0401
+from .authentication import (CachedJWTAuthentication, StatelessJWTAuthentication,
+                             get_user_cache)
+from .models import OutboxEmail
+from .outbox import (MAX_ATTEMPTS, ConsoleTransport, FileTransport, backoff,
+                     drain_outbox, enqueue_email)
+from .otp import check_otp, check_otp_cache, issue_otp
+from .serializers import MyTokenObtainPairSerializer
+from .throttling import EMAIL_BUCKETS, TokenBuckets
 
 User = get_user_model()
 
@@ -49,6 +73,7 @@ class AuthTests(APITestCase):
         self.register_url = reverse("register")
         self.token_url = reverse("token_obtain_pair")
         self.token_refresh_url = reverse("token_refresh")
+        EMAIL_BUCKETS.clear()
         # Create an inactive user for testing
         # self.inactive_user = User.objects.create_user(
         #     username="inactiveuser",
@@ -56,16 +81,15 @@ class AuthTests(APITestCase):
         #     is_active=False
         # )
 
-    @patch('auth_review.views.SendGridAPIClient')
+    @patch('auth_review.outbox.SendGridAPIClient')
 
     def test_register_new_user_success(self, mock_sendgrid):
         """Test successful registration of a new user.
 
         This test verifies that a new user can be registered successfully
-        and receives a confirmation message.
+        and receives a confirmation message, and that the verification
+        email is queued rather than sent during the request.
         """
-        # Mock the SendGrid send method
-        mock_sendgrid.return_value.send.return_value = True
         # Test successful registration
         data = {"username": "newuser", "email": "newuser@example.com", "password": "newpassword123"}
         response = self.client.post(self.register_url, data, format="json")
@@ -80,8 +104,11 @@ class AuthTests(APITestCase):
         self.assertFalse(user.is_verified)
         self.assertEqual(user.email, "newuser@example.com")
 
-        # Verify SendGrid was called
-        mock_sendgrid.return_value.send.assert_called_once()
+        # Verify the email was queued and SendGrid was not called
+        email = OutboxEmail.objects.get(to_email="newuser@example.com")
+        self.assertEqual(email.subject, "Verify your email")
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        mock_sendgrid.assert_not_called()
 
     def test_register_existing_user_error(self):
         """Test registration with an existing username.
@@ -99,6 +126,17 @@ class AuthTests(APITestCase):
         self.assertFalse(response.data["data"]["val"])
         self.assertEqual(response.data["data"]["detail"], "Entered username or email exists")
 
+    def test_register_email_queue_failure(self):
+        """Test that a user whose verification email cannot be queued is removed."""
+        data = {"username": "newuser", "email": "newuser@example.com",
+                "password": "newpassword123"}
+        with patch("auth_review.views.enqueue_email", side_effect=RuntimeError("down")):
+            response = self.client.post(self.register_url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(response.data["data"],
+                         {"val": False, "detail": "Failed to queue verification email: down"})
+        self.assertFalse(User.objects.filter(username="newuser").exists())
+
     def test_token_obtain_pair_success(self):
         """Test successful JWT token generation with valid credentials.
 
@@ -278,3 +316,476 @@ class ProfileTests(APITestCase):
         self.assertEqual(self.user.first_name, "Test")
         self.assertEqual(self.user.last_name, "User")
         self.assertEqual(self.user.bio, "This is a test bio.")
+
+    def test_get_profile_not_modified(self):
+        """
+        Test that a current ETag gets 304 and an updated profile a new ETag.
+        """
+        etag = self.client.get(self.profile_url)["ETag"]
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.put(self.profile_url, {"bio": "Updated bio."})
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+# pylint: disable=R0903
+class FailingTransport:
+    """A transport whose sends always fail."""
+
+    def send(self, email):
+        """Fail to send the email."""
+        raise ConnectionError(f"Cannot reach the provider for {email.to_email}")
+
+
+class OutboxTests(APITestCase):
+    """
+    Tests for the email outbox and its worker.
+    """
+    # pylint: disable=C0103
+    def setUp(self):
+        """
+        Create a user and a file for the FileTransport.
+        """
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="password123"
+        )
+        handle, self.path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        EMAIL_BUCKETS.clear()
+
+    def read_file(self):
+        """Return the emails the FileTransport wrote."""
+        with open(self.path, encoding="utf-8") as file:
+            return [json.loads(line) for line in file]
+
+    def test_send_otp_queues_email(self):
+        """
+        Test that the OTP email is queued and sent by the drain.
+        """
+        response = self.client.post(reverse("send_otp"), {
+            "email": "testuser@example.com"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("otp", response.data)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.subject, "Reset your password")
+        code = re.search(r"<b>(\d{6}) </b>", email.html_content).group(1)
+
+        counts = drain_outbox(FileTransport(self.path))
+        self.assertEqual(counts, {"sent": 1, "retried": 0, "failed": 0})
+        sent = self.read_file()
+        self.assertEqual(sent[0]["to"], "testuser@example.com")
+        self.assertIn(code, sent[0]["html"])
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.SENT)
+        self.assertIsNotNone(email.sent_at)
+        # A sent email is not sent again
+        self.assertEqual(drain_outbox(FileTransport(self.path))["sent"], 0)
+
+    def test_failed_send_is_retried_with_backoff(self):
+        """
+        Test that a failed send is rescheduled with a growing delay and
+        given up after the last attempt.
+        """
+        email = enqueue_email("testuser@example.com", "Hello", "<p>Hi</p>")
+        counts = drain_outbox(FailingTransport())
+        self.assertEqual(counts, {"sent": 0, "retried": 1, "failed": 0})
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        self.assertIn("Cannot reach the provider", email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now() + backoff(1) / 2)
+        # Not due again until the backoff has passed
+        self.assertEqual(drain_outbox(FileTransport(self.path))["sent"], 0)
+        self.assertGreater(backoff(3), backoff(2))
+
+        OutboxEmail.objects.filter(pk=email.pk).update(
+            attempts=MAX_ATTEMPTS - 1, next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(drain_outbox(FailingTransport())["failed"], 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.FAILED)
+
+    def test_drain_command_uses_configured_transport(self):
+        """
+        Test that the drain_outbox command sends with the transport of the settings.
+        """
+        enqueue_email("testuser@example.com", "First", "<p>1</p>")
+        enqueue_email("testuser@example.com", "Second", "<p>2</p>")
+        out = io.StringIO()
+        with override_settings(EMAIL_OUTBOX_TRANSPORT="auth_review.outbox.FileTransport",
+                               EMAIL_OUTBOX_FILE=self.path):
+            call_command("drain_outbox", stdout=out)
+        self.assertIn("2 sent", out.getvalue())
+        self.assertEqual([email["subject"] for email in self.read_file()], ["First", "Second"])
+
+    def test_console_transport(self):
+        """
+        Test that the console transport writes the email to its stream.
+        """
+        stream = io.StringIO()
+        enqueue_email("testuser@example.com", "Hello", "<p>Hi</p>")
+        drain_outbox(ConsoleTransport(stream))
+        self.assertIn("To: testuser@example.com", stream.getvalue())
+        self.assertIn("<p>Hi</p>", stream.getvalue())
+
+
+class LoginTests(APITestCase):
+    """
+    Tests for the single-lookup login pipeline and its asynchronous variant.
+    """
+    # pylint: disable=C0103
+    def setUp(self):
+        """
+        Create a verified, an unverified and an inactive user.
+        """
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="securepassword")
+        self.user.is_verified = True
+        self.user.save()
+        User.objects.create_user(
+            username="unverified", email="unverified@example.com", password="securepassword")
+        inactive = User.objects.create_user(
+            username="inactive", email="inactive@example.com", password="securepassword")
+        inactive.is_verified = True
+        inactive.is_active = False
+        inactive.save()
+        caches["default"].clear()
+        self.urls = [reverse("token_obtain_pair"), reverse("token_obtain_pair_async")]
+
+    def login(self, url, username, password="securepassword"):
+        """Post credentials to a token endpoint."""
+        return self.client.post(url, {"username": username, "password": password},
+                                format="json")
+
+    def test_login_reads_the_user_once(self):
+        """
+        Test that a successful login makes a single query.
+        """
+        with self.assertNumQueries(1):
+            response = self.login(self.urls[0], "testuser")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access", response.data["data"]["tokens"])
+
+    def test_both_endpoints_answer_alike(self):
+        """
+        Test the answers of both endpoints to each kind of login.
+        """
+        for url in self.urls:
+            response = self.login(url, "testuser")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            tokens = response.json()["data"]["tokens"]
+            self.assertEqual(set(tokens), {"access", "refresh"})
+
+            response = self.login(url, "unverified")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.json()["detail"],
+                             "Please verify your email before logging in.")
+
+            for username, password in (("unverified", "wrong"), ("testuser", "wrong"),
+                                       ("inactive", "securepassword"),
+                                       ("nobody", "securepassword")):
+                response = self.login(url, username, password)
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+            response = self.client.post(url, {}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("password", response.json())
+
+    @override_settings(THROTTLE_RATES={"login": "2/min"})
+    def test_both_endpoints_share_the_login_rate(self):
+        """
+        Test that the asynchronous endpoint is throttled like the other, on
+        the same count.
+        """
+        self.assertEqual(self.login(self.urls[0], "testuser").status_code, status.HTTP_200_OK)
+        self.assertEqual(self.login(self.urls[1], "testuser").status_code, status.HTTP_200_OK)
+        for url in self.urls:
+            response = self.login(url, "testuser")
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertIn("Retry-After", response)
+
+
+class UserCacheTests(APITestCase):
+    """
+    Tests for the cached and stateless user resolution of the JWT authentication.
+    """
+    # pylint: disable=C0103
+    def setUp(self):
+        """
+        Create a verified user and an access token for it.
+        """
+        get_user_cache().clear()
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="securepassword")
+        self.user.is_verified = True
+        self.user.save()
+        self.access = str(MyTokenObtainPairSerializer.get_token(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        self.profile_url = reverse("profile")
+
+    def test_user_is_read_once_per_ttl(self):
+        """
+        Test that a second request reuses the user read by the first.
+        """
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.profile_url).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.profile_url)
+        self.assertEqual(response.data["username"], "testuser")
+
+    def test_saving_the_user_invalidates_it(self):
+        """
+        Test that profile updates and deactivation are seen by the next request.
+        """
+        self.client.get(self.profile_url)
+        self.client.put(self.profile_url, {"bio": "Updated bio."}, format="json")
+        self.assertEqual(self.client.get(self.profile_url).data["bio"], "Updated bio.")
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.profile_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_user_is_copied_per_request(self):
+        """
+        Test that each authentication gets its own copy of the cached user.
+        """
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        first, _ = CachedJWTAuthentication().authenticate(request)
+        first.bio = "Changed in memory"
+        second, _ = CachedJWTAuthentication().authenticate(request)
+        self.assertIsNot(first, second)
+        self.assertIsNone(second.bio)
+
+    def test_stateless_user_comes_from_the_claims(self):
+        """
+        Test that the stateless authentication reads no user.
+        """
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        with self.assertNumQueries(0):
+            user, _ = StatelessJWTAuthentication().authenticate(request)
+        self.assertEqual((user.pk, user.is_verified, user.is_staff), ("testuser", True, False))
+
+        User.objects.filter(pk="testuser").delete()
+        with self.assertRaises(AuthenticationFailed):
+            CachedJWTAuthentication().authenticate(request)
+
+
+class RegistrationTests(APITestCase):
+    """
+    Tests for the single-insert registration and the unique normalized email.
+    """
+    # pylint: disable=C0103
+    def setUp(self):
+        """
+        Create an existing user.
+        """
+        User.objects.create_user(
+            username="testuser", email="TestUser@Example.com", password="securepassword")
+        self.register_url = reverse("register")
+        EMAIL_BUCKETS.clear()
+
+    def register(self, username, email):
+        """Post a registration."""
+        return self.client.post(self.register_url, {
+            "username": username, "email": email, "password": "newpassword123"}, format="json")
+
+    def test_email_is_stored_normalized(self):
+        """
+        Test that emails are stored lowercased and found whatever their case.
+        """
+        self.assertEqual(User.objects.get(pk="testuser").email, "testuser@example.com")
+        response = self.client.post(reverse("send_otp"), {
+            "email": " TESTUSER@example.COM "}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_registration_is_one_insert(self):
+        """
+        Test that a registration writes the user with one insert and no lookup.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.register("newuser", "NewUser@example.com")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user_queries = [query["sql"] for query in queries.captured_queries
+                        if "auth_review_client" in query["sql"]]
+        self.assertEqual(len(user_queries), 1)
+        self.assertTrue(user_queries[0].startswith("INSERT"))
+        self.assertEqual(User.objects.get(pk="newuser").email, "newuser@example.com")
+
+    def test_taken_username_or_email_is_refused(self):
+        """
+        Test that the unique indexes refuse a taken username or email with a 400.
+        """
+        for username, email in (("testuser", "other@example.com"),
+                                ("otheruser", "TESTUSER@example.com")):
+            response = self.register(username, email)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data["data"]["detail"], "Entered username or email exists")
+        self.assertEqual(User.objects.count(), 1)
+        self.assertFalse(OutboxEmail.objects.exists())
+
+
+class OtpTests(APITestCase):
+    """
+    Tests for the server-side one-time passwords and the email throttle.
+    """
+    # pylint: disable=C0103
+    def setUp(self):
+        """
+        Create a user and start with no OTP and full buckets.
+        """
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="password123"
+        )
+        caches["otp"].clear()
+        caches["default"].clear()
+        EMAIL_BUCKETS.clear()
+
+    def send_otp(self, email="testuser@example.com"):
+        """Request an OTP and return the code of the queued email."""
+        response = self.client.post(reverse("send_otp"), {"email": email}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        html = OutboxEmail.objects.order_by("-id").first().html_content
+        return re.search(r"<b>(\d{6}) </b>", html).group(1)
+
+    def update_password(self, otp):
+        """Post a new password with an OTP."""
+        data = {"email": "testuser@example.com", "password": "NewPassword456!"}
+        if otp is not None:
+            data["otp"] = otp
+        return self.client.post(reverse("update_password"), data, format="json")
+
+    def test_update_password_requires_the_otp(self):
+        """
+        Test that the password is only updated with the OTP sent, once.
+        """
+        code = self.send_otp()
+        response = self.client.post(reverse("verify_otp"), {
+            "email": "TestUser@example.com", "otp": code}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.update_password(None).status_code, status.HTTP_400_BAD_REQUEST)
+        wrong = f"{(int(code) + 1) % 1_000_000:06d}"
+        self.assertEqual(self.update_password(wrong).status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("password123"))
+
+        self.assertEqual(self.update_password(code).status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("NewPassword456!"))
+        # The OTP is used up
+        self.assertEqual(self.update_password(code).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_new_otp_replaces_the_previous_one(self):
+        """
+        Test that only the latest OTP of an email is valid.
+        """
+        first = issue_otp("testuser@example.com")
+        second = issue_otp("testuser@example.com")
+        if first != second:
+            self.assertFalse(check_otp("testuser@example.com", first))
+        self.assertTrue(check_otp("testuser@example.com", second))
+
+    @override_settings(OTP_MAX_ATTEMPTS=3)
+    def test_otp_dropped_after_max_attempts(self):
+        """
+        Test that the OTP cannot be used after too many wrong guesses.
+        """
+        code = issue_otp("testuser@example.com")
+        wrong = f"{(int(code) + 1) % 1_000_000:06d}"
+        for _ in range(3):
+            self.assertFalse(check_otp("testuser@example.com", wrong))
+        self.assertFalse(check_otp("testuser@example.com", code))
+
+    @override_settings(OTP_MAX_ATTEMPTS=3)
+    def test_concurrent_guesses_share_the_attempts(self):
+        """
+        Test that guesses checked at once are each counted, so that no more
+        than OTP_MAX_ATTEMPTS of them are compared to the code.
+        """
+        code = issue_otp("testuser@example.com")
+        wrong = f"{(int(code) + 1) % 1_000_000:06d}"
+        compared = []
+        with patch("auth_review.otp.constant_time_compare",
+                   side_effect=lambda a, b: compared.append(1) or a == b):
+            threads = [threading.Thread(target=check_otp, args=("testuser@example.com", wrong))
+                       for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertLessEqual(len(compared), 3)
+        self.assertFalse(check_otp("testuser@example.com", code))
+
+    @override_settings(THROTTLE_RATES={"otp": "2/min"})
+    def test_otp_checks_are_throttled(self):
+        """
+        Test that OTP checks, by verify-otp or update-password, are refused
+        past the rate of the otp scope.
+        """
+        response = self.client.post(reverse("verify_otp"), {
+            "email": "testuser@example.com", "otp": "000000"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.update_password("000000").status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse("verify_otp"), {
+            "email": "testuser@example.com", "otp": "000000"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.update_password("000000").status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_local_otp_cache_refused_with_several_workers(self):
+        """
+        Test that a cache local to each worker is refused for the OTPs when
+        several workers serve the API.
+        """
+        check_otp_cache()
+        with override_settings(WEB_CONCURRENCY=2):
+            with self.assertRaises(ImproperlyConfigured):
+                check_otp_cache()
+
+    def test_otp_expires(self):
+        """
+        Test that the OTP is refused once its lifetime has passed.
+        """
+        code = issue_otp("testuser@example.com")
+        later = time.time() + 601
+        with patch("time.time", return_value=later):
+            self.assertFalse(check_otp("testuser@example.com", code))
+
+    @override_settings(EMAIL_THROTTLE_RATES={"ip": (3, 30), "email": (2, 6)})
+    def test_throttled_requests_get_429_without_queries(self):
+        """
+        Test that requests beyond the burst of an email or an IP are refused
+        with a 429 and a Retry-After header before the database is read.
+        """
+        self.send_otp()
+        self.send_otp()
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse("send_otp"), {
+                "email": " TESTUSER@example.com"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "600")
+        self.assertEqual(OutboxEmail.objects.count(), 2)
+
+        # Another address from the same IP drains the IP's bucket
+        response = self.client.post(reverse("send_otp"), {
+            "email": "other@example.com"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        response = self.client.post(reverse("register"), {
+            "username": "newuser", "email": "newuser@example.com",
+            "password": "newpassword123"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertFalse(User.objects.filter(pk="newuser").exists())
+
+    def test_token_bucket_refills(self):
+        """
+        Test that a bucket gives its burst, then one token per refill period.
+        """
+        buckets = TokenBuckets()
+        self.assertEqual([buckets.take("key", 2, 60, now=0) for _ in range(2)], [0, 0])
+        self.assertEqual(buckets.take("key", 2, 60, now=0), 60)
+        self.assertEqual(buckets.take("key", 2, 60, now=30), 30)
+        self.assertEqual(buckets.take("key", 2, 60, now=60), 0)
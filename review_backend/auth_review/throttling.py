@@ -0,0 +1,123 @@
+"""
+Token-bucket rate limiting of the views that send emails.
+
+Every call to ``register/`` or ``send-otp/`` queues an email, which costs a
+SendGrid request, and reads the user collection. ``EmailSendThrottle``
+refuses a script hammering them before the view runs, with a 429 and a
+``Retry-After`` header, so a refused request touches neither.
+
+Each client IP and each email address has a token bucket: it holds up to
+``burst`` tokens, refills at ``per_hour`` tokens an hour, and a request
+takes one token from both the bucket of its IP and that of its email. The
+rates are set in ``settings.EMAIL_THROTTLE_RATES``.
+
+The buckets are kept in the memory of each process, so that checking them
+costs microseconds; with several workers a client gets at most the rate of
+each worker it reaches.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings  # pylint: disable=E0401
+from rest_framework.throttling import BaseThrottle  # pylint: disable=E0401
+from .models import ClientManager
+
+MAX_BUCKETS = 100_000 # Buckets kept per process, the least recently used go first
+
+
+class TokenBuckets:
+    """
+    A thread-safe set of token buckets, one per key.
+
+    Methods:
+        take(key, burst, per_hour): takes a token from the bucket of a key.
+        clear(): drops every bucket.
+    """
+
+    def __init__(self, max_size=MAX_BUCKETS):
+        self.max_size = max_size
+        self._buckets = OrderedDict() # key -> (tokens, time of the last update)
+        self._lock = threading.Lock()
+
+    def take(self, key, burst, per_hour, now=None):
+        """
+        Take a token from the bucket of a key if it has one.
+
+        Args:
+            key (str): The bucket, e.g. ``ip:10.0.0.1``.
+            burst (int): The capacity of the bucket.
+            per_hour (float): The tokens added back per hour.
+            now (float, optional): The current monotonic time.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until the
+            bucket has one again.
+        """
+        now = time.monotonic() if now is None else now
+        rate = per_hour / 3600
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate if rate > 0 else float("inf")
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        """Drop every bucket."""
+        with self._lock:
+            self._buckets.clear()
+
+
+EMAIL_BUCKETS = TokenBuckets() # The buckets of this process
+
+
+class EmailSendThrottle(BaseThrottle):
+    """
+    Limit the requests that send an email, per client IP and per email.
+
+    Methods:
+        allow_request(request, view): takes a token from both buckets.
+        wait(): the seconds until the refused request would be allowed.
+    """
+
+    def __init__(self):
+        self.retry_after = None
+
+    def allow_request(self, request, view):
+        """
+        Take a token from the bucket of the client IP and of the email.
+
+        Both buckets are charged even when one is empty, so that a client
+        cycling through addresses still drains its IP's bucket.
+
+        Args:
+            request (Request): The request.
+            view (APIView): The view.
+
+        Returns:
+            bool: True if neither bucket is empty.
+        """
+        rates = settings.EMAIL_THROTTLE_RATES
+        keys = [("ip", self.get_ident(request))]
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        if isinstance(email, str) and email.strip():
+            keys.append(("email", ClientManager.normalize_email(email)))
+        waits = [EMAIL_BUCKETS.take(f"{scope}:{value}", *rates[scope]) for scope, value in keys]
+        self.retry_after = max(waits)
+        return self.retry_after == 0
+
+    def wait(self):
+        """
+        Return the seconds until the refused request would be allowed.
+
+        Returns:
+            float: The time until both buckets have a token again.
+        """
+        return self.retry_after
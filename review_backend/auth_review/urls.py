@@ -14,8 +14,8 @@ from rest_framework_simplejwt.views import TokenRefreshView  # pylint: disable=E
 from django.urls import path  # pylint: disable=E0401
 # Import custom views for obtaining JWT tokens and registering users
 from .views import MyTokenObtainPairView, RegisterView
-from .views import  VerifyEmailView, SendOtpView, UpdatePasswordView
-from .views import ProfileView
+from .views import  VerifyEmailView, SendOtpView, UpdatePasswordView, VerifyOtpView
+from .views import ProfileView, AsyncTokenObtainPairView
 
 
 # Define URL routing for the auth_review application.
@@ -23,6 +23,8 @@ urlpatterns = [
     # This endpoint when accessed triggers the  MyTokenObtainPairView.as_view to handle the request/
     # Deals with user authentication and returns JWT token upon successful login.
     path("token/", MyTokenObtainPairView.as_view(), name="token_obtain_pair"),
+    # Same login, hashing the password off the event loop when served by ASGI
+    path("token/async/", AsyncTokenObtainPairView.as_view(), name="token_obtain_pair_async"),
     # Endpoint for refreshing a JWT token. Routes to TokenRefreshView,
     # which manages refreshing an expired token to provide a new one.
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
@@ -36,6 +38,8 @@ urlpatterns = [
 
     path("send-otp/", SendOtpView.as_view(), name="send_otp"),
 
+    path("verify-otp/", VerifyOtpView.as_view(), name="verify_otp"),
+
     path("update-password/", UpdatePasswordView.as_view(), name="update_password")
 ]
 # Enable the API to respond to different formats by applying format suffix patterns
@@ -10,10 +10,13 @@ APIView and serializers for managing request and response data.
 
 
 # Create your views here.
+import hashlib
+import json
+from asgiref.sync import sync_to_async  # pylint: disable=E0401
 from rest_framework.views import APIView  # pylint: disable=E0401
 from rest_framework.permissions import AllowAny  # pylint: disable=E0401
 from rest_framework.response import Response  # pylint: disable=E0401
-from rest_framework.exceptions import MethodNotAllowed
+from rest_framework.exceptions import APIException, MethodNotAllowed
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status  # pylint: disable=E0401
 from rest_framework_simplejwt.views import TokenObtainPairView  # pylint: disable=E0401
@@ -22,13 +25,23 @@ from django.conf import settings
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.contrib.auth.tokens import default_token_generator
-from django.db.models import Q
+from django.db import DatabaseError
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from service.mongo import is_duplicate_key
+from service.throttling import throttled_response
+from .authentication import CachedJWTAuthentication
+from .login import alogin_user
+from .otp import check_otp, issue_otp
+from .outbox import enqueue_email
 from .serializers import MyTokenObtainPairSerializer, RegisterSerializer
 from .serializers import ProfileSerializer
+from .throttling import EmailSendThrottle
 
 # This class is responsible for handling essential functionality for user
 # registration and authentication.
@@ -44,13 +57,31 @@ User = get_user_model()
 # pylint: disable=R0903
 
 
+class RegistrationFailed(APIException):
+    """
+    A registration that was refused or could not be completed.
+
+    DRF renders it with the ``{"data": {"val": False, "detail": ...}}`` body
+    of the register view.
+    """
+    status_code = status.HTTP_400_BAD_REQUEST
+
+    def __init__(self, detail, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__()
+        self.detail = {"data": {"val": False, "detail": detail}} # Kept as is, val stays a bool
+        self.status_code = status_code
+
+
 class RegisterView(APIView):
     """
     This view handles the registration of a new user.
 
-    Validates the password and stores the user in the dataset.
+    Validates the password and stores the user in the dataset with a single
+    insert; a taken username or email is detected by the unique indexes.
     """
     permission_classes = [AllowAny]
+    # Refuses scripted sign-ups with a 429 before the user collection is read
+    throttle_classes = [EmailSendThrottle]
 
     # pylint: disable=W0718
     def post(self, request):
@@ -63,77 +94,90 @@ class RegisterView(APIView):
 
         Returns:
             Response: The http response of the object with status and response data. 
+
+        Raises:
+            RegistrationFailed: If the data is invalid, the username or email is
+                taken, or the user or the verification email cannot be saved.
         """
         try:
-            user = User.objects.filter(
-                Q(username=request.data["username"]) |
-                Q(email=request.data["email"])
-            )
-
-            if len(user) > 0:
-                return Response(
-                    {"data": {"val": False, "detail": "Entered username or email exists"}},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
             serializer = RegisterSerializer(data=request.data)
-            if serializer.is_valid():
-                try:
-                    user = serializer.save()
-                    token = default_token_generator.make_token(user)
-                    uid = urlsafe_base64_encode(force_bytes(user.pk))
-                    verification_link = f"{settings.FRONTEND_URL}/verify-email/{uid}/{token}/"
-
-                    html_content = f"Click <a href='{verification_link}'> " \
-                    f"{verification_link}</a> to verify your email."
-
-                    message = Mail(
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        to_emails=user.email,
-                        subject="Verify your email",
-                        html_content=html_content
-                    )
-
-                    try:
-                        sg = SendGridAPIClient(settings.SENDGRID_API_KEY)
-                        sg.send(message)
-                        return Response(
-                            {
-                                "data": {
-                                    "val": True, 
-                                    "detail": "Registration Successful. Please verify your email."
-                                }
-                            },
-                            status=status.HTTP_200_OK,
-                        )
-                    except Exception as e:
-                        # Delete the user if email sending fails
-                        user.delete()
-                        return Response(
-                            {
-                                "data": {
-                                    "val": False, 
-                                    "detail": f"Failed to send verification email: {str(e)}"
-                                }
-                            },
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        )
-                except Exception as e:
-                    return Response(
-                        {"data": {"val": False, "detail": f"Registration failed: {str(e)}"}},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    )
-
+            if not serializer.is_valid():
+                raise RegistrationFailed(serializer.errors)
+            self.send_verification(self.create_user(serializer))
             return Response(
-                {"data": {"val": False, "detail": serializer.errors}},
-                status=status.HTTP_400_BAD_REQUEST,
+                {
+                    "data": {
+                        "val": True, 
+                        "detail": "Registration Successful. Please verify your email."
+                    }
+                },
+                status=status.HTTP_200_OK,
             )
+        except RegistrationFailed:
+            raise # Rendered by DRF with its own status
         except Exception as e:
             return Response(
                 {"data": {"val": False, "detail": f"Server error: {str(e)}"}},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    # pylint: disable=W0718
+    @staticmethod
+    def create_user(serializer):
+        """
+        Save the validated user.
+
+        Args:
+            serializer (RegisterSerializer): The validated serializer.
+
+        Returns:
+            User: The new user.
+
+        Raises:
+            RegistrationFailed: If the username or email is taken, or the user
+                cannot be saved.
+        """
+        try:
+            return serializer.save()
+        except DatabaseError as e:
+            # The unique indexes on username and email refuse a taken one
+            if is_duplicate_key(e):
+                raise RegistrationFailed("Entered username or email exists") from e
+            raise RegistrationFailed(f"Registration failed: {str(e)}",
+                                     status.HTTP_500_INTERNAL_SERVER_ERROR) from e
+        except Exception as e:
+            raise RegistrationFailed(f"Registration failed: {str(e)}",
+                                     status.HTTP_500_INTERNAL_SERVER_ERROR) from e
+
+    # pylint: disable=W0718
+    @staticmethod
+    def send_verification(user):
+        """
+        Queue the verification email of a new user.
+
+        Args:
+            user (User): The new user.
+
+        Raises:
+            RegistrationFailed: If the email cannot be queued; the user is
+                deleted so that they can register again.
+        """
+        token = default_token_generator.make_token(user)
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
+        verification_link = f"{settings.FRONTEND_URL}/verify-email/{uid}/{token}/"
+
+        html_content = f"Click <a href='{verification_link}'> " \
+        f"{verification_link}</a> to verify your email."
+
+        # Sent by the outbox worker, so the request does not wait on SendGrid
+        try:
+            enqueue_email(user.email, "Verify your email", html_content)
+        except Exception as e:
+            # Delete the user if the email cannot be queued
+            user.delete()
+            raise RegistrationFailed(f"Failed to queue verification email: {str(e)}",
+                                     status.HTTP_500_INTERNAL_SERVER_ERROR) from e
+
 
 class VerifyEmailView(APIView):
     """
@@ -203,6 +247,7 @@ class MyTokenObtainPairView(TokenObtainPairView):
     # Allows token endpoint access to anyone
     permission_classes = [AllowAny]
     serializer_class = MyTokenObtainPairSerializer
+    throttle_scope = "login" # Slows password guessing, see THROTTLE_RATES["login"]
 
     # get requests not allowed for this endpoint
     # pylint: disable=W0613
@@ -226,25 +271,17 @@ class MyTokenObtainPairView(TokenObtainPairView):
         """
         Handle POST requests to the token endpoint.
 
-        This methods verifies whether the user's email is verified or not.
-        Also generates a token if the user is verified.
+        The serializer loads the user once, checks the password once and
+        refuses unverified emails (see ``auth_review/login.py``), then
+        generates the tokens.
 
         Args:
-            request: HTTP Request object containing the username of the user's account.
+            request: HTTP Request object containing the username and password of the
+                user's account.
 
         Returns:
             Response: An HTTP response object with status and data containing token.
         """
-        try:
-            user = User.objects.get(username=request.data.get('username'))
-            if not user.is_verified:
-                return Response(
-                    {"detail": "Please verify your email before logging in."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        except User.DoesNotExist:
-            pass
-
         response = super().post(request, *args, **kwargs)
         if response.status_code == 200:
             return Response(
@@ -258,6 +295,53 @@ class MyTokenObtainPairView(TokenObtainPairView):
             )
         return response
 
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncTokenObtainPairView(View):
+    """
+    Asynchronous variant of ``MyTokenObtainPairView`` for ASGI deployments.
+
+    It answers like ``MyTokenObtainPairView``, but hashes the password on
+    the thread pool of the event loop (``alogin_user``), so the worker keeps
+    serving other requests meanwhile. Under WSGI Django runs it in an event
+    loop of its own, so it brings nothing there.
+
+    Methods:
+        post(request): authenticates the credentials and issues the tokens.
+    """
+    throttle_scope = "login" # Shares the rate of MyTokenObtainPairView
+
+    async def post(self, request):
+        """
+        Handle POST requests to the asynchronous token endpoint.
+
+        Args:
+            request: HTTP Request object with a JSON body holding the username
+                and password of the user's account.
+
+        Returns:
+            JsonResponse: The tokens as with ``MyTokenObtainPairView``, or the
+            error with its status.
+        """
+        throttled = await sync_to_async(throttled_response)(request, self)
+        if throttled is not None:
+            return throttled
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"detail": "Invalid JSON body."},
+                                status=status.HTTP_400_BAD_REQUEST)
+        data = data if isinstance(data, dict) else {}
+        missing = {field: ["This field is required."] for field in ("username", "password")
+                   if not data.get(field)}
+        if missing:
+            return JsonResponse(missing, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            user = await alogin_user(str(data["username"]), str(data["password"]))
+        except APIException as e:
+            return JsonResponse({"detail": e.detail}, status=e.status_code)
+        tokens = await sync_to_async(MyTokenObtainPairSerializer.tokens_for)(user)
+        return JsonResponse({"data": {"val": True, "tokens": tokens}})
+
 class ProfileView(APIView):
     """
     View for handling user's profile operations.
@@ -268,12 +352,26 @@ class ProfileView(APIView):
         get(request): handles fetching user's information
         put(request): handles updating existing information or inserting new information.
     """
+    # The profile is read from the database even with JWT_STATELESS_USER
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        """Get user Profile"""
-        serializer = ProfileSerializer(request.user)
-        return Response(serializer.data)
+        """
+        Get user Profile.
+
+        The ETag is a hash of the profile fields of the user the
+        authentication already loaded, so a client whose copy is current
+        gets 304 Not Modified without the profile being serialized.
+        """
+        profile = [getattr(request.user, field) for field in ProfileSerializer.Meta.fields]
+        etag = '"' + hashlib.sha1(repr(profile).encode("utf-8")).hexdigest() + '"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(ProfileSerializer(request.user).data)
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
     def put(self, request):
         """Update user Profile"""
@@ -287,76 +385,105 @@ class SendOtpView(APIView):
     """
     This view handles the post request made to 'auth/send-otp' endpoint.
 
-    This allows users to mail the generated otp to the user's email address.
+    This allows users to mail a one-time password to the user's email address.
+    The OTP is generated and kept on the server (see ``auth_review/otp.py``)
+    and never returned to the client.
 
     Methods:
         post(request): This method deals with sending a generated otp via mail.
     """
+    # Refuses repeated requests with a 429 before the user collection is read
+    throttle_classes = [EmailSendThrottle]
+
     def post(self, request):
         """
-            This method sends the generated otp via mail. 
+            This method generates an otp and sends it via mail.
 
             It checks whether the request email id exists in the database or not.
-            If it does, then send otp to the email using sendgrid.
+            If it does, then issue a new otp and queue its email in the outbox.
 
             Args:
-                request: An HTTP request object containing the genreated otp and entered email.
+                request: An HTTP request object containing the entered email.
 
             Returns:
                 Http Response object containing the status and any response data.
         """
         try:
-            email = request.data.get("email")
-            generated_otp = request.data.get("generated_otp")
+            email = User.objects.normalize_email(request.data.get("email"))
 
             user = User.objects.get(email=email)
 
+            otp = issue_otp(email)
+            minutes = settings.OTP_TTL_SECONDS // 60
             html_content = f"Hi {user.username},<br/><br/> Your OTP for resetting your password " \
-                f"is <b>{generated_otp} </b>.<br/>Please use it within the next 10 minutes."
-
-            if user is None:
-                response_data = {'message' : 'Entered email id does not exist'}
-                return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
-
-            # metadata of mail (sender, recipient, subject and content)
-            message = Mail(
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to_emails=user.email,
-                subject="Reset your password",
-                html_content=html_content
-            )
+                f"is <b>{otp} </b>.<br/>Please use it within the next {minutes} minutes."
 
-            # sending mail
-            sg = SendGridAPIClient(settings.SENDGRID_API_KEY)
-            sg.send(message)
+            # queue the mail for the outbox worker instead of sending it here
+            enqueue_email(user.email, "Reset your password", html_content)
 
-            return Response(data={"otp": generated_otp}, status=status.HTTP_200_OK)
+            return Response({"message": "A one-time password has been sent to your email id."},
+                            status=status.HTTP_200_OK)
 
         except User.DoesNotExist:
             response_data = {'message' : 'Entered email id does not exist'}
             return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
 
+class VerifyOtpView(APIView):
+    """
+    This view handles the post request made to 'auth/verify-otp' endpoint.
+
+    It checks an otp entered by the user without using it up, so that the
+    password form is only shown for a valid one. A wrong otp counts as an
+    attempt.
+
+    Methods:
+        post(request): checks the otp of an email.
+    """
+    throttle_scope = "otp" # Slows otp guessing, see THROTTLE_RATES["otp"]
+
+    def post(self, request):
+        """
+        This method checks the otp entered for an email.
+
+        Args:
+            request: An HTTP request object containing the email and the otp.
+
+        Returns:
+            Response: 200 if the otp is valid, 400 otherwise.
+        """
+        email = User.objects.normalize_email(request.data.get("email"))
+        if check_otp(email, request.data.get("otp")):
+            return Response({"message": "OTP verified."}, status=status.HTTP_200_OK)
+        return Response({"message": "OTP entered is not valid or has expired."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
 class UpdatePasswordView(APIView):
     """
     This view handles updating password for an existing user.
 
+    The request must carry the otp sent to the user's email, which is used
+    up by a successful update.
+
     Methods:
         post(request): called when http post request is made to '/auth/update-password' endpoint.
     
     """
+    throttle_scope = "otp" # Guesses share the rate of VerifyOtpView
     # pylint: disable=W0718
     def post(self, request):
         """
         This method deals with the post request made to '/auth/update-password' endpoint.
 
         Args:
-            request: The HTTP request containing the email id of the user's account.
+            request: The HTTP request containing the email id of the user's account,
+                the otp sent to it and the new password.
 
         Returns:
             Response: A response object containing an error message.      
         """
         try:
-            user = User.objects.get(email=request.data.get("email"))
+            email = User.objects.normalize_email(request.data.get("email"))
+            user = User.objects.get(email=email)
 
             password = request.data.get("password")
 
@@ -365,6 +492,11 @@ class UpdatePasswordView(APIView):
             except ValidationError as e:
                 return Response({"errors": e.message}, status=status.HTTP_400_BAD_REQUEST)
 
+            # checked last, so that a rejected password does not use up the otp
+            if not check_otp(email, request.data.get("otp"), consume=True):
+                return Response({"message": "OTP entered is not valid or has expired."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
             user.set_password(password)
             user.save()
 
@@ -59,10 +59,35 @@ INSTALLED_APPS = [
 # Set the custom user model for authentication
 AUTH_USER_MODEL = "auth_review.Client"
 # Django REST Framework configuration
+# Seconds a process keeps the users read by the JWT authentication, 0 to
+# read the user on every request (see auth_review/authentication.py)
+JWT_USER_CACHE_TTL = float(os.getenv("JWT_USER_CACHE_TTL", "30"))
+
+# Build the user of a request from its token claims instead of reading it;
+# deactivating a user then only takes effect when its access token expires
+JWT_STATELESS_USER = os.getenv("JWT_STATELESS_USER", "false").lower() == "true"
+
+# Requests allowed per user (or client IP when anonymous) for each
+# throttle_scope of the views, e.g. "600/min"; empty for no limit
+# (see service/throttling.py)
+THROTTLE_RATES = {
+    "reviews": os.getenv("THROTTLE_RATE_REVIEWS", "600/min"),
+    "vacancies": os.getenv("THROTTLE_RATE_VACANCIES", "600/min"),
+    "comments": os.getenv("THROTTLE_RATE_COMMENTS", "600/min"),
+    "search": os.getenv("THROTTLE_RATE_SEARCH", "300/min"),
+    "stats": os.getenv("THROTTLE_RATE_STATS", "300/min"),
+    "login": os.getenv("THROTTLE_RATE_LOGIN", "60/min"),
+    "otp": os.getenv("THROTTLE_RATE_OTP", "10/min"),
+}
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication", # Use JWT for authentication
+        # Use JWT for authentication
+        "auth_review.authentication.StatelessJWTAuthentication" if JWT_STATELESS_USER
+        else "auth_review.authentication.CachedJWTAuthentication",
     ],
+    # Per-endpoint rate limits, from THROTTLE_RATES
+    "DEFAULT_THROTTLE_CLASSES": ["service.throttling.EndpointRateThrottle"],
 }
 # Configuration for Simple JWT token settings
 SIMPLE_JWT = {
@@ -90,6 +115,10 @@ SIMPLE_JWT = {
 
 # Middleware settings for processing requests
 MIDDLEWARE = [
+    # Request counts and latencies per view (see service/metrics.py), first to time everything
+    "service.metrics.metrics_middleware",
+    # Server-Timing header and log of the queries of each request, if REQUEST_TIMING is on
+    "service.timing.request_timing_middleware",
     "django.middleware.security.SecurityMiddleware", # Security middleware
     "django.contrib.sessions.middleware.SessionMiddleware", # Session management
     "django.middleware.common.CommonMiddleware", # Common middleware
@@ -98,8 +127,39 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware", # Message framework
     "django.middleware.clickjacking.XFrameOptionsMiddleware", # Clickjacking protection
     "corsheaders.middleware.CorsMiddleware", # CORS middleware for handling cross-origin requests
+    # Concurrency limit with a bounded wait queue, last so that its 503s get CORS headers
+    "service.loadshedding.load_shedding_middleware",
 ]
 
+# Load shedding (see service/loadshedding.py), per worker process
+LOAD_SHEDDING_MAX_ACTIVE = int(os.getenv("LOAD_SHEDDING_MAX_ACTIVE", "32")) # 0 disables it
+LOAD_SHEDDING_MAX_WAITING = int(os.getenv("LOAD_SHEDDING_MAX_WAITING", "64")) # Queue length
+# Longest wait in the queue, in seconds, before a 503
+LOAD_SHEDDING_QUEUE_TIMEOUT = float(os.getenv("LOAD_SHEDDING_QUEUE_TIMEOUT", "2"))
+LOAD_SHEDDING_RETRY_AFTER = int(os.getenv("LOAD_SHEDDING_RETRY_AFTER", "1")) # Seconds
+# Paths that are never limited
+LOAD_SHEDDING_EXEMPT_PATHS = ("/admin/", "/service/load/stats/", "/metrics")
+
+# Bearer token required to scrape /metrics; unset leaves it open
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Count the queries, MongoDB commands and serializer time of each request, and
+# report them in a Server-Timing header and the service.timing log (see
+# service/timing.py); read at startup
+REQUEST_TIMING = os.getenv("REQUEST_TIMING", "false").lower() == "true"
+# Requests making more queries are logged as warnings, to spot N+1 patterns
+REQUEST_TIMING_MAX_QUERIES = int(os.getenv("REQUEST_TIMING_MAX_QUERIES", "20"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        # One line per timed request, with the counts and durations as record fields
+        "service.timing": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -159,11 +219,31 @@ WSGI_APPLICATION = "review_backend.wsgi.application"
 # }
 # Load environment variables from .env file
 load_dotenv() # Load environment variables for secure configurations
+# Connection pool of the MongoClient of each worker process (see service/mongo.py).
+# A deployment opens up to workers x MONGO_MAX_POOL_SIZE connections to the cluster.
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "20")), # Connections per process
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")), # Connections kept open
+    # Idle connections are closed after this many milliseconds
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+    # Longest wait for a free connection when the pool is exhausted
+    "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+    # Longest wait for a usable server, e.g. during an Atlas failover
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")), # Per operation
+}
 # Database configuration for MongoDB using Djongo
 DATABASES = {
     "default": {
         "ENGINE": "djongo", # Use Djongo for MongoDB support
         "NAME": os.getenv("DB_NAME"), # Get the database name from environment variable
+        # Keep connections across requests: closing one closes the shared client and its
+        # pool. Set MONGO_CONN_MAX_AGE to a number of seconds to recycle them. A failed
+        # write inside atomic() closes it too, since Djongo cannot roll back: leave
+        # ATOMIC_REQUESTS off and see service.mongo.atomic_unless_mongo.
+        "CONN_MAX_AGE": int(os.environ["MONGO_CONN_MAX_AGE"])
+        if os.getenv("MONGO_CONN_MAX_AGE") else None,
         # MongoDB connection settings
         "CLIENT": {
             # 'host': "mongodb+srv://"+os.getenv('DB_USERNAME')+":"
@@ -172,7 +252,8 @@ DATABASES = {
             + os.getenv("DB_USERNAME") # Get the username from environment variable
             + ":"
             + os.getenv("DB_PASSWORD") # Get the password from environment variable
-            + "@cluster0.falr3.mongodb.net/?retryWrites=true&w=majority&appName=Cluster0"
+            + "@cluster0.falr3.mongodb.net/?retryWrites=true&w=majority&appName=Cluster0",
+            **MONGO_CLIENT_OPTIONS,
         },
     }
 }
@@ -241,3 +322,53 @@ SENDGRID_SANDBOX_MODE_IN_DEBUG = False
 
 # Get the default email address from environment variable
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL")
+
+# Transport the outbox worker sends the queued emails with (see
+# auth_review/outbox.py); ConsoleTransport and FileTransport keep them local
+EMAIL_OUTBOX_TRANSPORT = os.getenv("EMAIL_OUTBOX_TRANSPORT",
+                                   "auth_review.outbox.SendGridTransport")
+
+# File the FileTransport appends the emails to, one JSON object per line
+EMAIL_OUTBOX_FILE = os.getenv("EMAIL_OUTBOX_FILE", str(BASE_DIR / "outbox.jsonl"))
+
+# One-time passwords of the password reset (see auth_review/otp.py)
+OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", "600")) # Lifetime of a code
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5")) # Wrong guesses before it is dropped
+
+# Token buckets of the views that send emails, as (burst, tokens per hour),
+# per client IP and per email address (see auth_review/throttling.py)
+EMAIL_THROTTLE_RATES = {
+    "ip": (int(os.getenv("EMAIL_THROTTLE_IP_BURST", "10")),
+           float(os.getenv("EMAIL_THROTTLE_IP_PER_HOUR", "30"))),
+    "email": (int(os.getenv("EMAIL_THROTTLE_EMAIL_BURST", "3")),
+              float(os.getenv("EMAIL_THROTTLE_EMAIL_PER_HOUR", "6"))),
+}
+
+# Snapshot file of the review full-text search index (see service/search.py)
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", str(BASE_DIR / "search_index.bin"))
+
+# Caches. "responses" holds the versioned review and vacancy listings (see
+# service/cache.py); use a shared backend when running several workers.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "responses": {
+        "BACKEND": os.getenv("RESPONSE_CACHE_BACKEND",
+                             "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("RESPONSE_CACHE_LOCATION", "responses"),
+        "TIMEOUT": int(os.getenv("RESPONSE_CACHE_TIMEOUT", "300")), # Seconds an entry is kept
+        "OPTIONS": {"MAX_ENTRIES": 5000}, # Listings kept by the local-memory backend
+    },
+    # Issued one-time passwords and the guesses made at them; a shared backend
+    # is required when running several workers (see below)
+    "otp": {
+        "BACKEND": os.getenv("OTP_CACHE_BACKEND",
+                             "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("OTP_CACHE_LOCATION", "otp"),
+    },
+}
+
+# Worker processes serving the API, as gunicorn and uvicorn read it. Above 1
+# the OTP cache must be shared, see auth_review/otp.py
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
@@ -18,6 +18,8 @@ Including another URLconf
 from django.contrib import admin  # pylint: disable=E0401
 # Import path and include functions for URL routing
 from django.urls import path, include  # pylint: disable=E0401
+# Import the Prometheus metrics view
+from service.views import MetricsView
 
 # Define the URL patterns for the project, mapping each path to the appropriate view or app
 urlpatterns = [
@@ -27,4 +29,6 @@ urlpatterns = [
     path("auth/", include("auth_review.urls")),
     # Routes requests starting with 'service/' to the URL configurations defined in 'service.urls'
     path("service/", include("service.urls")),
+    # Request counts and latency histograms in the Prometheus text format
+    path("metrics", MetricsView.as_view(), name="metrics"),
 ]
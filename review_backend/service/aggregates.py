@@ -0,0 +1,223 @@
+"""
+Materialized rating statistics per job title and per department.
+
+The frontend used to compute every average rating and recommendation rate
+from the full review list. This module keeps one ``RatingAggregate``
+document per job title and per department instead, holding the review
+count, the rating sum, the rating histogram and the recommendation totals.
+
+``ReviewsViewSet`` calls ``apply_review`` after each create, update and
+delete, and the bulk import calls ``apply_reviews`` once per batch. On
+MongoDB the counters are changed with a single upserted ``$inc`` per
+document, so concurrent writers never lose an update; other backends use
+``F()`` expressions. ``rebuild_aggregates`` recomputes everything from
+the Reviews collection and backs the ``rebuild_rating_aggregates`` command.
+MongoDB has no transaction to hide the rebuild behind, so there the new
+documents replace the stored ones in place and the stale ones are deleted
+last; readers never see the statistics missing.
+"""
+from django.db import transaction  # pylint: disable=E0401
+from django.db.models import F  # pylint: disable=E0401
+from pymongo import ReplaceOne  # pylint: disable=E0401
+from .models import RatingAggregate, Reviews
+from .mongo import is_mongo, to_document
+
+REBUILD_BATCH_SIZE = 1000 # Documents written by one bulk write of the rebuild
+
+# Review fields the statistics are grouped by
+AGGREGATE_SCOPES = ("job_title", "department")
+
+# Review fields the statistics depend on
+AGGREGATE_FIELDS = AGGREGATE_SCOPES + ("rating", "recommendation")
+
+# Counters of a RatingAggregate document
+COUNTERS = ("count", "rating_sum", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5",
+            "recommendation_count", "recommendation_sum")
+
+
+def aggregate_key(scope, value):
+    """
+    Return the primary key of the statistics of a job title or department.
+
+    Args:
+        scope (str): ``job_title`` or ``department``.
+        value (str): The job title or department.
+
+    Returns:
+        str: The RatingAggregate primary key.
+    """
+    return f"{scope}:{value}"
+
+
+def snapshot(review):
+    """
+    Copy the fields of a review the statistics depend on.
+
+    Used to remember the previous values of a review before it is updated.
+
+    Args:
+        review (Reviews): The review.
+
+    Returns:
+        dict: The grouping fields, rating and recommendation of the review.
+    """
+    return {field: getattr(review, field) for field in AGGREGATE_FIELDS}
+
+
+def review_counters(review, sign=1):
+    """
+    Return the counter increments contributed by a review.
+
+    Args:
+        review (dict): The fields of the review, see ``snapshot``.
+        sign (int): 1 to add the review, -1 to remove it.
+
+    Returns:
+        dict: Increment of each counter in ``COUNTERS``.
+    """
+    increments = dict.fromkeys(COUNTERS, 0)
+    rating, recommendation = review["rating"], review["recommendation"]
+    increments["count"] = sign
+    increments["rating_sum"] = sign * rating
+    if 1 <= rating <= 5:
+        increments[f"rating_{rating}"] = sign
+    if recommendation is not None:
+        increments["recommendation_count"] = sign
+        increments["recommendation_sum"] = sign * recommendation
+    return increments
+
+
+def add_counters(totals, review, sign=1):
+    """
+    Add the counters of a review to running totals for each of its groups.
+
+    Args:
+        totals (dict): ``{(scope, value): {counter: total}}``, updated in place.
+        review (dict): The fields of the review, see ``snapshot``.
+        sign (int): 1 to add the review, -1 to remove it.
+    """
+    increments = review_counters(review, sign)
+    for scope in AGGREGATE_SCOPES:
+        counters = totals.setdefault((scope, review[scope]), dict.fromkeys(COUNTERS, 0))
+        for name, delta in increments.items():
+            counters[name] += delta
+
+
+def increment(scope, value, increments):
+    """
+    Atomically add increments to the statistics of a job title or department.
+
+    Args:
+        scope (str): ``job_title`` or ``department``.
+        value (str): The job title or department.
+        increments (dict): Increment of each counter.
+    """
+    key = aggregate_key(scope, value)
+    if is_mongo(RatingAggregate):
+        RatingAggregate.objects.mongo_update_one( # pylint: disable=E1101
+            {"key": key},
+            {"$inc": increments, "$setOnInsert": {"scope": scope, "value": value}},
+            upsert=True,
+        )
+        return
+    with transaction.atomic():
+        # pylint: disable=E1101
+        RatingAggregate.objects.get_or_create(key=key, defaults={"scope": scope, "value": value})
+        RatingAggregate.objects.filter(key=key).update(
+            **{name: F(name) + delta for name, delta in increments.items() if delta}
+        )
+
+
+def apply_review(old=None, new=None):
+    """
+    Update the statistics after a review was created, updated or deleted.
+
+    Args:
+        old (Reviews or dict, optional): The review before the change, see
+            ``snapshot``; None if it was created.
+        new (Reviews or dict, optional): The review after the change; None
+            if it was deleted.
+    """
+    changes = {}
+    for review, sign in ((old, -1), (new, 1)):
+        if review is not None:
+            add_counters(changes, review if isinstance(review, dict) else snapshot(review), sign)
+    for (scope, value), increments in changes.items():
+        if any(increments.values()): # Skip groups an update left unchanged
+            increment(scope, value, increments)
+
+
+def apply_reviews(reviews):
+    """
+    Count many created reviews with one increment per affected group.
+
+    Args:
+        reviews (iterable): The created reviews (Reviews or dicts, see
+            ``snapshot``).
+    """
+    totals = {}
+    for review in reviews:
+        add_counters(totals, review if isinstance(review, dict) else snapshot(review))
+    for (scope, value), increments in totals.items():
+        increment(scope, value, increments)
+
+
+def get_aggregate(scope, value):
+    """
+    Read the statistics of a job title or department.
+
+    Args:
+        scope (str): ``job_title`` or ``department``.
+        value (str): The job title or department.
+
+    Returns:
+        RatingAggregate or None: The statistics, or None if no review was
+        ever counted for the value.
+    """
+    # pylint: disable=E1101
+    return RatingAggregate.objects.filter(key=aggregate_key(scope, value)).first()
+
+
+def rebuild_aggregates():
+    """
+    Recompute every statistics document from the Reviews collection.
+
+    Returns:
+        int: The number of statistics documents written.
+    """
+    totals = {}
+    # pylint: disable=E1101
+    for review in Reviews.objects.values(*AGGREGATE_FIELDS).iterator():
+        add_counters(totals, review)
+    documents = [
+        RatingAggregate(key=aggregate_key(scope, value), scope=scope, value=value, **counters)
+        for (scope, value), counters in totals.items()
+    ]
+    if is_mongo(RatingAggregate):
+        replace_aggregates(documents)
+        return len(documents)
+    with transaction.atomic():
+        RatingAggregate.objects.all().delete()
+        RatingAggregate.objects.bulk_create(documents, batch_size=REBUILD_BATCH_SIZE)
+    return len(documents)
+
+
+def replace_aggregates(documents):
+    """
+    Replace the stored statistics on MongoDB without emptying them first.
+
+    Every document is upserted on its key, then the documents of job titles
+    and departments that no longer have reviews are deleted.
+
+    Args:
+        documents (list): The recomputed, unsaved RatingAggregate documents.
+    """
+    # pylint: disable=E1101
+    for start in range(0, len(documents), REBUILD_BATCH_SIZE):
+        RatingAggregate.objects.mongo_bulk_write(
+            [ReplaceOne({"key": document.key}, to_document(document), upsert=True)
+             for document in documents[start:start + REBUILD_BATCH_SIZE]],
+            ordered=False,
+        )
+    RatingAggregate.objects.mongo_delete_many(
+        {"key": {"$nin": [document.key for document in documents]}})
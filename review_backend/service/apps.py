@@ -29,3 +29,16 @@ class ServiceConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"  # Set default PK
     # field type to BigAutoField
     name = "service" # Define the app name used by Django
+
+    def ready(self):
+        """
+        Connect the signal handlers that keep the in-process indexes updated,
+        set up the per-process MongoDB client (see ``service.mongo``) and the
+        query timing of the requests (see ``service.timing``).
+        """
+        from . import signals  # pylint: disable=C0415,W0611
+        from .mongo import check_mongo_transactions, install_process_hooks  # pylint: disable=C0415
+        from .timing import install_timing_hooks  # pylint: disable=C0415
+        check_mongo_transactions()
+        install_process_hooks()
+        install_timing_hooks()
@@ -0,0 +1,57 @@
+"""
+Documents seeded by the benchmark commands of the 'service' app.
+
+The ``benchmark_pagination``, ``benchmark_streaming`` and
+``benchmark_repository`` commands time the read paths of the review listing
+against a development database. They insert the same marked reviews, with
+the ids, ratings, departments, titles and pay spread over a few repeating
+values, so that the filters of the listing match a known share of them, and
+remove them once the run is over.
+"""
+from .models import Reviews
+
+BENCHMARK_USER = "__benchmark__" # Marks the documents created by the benchmark commands
+SEED_BATCH_SIZE = 1000 # Reviews inserted by one bulk write
+
+
+def benchmark_review(number):
+    """
+    Build an unsaved benchmark review.
+
+    Args:
+        number (int): The number of the review, which its fields derive from.
+
+    Returns:
+        Reviews: The review.
+    """
+    return Reviews(
+        department=f"Department {number % 50}",
+        locations="Raleigh",
+        job_title=f"Job {number % 500}",
+        hourly_pay=str(10 + number % 20),
+        hourly_pay_cents=(10 + number % 20) * 100,
+        benefits="Flexible hours",
+        review=f"Benchmark review number {number}",
+        rating=number % 5 + 1,
+        recommendation=number % 10 + 1,
+        reviewed_by=BENCHMARK_USER,
+    )
+
+
+def seed_reviews(start, stop):
+    """
+    Insert the benchmark reviews with numbers in ``[start, stop)``, in batches.
+
+    Args:
+        start (int): The number of the first review.
+        stop (int): The number after the last review.
+    """
+    for first in range(start, stop, SEED_BATCH_SIZE):
+        Reviews.objects.bulk_create([ # pylint: disable=E1101
+            benchmark_review(number) for number in range(first, min(first + SEED_BATCH_SIZE, stop))
+        ])
+
+
+def remove_benchmark_reviews():
+    """Delete the reviews seeded by ``seed_reviews``."""
+    Reviews.objects.filter(reviewed_by=BENCHMARK_USER).delete() # pylint: disable=E1101
@@ -0,0 +1,145 @@
+"""
+Bulk validation and insertion of reviews.
+
+Reviews used to be added one POST at a time, each with its own serializer
+pass and insert. ``import_reviews`` takes any number of rows, validates
+them with the ``ReviewsSerializer`` rules one batch at a time and writes
+each batch of valid rows with a single bulk insert. Invalid rows are
+skipped and reported with their position and field errors, so one bad row
+does not stop a large import. It backs both the ``import_reviews``
+management command and the ``/service/reviews/bulk/`` endpoint.
+
+Bulk inserts send no ``post_save`` signals, so the work the signal handlers
+and ``ReviewsViewSet`` do for a single review is done here once per batch:
+the rating statistics, the versions of the cached listings and, when asked,
+the search index and title matcher of the current process.
+"""
+from .aggregates import apply_reviews
+from .cache import bump_version
+from .feeds import FeedError, validated_rows
+from .models import Reviews
+from .mongo import is_mongo, reserve_ids, to_document
+from .pay import parse_pay_cents
+from .search import index_review_write
+from .serializers import ReviewsSerializer
+from .titles import get_title_matcher
+
+IMPORT_BATCH_SIZE = 500 # Rows validated and inserted at a time
+
+
+def validate_rows(rows, start=0, reviewed_by=None):
+    """
+    Validate rows with the ``ReviewsSerializer`` rules.
+
+    A single serializer validates every row, so its fields are only built
+    once.
+
+    Args:
+        rows (list): The rows to validate, as dicts of review fields.
+        start (int): The position of the first row in the whole import.
+        reviewed_by (str, optional): Overrides the author of every row.
+
+    Returns:
+        tuple: The unsaved ``Reviews`` of the valid rows, and a list of
+        ``{"row": position, "errors": {...}}`` for the invalid ones.
+    """
+    reviews, errors = [], []
+    for attrs in validated_rows(ReviewsSerializer(), rows, start, errors):
+        if reviewed_by is not None:
+            attrs["reviewed_by"] = reviewed_by
+        review = Reviews(**attrs)
+        review.hourly_pay_cents = parse_pay_cents(review.hourly_pay) # save() is bypassed
+        reviews.append(review)
+    return reviews, errors
+
+
+def insert_reviews(reviews):
+    """
+    Insert reviews with one bulk write and give them their ids.
+
+    On MongoDB a block of ids is reserved first and the documents are
+    written with ``insert_many``; other backends use ``bulk_create``,
+    which returns the ids.
+
+    Args:
+        reviews (list): Unsaved reviews.
+    """
+    if not reviews:
+        return
+    if is_mongo(Reviews):
+        for review, pk in zip(reviews, reserve_ids(Reviews, len(reviews))):
+            review.pk = pk
+        # pylint: disable=E1101
+        Reviews.objects.mongo_insert_many([to_document(review) for review in reviews],
+                                          ordered=False)
+    else:
+        Reviews.objects.bulk_create(reviews) # pylint: disable=E1101
+
+
+def reviews_created(reviews, index=True):
+    """
+    Do the work of the save signals for reviews that were bulk inserted.
+
+    Args:
+        reviews (list): The inserted reviews, with their ids.
+        index (bool): Also add them to the search index and title matcher
+            of this process. Off for commands, whose process ends with the
+            import.
+    """
+    if not reviews:
+        return
+    apply_reviews(reviews)
+    if index:
+        matcher = get_title_matcher()
+        for review in reviews:
+            index_review_write(review.pk, review)
+            matcher.add("review", review.pk, review.job_title)
+    bump_version("reviews")
+
+
+def import_reviews(rows, batch_size=IMPORT_BATCH_SIZE, reviewed_by=None,
+                   dry_run=False, index=True):
+    """
+    Validate and insert reviews in batches.
+
+    Args:
+        rows (iterable): The rows to import, as dicts of review fields. It
+            is consumed one batch at a time, so it can be a file reader.
+        batch_size (int): The number of rows validated and inserted at a time.
+        reviewed_by (str, optional): Overrides the author of every row.
+        dry_run (bool): Only validate the rows.
+        index (bool): See ``reviews_created``.
+
+    Raises:
+        FeedError: If the file cannot be read past a line. The rows read
+            before it are imported, and the error carries the ``created``
+            count and the ``errors`` so far as its report.
+
+    Returns:
+        tuple: The number of valid rows (inserted unless ``dry_run``), and
+        the errors of the invalid rows, see ``validate_rows``.
+    """
+    created, errors, batch, start = 0, [], [], 0
+
+    def flush():
+        reviews, batch_errors = validate_rows(batch, start, reviewed_by)
+        errors.extend(batch_errors)
+        if not dry_run:
+            insert_reviews(reviews)
+            reviews_created(reviews, index=index)
+        return len(reviews)
+
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                created += flush()
+                start += len(batch)
+                batch = []
+    except (FeedError, UnicodeDecodeError) as e: # Earlier batches are already written
+        if batch:
+            created += flush()
+        raise FeedError(str(e), {"created": created, "errors": errors}) from e
+    if batch:
+        created += flush()
+    return created, errors
@@ -0,0 +1,203 @@
+"""
+Versioned response cache for the review and vacancy listings.
+
+Reviews and vacancies are read far more often than they are written, yet
+every listing request used to query MongoDB and serialize each document
+again. ``CachedListMixin`` stores the serialized payload of a listing under
+a key made of the collection, the collection's version and the request
+path and query parameters. Every write to a collection bumps its version
+(see ``service.signals``), so entries of older versions are never read
+again and simply expire; nothing has to be deleted on write.
+
+Entries and versions live in the ``responses`` cache of ``settings.CACHES``.
+It is a local-memory cache by default, which is only coherent within one
+process; point ``RESPONSE_CACHE_BACKEND`` and ``RESPONSE_CACHE_LOCATION``
+at a shared backend (Redis, Memcached, the database cache) when several
+workers serve the API, so that a write in one worker invalidates the
+listings of all of them.
+"""
+import hashlib
+import threading
+import time
+from django.core.cache import caches  # pylint: disable=E0401
+from rest_framework.response import Response  # pylint: disable=E0401
+
+CACHE_ALIAS = "responses" # Entry of settings.CACHES holding the cached payloads
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0} # Lookups served by this process
+
+
+def get_cache():
+    """
+    Return the cache backend of the response cache.
+
+    Returns:
+        BaseCache: The ``responses`` cache.
+    """
+    return caches[CACHE_ALIAS]
+
+
+def version_key(collection):
+    """Return the cache key holding the version of a collection."""
+    return f"version:{collection}"
+
+
+def modified_key(collection):
+    """Return the cache key holding the last write time of a collection."""
+    return f"modified:{collection}"
+
+
+def get_version(collection):
+    """
+    Return the current version of a collection.
+
+    The first version is the current time in milliseconds rather than 1,
+    so that a version counter evicted from the cache never restarts at a
+    value whose entries are still stored.
+
+    Args:
+        collection (str): The collection name, e.g. ``reviews``.
+
+    Returns:
+        int: The version.
+    """
+    return get_validators(collection)[0]
+
+
+def get_validators(collection):
+    """
+    Return the current version and last write time of a collection.
+
+    A collection that was not written since its version was created (or
+    evicted) reports the creation time, which is never earlier than the
+    last write the cache has forgotten about.
+
+    Args:
+        collection (str): The collection name, e.g. ``reviews``.
+
+    Returns:
+        tuple: The version (int) and the last write time in seconds since
+        the epoch (float).
+    """
+    cache = get_cache()
+    keys = (version_key(collection), modified_key(collection))
+    values = cache.get_many(keys)
+    if keys[0] not in values:
+        now = time.time_ns()
+        if cache.add(keys[0], now // 1_000_000, timeout=None):
+            cache.set(keys[1], now / 1e9, timeout=None)
+        values = cache.get_many(keys)
+    return values[keys[0]], values.get(keys[1], 0.0)
+
+
+def bump_version(collection):
+    """
+    Invalidate every cached listing of a collection.
+
+    Args:
+        collection (str): The collection name, e.g. ``reviews``.
+    """
+    cache = get_cache()
+    try:
+        cache.incr(version_key(collection))
+    except ValueError: # The version was never read or has been evicted
+        get_validators(collection)
+        cache.incr(version_key(collection))
+    cache.set(modified_key(collection), time.time(), timeout=None)
+
+
+def response_key(collection, request):
+    """
+    Build the cache key of a listing request.
+
+    The query parameters are sorted so that equivalent requests share an
+    entry, and the host is included because the pagination links in the
+    payload are absolute URLs.
+
+    Args:
+        collection (str): The collection the listing reads.
+        request (Request): The listing request.
+
+    Returns:
+        str: The cache key.
+    """
+    params = sorted((name, value) for name in request.query_params
+                    for value in request.query_params.getlist(name))
+    raw = repr((request.get_host(), request.path, params)).encode("utf-8")
+    return f"response:{collection}:{get_version(collection)}:{hashlib.sha1(raw).hexdigest()}"
+
+
+def record(hit):
+    """Count a lookup of this process as a hit or a miss."""
+    with _stats_lock:
+        _stats["hits" if hit else "misses"] += 1
+
+
+def cache_stats():
+    """
+    Return the response cache lookups served by this process.
+
+    Returns:
+        dict: The number of ``hits`` and ``misses`` and the ``hit_ratio``.
+    """
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {"hits": hits, "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else None}
+
+
+def reset_cache_stats():
+    """Reset the hit and miss counters of this process."""
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+# pylint: disable=R0903
+class CachedListMixin:
+    """
+    Serve the ``list`` action of a view from the versioned response cache.
+
+    The view sets ``cache_collection`` to the collection its listing reads.
+    Only successful responses are stored. Parts of the payload that change
+    without a write to the collection are brought up to date on every hit
+    by ``refresh_cached``. Every response carries an ``X-Cache`` header
+    telling whether it was a ``HIT`` or a ``MISS``.
+    """
+    cache_collection = None # Collection the listing reads, e.g. "reviews"
+
+    def refresh_cached(self, data):
+        """
+        Update the parts of a cached payload that its version does not cover.
+
+        Args:
+            data (dict): The cached payload.
+
+        Returns:
+            dict: The payload to serve.
+        """
+        return data
+
+    def list(self, request, *args, **kwargs):
+        """
+        Return the cached listing, or build and store it.
+
+        Args:
+            request (Request): The listing request.
+
+        Returns:
+            Response: The listing payload.
+        """
+        cache = get_cache()
+        key = response_key(self.cache_collection, request)
+        data = cache.get(key)
+        if data is not None:
+            record(hit=True)
+            return Response(self.refresh_cached(data), headers={"X-Cache": "HIT"})
+        record(hit=False)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200: # Entries expire after the cache's TIMEOUT
+            cache.set(key, response.data)
+        response["X-Cache"] = "MISS"
+        return response
@@ -0,0 +1,260 @@
+"""
+Batched reads of the comments of several reviews.
+
+A page of review cards used to fetch the comments of every review with its
+own request and query. ``comments_for_reviews`` reads the first comments of
+many reviews with a single ``$in`` query on the (review, created_at, id)
+index. On MongoDB it is one aggregation that groups the matched comments
+by review with ``$topN``, which holds only the first ``limit + 1``
+comments of each review while grouping, so a review with thousands of
+comments costs no more memory than one with a few. ``$topN`` needs MongoDB
+5.2 or later; an older server refuses it, and from then on the process
+sorts the comments, pushes them into their groups and slices each group,
+which holds every matched comment while grouping. Other backends read the
+matched comments in index order and cut each review's list in Python.
+
+The extra comment of a review tells whether it has more; the rest is read
+through the cursor pages of ``/service/comments/<id>/``.
+
+Each review also carries its number of comments and a preview of the newest
+one, so that listings can show them without reading the comments. The
+comment views keep them up to date with one atomic update of the review per
+write (``comment_added`` and ``comment_removed``), and
+``reconcile_comment_counts`` recomputes them from the comments to repair
+drift, e.g. after comments were written around the views. A comment write
+bumps the ``comments`` version, not the ``reviews`` one: the cached review
+listings stay valid, and only their counts and previews are read again
+(``comment_summary_fields``) when they are served.
+"""
+from django.db.models import F  # pylint: disable=E0401
+from pymongo import UpdateOne  # pylint: disable=E0401
+from pymongo.errors import OperationFailure  # pylint: disable=E0401
+from .cache import bump_version
+from .models import Comment, Reviews
+from .mongo import is_mongo
+from .repository import to_instance
+
+MAX_BATCH_REVIEWS = 100 # Most reviews whose comments are read at once
+PREVIEW_LENGTH = 120 # Characters of the newest comment stored on its review
+COMMENT_ORDERINGS = ("created_at", "-created_at") # Orders the comments can be read in
+UNKNOWN_GROUP_OPERATOR = 15952 # Server code refusing $topN, before MongoDB 5.2
+SUMMARY_FIELDS = ("comment_count", "latest_comment_id", "latest_comment_user",
+                  "latest_comment_text", "latest_comment_at") # Kept up to date by the comments
+_server = {"top_n": True} # Whether the server of this process accepted $topN
+
+
+def first_comments_pipeline(review_ids, limit, direction):
+    """
+    Build the aggregation of the first comments of each review.
+
+    Args:
+        review_ids (list): The ids of the reviews.
+        limit (int): The number of comments kept per review.
+        direction (int): 1 for the oldest comments first, -1 for the newest.
+
+    Returns:
+        list: The pipeline, with ``$topN`` unless the server refused it.
+    """
+    order = {"created_at": direction, "id": direction}
+    match = {"$match": {"review_id": {"$in": review_ids}}}
+    if _server["top_n"]:
+        return [match, {"$group": {"_id": "$review_id", "comments": {"$topN": {
+            "n": limit, "sortBy": order, "output": "$$ROOT"}}}}]
+    return [match, {"$sort": {"review_id": 1, **order}},
+            {"$group": {"_id": "$review_id", "comments": {"$push": "$$ROOT"}}},
+            {"$project": {"comments": {"$slice": ["$comments", limit]}}}]
+
+
+def comments_for_reviews(review_ids, limit, ordering="created_at"):
+    """
+    Read the first comments of each review with one query.
+
+    Args:
+        review_ids (list): The ids of the reviews.
+        limit (int): The number of comments wanted per review.
+        ordering (str): ``created_at`` for the oldest comments first,
+            ``-created_at`` for the newest.
+
+    Returns:
+        dict: ``{review id: [Comment, ...]}`` for every requested review,
+        with up to ``limit + 1`` comments each; an extra comment means the
+        review has more than ``limit``.
+    """
+    grouped = {review_id: [] for review_id in review_ids}
+    if not grouped:
+        return grouped
+    direction = -1 if ordering.startswith("-") else 1
+    if is_mongo(Comment):
+        # pylint: disable=E1101
+        try:
+            groups = list(Comment.objects.mongo_aggregate(
+                first_comments_pipeline(list(grouped), limit + 1, direction)))
+        except OperationFailure as e:
+            if e.code != UNKNOWN_GROUP_OPERATOR or not _server["top_n"]:
+                raise
+            _server["top_n"] = False # MongoDB before 5.2
+            groups = Comment.objects.mongo_aggregate(
+                first_comments_pipeline(list(grouped), limit + 1, direction))
+        for group in groups:
+            # Aware datetimes, as read through the ORM, for the comment cursors
+            grouped[group["_id"]] = [to_instance(Comment, document)
+                                     for document in group["comments"]]
+        return grouped
+
+    prefix = "-" if direction < 0 else ""
+    # pylint: disable=E1101
+    queryset = (Comment.objects.filter(review_id__in=list(grouped))
+                .order_by("review_id", f"{prefix}created_at", f"{prefix}id"))
+    for comment in queryset.iterator():
+        comments = grouped[comment.review_id]
+        if len(comments) <= limit:
+            comments.append(comment)
+    return grouped
+
+
+def preview_fields(comment):
+    """
+    Return the latest-comment fields of a review for its newest comment.
+
+    Args:
+        comment (Comment or None): The newest comment of the review.
+
+    Returns:
+        dict: The values of the ``latest_comment_*`` fields, all None when
+        the review has no comments.
+    """
+    if comment is None:
+        return {"latest_comment_id": None, "latest_comment_user": None,
+                "latest_comment_text": None, "latest_comment_at": None}
+    return {"latest_comment_id": comment.pk, "latest_comment_user": comment.user_id,
+            "latest_comment_text": comment.text[:PREVIEW_LENGTH],
+            "latest_comment_at": comment.created_at}
+
+
+def update_review(review_id, delta, comment):
+    """
+    Add ``delta`` to the comment count of a review and set its preview.
+
+    Args:
+        review_id (int): The id of the review.
+        delta (int): The change of the comment count.
+        comment (Comment or None): The newest comment of the review.
+    """
+    fields = preview_fields(comment)
+    if is_mongo(Reviews):
+        Reviews.objects.mongo_update_one( # pylint: disable=E1101
+            {"id": review_id}, {"$inc": {"comment_count": delta}, "$set": fields})
+    else:
+        Reviews.objects.filter(pk=review_id).update( # pylint: disable=E1101
+            comment_count=F("comment_count") + delta, **fields)
+    bump_version("comments") # Changes the ETag, not the cached pages, of the listings
+
+
+def comment_summary_fields(review_ids):
+    """
+    Read the comment counts and previews stored on reviews.
+
+    Args:
+        review_ids (list): The ids of the reviews.
+
+    Returns:
+        dict: ``{review id: Reviews}``, with only the ``SUMMARY_FIELDS``
+        loaded.
+    """
+    # pylint: disable=E1101
+    reviews = Reviews.objects.filter(pk__in=review_ids).only(*SUMMARY_FIELDS)
+    return {review.pk: review for review in reviews}
+
+
+def newest_comment(review_id):
+    """
+    Return the newest comment of a review.
+
+    Args:
+        review_id (int): The id of the review.
+
+    Returns:
+        Comment or None: The newest comment, None if the review has none.
+    """
+    # pylint: disable=E1101
+    return Comment.objects.filter(review_id=review_id).order_by("-created_at", "-id").first()
+
+
+def comment_added(comment):
+    """
+    Count a new comment on its review and make it the preview.
+
+    Args:
+        comment (Comment): The saved comment.
+    """
+    update_review(comment.review_id, 1, comment)
+
+
+def comment_removed(comment):
+    """
+    Uncount a deleted comment and preview the newest remaining one.
+
+    Args:
+        comment (Comment): The deleted comment.
+    """
+    update_review(comment.review_id, -1, newest_comment(comment.review_id))
+
+
+def comment_summaries():
+    """
+    Count the comments of every review and find the newest.
+
+    Returns:
+        dict: ``{review id: (count, newest Comment)}`` for the reviews with
+        comments.
+    """
+    summaries = {}
+    if is_mongo(Comment):
+        pipeline = [
+            {"$sort": {"review_id": 1, "created_at": -1, "id": -1}},
+            {"$group": {"_id": "$review_id", "count": {"$sum": 1},
+                        "latest": {"$first": "$$ROOT"}}},
+        ]
+        # pylint: disable=E1101
+        for group in Comment.objects.mongo_aggregate(pipeline, allowDiskUse=True):
+            latest = {column: value for column, value in group["latest"].items()
+                      if column != "_id"}
+            summaries[group["_id"]] = (group["count"], Comment(**latest))
+        return summaries
+    # pylint: disable=E1101
+    for comment in Comment.objects.order_by("review_id", "-created_at", "-id").iterator():
+        count, latest = summaries.get(comment.review_id, (0, comment))
+        summaries[comment.review_id] = (count + 1, latest)
+    return summaries
+
+
+def reconcile_comment_counts(dry_run=False):
+    """
+    Recompute the comment count and preview of every review from the comments.
+
+    Args:
+        dry_run (bool): Only report the reviews that have drifted.
+
+    Returns:
+        list: The ids of the reviews whose stored count or preview was wrong.
+    """
+    summaries = comment_summaries()
+    repairs = {}
+    # pylint: disable=E1101
+    stored = Reviews.objects.values_list("pk", "comment_count", "latest_comment_id")
+    for review_id, count, latest_id in stored.iterator():
+        expected_count, latest = summaries.get(review_id, (0, None))
+        expected_id = latest.pk if latest is not None else None
+        if (count, latest_id) != (expected_count, expected_id):
+            repairs[review_id] = {"comment_count": expected_count, **preview_fields(latest)}
+    if dry_run or not repairs:
+        return list(repairs)
+    if is_mongo(Reviews):
+        Reviews.objects.mongo_bulk_write( # pylint: disable=E1101
+            [UpdateOne({"id": review_id}, {"$set": fields})
+             for review_id, fields in repairs.items()], ordered=False)
+    else:
+        for review_id, fields in repairs.items():
+            Reviews.objects.filter(pk=review_id).update(**fields) # pylint: disable=E1101
+    bump_version("comments")
+    return list(repairs)
@@ -0,0 +1,104 @@
+"""
+Conditional GET (ETag / Last-Modified) support for the 'service' listings.
+
+The React pages and the browser extension fetch the same listings again and
+again. ``ConditionalListMixin`` labels every listing with a strong ETag and
+a Last-Modified date derived from the version of the collection it reads
+(see ``service.cache``), so a client that still holds the current listing
+sends ``If-None-Match`` (or ``If-Modified-Since``) and gets an empty
+``304 Not Modified`` back. The validators come from the cache alone: a 304
+costs neither a database query nor a serializer run.
+"""
+import hashlib
+from django.utils.cache import get_conditional_response  # pylint: disable=E0401
+from django.utils.cache import patch_cache_control  # pylint: disable=E0401
+from django.utils.http import http_date  # pylint: disable=E0401
+from .cache import get_validators
+
+
+def make_etag(*parts):
+    """
+    Build a strong ETag from the values a response depends on.
+
+    Args:
+        *parts: Values that identify the representation, e.g. a collection
+            version and the query parameters.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    return '"' + hashlib.sha1(repr(parts).encode("utf-8")).hexdigest() + '"'
+
+
+def listing_etag(request, version):
+    """
+    Build the ETag of a listing request at a collection version.
+
+    Args:
+        request (Request): The listing request.
+        version (int or tuple): The version of the collection the listing
+            reads, paired with those of its related collections.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    params = sorted((name, value) for name in request.query_params
+                    for value in request.query_params.getlist(name))
+    # The Accept header picks the renderer, i.e. the representation
+    return make_etag(version, request.get_host(), request.path, params,
+                     request.META.get("HTTP_ACCEPT", ""))
+
+
+# pylint: disable=R0903
+class ConditionalListMixin:
+    """
+    Answer conditional requests for the ``list`` action of a view.
+
+    The view names the collection its listing reads with
+    ``cache_collection``, or overrides ``get_version_collection`` when the
+    listing depends on a narrower version (e.g. the comments of one
+    review). ``related_collections`` names the other versions the listing
+    shows, e.g. the comment counts of the reviews. Responses are marked
+    ``no-cache`` so that browsers revalidate them instead of reusing them
+    unchecked.
+    """
+    cache_collection = None # Collection the listing reads, e.g. "reviews"
+    related_collections = () # Other versions the listing depends on
+
+    def get_version_collection(self):
+        """
+        Return the name of the version the listing depends on.
+
+        Returns:
+            str: The collection name.
+        """
+        return self.cache_collection
+
+    def list(self, request, *args, **kwargs):
+        """
+        Return ``304 Not Modified`` if the client's copy is current, or the
+        listing with its validators otherwise.
+
+        Args:
+            request (Request): The listing request.
+
+        Returns:
+            Response: The listing, or an empty 304 response.
+        """
+        version, modified = get_validators(self.get_version_collection())
+        for collection in self.related_collections:
+            related_version, related_modified = get_validators(collection)
+            version, modified = (version, related_version), max(modified, related_modified)
+        etag = listing_etag(request, version)
+        not_modified = get_conditional_response(request, etag=etag,
+                                                last_modified=int(modified))
+        if not_modified is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        else:
+            response = not_modified
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(int(modified))
+        patch_cache_control(response, no_cache=True)
+        return response
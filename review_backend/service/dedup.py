@@ -0,0 +1,46 @@
+"""
+Normalization of job titles and the deduplication key of vacancies.
+
+Titles and locations are typed by people and scraped from postings, so the
+same vacancy arrives as "Library Assistant", "library  assistant" or
+"Library Assistant!". ``normalize_title`` reduces a title to its lowercase
+words, which the title matcher indexes, and ``vacancy_key`` hashes the
+normalized title and location of a posting into the unique key that
+``Vacancies`` stores on save. The module imports nothing of the project, so
+the models, the views, the ingestion and the title matcher can all share it.
+"""
+import hashlib
+import re
+
+WORD_RE = re.compile(r"[a-z0-9]+") # The words of a title or location
+
+
+def normalize_title(title):
+    """
+    Normalize a job title for matching.
+
+    Args:
+        title (str): The job title.
+
+    Returns:
+        str: The lowercase words of the title separated by single spaces.
+    """
+    return " ".join(WORD_RE.findall((title or "").lower()))
+
+
+def vacancy_key(job_title, job_location):
+    """
+    Return the deduplication key of a vacancy posting.
+
+    Two postings with the same title and location, up to case, spacing and
+    punctuation, are the same vacancy.
+
+    Args:
+        job_title (str): The job title of the posting.
+        job_location (str): The location of the posting.
+
+    Returns:
+        str: A fixed-length hash of the normalized title and location.
+    """
+    normalized = f"{normalize_title(job_title)}|{normalize_title(job_location)}"
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
@@ -0,0 +1,150 @@
+"""
+Digest emails of the comments written on each user's reviews.
+
+Emailing the author of a review for every comment would spend the SendGrid
+quota and a network round trip per comment. Instead, ``CommentViewSet``
+marks each new comment ``digest_pending``, and ``send_comment_digests``,
+run periodically by the ``send_comment_digests`` command, coalesces the
+pending comments per review author (``Reviews.reviewed_by``) into one email
+each:
+
+- the pending comments are read with their review in one query: an
+  aggregation with a ``$lookup`` of the reviews on MongoDB, a join on other
+  backends, through the index on ``digest_pending``;
+- the email addresses of the authors are read with one ``__in`` query;
+- the digests are queued in the outbox with one insert (see
+  ``auth_review/outbox.py``), and the comments are cleared with one update.
+
+Comments are cleared only after their digests are queued, so a run that
+fails half way sends them with the next run rather than losing them.
+Comments an author wrote on their own reviews, and those on reviews without
+a known author, are cleared without being sent.
+"""
+from collections import defaultdict
+from html import escape
+from django.conf import settings  # pylint: disable=E0401
+from django.contrib.auth import get_user_model  # pylint: disable=E0401
+from auth_review.outbox import enqueue_emails
+from .comments import PREVIEW_LENGTH
+from .models import Comment, Reviews
+from .mongo import is_mongo
+
+DIGEST_COMMENTS_PER_REVIEW = 3 # Newest comments quoted per review, the rest are counted
+DIGEST_SUBJECT = "New comments on your reviews"
+
+
+def pending_comments():
+    """
+    Read the comments awaiting a digest, with the author of their review.
+
+    Returns:
+        list: ``(comment id, review id, review author, job title, commenter,
+        text)`` rows, ordered by review and creation time.
+    """
+    if is_mongo(Comment):
+        pipeline = [
+            {"$match": {"digest_pending": True}},
+            {"$sort": {"review_id": 1, "created_at": 1, "id": 1}},
+            {"$lookup": {"from": Reviews._meta.db_table, # pylint: disable=W0212
+                         "localField": "review_id", "foreignField": "id", "as": "review"}},
+            {"$unwind": {"path": "$review", "preserveNullAndEmptyArrays": True}},
+            {"$project": {"_id": 0, "id": 1, "review_id": 1, "user_id": 1, "text": 1,
+                          "author": "$review.reviewed_by", "job_title": "$review.job_title"}},
+        ]
+        # pylint: disable=E1101
+        return [(row["id"], row["review_id"], row.get("author"), row.get("job_title"),
+                 row["user_id"], row["text"])
+                for row in Comment.objects.mongo_aggregate(pipeline, allowDiskUse=True)]
+    # pylint: disable=E1101
+    return list(Comment.objects.filter(digest_pending=True)
+                .order_by("review_id", "created_at", "id")
+                .values_list("id", "review_id", "review__reviewed_by", "review__job_title",
+                             "user_id", "text"))
+
+
+def group_digests(rows):
+    """
+    Group the pending comments by review author and review.
+
+    Args:
+        rows (list): The rows of ``pending_comments``.
+
+    Returns:
+        dict: ``{author: {review id: (job title, [(commenter, text), ...])}}``,
+        without the comments authors wrote on their own reviews.
+    """
+    digests = defaultdict(dict)
+    for _, review_id, author, job_title, commenter, text in rows:
+        if not author or author == commenter:
+            continue
+        digests[author].setdefault(review_id, (job_title, []))[1].append((commenter, text))
+    return digests
+
+
+def render_digest(author, reviews):
+    """
+    Render the HTML body of an author's digest.
+
+    Args:
+        author (str): The username of the review author.
+        reviews (dict): ``{review id: (job title, [(commenter, text), ...])}``.
+
+    Returns:
+        str: The HTML body.
+    """
+    total = sum(len(comments) for _, comments in reviews.values())
+    parts = [f"Hi {escape(author)},<br/><br/>Your reviews received {total} new "
+             f"comment{'s' if total != 1 else ''}:<br/>"]
+    for job_title, comments in reviews.values():
+        parts.append(f"<br/><b>{escape(job_title or '')}</b> ({len(comments)})<ul>")
+        for commenter, text in comments[-DIGEST_COMMENTS_PER_REVIEW:]: # The newest ones
+            parts.append(f"<li>{escape(commenter)}: {escape(text[:PREVIEW_LENGTH])}</li>")
+        if len(comments) > DIGEST_COMMENTS_PER_REVIEW:
+            parts.append(f"<li>and {len(comments) - DIGEST_COMMENTS_PER_REVIEW} more</li>")
+        parts.append("</ul>")
+    parts.append(f"<a href='{settings.FRONTEND_URL}'>{settings.FRONTEND_URL}</a>")
+    return "".join(parts)
+
+
+def clear_pending(comment_ids):
+    """
+    Mark comments as sent in their digest.
+
+    Args:
+        comment_ids (list): The ids of the comments.
+    """
+    if not comment_ids:
+        return
+    if is_mongo(Comment):
+        Comment.objects.mongo_update_many( # pylint: disable=E1101
+            {"id": {"$in": comment_ids}}, {"$set": {"digest_pending": False}})
+    else:
+        Comment.objects.filter(pk__in=comment_ids).update( # pylint: disable=E1101
+            digest_pending=False)
+
+
+def send_comment_digests(dry_run=False):
+    """
+    Queue one digest email per review author with new comments.
+
+    Args:
+        dry_run (bool): Only build the digests, without queueing them or
+            clearing the comments.
+
+    Returns:
+        dict: The number of ``comments`` read and of ``digests`` queued,
+        and the ``skipped`` authors, who have no email address.
+    """
+    rows = pending_comments()
+    digests = group_digests(rows)
+    User = get_user_model() # pylint: disable=C0103
+    emails = dict(User.objects.filter(pk__in=list(digests)).values_list("pk", "email"))
+    messages = [(emails[author], DIGEST_SUBJECT, render_digest(author, reviews))
+                for author, reviews in digests.items() if emails.get(author)]
+    result = {"comments": len(rows), "digests": len(messages),
+              "skipped": sorted(author for author in digests if not emails.get(author))}
+    if dry_run:
+        return result
+    enqueue_emails(messages)
+    clear_pending([row[0] for row in rows])
+    return result
@@ -0,0 +1,133 @@
+"""
+Readers for the CSV and JSONL files used to import reviews and vacancies.
+
+The readers take any iterable of text lines (an open file, or the decoded
+body of an upload) and yield one dict per record, so that imports consume
+their input one batch at a time instead of loading it whole.
+"""
+import codecs
+import csv
+import json
+from rest_framework.exceptions import ValidationError  # pylint: disable=E0401
+
+
+class FeedError(ValueError):
+    """
+    Raised when a record of a feed cannot be decoded.
+
+    Attributes:
+        report (dict or None): What was written before the error, when
+            raised by ``ingest.ingest_vacancies`` or ``bulk.import_reviews``.
+    """
+
+    def __init__(self, message, report=None):
+        super().__init__(message)
+        self.report = report
+
+
+# Upload content types and the feed format they carry
+FEED_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+}
+
+
+def read_csv(lines):
+    """
+    Yield the rows of a CSV file as dicts, leaving out empty cells.
+
+    Args:
+        lines (iterable): The lines of the file, starting with the header.
+
+    Raises:
+        FeedError: If a row is not valid CSV, e.g. a field is larger than
+            ``csv.field_size_limit()``.
+
+    Yields:
+        dict: The non-empty fields of each row.
+    """
+    reader = csv.DictReader(lines)
+    try:
+        for row in reader:
+            yield {name: value for name, value in row.items()
+                   if name and value not in ("", None)}
+    except csv.Error as e:
+        raise FeedError(f"Invalid CSV after line {reader.line_num}: {e}") from e
+
+
+def read_jsonl(lines):
+    """
+    Yield the objects of a JSONL file, skipping blank lines.
+
+    Args:
+        lines (iterable): The lines of the file.
+
+    Raises:
+        FeedError: If a line is not valid JSON.
+
+    Yields:
+        object: The decoded value of each line.
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise FeedError(f"Line {number} is not valid JSON: {e}") from e
+
+
+def read_feed(lines, feed_format):
+    """
+    Return the records of a feed in the given format.
+
+    Args:
+        lines (iterable): The lines of the feed.
+        feed_format (str): ``csv`` or ``jsonl``.
+
+    Returns:
+        iterator: The records, see ``read_csv`` and ``read_jsonl``.
+    """
+    return read_csv(lines) if feed_format == "csv" else read_jsonl(lines)
+
+
+def validated_rows(serializer, rows, start, errors):
+    """
+    Validate the rows of a feed with the rules of a serializer.
+
+    Args:
+        serializer (Serializer): The serializer whose rules apply.
+        rows (iterable): The rows to validate.
+        start (int): The position of the first row in the whole feed.
+        errors (list): Receives ``{"row": position, "errors": {...}}``
+            for every invalid row.
+
+    Yields:
+        dict: The validated fields of each valid row.
+    """
+    for position, row in enumerate(rows, start):
+        if not isinstance(row, dict):
+            errors.append({"row": position,
+                           "errors": {"non_field_errors": ["Expected an object."]}})
+            continue
+        try:
+            attrs = serializer.run_validation(row)
+        except ValidationError as e:
+            errors.append({"row": position, "errors": e.detail})
+            continue
+        yield attrs
+
+
+def decode_lines(stream, encoding="utf-8"):
+    """
+    Decode a binary stream into text lines as it is read.
+
+    Args:
+        stream (iterable): Yields binary lines, e.g. an uploaded request body.
+        encoding (str): The text encoding.
+
+    Returns:
+        iterator: The decoded lines.
+    """
+    return codecs.iterdecode(stream, encoding)
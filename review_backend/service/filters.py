@@ -0,0 +1,138 @@
+"""
+Query-parameter filters for the 'service' list endpoints.
+
+The review listing used to return every review and let the browser filter
+the list. The functions in this module translate the same filter fields
+the frontend exposes (department, locations, job_title, min_rating and
+max_rating) into queryset filters, so that the filtering runs in MongoDB
+and only the matching documents leave the database.
+
+The ``min_pay`` and ``max_pay`` bounds, given in dollars, compare against
+the indexed pay in cents parsed from the free-form pay strings.
+"""
+from rest_framework.exceptions import ValidationError  # pylint: disable=E0401
+from .pay import AMOUNT_RE, parse_pay_cents
+
+# Text filters, matched case-insensitively as a substring (same as the frontend)
+REVIEW_TEXT_FILTERS = ("department", "locations", "job_title")
+
+
+def parse_rating(params, name):
+    """
+    Read an optional rating bound from the query parameters.
+
+    Args:
+        params (QueryDict): The request query parameters.
+        name (str): The name of the parameter to read.
+
+    Raises:
+        ValidationError: If the value is not an integer between 1 and 5.
+
+    Returns:
+        int or None: The parsed rating, or None if the parameter is absent.
+    """
+    value = params.get(name, "")
+    if value == "":
+        return None
+    try:
+        rating = int(value)
+    except (TypeError, ValueError) as e:
+        raise ValidationError({name: "Rating must be an integer."}) from e
+    if rating < 1 or rating > 5:
+        raise ValidationError({name: "Rating must be between 1 and 5."})
+    return rating
+
+
+def parse_pay(params, name):
+    """
+    Read an optional pay bound, in dollars, from the query parameters.
+
+    Args:
+        params (QueryDict): The request query parameters.
+        name (str): The name of the parameter to read.
+
+    Raises:
+        ValidationError: If the value is not a non-negative amount.
+
+    Returns:
+        int or None: The bound in cents, or None if the parameter is absent.
+    """
+    value = params.get(name, "").strip()
+    if value == "":
+        return None
+    cents = parse_pay_cents(value) if AMOUNT_RE.fullmatch(value) else None
+    if cents is None:
+        raise ValidationError({name: "Pay must be a non-negative amount."})
+    return cents
+
+
+def filter_pay(queryset, params, field):
+    """
+    Apply the ``min_pay`` and ``max_pay`` bounds to a queryset.
+
+    Documents whose pay could not be parsed have no amount and are left out
+    as soon as a bound is given.
+
+    Args:
+        queryset (QuerySet): The queryset to filter.
+        params (QueryDict): The request query parameters.
+        field (str): The name of the pay field in cents.
+
+    Raises:
+        ValidationError: If a pay bound is invalid.
+
+    Returns:
+        QuerySet: The filtered queryset.
+    """
+    min_pay = parse_pay(params, "min_pay")
+    max_pay = parse_pay(params, "max_pay")
+    if min_pay is not None:
+        queryset = queryset.filter(**{f"{field}__gte": min_pay})
+    if max_pay is not None:
+        queryset = queryset.filter(**{f"{field}__lte": max_pay})
+    return queryset
+
+
+def filter_reviews(queryset, params):
+    """
+    Apply the review list filters from the query parameters to a queryset.
+
+    Args:
+        queryset (QuerySet): The Reviews queryset to filter.
+        params (QueryDict): The request query parameters.
+
+    Raises:
+        ValidationError: If a rating or pay bound is invalid.
+
+    Returns:
+        QuerySet: The filtered queryset.
+    """
+    for field in REVIEW_TEXT_FILTERS:
+        value = params.get(field, "").strip()
+        if value:
+            queryset = queryset.filter(**{f"{field}__icontains": value})
+
+    min_rating = parse_rating(params, "min_rating")
+    max_rating = parse_rating(params, "max_rating")
+    if min_rating is not None:
+        queryset = queryset.filter(rating__gte=min_rating)
+    if max_rating is not None:
+        queryset = queryset.filter(rating__lte=max_rating)
+    return filter_pay(queryset, params, "hourly_pay_cents")
+
+
+def filter_vacancies(queryset, params):
+    """
+    Apply the vacancy list filters from the query parameters to a queryset.
+
+    Args:
+        queryset (QuerySet): The Vacancies queryset to filter.
+        params (QueryDict): The request query parameters.
+
+    Raises:
+        ValidationError: If a pay bound is invalid.
+
+    Returns:
+        QuerySet: The filtered queryset.
+    """
+    return filter_pay(queryset, params, "payRateCents")
@@ -0,0 +1,231 @@
+"""
+MongoDB index management for the models.
+
+The indexes of a model are declared where Django expects them: ``db_index``
+and ``unique`` on fields, and ``Meta.indexes`` for the compound indexes that
+follow the filter and sort shapes of the queries. No migrations are
+committed for the MongoDB database, so nothing applies those declarations;
+``sync_indexes`` compares them with the indexes of each collection, creates
+the missing ones and, with ``--drop``, drops the ones nobody declares, such
+as the single-field indexes on long free-text fields that no query filters
+on. Dropping is opt-in, since an index created by hand for an ad-hoc query
+or a text search is undeclared too.
+
+Indexes are matched on their keys and uniqueness, not their names, so an
+index created by an earlier Djongo migration under another name is kept.
+A unique field that allows nulls gets a partial index, on the documents
+where the field holds a value (``PARTIAL_TYPES``), so that any number of
+documents can leave it null, as SQL databases allow.
+
+``CANONICAL_QUERIES`` lists the query shapes the indexes are meant for;
+``explain_query`` reports the plan MongoDB picks for each of them.
+"""
+from collections import namedtuple
+from pymongo import IndexModel  # pylint: disable=E0401
+from .mongo import get_collection
+
+# One index of a collection: its name, its (column, direction) keys, uniqueness
+# and, for a partial index, the BSON type of the documents it covers
+IndexSpec = namedtuple("IndexSpec", ["name", "keys", "unique", "partial"], defaults=(None,))
+# What sync_indexes does to one collection
+IndexChanges = namedtuple("IndexChanges", ["create", "drop", "keep"])
+
+# BSON type of the values of a nullable unique field, by Django field type
+PARTIAL_TYPES = {"CharField": "string", "EmailField": "string", "TextField": "string",
+                 "IntegerField": "number", "BigIntegerField": "number"}
+
+# The filter and sort shapes the indexes are declared for, as
+# (description, model name, filter, sort)
+CANONICAL_QUERIES = (
+    ("review listing page", "Reviews", {}, [("id", 1)]),
+    ("cursor page by rating", "Reviews", {"rating": {"$lte": 4}}, [("rating", -1), ("id", -1)]),
+    ("cursor page by pay", "Reviews", {"hourly_pay_cents": {"$gte": 1500}},
+     [("hourly_pay_cents", 1), ("id", 1)]),
+    ("department by rating", "Reviews", {"department": "Computer Science"}, [("rating", -1)]),
+    ("job title by rating", "Reviews", {"job_title": "Library Assistant"}, [("rating", -1)]),
+    ("reviews of an author", "Reviews", {"reviewed_by": "student"}, [("id", 1)]),
+    ("comments of a review", "Comment", {"review_id": 1}, [("created_at", 1), ("id", 1)]),
+    ("comments awaiting a digest", "Comment", {"digest_pending": True}, None),
+    ("vacancy by title and location", "Vacancies", {"dedupKey": "0" * 40}, None),
+    ("vacancies by pay", "Vacancies", {"payRateCents": {"$gte": 1500}},
+     [("payRateCents", 1), ("id", 1)]),
+)
+
+
+def declared_indexes(model):
+    """
+    Return the indexes the model declares.
+
+    Args:
+        model (Model): The model class.
+
+    Returns:
+        list: The ``IndexSpec`` of every indexed or unique field, the
+        primary key included, and of every ``Meta.indexes`` entry.
+    """
+    opts = model._meta # pylint: disable=W0212
+    specs = []
+    for field in opts.local_concrete_fields:
+        unique = field.primary_key or field.unique
+        if unique or field.db_index:
+            partial = PARTIAL_TYPES.get(field.get_internal_type()) if unique and field.null \
+                else None
+            specs.append(IndexSpec(f"{field.column}_1", ((field.column, 1),), unique, partial))
+    for index in opts.indexes:
+        keys = tuple((opts.get_field(name.lstrip("-")).column, -1 if name.startswith("-") else 1)
+                     for name in index.fields)
+        specs.append(IndexSpec(index.name, keys, False))
+    return specs
+
+
+def existing_indexes(index_information):
+    """
+    Read the indexes of a collection.
+
+    Args:
+        index_information (dict): The result of ``index_information()``.
+
+    Returns:
+        list: The ``IndexSpec`` of every index except the one on ``_id``.
+        Numeric directions are read as ints; the others, e.g. ``"text"``,
+        ``"2dsphere"`` or ``"hashed"``, are kept as they are.
+    """
+    return [IndexSpec(name, tuple((key, direction if isinstance(direction, str) else int(direction))
+                                  for key, direction in info["key"]),
+                      bool(info.get("unique")), partial_type(info.get("partialFilterExpression")))
+            for name, info in index_information.items() if name != "_id_"]
+
+
+def partial_type(expression):
+    """
+    Read the BSON type a partial index covers.
+
+    Args:
+        expression (dict or None): The ``partialFilterExpression`` of the index.
+
+    Returns:
+        str or None: The type, e.g. ``string``; None for a full index. A
+        filter of another shape is returned as text, so that it matches no
+        declared index and the index is rebuilt.
+    """
+    if not expression:
+        return None
+    conditions = list(expression.values())
+    if len(conditions) == 1 and list(conditions[0]) == ["$type"]:
+        return conditions[0]["$type"]
+    return repr(dict(expression))
+
+
+def index_model(spec):
+    """
+    Build the pymongo model of a declared index.
+
+    Args:
+        spec (IndexSpec): The declared index.
+
+    Returns:
+        IndexModel: The index to create.
+    """
+    options = {"name": spec.name, "unique": spec.unique}
+    if spec.partial:
+        options["partialFilterExpression"] = {spec.keys[0][0]: {"$type": spec.partial}}
+    return IndexModel(list(spec.keys), **options)
+
+
+def plan_changes(declared, existing):
+    """
+    Compare the declared indexes of a collection with the existing ones,
+    on their keys, uniqueness and partial type.
+
+    Args:
+        declared (list): The ``IndexSpec`` declared by the model.
+        existing (list): The ``IndexSpec`` of the collection.
+
+    Returns:
+        IndexChanges: The declared indexes to create, and the existing
+        indexes to drop and to keep.
+    """
+    wanted = {spec[1:] for spec in declared} # (keys, unique, partial)
+    present = {spec[1:] for spec in existing}
+    return IndexChanges(
+        create=[spec for spec in declared if spec[1:] not in present],
+        drop=[spec for spec in existing if spec[1:] not in wanted],
+        keep=[spec for spec in existing if spec[1:] in wanted],
+    )
+
+
+def sync_model_indexes(model, drop=False, dry_run=False):
+    """
+    Make the indexes of a model's collection match its declarations.
+
+    Undeclared indexes are dropped before the missing ones are created, so
+    that an index can change its uniqueness or become partial.
+
+    Args:
+        model (Model): A model stored in MongoDB.
+        drop (bool): Drop the indexes the model does not declare.
+        dry_run (bool): Only compute the changes.
+
+    Returns:
+        IndexChanges: The changes, with ``drop`` empty when not dropping.
+    """
+    collection = get_collection(model)
+    changes = plan_changes(declared_indexes(model),
+                           existing_indexes(collection.index_information()))
+    if not drop:
+        changes = changes._replace(drop=[])
+    if dry_run:
+        return changes
+    for spec in changes.drop:
+        collection.drop_index(spec.name)
+    if changes.create:
+        collection.create_indexes([index_model(spec) for spec in changes.create])
+    return changes
+
+
+def plan_stages(plan):
+    """
+    Summarize a query plan as its chain of stages.
+
+    Args:
+        plan (dict): The ``winningPlan`` of an explain result.
+
+    Returns:
+        str: The stages from the root to the leaf, e.g.
+        ``LIMIT > FETCH > IXSCAN department_1_rating_1``.
+    """
+    plan = plan.get("queryPlan", plan) # Plans of the slot-based engine
+    stage = plan["stage"]
+    if "indexName" in plan:
+        stage = f"{stage} {plan['indexName']}"
+    children = plan.get("inputStages") or ([plan["inputStage"]] if "inputStage" in plan else [])
+    if not children:
+        return stage
+    return f"{stage} > " + " | ".join(plan_stages(child) for child in children)
+
+
+def explain_query(model, query, sort=None, limit=20):
+    """
+    Explain a query the way the views run it.
+
+    Args:
+        model (Model): The model whose collection is queried.
+        query (dict): The MongoDB filter.
+        sort (list, optional): The ``(field, direction)`` sort keys.
+        limit (int): The number of documents read.
+
+    Returns:
+        dict: The ``plan`` stages, and the documents returned and the keys
+        and documents examined when MongoDB reports them.
+    """
+    cursor = get_collection(model).find(query).limit(limit)
+    if sort:
+        cursor = cursor.sort(sort)
+    explained = cursor.explain()
+    stats = explained.get("executionStats", {})
+    return {
+        "plan": plan_stages(explained["queryPlanner"]["winningPlan"]),
+        "returned": stats.get("nReturned"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+    }
@@ -0,0 +1,215 @@
+"""
+Batched ingestion of vacancy feeds with upsert semantics.
+
+Vacancies used to be created one POST at a time, and nothing stopped the
+same posting from being stored twice. ``ingest_vacancies`` reads a feed one
+batch at a time, validates every row with the ``VacanciesSerializer`` rules
+and upserts the batch on the deduplication key of a posting, the hash of
+its normalized title and location (see ``dedup.vacancy_key``). A posting
+that is already stored is updated in place; rows of the feed that repeat a
+posting are folded into one write, the last one winning.
+
+On MongoDB each batch is a single unordered ``bulk_write`` of upserts, with
+the ids of new postings reserved up front. Other backends read the
+existing postings of the batch with one query and write them with
+``bulk_update`` and ``bulk_create``.
+
+The deduplication key is unique, so when two ingestions insert the same
+new posting at once, one of them is refused; its writes are retried once,
+and find the posting the other one inserted.
+"""
+from django.db import DatabaseError, transaction  # pylint: disable=E0401
+from pymongo import UpdateOne  # pylint: disable=E0401
+from pymongo.errors import BulkWriteError  # pylint: disable=E0401
+from .cache import bump_version
+from .feeds import FeedError, validated_rows
+from .models import Vacancies
+from .mongo import DUPLICATE_KEY_CODES, atomic_unless_mongo, is_duplicate_key, is_mongo
+from .mongo import reserve_ids, to_document
+from .dedup import vacancy_key
+from .pay import parse_pay_cents
+from .serializers import VacanciesSerializer
+from .titles import get_title_matcher
+
+INGEST_BATCH_SIZE = 1000 # Rows validated and upserted at a time
+
+
+def backfill_vacancy_keys():
+    """
+    Compute the deduplication key of vacancies saved before it existed.
+
+    A vacancy repeating the title and location of another keeps no key,
+    since the key is unique; only the first of them is then upserted on.
+
+    Returns:
+        int: The number of vacancies updated.
+    """
+    updated = 0
+    # pylint: disable=E1101
+    missing = Vacancies.objects.filter(dedupKey__isnull=True)
+    for pk, title, location in missing.values_list("pk", "jobTitle", "jobLocation").iterator():
+        try:
+            with atomic_unless_mongo(Vacancies): # Keeps the connection usable if refused
+                Vacancies.objects.filter(pk=pk).update(dedupKey=vacancy_key(title, location))
+        except DatabaseError as e:
+            if not is_duplicate_key(e):
+                raise
+            continue
+        updated += 1
+    return updated
+
+
+def validate_rows(rows, start=0):
+    """
+    Validate vacancy rows with the ``VacanciesSerializer`` rules.
+
+    Args:
+        rows (list): The rows to validate, as dicts of vacancy fields.
+        start (int): The position of the first row in the whole feed.
+
+    Returns:
+        tuple: ``{dedup key: unsaved Vacancies}`` for the valid rows, the
+        number of valid rows that repeated an earlier row of the batch, and
+        a list of ``{"row": position, "errors": {...}}`` for the invalid ones.
+    """
+    vacancies, repeated, errors = {}, 0, []
+    for attrs in validated_rows(VacanciesSerializer(), rows, start, errors):
+        vacancy = Vacancies(**attrs)
+        vacancy.payRateCents = parse_pay_cents(vacancy.jobPayRate) # save() is bypassed
+        vacancy.dedupKey = vacancy_key(vacancy.jobTitle, vacancy.jobLocation)
+        repeated += vacancy.dedupKey in vacancies
+        vacancies[vacancy.dedupKey] = vacancy
+    return vacancies, repeated, errors
+
+
+def upsert_vacancies(vacancies):
+    """
+    Insert new postings and update stored ones, in one bulk write.
+
+    Args:
+        vacancies (dict): ``{dedup key: unsaved Vacancies}``.
+
+    Returns:
+        list: The newly inserted vacancies, with their ids; the others
+        count as updated.
+    """
+    if not vacancies:
+        return []
+    batch = list(vacancies.values())
+    if not is_mongo(Vacancies):
+        try:
+            with transaction.atomic(): # Keeps the connection usable if the insert is refused
+                return update_or_create(batch)
+        except DatabaseError as e:
+            if not is_duplicate_key(e):
+                raise
+        with transaction.atomic(): # The postings inserted meanwhile are now updated
+            return update_or_create(batch)
+
+    ids = reserve_ids(Vacancies, len(batch)) # Ids of postings that turn out new are unused
+    operations = []
+    for vacancy, pk in zip(batch, ids):
+        document = to_document(vacancy)
+        document.pop("id")
+        operations.append(UpdateOne({"dedupKey": vacancy.dedupKey},
+                                    {"$set": document, "$setOnInsert": {"id": pk}},
+                                    upsert=True))
+    # pylint: disable=E1101
+    try:
+        upserted = Vacancies.objects.mongo_bulk_write(operations, ordered=False).upserted_ids
+    except BulkWriteError as e:
+        refused = [error["index"] for error in e.details["writeErrors"]]
+        if any(error["code"] not in DUPLICATE_KEY_CODES for error in e.details["writeErrors"]):
+            raise
+        upserted = {item["index"]: item["_id"] for item in e.details["upserted"]}
+        # The upserts that lost the race for a new posting now match it and update it
+        retried = Vacancies.objects.mongo_bulk_write([operations[i] for i in refused],
+                                                     ordered=False)
+        upserted.update({refused[i]: pk for i, pk in retried.upserted_ids.items()})
+    created = []
+    for position in sorted(upserted):
+        batch[position].pk = ids[position]
+        created.append(batch[position])
+    return created
+
+
+def update_or_create(batch):
+    """
+    Write a batch with one query and two bulk writes, on non-MongoDB backends.
+
+    Args:
+        batch (list): Unsaved Vacancies with distinct dedup keys.
+
+    Returns:
+        list: The vacancies that were inserted.
+    """
+    # pylint: disable=E1101
+    existing = dict(Vacancies.objects.filter(dedupKey__in=[v.dedupKey for v in batch])
+                    .values_list("dedupKey", "pk"))
+    updated = [vacancy for vacancy in batch if vacancy.dedupKey in existing]
+    created = [vacancy for vacancy in batch if vacancy.dedupKey not in existing]
+    for vacancy in updated:
+        vacancy.pk = existing[vacancy.dedupKey]
+    fields = [field.name for field in Vacancies._meta.concrete_fields # pylint: disable=W0212
+              if not field.primary_key]
+    Vacancies.objects.bulk_update(updated, fields)
+    Vacancies.objects.bulk_create(created)
+    return created
+
+
+def ingest_vacancies(rows, batch_size=INGEST_BATCH_SIZE, dry_run=False, index=True):
+    """
+    Validate and upsert a vacancy feed in batches.
+
+    Args:
+        rows (iterable): The rows of the feed, as dicts of vacancy fields.
+            It is consumed one batch at a time, so it can be a file reader.
+        batch_size (int): The number of rows validated and upserted at a time.
+        dry_run (bool): Only validate the rows.
+        index (bool): Add new titles to the title matcher of this process.
+            Off for commands, whose process ends with the ingestion.
+
+    Raises:
+        FeedError: If the feed cannot be read past a line. The rows read
+            before it are ingested, and the error carries the report of
+            what was written.
+
+    Returns:
+        dict: The number of ``created`` and ``updated`` postings, of
+        ``repeated`` rows folded into another row of their batch, and the
+        ``errors`` of the invalid rows. In a dry run every valid posting
+        counts as updated.
+    """
+    report = {"created": 0, "updated": 0, "repeated": 0, "errors": []}
+    if not dry_run:
+        backfill_vacancy_keys()
+    batch, start = [], 0
+
+    def flush():
+        vacancies, repeated, errors = validate_rows(batch, start)
+        report["repeated"] += repeated
+        report["errors"].extend(errors)
+        created = [] if dry_run else upsert_vacancies(vacancies)
+        report["created"] += len(created)
+        report["updated"] += len(vacancies) - len(created)
+        if index and created:
+            matcher = get_title_matcher()
+            for vacancy in created:
+                matcher.add("vacancy", vacancy.pk, vacancy.jobTitle)
+        if vacancies and not dry_run:
+            bump_version("vacancies")
+
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                flush()
+                start += len(batch)
+                batch = []
+    except (FeedError, UnicodeDecodeError) as e: # Earlier batches are already written
+        if batch:
+            flush()
+        raise FeedError(str(e), report) from e
+    if batch:
+        flush()
+    return report
@@ -0,0 +1,276 @@
+"""
+Concurrency limit and load shedding for the whole API.
+
+Under a traffic spike every request used to be accepted, so full-collection
+reads such as ``all_reviews/`` queued behind each other for database
+connections until the workers timed out, and every request got slow.
+``load_shedding_middleware`` admits at most
+``settings.LOAD_SHEDDING_MAX_ACTIVE`` requests at a time per process. The
+others wait in a queue of at most ``LOAD_SHEDDING_MAX_WAITING`` requests
+for up to ``LOAD_SHEDDING_QUEUE_TIMEOUT`` seconds; a request that finds the
+queue full, or is still waiting at the deadline, gets an immediate 503 with
+a ``Retry-After`` header. The latency of admitted requests thus stays
+bounded by the work of ``MAX_ACTIVE`` requests plus the queue timeout.
+
+A streamed response keeps its slot until its body is sent, since that is
+when it reads the database. Paths starting with one of
+``LOAD_SHEDDING_EXEMPT_PATHS`` bypass the limit, so that the admin and the
+counters stay reachable during an overload. ``LOAD_SHEDDING_MAX_ACTIVE=0``
+disables the middleware.
+
+The counters of admitted and shed requests are served by
+``service/load/stats/``. Like the rest of the limiter they belong to the
+worker process that answers.
+"""
+import asyncio
+import threading
+import time
+from django.conf import settings  # pylint: disable=E0401
+from django.http import JsonResponse  # pylint: disable=E0401
+from django.utils.decorators import sync_and_async_middleware  # pylint: disable=E0401
+
+COUNTERS = ("admitted", "queued", "shed_queue_full", "shed_timeout")
+
+
+class ConcurrencyLimiter:
+    """
+    A thread-safe limit on the requests running at once, with a bounded
+    and time-limited wait queue.
+
+    Attributes:
+        max_active (int): Most requests running at once.
+        max_waiting (int): Most requests waiting for a slot.
+        timeout (float): Longest wait for a slot, in seconds.
+
+    Methods:
+        try_acquire(): takes a free slot without waiting.
+        acquire(): takes a slot, waiting in the queue if needed.
+        release(): gives a slot back.
+        snapshot(): returns the settings, the current load and the counters.
+    """
+
+    def __init__(self, max_active, max_waiting, timeout):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.active = 0 # Requests holding a slot
+        self.waiting = 0 # Requests in the queue
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._condition = threading.Condition()
+
+    def try_acquire(self):
+        """
+        Take a slot if one is free and nobody is queued for it.
+
+        Returns:
+            bool: True if a slot was taken.
+        """
+        with self._condition:
+            if self.active >= self.max_active or self.waiting:
+                return False
+            self.active += 1
+            self.counters["admitted"] += 1
+            return True
+
+    def acquire(self):
+        """
+        Take a slot, waiting up to ``timeout`` seconds for one.
+
+        Returns:
+            str or None: None if a slot was taken, otherwise why the
+            request is shed, ``queue_full`` or ``timeout``.
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            if self.active < self.max_active and not self.waiting:
+                self.active += 1
+                self.counters["admitted"] += 1
+                return None
+            if self.waiting >= self.max_waiting:
+                self.counters["shed_queue_full"] += 1
+                return "queue_full"
+            self.waiting += 1
+            try:
+                while self.active >= self.max_active:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters["shed_timeout"] += 1
+                        return "timeout"
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.counters["admitted"] += 1
+            self.counters["queued"] += 1
+            return None
+
+    def release(self):
+        """Give a slot back and wake the first request waiting for one."""
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def snapshot(self):
+        """
+        Return the settings, the current load and the counters.
+
+        Returns:
+            dict: ``max_active``, ``max_waiting``, ``queue_timeout``,
+            ``active``, ``waiting``, the counters of ``COUNTERS`` and
+            ``shed``, their total of shed requests.
+        """
+        with self._condition:
+            stats = {"max_active": self.max_active, "max_waiting": self.max_waiting,
+                     "queue_timeout": self.timeout, "active": self.active,
+                     "waiting": self.waiting, **self.counters}
+        stats["shed"] = stats["shed_queue_full"] + stats["shed_timeout"]
+        return stats
+
+
+class ReleasingContent:
+    """
+    The body of a streamed response, releasing its slot once sent.
+
+    The server closes the response when the body is sent or the client
+    disconnects, even if the body was never iterated; releasing in both
+    ``__iter__`` and ``close`` covers every case, once.
+
+    Methods:
+        close(): releases the slot.
+    """
+
+    def __init__(self, content, release):
+        self.content = content
+        self._release = release
+        self._released = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        try:
+            yield from self.content
+        finally:
+            self.close()
+
+    def close(self):
+        """Release the slot unless it was already released."""
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._release()
+
+
+# The ConcurrencyLimiter of the middleware of this process
+_limiter = None # pylint: disable=C0103
+
+
+def get_limiter():
+    """
+    Return the limiter of the middleware of this process.
+
+    Returns:
+        ConcurrencyLimiter or None: None until the middleware is loaded, or
+        if it is disabled.
+    """
+    return _limiter
+
+
+def load_stats():
+    """
+    Return the load and the shedding counters of this process.
+
+    Returns:
+        dict: ``enabled`` and, when enabled, ``ConcurrencyLimiter.snapshot``.
+    """
+    limiter = get_limiter()
+    if limiter is None:
+        return {"enabled": False}
+    return {"enabled": True, **limiter.snapshot()}
+
+
+def overloaded_response():
+    """
+    Build the response of a shed request.
+
+    Returns:
+        JsonResponse: A 503 with a ``Retry-After`` header.
+    """
+    response = JsonResponse({"detail": "The server is overloaded, please retry shortly."},
+                            status=503)
+    response["Retry-After"] = str(settings.LOAD_SHEDDING_RETRY_AFTER)
+    # Not logged as a server error, which would email the admins once per shed request
+    response._has_been_logged = True # pylint: disable=W0212
+    return response
+
+
+def hold_until_sent(response, limiter):
+    """
+    Release the slot of a request once its response is sent.
+
+    Args:
+        response (HttpResponse): The response of the view.
+        limiter (ConcurrencyLimiter): The limiter holding the slot.
+
+    Returns:
+        HttpResponse: The response, whose streamed body now releases the slot.
+    """
+    if response.streaming:
+        response.streaming_content = ReleasingContent(response.streaming_content,
+                                                      limiter.release)
+    else:
+        limiter.release()
+    return response
+
+
+@sync_and_async_middleware
+def load_shedding_middleware(get_response):
+    """
+    Build the middleware that limits the requests running at once.
+
+    The limiter is created from the settings when Django loads the
+    middleware, i.e. once per process.
+
+    Args:
+        get_response (callable): The rest of the middleware chain.
+
+    Returns:
+        callable: The middleware, asynchronous if ``get_response`` is.
+    """
+    global _limiter # pylint: disable=W0603
+    if settings.LOAD_SHEDDING_MAX_ACTIVE <= 0:
+        _limiter = None
+        return get_response
+    limiter = ConcurrencyLimiter(settings.LOAD_SHEDDING_MAX_ACTIVE,
+                                 settings.LOAD_SHEDDING_MAX_WAITING,
+                                 settings.LOAD_SHEDDING_QUEUE_TIMEOUT)
+    _limiter = limiter
+    exempt = tuple(settings.LOAD_SHEDDING_EXEMPT_PATHS)
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            if request.path.startswith(exempt):
+                return await get_response(request)
+            # Waiting blocks, so it happens on a worker thread of the event loop
+            if not limiter.try_acquire() and await asyncio.get_running_loop().run_in_executor(
+                    None, limiter.acquire):
+                return overloaded_response()
+            try:
+                response = await get_response(request)
+            except BaseException:
+                limiter.release()
+                raise
+            return hold_until_sent(response, limiter)
+    else:
+        def middleware(request):
+            if request.path.startswith(exempt):
+                return get_response(request)
+            if limiter.acquire():
+                return overloaded_response()
+            try:
+                response = get_response(request)
+            except BaseException:
+                limiter.release()
+                raise
+            return hold_until_sent(response, limiter)
+
+    return middleware
@@ -0,0 +1,102 @@
+"""
+This module contains a command for backfilling the parsed pay of reviews and
+vacancies.
+
+``Reviews.hourly_pay_cents`` and ``Vacancies.payRateCents`` are set on every
+save, but documents written before those fields existed, or through bulk
+inserts, do not have them. The command walks each collection in id order,
+one batch at a time, so it can run against a live database and be resumed.
+On MongoDB each batch is written with a single ``bulk_write``.
+
+This is called from the command line manually, once after deploying the pay
+fields and after any bulk import.
+"""
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne  # pylint: disable=E0401
+from service.cache import bump_version
+from service.models import Reviews, Vacancies
+from service.mongo import is_mongo
+from service.pay import parse_pay_cents
+
+# (model, free-form pay field, parsed pay field, cached collection) of each
+# backfilled collection
+PAY_FIELDS = (
+    (Reviews, "hourly_pay", "hourly_pay_cents", "reviews"),
+    (Vacancies, "jobPayRate", "payRateCents", "vacancies"),
+)
+
+
+class Command(BaseCommand):
+    """
+    Command class to parse the pay of existing reviews and vacancies.
+
+    Methods:
+        add_arguments: declares the command line options
+        backfill: parses the pay of one collection batch by batch
+        handle: backfills every collection
+    """
+    help = 'Backfill the parsed pay in cents of reviews and vacancies'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of documents read and written per batch')
+        parser.add_argument('--all', action='store_true',
+                            help='Parse every document, not only those without a parsed pay')
+
+    @staticmethod
+    def backfill(model, text_field, cents_field, batch_size, everything):
+        """
+        Parse the pay of one collection in batches of consecutive ids.
+
+        Args:
+            model (Model): The model to backfill.
+            text_field (str): The free-form pay field.
+            cents_field (str): The parsed pay field.
+            batch_size (int): The number of documents per batch.
+            everything (bool): Parse every document instead of only those
+                without a parsed pay.
+
+        Returns:
+            int: The number of documents whose parsed pay was changed.
+        """
+        queryset = model.objects.all()
+        if not everything:
+            queryset = queryset.filter(**{f"{cents_field}__isnull": True})
+        updated, last = 0, 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last).order_by("pk")
+                        .values_list("pk", text_field, cents_field)[:batch_size])
+            if not rows:
+                return updated
+            last = rows[-1][0]
+            changes = {}
+            for pk, text, cents in rows:
+                parsed = parse_pay_cents(text)
+                if parsed != cents:
+                    changes[pk] = parsed
+            if not changes:
+                continue
+            if is_mongo(model):
+                model.objects.mongo_bulk_write( # pylint: disable=E1101
+                    [UpdateOne({"id": pk}, {"$set": {cents_field: cents}})
+                     for pk, cents in changes.items()],
+                    ordered=False,
+                )
+            else:
+                instances = [model(pk=pk, **{cents_field: cents}) for pk, cents in changes.items()]
+                model.objects.bulk_update(instances, [cents_field])
+            updated += len(changes)
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Backfill the parsed pay of every collection and print the counts.
+        """
+        for model, text_field, cents_field, collection in PAY_FIELDS:
+            updated = self.backfill(model, text_field, cents_field,
+                                    options['batch_size'], options['all'])
+            if updated: # Bulk writes send no signals, so drop the cached listings here
+                bump_version(collection)
+            name = model._meta.verbose_name_plural # pylint: disable=W0212
+            self.stdout.write(self.style.SUCCESS(f'Updated the parsed pay of {updated} {name}'))
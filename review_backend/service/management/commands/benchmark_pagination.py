@@ -0,0 +1,101 @@
+"""
+This module contains a command for benchmarking offset and cursor pagination
+of the review listing.
+
+It seeds a configurable number of reviews, requests pages at increasing depths
+through ``ReviewsView`` with both pagination modes and prints the median
+latency of each. Offset pages slow down with depth because MongoDB skips every
+earlier document; cursor pages should stay flat.
+
+This is called from the command line manually, against a development database.
+"""
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+from service.benchmarks import remove_benchmark_reviews, seed_reviews
+from service.models import Reviews
+from service.pagination import KeysetPagination
+from service.views import ReviewsView
+
+
+class Command(BaseCommand):
+    """
+    Command class to compare offset and cursor pagination latency.
+
+    Methods:
+        add_arguments: declares the command line options
+        handle: seeds the reviews, runs the benchmark and cleans up
+    """
+    help = 'Benchmark offset vs cursor pagination of the review listing'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('--documents', type=int, default=100_000,
+                            help='Number of reviews to seed')
+        parser.add_argument('--page-size', type=int, default=20,
+                            help='Number of reviews per page')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Requests per depth; the median is reported')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded reviews after the run')
+
+    @staticmethod
+    def time_request(view, factory, params, repeat):
+        """
+        Time a listing request and return the median latency in milliseconds.
+
+        Args:
+            view (callable): The ReviewsView view function.
+            factory (APIRequestFactory): Factory for building requests.
+            params (dict): The query parameters of the request.
+            repeat (int): The number of timed requests.
+
+        Returns:
+            float: The median latency in milliseconds.
+        """
+        samples = []
+        for _ in range(repeat):
+            request = factory.get("/service/all_reviews/", params)
+            start = time.perf_counter()
+            response = view(request)
+            response.render()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Seed the reviews, time offset and cursor pages at increasing depths
+        and print one row per depth.
+        """
+        documents, page_size = options['documents'], options['page_size']
+        self.stdout.write(f'Seeding {documents} reviews...')
+        seed_reviews(0, documents)
+
+        factory = APIRequestFactory()
+        view = ReviewsView.as_view()
+        try:
+            total_pages = Reviews.objects.count() // page_size # pylint: disable=E1101
+            depths = sorted({1, 10, 100, 1000, total_pages // 2, total_pages})
+            self.stdout.write(f'{"page":>8} {"offset ms":>12} {"cursor ms":>12}')
+            for depth in depths:
+                if depth < 1:
+                    continue
+                offset_ms = self.time_request(
+                    view, factory, {"page": depth, "page_size": page_size}, options['repeat'])
+
+                # Position the cursor just before the requested page (not timed)
+                cursor = ""
+                if depth > 1:
+                    # pylint: disable=E1101
+                    last = Reviews.objects.order_by("id")[(depth - 1) * page_size - 1]
+                    cursor = KeysetPagination.encode_cursor("id", str(last.pk), last.pk)
+                cursor_ms = self.time_request(
+                    view, factory, {"cursor": cursor, "page_size": page_size}, options['repeat'])
+
+                self.stdout.write(f'{depth:>8} {offset_ms:>12.2f} {cursor_ms:>12.2f}')
+        finally:
+            if not options['keep']:
+                remove_benchmark_reviews()
+                self.stdout.write(self.style.SUCCESS('Removed the benchmark reviews'))
@@ -0,0 +1,166 @@
+"""
+This module contains a command for benchmarking the pymongo read repository
+against the Djongo ORM.
+
+It seeds reviews, vacancies and comments, then runs each hot read of the
+list endpoints through both paths: the ORM queryset the views used to
+evaluate, and the ``MongoQuery`` of ``service.repository``. For every read
+it checks that both return the same documents and prints the mean time per
+call of each path and the speedup.
+
+This is called from the command line manually, against a development
+MongoDB database.
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from service.benchmarks import BENCHMARK_USER, remove_benchmark_reviews, seed_reviews
+from service.filters import filter_reviews, filter_vacancies
+from service.models import Comment, Reviews, Vacancies
+from service.mongo import is_mongo
+from service.repository import comment_query, review_query, vacancy_query
+
+PAGE_SIZE = 20 # Reviews per listing page, as in ReviewsPagination
+
+
+class Command(BaseCommand):
+    """
+    Command class to compare the read repository with the ORM.
+
+    Methods:
+        add_arguments: declares the command line options
+        seed: inserts benchmark documents
+        reads: returns the pairs of reads to compare
+        measure: times one read
+        handle: seeds, runs the benchmark and cleans up
+    """
+    help = 'Benchmark the pymongo read repository against the Djongo ORM'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('--reviews', type=int, default=20_000,
+                            help='Number of reviews to seed')
+        parser.add_argument('--vacancies', type=int, default=500,
+                            help='Number of vacancies to seed')
+        parser.add_argument('--comments', type=int, default=50,
+                            help='Number of comments to seed on one review')
+        parser.add_argument('--repeat', type=int, default=200,
+                            help='Number of calls timed per read and path')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded documents after the run')
+
+    @staticmethod
+    def seed(reviews, vacancies, comments):
+        """
+        Insert the benchmark documents.
+
+        Args:
+            reviews (int): The number of reviews.
+            vacancies (int): The number of vacancies.
+            comments (int): The number of comments on the first review.
+
+        Returns:
+            int: The id of the review with the comments.
+        """
+        seed_reviews(0, reviews)
+        # pylint: disable=E1101
+        Vacancies.objects.bulk_create([Vacancies(
+            jobTitle=f"{BENCHMARK_USER} {i}",
+            jobDescription="Benchmark vacancy",
+            jobLocation="Raleigh",
+            jobPayRate=str(10 + i % 20),
+            payRateCents=(10 + i % 20) * 100,
+            maxHoursAllowed=20,
+        ) for i in range(vacancies)])
+        review = Reviews.objects.filter(reviewed_by=BENCHMARK_USER).order_by("id").first()
+        Comment.objects.bulk_create([
+            Comment(review=review, user_id=BENCHMARK_USER, text=f"Comment {i}")
+            for i in range(comments)])
+        return review.pk
+
+    @staticmethod
+    def reads(review_id, middle):
+        """
+        Return the reads to compare.
+
+        Args:
+            review_id (int): The review with the seeded comments.
+            middle (int): The offset of a page in the middle of the listing.
+
+        Returns:
+            list: ``(name, ORM read, repository read)``; each read returns
+            the ids it found.
+        """
+        plain = QueryDict()
+        filtered = QueryDict("department=Department 7&min_rating=3&min_pay=12")
+
+        def orm_page(params, offset):
+            # pylint: disable=E1101
+            queryset = filter_reviews(Reviews.objects.all(), params).order_by("id")
+            queryset.count()
+            return [review.pk for review in queryset[offset:offset + PAGE_SIZE]]
+
+        def repository_page(params, offset):
+            query = review_query(params)
+            query.count()
+            return [review.pk for review in query[offset:offset + PAGE_SIZE]]
+
+        # pylint: disable=E1101
+        return [
+            ("reviews page 1", lambda: orm_page(plain, 0), lambda: repository_page(plain, 0)),
+            ("reviews middle page", lambda: orm_page(plain, middle),
+             lambda: repository_page(plain, middle)),
+            ("filtered reviews", lambda: orm_page(filtered, 0),
+             lambda: repository_page(filtered, 0)),
+            ("review comments",
+             lambda: sorted(c.pk for c in Comment.objects.filter(review_id=review_id)),
+             lambda: sorted(c.pk for c in comment_query(review_id))),
+            ("vacancies",
+             lambda: [v.pk for v in filter_vacancies(Vacancies.objects.order_by("id"), plain)],
+             lambda: [v.pk for v in vacancy_query(plain)]),
+        ]
+
+    @staticmethod
+    def measure(read, repeat):
+        """
+        Time a read.
+
+        Args:
+            read (callable): The read to time.
+            repeat (int): The number of calls.
+
+        Returns:
+            float: The mean time per call in milliseconds.
+        """
+        read() # Warm up the connection and the caches
+        start = time.perf_counter()
+        for _ in range(repeat):
+            read()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Seed the documents, time both paths of every read and print one row
+        per read.
+        """
+        if not is_mongo(Reviews):
+            raise CommandError('The repository only serves MongoDB databases')
+        self.stdout.write('Seeding the benchmark documents...')
+        review_id = self.seed(options['reviews'], options['vacancies'], options['comments'])
+        try:
+            self.stdout.write(f'{"read":<22} {"ORM ms":>9} {"repo ms":>9} {"speedup":>8}')
+            for name, orm, repository in self.reads(review_id, options['reviews'] // 2):
+                if orm() != repository():
+                    raise CommandError(f'The two paths disagree on "{name}"')
+                orm_ms = self.measure(orm, options['repeat'])
+                repository_ms = self.measure(repository, options['repeat'])
+                self.stdout.write(f'{name:<22} {orm_ms:>9.2f} {repository_ms:>9.2f} '
+                                  f'{orm_ms / repository_ms:>7.1f}x')
+        finally:
+            if not options['keep']:
+                # pylint: disable=E1101
+                Comment.objects.filter(user_id=BENCHMARK_USER).delete()
+                Vacancies.objects.filter(jobTitle__startswith=BENCHMARK_USER).delete()
+                remove_benchmark_reviews()
+                self.stdout.write(self.style.SUCCESS('Removed the benchmark documents'))
@@ -0,0 +1,102 @@
+"""
+This module contains a command for benchmarking the review search index.
+
+It builds an index over synthetic reviews (no database access), writes and
+memory-maps a snapshot, and prints query latency percentiles for the index
+as built in memory (with the last reviews added to its delta segment, as a
+running worker would have them) and for the memory-mapped snapshot.
+
+This is called from the command line manually.
+"""
+import os
+import random
+import statistics
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from service.search import STOP_WORDS, SearchIndex
+
+
+class Command(BaseCommand):
+    """
+    Command class to measure search latency at a given collection size.
+
+    Methods:
+        add_arguments: declares the command line options
+        handle: builds the indexes and runs the queries
+    """
+    help = 'Benchmark BM25 query latency of the review search index'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('--documents', type=int, default=100_000,
+                            help='Number of synthetic reviews to index')
+        parser.add_argument('--queries', type=int, default=1000,
+                            help='Number of timed queries')
+        parser.add_argument('--vocabulary', type=int, default=20_000,
+                            help='Number of distinct words')
+        parser.add_argument('--words', type=int, default=80,
+                            help='Number of words per review')
+        parser.add_argument('--delta', type=int, default=1000,
+                            help='Number of reviews added after the build')
+        parser.add_argument('--seed', type=int, default=510)
+
+    @staticmethod
+    def percentiles(samples):
+        """Return the p50, p95 and p99 of the samples in milliseconds."""
+        cuts = statistics.quantiles(samples, n=100)
+        return cuts[49], cuts[94], cuts[98]
+
+    def run_queries(self, index, queries):
+        """Time each query against the index and return the latencies."""
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, 20)
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Build the synthetic index, then time queries against it and against
+        the memory-mapped snapshot.
+        """
+        rng = random.Random(options['seed'])
+        # Zipf-like word frequencies, as in natural text, where the most
+        # frequent words are the stop words
+        words = sorted(STOP_WORDS) + [f"w{i}" for i in range(options['vocabulary'])]
+        weights = [1 / (rank + 1) for rank in range(len(words))]
+
+        self.stdout.write(f"Generating {options['documents']} reviews...")
+        reviews = [
+            {"id": i + 1, "review": " ".join(rng.choices(words, weights, k=options['words']))}
+            for i in range(options['documents'])
+        ]
+        queries = [" ".join(rng.choices(words, weights, k=rng.randint(1, 3)))
+                   for _ in range(options['queries'])]
+
+        split = max(len(reviews) - options['delta'], 0)
+        start = time.perf_counter()
+        memory_index = SearchIndex.build(reviews[:split])
+        self.stdout.write(f"Built in-memory index in {time.perf_counter() - start:.1f} s")
+        for review in reviews[split:]:
+            memory_index.add(review["id"], review["review"])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "search_index.bin")
+            start = time.perf_counter()
+            memory_index.save(path)
+            self.stdout.write(f"Saved snapshot in {time.perf_counter() - start:.1f} s")
+            start = time.perf_counter()
+            mapped_index = SearchIndex.load(path)
+            self.stdout.write(
+                f"Loaded {os.path.getsize(path) / 2**20:.1f} MiB snapshot in "
+                f"{(time.perf_counter() - start) * 1000:.1f} ms"
+            )
+
+            self.stdout.write(f'{"segment":>10} {"p50 ms":>10} {"p95 ms":>10} {"p99 ms":>10}')
+            for name, index in (("memory", memory_index), ("mmap", mapped_index)):
+                p50, p95, p99 = self.percentiles(self.run_queries(index, queries))
+                self.stdout.write(f'{name:>10} {p50:>10.2f} {p95:>10.2f} {p99:>10.2f}')
+            del mapped_index
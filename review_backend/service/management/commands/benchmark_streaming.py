@@ -0,0 +1,101 @@
+"""
+This module contains a command for benchmarking the memory use of the
+buffered and streamed review listing.
+
+For each collection size it seeds reviews, then renders the whole listing
+twice: buffered, the way the listing used to materialize it (every instance,
+the serialized list, then the rendered bytes), and streamed through
+``ReviewsView`` with ``?stream=1``. It prints the peak Python memory
+allocated by each (measured with ``tracemalloc``), the time to the first
+byte and the total time. The streamed peak should stay flat as the
+collection grows.
+
+This is called from the command line manually, against a development database.
+"""
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from service.benchmarks import remove_benchmark_reviews, seed_reviews
+from service.models import Reviews
+from service.serializers import ReviewsSerializer
+from service.views import ReviewsView
+
+
+class Command(BaseCommand):
+    """
+    Command class to compare the memory use of buffered and streamed listings.
+
+    Methods:
+        add_arguments: declares the command line options
+        measure: runs one rendering under tracemalloc
+        handle: seeds each size, runs the benchmark and cleans up
+    """
+    help = 'Benchmark peak memory of the buffered vs streamed review listing'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('--sizes', type=int, nargs='+', default=[50_000, 500_000],
+                            help='Collection sizes to measure, in increasing order')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the seeded reviews after the run')
+
+    @staticmethod
+    def measure(chunks):
+        """
+        Consume an iterable of byte chunks under tracemalloc.
+
+        Args:
+            chunks (callable): Returns the iterable of chunks to consume.
+
+        Returns:
+            tuple: Peak memory in MiB, time to the first byte and total time
+            in seconds, and the number of bytes produced.
+        """
+        tracemalloc.start()
+        start = time.perf_counter()
+        first_byte, size = None, 0
+        for chunk in chunks():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            size += len(chunk)
+        total = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+        return peak, first_byte, total, size
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Seed each collection size, measure both modes and print one row per
+        size and mode.
+        """
+        factory = APIRequestFactory()
+        view = ReviewsView.as_view()
+
+        def buffered():
+            # pylint: disable=E1101
+            data = ReviewsSerializer(Reviews.objects.order_by("id"), many=True).data
+            return [JSONRenderer().render(data)]
+
+        def streamed():
+            response = view(factory.get("/service/all_reviews/", {"stream": "1"}))
+            return response.streaming_content
+
+        seeded = 0
+        try:
+            self.stdout.write(f'{"reviews":>9} {"mode":>9} {"peak MiB":>10} '
+                              f'{"TTFB s":>8} {"total s":>8} {"MiB out":>8}')
+            for size in sorted(options['sizes']):
+                self.stdout.write(f'Seeding up to {size} reviews...')
+                seed_reviews(seeded, size)
+                seeded = max(seeded, size)
+                for mode, chunks in (("buffered", buffered), ("streamed", streamed)):
+                    peak, first_byte, total, out = self.measure(chunks)
+                    self.stdout.write(f'{size:>9} {mode:>9} {peak:>10.1f} '
+                                      f'{first_byte:>8.3f} {total:>8.3f} {out / 2 ** 20:>8.1f}')
+        finally:
+            if not options['keep']:
+                remove_benchmark_reviews()
+                self.stdout.write(self.style.SUCCESS('Removed the benchmark reviews'))
@@ -0,0 +1,39 @@
+"""
+This module contains a command for rebuilding the review search index snapshot.
+
+The snapshot is read through mmap by every worker on first use, and workers
+that are already running switch to it on their next query. Run it after bulk
+changes to the Reviews collection, or periodically so that each worker's
+in-memory delta stays small.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from service.search import SearchIndex
+
+
+class Command(BaseCommand):
+    """
+    Command class to build the search index from the Reviews collection.
+
+    Methods:
+        add_arguments: declares the command line options
+        handle: builds the index and writes the snapshot
+    """
+    help = 'Build the review full-text search index snapshot'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('--path', default=None,
+                            help='Snapshot file to write (default: settings.SEARCH_INDEX_PATH)')
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Index every review and write the snapshot atomically.
+        """
+        path = options['path'] or settings.SEARCH_INDEX_PATH
+        index = SearchIndex.build_from_database()
+        index.save(path)
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {len(index)} reviews into {path}')
+        )
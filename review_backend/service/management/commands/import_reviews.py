@@ -0,0 +1,74 @@
+"""
+This module contains a command for importing reviews from a CSV or JSONL file.
+
+It is meant for onboarding the historical reviews of a department: the file
+is read one batch at a time, every row is validated with the same rules as
+the review API and the valid rows of each batch are inserted with a single
+bulk write. Invalid rows are skipped and listed with their number (the
+first review of the file is row 1) and errors.
+
+CSV files need a header row naming the review fields (``department``,
+``job_title``, ``hourly_pay``, ``rating``, ...); empty cells are treated as
+missing. JSONL files hold one review object per line.
+
+The search indexes of running workers only see reviews saved through them,
+so run ``build_search_index`` after a large import.
+"""
+import json
+from django.core.management.base import BaseCommand, CommandError
+from service.bulk import IMPORT_BATCH_SIZE, import_reviews
+from service.feeds import FeedError, read_feed
+
+
+class Command(BaseCommand):
+    """
+    Command class to bulk import reviews from a file.
+
+    Methods:
+        add_arguments: declares the command line options
+        handle: reads, validates and inserts the reviews and reports errors
+        write_report: prints the invalid rows and the summary
+    """
+    help = 'Import reviews from a CSV or JSONL file with batched validation and inserts'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('path', help='The CSV or JSONL file to import')
+        parser.add_argument('--format', choices=('csv', 'jsonl'), default=None,
+                            help='File format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Number of rows validated and inserted at a time')
+        parser.add_argument('--reviewed-by', default=None,
+                            help='Author to record on every imported review')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only validate the rows and report errors')
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Import the file and print one line per invalid row and a summary.
+        """
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in ('csv', 'jsonl'):
+            raise CommandError('Cannot tell the file format, pass --format csv or jsonl')
+        with open(path, newline='', encoding='utf-8') as handle:
+            try:
+                created, errors = import_reviews(
+                    read_feed(handle, file_format), batch_size=options['batch_size'],
+                    reviewed_by=options['reviewed_by'], dry_run=options['dry_run'], index=False,
+                )
+            except FeedError as e: # A line is not valid JSON or CSV, or not UTF-8
+                if e.report:
+                    self.write_report(e.report['created'], e.report['errors'],
+                                      options['dry_run'])
+                raise CommandError(str(e)) from e
+        self.write_report(created, errors, options['dry_run'])
+
+    def write_report(self, created, errors, dry_run):
+        """Print one line per invalid row and a summary of the import."""
+        for error in errors:
+            self.stderr.write(f'Row {error["row"] + 1}: {json.dumps(error["errors"])}')
+        verb = 'Validated' if dry_run else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {created} reviews, skipped {len(errors)} invalid rows'))
@@ -0,0 +1,80 @@
+"""
+This module contains a command for ingesting a vacancy feed from a CSV or
+JSONL file.
+
+The file is read one batch at a time, every row is validated with the same
+rules as the vacancy API (including ``maxHoursAllowed`` > 0) and each batch
+is upserted with a single bulk write. Postings are matched on their
+normalized job title and location: a posting that is already stored is
+updated, a new one is inserted, and rows that repeat a posting within a
+batch are folded into one, the last one winning. Invalid rows are skipped
+and listed with their number (the first vacancy of the file is row 1) and
+errors.
+
+CSV files need a header row naming the vacancy fields (``jobTitle``,
+``jobDescription``, ``jobLocation``, ``jobPayRate``, ``maxHoursAllowed``);
+empty cells are treated as missing. JSONL files hold one vacancy object per
+line.
+
+The title matchers of running workers only see vacancies saved through
+them, so restart them after a large ingestion.
+"""
+import json
+from django.core.management.base import BaseCommand, CommandError
+from service.feeds import FeedError, read_feed
+from service.ingest import INGEST_BATCH_SIZE, ingest_vacancies
+
+
+class Command(BaseCommand):
+    """
+    Command class to ingest a vacancy feed from a file.
+
+    Methods:
+        add_arguments: declares the command line options
+        handle: reads, validates and upserts the vacancies and reports errors
+        write_report: prints the invalid rows and the summary
+    """
+    help = 'Upsert vacancies from a CSV or JSONL feed with batched validation and writes'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('path', help='The CSV or JSONL feed to ingest')
+        parser.add_argument('--format', choices=('csv', 'jsonl'), default=None,
+                            help='File format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE,
+                            help='Number of rows validated and upserted at a time')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only validate the rows and report errors')
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Ingest the file and print one line per invalid row and a summary.
+        """
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in ('csv', 'jsonl'):
+            raise CommandError('Cannot tell the file format, pass --format csv or jsonl')
+        with open(path, newline='', encoding='utf-8') as handle:
+            try:
+                report = ingest_vacancies(
+                    read_feed(handle, file_format), batch_size=options['batch_size'],
+                    dry_run=options['dry_run'], index=False,
+                )
+            except FeedError as e: # A line is not valid JSON or CSV, or not UTF-8
+                if e.report:
+                    self.write_report(e.report, options['dry_run'])
+                raise CommandError(str(e)) from e
+        self.write_report(report, options['dry_run'])
+
+    def write_report(self, report, dry_run):
+        """Print one line per invalid row and a summary of the ingestion."""
+        for error in report['errors']:
+            self.stderr.write(f'Row {error["row"] + 1}: {json.dumps(error["errors"])}')
+        if dry_run:
+            summary = f'Validated {report["updated"]} vacancies'
+        else:
+            summary = f'Created {report["created"]} and updated {report["updated"]} vacancies'
+        self.stdout.write(self.style.SUCCESS(
+            f'{summary}, folded {report["repeated"]} repeated rows, '
+            f'skipped {len(report["errors"])} invalid rows'))
@@ -0,0 +1,29 @@
+"""
+This module contains a command for rebuilding the materialized rating statistics.
+
+The statistics are kept up to date incrementally by the review views. Run it
+once after deploying them, and after any change to the Reviews collection
+that bypasses the API, such as a bulk import or a manual database edit.
+"""
+from django.core.management.base import BaseCommand
+from service.aggregates import rebuild_aggregates
+
+
+class Command(BaseCommand):
+    """
+    Command class to recompute the rating statistics from the Reviews collection.
+
+    Methods:
+        handle: replaces every RatingAggregate document
+    """
+    help = 'Rebuild the per job title and per department rating statistics'
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Recompute the statistics of every job title and department.
+        """
+        written = rebuild_aggregates()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {written} rating statistics documents')
+        )
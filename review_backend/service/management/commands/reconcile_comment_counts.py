@@ -0,0 +1,36 @@
+"""
+This module contains a command for repairing the comment counts and previews
+stored on the reviews.
+
+The comment views keep them up to date as comments are written. Run it once
+after deploying them, and after any change to the Comment collection that
+bypasses the API, such as a manual database edit; it only rewrites the
+reviews whose stored count or newest comment is wrong.
+"""
+from django.core.management.base import BaseCommand
+from service.comments import reconcile_comment_counts
+
+
+class Command(BaseCommand):
+    """
+    Command class to recompute the comment count and preview of every review.
+
+    Methods:
+        add_arguments: declares the command line options
+        handle: repairs the reviews that have drifted
+    """
+    help = 'Recompute the comment count and latest-comment preview of every review'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the reviews that have drifted')
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Compare every review with its comments and fix the ones that differ.
+        """
+        drifted = reconcile_comment_counts(dry_run=options['dry_run'])
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} drifted reviews'))
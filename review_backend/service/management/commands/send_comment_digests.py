@@ -0,0 +1,41 @@
+"""
+This module contains a command for queueing the comment digest emails.
+
+Every comment written through the API waits for the next digest of its
+review's author (see ``service/digests.py``). This command builds one email
+per author from all the waiting comments and queues them in the outbox,
+which ``drain_outbox`` then sends.
+
+Run it from a scheduler at the digest period, e.g. hourly or daily from cron.
+"""
+from django.core.management.base import BaseCommand
+from service.digests import send_comment_digests
+
+
+class Command(BaseCommand):
+    """
+    Command class to queue one digest email per review author.
+
+    Methods:
+        add_arguments: declares the command line options
+        handle: builds and queues the digests
+    """
+    help = 'Queue one email per review author with the comments since the last digest'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the digests, without queueing them')
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Build the digests of the waiting comments and queue them.
+        """
+        result = send_comment_digests(dry_run=options['dry_run'])
+        verb = 'Would queue' if options['dry_run'] else 'Queued'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {result["digests"]} digests of {result["comments"]} comments'))
+        if result["skipped"]:
+            self.stdout.write(self.style.WARNING(
+                f'No email address for: {", ".join(result["skipped"])}'))
@@ -0,0 +1,95 @@
+"""
+This module contains a command for making the MongoDB indexes match the
+models.
+
+For every model of the given apps (``service`` and ``auth_review`` by
+default) it compares the indexes declared on the model (``db_index``,
+``unique`` and ``Meta.indexes``) with those of its collection, creates the
+missing ones and, with ``--drop``, drops the undeclared ones. It then prints
+the plan MongoDB picks for each canonical query shape of the views
+(``service.indexes.CANONICAL_QUERIES``), so that a query that still scans
+the collection (``COLLSCAN``) stands out.
+
+This is called from the command line manually, after deploying a change to
+the declared indexes. Index builds run in the background of the cluster,
+but dropping an index that a running query relies on slows it down, so use
+``--dry-run --drop`` first to list what would be dropped.
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from service.indexes import CANONICAL_QUERIES, explain_query, sync_model_indexes
+from service.mongo import is_mongo
+
+
+class Command(BaseCommand):
+    """
+    Command class to sync the MongoDB indexes with the model declarations.
+
+    Methods:
+        add_arguments: declares the command line options
+        handle: syncs the indexes of every model and explains the canonical queries
+    """
+    help = 'Create the declared MongoDB indexes, optionally drop the unused ones and explain ' \
+           'the queries'
+
+    def add_arguments(self, parser):
+        """Declare the command line options."""
+        parser.add_argument('app_labels', nargs='*', default=['service', 'auth_review'],
+                            help='Apps whose models are synced (default: service auth_review)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only print the indexes that would be created and dropped')
+        parser.add_argument('--drop', action='store_true',
+                            help='Also drop the indexes the models do not declare')
+        parser.add_argument('--no-explain', action='store_true',
+                            help='Do not explain the canonical queries')
+
+    # pylint: disable=W0613
+    def handle(self, *args, **options):
+        """
+        Sync the indexes of every model, then print one plan per canonical query.
+        """
+        models = []
+        for label in options['app_labels']:
+            try:
+                models.extend(apps.get_app_config(label).get_models())
+            except LookupError as e:
+                raise CommandError(str(e)) from e
+        if not all(is_mongo(model) for model in models):
+            raise CommandError('Indexes are only synced on MongoDB; other databases '
+                               'get them from their migrations')
+        for model in models:
+            self.sync(model, options['drop'], options['dry_run'])
+        if not options['no_explain']:
+            self.explain()
+
+    def sync(self, model, drop, dry_run):
+        """
+        Sync the indexes of one model and print the changes.
+
+        Args:
+            model (Model): The model whose collection is synced.
+            drop (bool): Drop the indexes the model does not declare.
+            dry_run (bool): Only print the changes.
+        """
+        changes = sync_model_indexes(model, drop=drop, dry_run=dry_run)
+        prefix = 'Would ' if dry_run else ''
+        table = model._meta.db_table # pylint: disable=W0212
+        for verb, specs in (('drop', changes.drop), ('create', changes.create)):
+            for spec in specs:
+                keys = ', '.join(f'{key} {direction}' for key, direction in spec.keys)
+                unique = ' unique' if spec.unique else ''
+                self.stdout.write(f'{prefix}{verb} {table}.{spec.name} ({keys}){unique}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{table}: {len(changes.keep)} kept, {len(changes.create)} created, '
+            f'{len(changes.drop)} dropped'))
+
+    def explain(self):
+        """Print the plan MongoDB picks for every canonical query."""
+        for description, model_name, query, sort in CANONICAL_QUERIES:
+            model = apps.get_model('service', model_name)
+            explained = explain_query(model, query, sort)
+            self.stdout.write(f'{description}: {explained["plan"]}')
+            if explained['returned'] is not None:
+                self.stdout.write(f'    returned {explained["returned"]}, examined '
+                                  f'{explained["keys_examined"]} keys and '
+                                  f'{explained["docs_examined"]} documents')
@@ -0,0 +1,297 @@
+"""
+Request metrics of the API in the Prometheus text format.
+
+``metrics_middleware`` counts every request by resolved view, HTTP method
+and status code, and records its latency in a histogram, so that slow
+endpoints such as ``get-reviews`` or ``token_obtain_pair`` show up in
+Prometheus. The view label is the URL name of ``urls.py`` (with its
+namespace, e.g. ``admin:index``); requests that match no URL, or are shed
+before reaching one, are labelled ``<unresolved>``. The latency runs until
+the view returns its response, so for a streamed listing it is the time
+to the first byte.
+
+Recording a request must cost next to nothing, so each thread adds to a
+shard of its own, without a lock; ``/metrics`` sums the shards when it is
+scraped. When a thread ends, its shard is folded into the series of the
+ended threads, so that servers starting a thread per request, such as
+``runserver``, keep a shard per live thread only. Each worker process
+exports its own series, like every in-process counter of this project;
+scrape every worker, or rely on the sums over them.
+
+``/metrics`` is open unless ``settings.METRICS_TOKEN`` is set, in which
+case it requires the header ``Authorization: Bearer <token>``.
+"""
+import asyncio
+import itertools
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from django.conf import settings  # pylint: disable=E0401
+from django.urls import Resolver404, resolve  # pylint: disable=E0401
+from django.utils.decorators import sync_and_async_middleware  # pylint: disable=E0401
+from .loadshedding import load_stats
+
+# Upper bounds of the latency buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+UNRESOLVED = "<unresolved>" # View label of the requests that matched no URL
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_local = threading.local()
+_shards = {} # The shard of every live thread that recorded a request, by number
+_retired = {} # The series of the threads that ended, summed
+_shard_numbers = itertools.count()
+# Reentrant, since a shard may be retired by the garbage collector of a thread holding it
+_shards_lock = threading.RLock()
+
+
+class ShardOwner:
+    """
+    Held only by the thread-local storage of a thread, so that it is
+    collected, and its shard retired, when the thread ends.
+    """
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+def get_shard():
+    """
+    Return the shard of the current thread, creating it on first use.
+
+    A shard maps ``(view, method, status)`` to a list holding the count of
+    requests per latency bucket, the last one for latencies above every
+    bucket, then the sum of the latencies.
+
+    Returns:
+        dict: The series of this thread.
+    """
+    try:
+        return _local.owner.shard
+    except AttributeError:
+        shard, number = {}, next(_shard_numbers)
+        _local.owner = ShardOwner(shard)
+        weakref.finalize(_local.owner, retire_shard, number)
+        with _shards_lock:
+            _shards[number] = shard
+        return shard
+
+
+def retire_shard(number):
+    """
+    Fold the shard of a thread that ended into the series of ended threads.
+
+    Args:
+        number (int): The number of the shard.
+    """
+    with _shards_lock:
+        add_series(_retired, _shards.pop(number, {}))
+
+
+def add_series(totals, shard):
+    """
+    Add the series of a shard to totals of the same shape.
+
+    Args:
+        totals (dict): The series to add to.
+        shard (dict): The series to add.
+    """
+    for key, series in shard.copy().items():
+        total = totals.setdefault(key, [0] * (len(BUCKETS) + 1) + [0.0])
+        for i, value in enumerate(series):
+            total[i] += value
+
+
+def observe(view, method, status, seconds):
+    """
+    Record a request in the shard of the current thread.
+
+    Args:
+        view (str): The view label.
+        method (str): The HTTP method.
+        status (int): The status code of the response.
+        seconds (float): The latency.
+    """
+    shard = get_shard()
+    key = (view, method, status)
+    series = shard.get(key)
+    if series is None:
+        series = shard[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+    series[bisect_left(BUCKETS, seconds)] += 1
+    series[-1] += seconds
+
+
+def collect():
+    """
+    Sum the shards of every thread, live or ended.
+
+    Returns:
+        dict: ``(view, method, status)`` mapped to the request count per
+        bucket followed by the latency sum, as in a shard.
+    """
+    totals = {}
+    with _shards_lock:
+        add_series(totals, _retired)
+        shards = list(_shards.values())
+    for shard in shards:
+        add_series(totals, shard)
+    return totals
+
+
+def reset_metrics():
+    """Zero the series of every thread, e.g. between tests."""
+    with _shards_lock:
+        _retired.clear()
+        for shard in _shards.values():
+            shard.clear()
+
+
+def view_label(request):
+    """
+    Return the view label of a request.
+
+    Args:
+        request (HttpRequest): The request, after its response was built.
+
+    Returns:
+        str: The namespaced URL name, or ``UNRESOLVED``.
+    """
+    match = request.resolver_match
+    if match is None: # Answered before the URL was resolved, e.g. a 503 of load shedding
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return UNRESOLVED
+    return match.view_name or UNRESOLVED
+
+
+def escape(value):
+    """Escape a label value of the text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def request_lines(totals):
+    """
+    Render the request counters and sum the latency series of each view.
+
+    Args:
+        totals (dict): The series of every ``(view, method, status)``, as
+            returned by ``collect``.
+
+    Returns:
+        tuple: The lines of ``http_requests_total``, and ``{labels: series}``
+        summed over the statuses of each view and method.
+    """
+    lines = ["# HELP http_requests_total Requests answered, by view, method and status.",
+             "# TYPE http_requests_total counter"]
+    histograms = {}
+    for (view, method, status), series in sorted(totals.items()):
+        labels = f'view="{escape(view)}",method="{method}"'
+        lines.append(f'http_requests_total{{{labels},status="{status}"}} {sum(series[:-1])}')
+        histogram = histograms.setdefault(labels, [0] * len(series))
+        for i, value in enumerate(series):
+            histogram[i] += value
+    return lines, histograms
+
+
+def duration_lines(histograms):
+    """
+    Render the latency histograms.
+
+    Args:
+        histograms (dict): ``{labels: series}`` of each view and method.
+
+    Returns:
+        list: The lines of ``http_request_duration_seconds``.
+    """
+    lines = ["# HELP http_request_duration_seconds Time until the view returned its response.",
+             "# TYPE http_request_duration_seconds histogram"]
+    for labels, histogram in histograms.items():
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), histogram[:-1]):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} '
+                         f'{cumulative}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {histogram[-1]:.6f}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+    return lines
+
+
+def load_shedding_lines():
+    """
+    Render the load shedding counters of this worker.
+
+    Returns:
+        list: Their lines, empty when load shedding is disabled.
+    """
+    stats = load_stats()
+    if not stats["enabled"]:
+        return []
+    lines = ["# HELP load_shedding_requests_total Requests admitted or shed by the "
+             "concurrency limit.",
+             "# TYPE load_shedding_requests_total counter"]
+    for outcome in ("admitted", "queued", "shed_queue_full", "shed_timeout"):
+        lines.append(f'load_shedding_requests_total{{outcome="{outcome}"}} {stats[outcome]}')
+    return lines + ["# HELP load_shedding_requests Requests running or waiting for a slot.",
+                    "# TYPE load_shedding_requests gauge",
+                    f'load_shedding_requests{{state="active"}} {stats["active"]}',
+                    f'load_shedding_requests{{state="waiting"}} {stats["waiting"]}']
+
+
+def render_metrics():
+    """
+    Render the request metrics and the load shedding counters.
+
+    Returns:
+        str: The metrics in the Prometheus text exposition format.
+    """
+    lines, histograms = request_lines(collect())
+    lines += duration_lines(histograms) + load_shedding_lines()
+    return "\n".join(lines) + "\n"
+
+
+def is_authorized(request):
+    """
+    Check the bearer token of a scrape when ``settings.METRICS_TOKEN`` is set.
+
+    Args:
+        request (HttpRequest): The scrape request.
+
+    Returns:
+        bool: True if no token is required or the right one was sent.
+    """
+    token = settings.METRICS_TOKEN
+    return not token or request.headers.get("Authorization") == f"Bearer {token}"
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """
+    Build the middleware that records the count and latency of requests.
+
+    Args:
+        get_response (callable): The rest of the middleware chain.
+
+    Returns:
+        callable: The middleware, asynchronous if ``get_response`` is.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            start = time.perf_counter()
+            response = await get_response(request)
+            observe(view_label(request),
+                    request.method if request.method in METHODS else "other",
+                    response.status_code, time.perf_counter() - start)
+            return response
+    else:
+        def middleware(request):
+            start = time.perf_counter()
+            response = get_response(request)
+            observe(view_label(request),
+                    request.method if request.method in METHODS else "other",
+                    response.status_code, time.perf_counter() - start)
+            return response
+
+    return middleware
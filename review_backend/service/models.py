@@ -10,6 +10,8 @@ vacancy information in the database.
 from djongo import models  # pylint: disable=E0401
 from rest_framework.exceptions import ValidationError # Import ValidationError
 from django.conf import settings  # Import settings
+from .pay import parse_pay_cents # Parse the free-form pay strings into cents
+from .dedup import vacancy_key # Deduplication key of a vacancy posting
 # for custom validation logic
 
 # from django.contrib.auth.models import AbstractUser
@@ -27,24 +29,45 @@ class Reviews(models.Model):
         job_title (str): The title of the job.
         job_description (str): A description of the job.
         hourly_pay (str): The pay rate for the job.
+        hourly_pay_cents (int): ``hourly_pay`` parsed into cents, set on save.
         benefits (str): The benefits offered for the job.
         review (str): The text of the review.
         rating (int): The rating given by the reviewer.
         recommendation (int): Indicates whether the reviewer would recommend the job.
+        comment_count (int): The number of comments on the review.
+        latest_comment_id (int): The id of the newest comment, None without comments.
+        latest_comment_user (str): The author of the newest comment.
+        latest_comment_text (str): The start of the text of the newest comment.
+        latest_comment_at (datetime): When the newest comment was written.
     """
 
     # Unique identifier for each review
     department = models.CharField(max_length=100, blank=False, null=False) # Department name
-    locations = models.CharField(max_length=120, db_index=True, blank=True) # Job location
-    job_title = models.CharField(max_length=64, db_index=True, null=False) # Job description
-    job_description = models.CharField(max_length=120, db_index=True, blank=True, null=True)
+    locations = models.CharField(max_length=120, blank=True) # Job location
+    job_title = models.CharField(max_length=64, null=False) # Job description
+    job_description = models.CharField(max_length=120, blank=True, null=True)
     hourly_pay = models.CharField(max_length=10, null=False, blank=False) # Pay rate as a string
-    benefits = models.CharField(max_length=120, db_index=True, null=False, blank=True) # Job
+    # Pay rate in cents, None when hourly_pay holds no amount
+    hourly_pay_cents = models.IntegerField(null=True, blank=True, editable=False)
+    benefits = models.CharField(max_length=120, null=False, blank=True) # Job
     # benefits
-    review = models.CharField(max_length=120, db_index=True, null=True, blank=True) # Review text
+    review = models.CharField(max_length=120, null=True, blank=True) # Review text
     rating = models.IntegerField(null=False, blank=False) # Rating out of 5
     recommendation = models.IntegerField(null=True, blank=True) # Recommendation flag
     reviewed_by = models.CharField(max_length=120, db_index=True, null=True, blank=True) # User who
+    # Kept up to date by the comment views, see service.comments
+    comment_count = models.IntegerField(default=0, editable=False) # Number of comments
+    latest_comment_id = models.IntegerField(null=True, blank=True, editable=False)
+    latest_comment_user = models.CharField(max_length=50, null=True, blank=True, editable=False)
+    latest_comment_text = models.CharField(max_length=120, null=True, blank=True, editable=False)
+    latest_comment_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = models.DjongoManager() # Exposes the pymongo collection as objects.mongo_*
+
+    def save(self, *args, **kwargs):
+        """Parse the pay rate into cents before saving the review."""
+        self.hourly_pay_cents = parse_pay_cents(self.hourly_pay)
+        super().save(*args, **kwargs)
 
     def clean(self):
         """Custom validation logic for the Reviews model.
@@ -79,6 +102,13 @@ class Reviews(models.Model):
         # pylint: disable=R0903
         """Meta options for the Reviews model."""
         verbose_name_plural = "Reviews"
+        # The indexes follow the query shapes; apply them with manage.py sync_indexes
+        indexes = [
+            models.Index(fields=["rating", "id"]), # Keyset pagination ordered by rating
+            models.Index(fields=["hourly_pay_cents", "id"]), # Keyset pagination ordered by pay
+            models.Index(fields=["department", "rating"]), # A department's reviews by rating
+            models.Index(fields=["job_title", "rating"]), # A job title's reviews by rating
+        ]
 # pylint: disable=R0903
 
 
@@ -90,17 +120,29 @@ class Vacancies(models.Model):
         jobDescription (str): A description of the job vacancy.
         jobLocation (str): The location of the job vacancy.
         jobPayRate (str): The pay rate for the job vacancy.
+        payRateCents (int): ``jobPayRate`` parsed into cents, set on save.
+        dedupKey (str): Hash of the normalized title and location, set on
+            save; postings with the same key are the same vacancy, so it is
+            unique.
         maxHoursAllowed (int): The maximum hours allowed for the job vacancy.
     """
 
     # vacancyId = models.AutoField(primary_key=True)  # Unique ID for each
     # vacancy
-    jobTitle = models.CharField(max_length=500, db_index=True) # Job title
-    jobDescription = models.CharField(max_length=1000, db_index=True) # Description of the vacancy
-    jobLocation = models.CharField(max_length=500, db_index=True) # Job location
-    jobPayRate = models.CharField(max_length=120, db_index=True) # Pay rate
+    jobTitle = models.CharField(max_length=500) # Job title
+    jobDescription = models.CharField(max_length=1000) # Description of the vacancy
+    jobLocation = models.CharField(max_length=500) # Job location
+    jobPayRate = models.CharField(max_length=120) # Pay rate
+    # Pay rate in cents, None when jobPayRate holds no amount
+    payRateCents = models.IntegerField(null=True, blank=True, editable=False)
+    # Normalized (jobTitle, jobLocation) hash that feed ingestion upserts on; unique
+    # among the set keys (a partial index on MongoDB), vacancies saved before it are null
+    dedupKey = models.CharField(max_length=40, null=True, blank=True, editable=False,
+                                unique=True)
     maxHoursAllowed = models.IntegerField() # Maximum hours allowed for job
 
+    objects = models.DjongoManager() # Exposes the pymongo collection as objects.mongo_*
+
     # def __init__(self, jobTitle, jobDescription, jobLocation, jobPayRate, maxHoursAllowed):
     #     super().__init__()  # Call the parent constructor
     #     self.jobTitle = jobTitle
@@ -109,9 +151,19 @@ class Vacancies(models.Model):
     #     self.jobPayRate = jobPayRate
     #     self.maxHoursAllowed = maxHoursAllowed
 
+    def save(self, *args, **kwargs):
+        """Parse the pay rate and compute the deduplication key before saving."""
+        # pylint: disable=C0103
+        self.payRateCents = parse_pay_cents(self.jobPayRate)
+        self.dedupKey = vacancy_key(self.jobTitle, self.jobLocation)
+        super().save(*args, **kwargs)
+
     class Meta:
         """Meta options for the Vacancies model."""
         verbose_name_plural = "Vacancies" # Specify plural name for admin
+        indexes = [
+            models.Index(fields=["payRateCents", "id"]), # Keyset pagination ordered by pay
+        ]
 
 class Comment(models.Model):
     """Model that stores comments related to reviews.
@@ -125,15 +177,68 @@ class Comment(models.Model):
         user (ForeignKey): A foreign key linking the comment to a specific user.
         text (TextField): The content of the comment left by the user.
         created_at (DateTimeField): The timestamp when the comment was created.
+        digest_pending (bool): Whether the comment still has to be sent in
+            the digest email of the review's author.
     
     Methods:
         __str__: Returns a string representation of the comment, showing the username
         of the commenter and the job title of the review.
     """
-    review = models.ForeignKey(Reviews, related_name='comments', on_delete=models.CASCADE)
+    # Looked up through the (review, created_at, id) index, whose prefix it is
+    review = models.ForeignKey(Reviews, related_name='comments', on_delete=models.CASCADE,
+                               db_index=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set by the comment views, cleared once sent in a digest, see service.digests
+    digest_pending = models.BooleanField(default=False, db_index=True, editable=False)
+
+    objects = models.DjongoManager() # Exposes the pymongo collection as objects.mongo_*
+
+    class Meta:
+        """Meta options for the Comment model."""
+        indexes = [
+            # Keyset pagination of a review's comments ordered by creation time
+            models.Index(fields=["review", "created_at", "id"]),
+        ]
 
     def __str__(self):
         return f"Comment by {self.user.username} on {self.review.job_title}"
+
+
+class RatingAggregate(models.Model):
+    """Model that stores the rating statistics of one job title or department.
+
+    One document is kept per job title and per department. Its counters are
+    updated with atomic increments whenever a review is created, updated or
+    deleted, so that statistics are read with a single primary-key lookup
+    instead of a pass over every review.
+
+    Attributes:
+        key (str): ``<scope>:<value>``, e.g. ``job_title:Library Assistant``.
+        scope (str): What the statistics are grouped by, ``job_title`` or
+            ``department``.
+        value (str): The job title or department.
+        count (int): The number of reviews.
+        rating_sum (int): The sum of the ratings.
+        rating_1 .. rating_5 (int): The number of reviews with each rating.
+        recommendation_count (int): The number of reviews with a recommendation.
+        recommendation_sum (int): The sum of the recommendations (1-10 each).
+    """
+    key = models.CharField(max_length=200, primary_key=True) # Scope and value of the document
+    scope = models.CharField(max_length=20) # job_title or department
+    value = models.CharField(max_length=120) # The job title or department
+    count = models.IntegerField(default=0) # Number of reviews
+    rating_sum = models.IntegerField(default=0) # Sum of the ratings
+    rating_1 = models.IntegerField(default=0) # Rating histogram
+    rating_2 = models.IntegerField(default=0)
+    rating_3 = models.IntegerField(default=0)
+    rating_4 = models.IntegerField(default=0)
+    rating_5 = models.IntegerField(default=0)
+    recommendation_count = models.IntegerField(default=0) # Reviews with a recommendation
+    recommendation_sum = models.IntegerField(default=0) # Sum of the recommendations
+
+    objects = models.DjongoManager() # Exposes the pymongo collection as objects.mongo_*
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,329 @@
+"""
+Helpers for reaching the MongoDB collections behind the 'service' models.
+
+Djongo translates ORM queries into MongoDB commands, but a few operations
+(metadata counts, atomic increments, bulk writes) are only available on the
+underlying pymongo collection. The models expose that collection through
+``DjongoManager`` (``Model.objects.mongo_<method>``); the helpers in this
+module wrap those calls so that views stay readable and so that the same code
+keeps working when the project is pointed at a non-MongoDB test database.
+
+Djongo keeps one ``MongoClient`` per database and process, created lazily
+by the first query, and every thread's connection and every ``mongo_*`` call
+shares its pool (sized by ``settings.MONGO_CLIENT_OPTIONS``). A client must
+not be used across ``fork()``: a server that imports the project before
+forking its workers (gunicorn ``--preload``) would hand every worker the
+sockets and monitor threads of the parent. ``install_process_hooks`` makes
+a forked child forget the inherited client, so that each worker creates
+its own on first use, and registers ``POOL_STATS``, which counts the pool
+events of the process.
+
+Closing a Djongo connection closes that shared client, and with it the pool
+of every thread. Djongo has no transactions: when a write fails inside
+``transaction.atomic()``, its rollback raises and Django closes the
+connection, so the next query reconnects from an empty pool. Writes that may
+be refused therefore use ``atomic_unless_mongo``, ``check_mongo_transactions``
+refuses ``ATOMIC_REQUESTS`` on a Djongo database, and ``POOL_STATS`` counts
+the closed pools, so that such reconnects show up in ``pool_stats``.
+"""
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+from django.conf import settings  # pylint: disable=E0401
+from django.core.exceptions import ImproperlyConfigured  # pylint: disable=E0401
+from django.db import IntegrityError, connections, router, transaction  # pylint: disable=E0401
+from djongo import database as djongo_database  # pylint: disable=E0401
+from pymongo import ReturnDocument, monitoring  # pylint: disable=E0401
+from pymongo.errors import DuplicateKeyError  # pylint: disable=E0401
+
+
+def is_mongo(model):
+    """
+    Check whether the given model is stored in MongoDB through Djongo.
+
+    Args:
+        model (Model): The model class to check.
+
+    Returns:
+        bool: True if reads for the model are routed to a Djongo database.
+    """
+    return connections[router.db_for_read(model)].vendor == "djongo"
+
+
+def estimated_count(model):
+    """
+    Return the approximate number of documents stored for a model.
+
+    On MongoDB this uses the collection metadata (``estimatedDocumentCount``),
+    which is O(1) and does not scan the collection. Other backends fall back
+    to an exact ``COUNT``.
+
+    Args:
+        model (Model): The model class whose collection is counted.
+
+    Returns:
+        int: The estimated number of documents.
+    """
+    if is_mongo(model):
+        return model.objects.mongo_estimated_document_count()
+    return model.objects.count()
+
+
+def get_collection(model):
+    """
+    Return the pymongo collection of any model stored through Djongo.
+
+    ``objects.mongo_*`` only exists on models with a ``DjongoManager``; this
+    also reaches the others, e.g. the user model.
+
+    Args:
+        model (Model): A model stored in MongoDB through Djongo.
+
+    Returns:
+        Collection: The collection of the model, on the shared client.
+    """
+    connection = connections[router.db_for_write(model)]
+    connection.ensure_connection()
+    return connection.connection[model._meta.db_table] # pylint: disable=W0212
+
+
+def reserve_ids(model, count):
+    """
+    Reserve a block of consecutive auto-increment ids on MongoDB.
+
+    Djongo numbers documents from a per-collection counter in the
+    ``__schema__`` collection. Advancing that counter by ``count`` in one
+    atomic update hands the caller ids that no other insert will use, so
+    documents can be written with ``insert_many`` and still be known by id.
+
+    Args:
+        model (Model): A model stored in MongoDB through Djongo.
+        count (int): The number of ids to reserve.
+
+    Returns:
+        range: The reserved ids.
+    """
+    schema = model.objects.mongo_database["__schema__"]
+    counter = schema.find_one_and_update(
+        {"name": model._meta.db_table, "auto": {"$exists": True}}, # pylint: disable=W0212
+        {"$inc": {"auto.seq": count}},
+        return_document=ReturnDocument.AFTER,
+    )
+    last = counter["auto"]["seq"]
+    return range(last - count + 1, last + 1)
+
+
+def to_document(instance):
+    """
+    Build the MongoDB document Djongo would store for a model instance.
+
+    Args:
+        instance (Model): An instance whose fields hold plain values.
+
+    Returns:
+        dict: The column values of the instance.
+    """
+    return {field.column: getattr(instance, field.attname)
+            for field in instance._meta.concrete_fields} # pylint: disable=W0212
+
+
+DUPLICATE_KEY_CODES = frozenset((11000, 11001, 12582)) # Server codes of a unique index refusal
+
+
+def is_duplicate_key(error):
+    """
+    Check whether a database error was caused by a unique index.
+
+    Django backends raise ``IntegrityError``; Djongo raises a plain
+    ``DatabaseError`` caused by pymongo's ``DuplicateKeyError``.
+
+    Args:
+        error (Exception): The error raised by a write.
+
+    Returns:
+        bool: True if the write broke a unique constraint.
+    """
+    while error is not None:
+        if isinstance(error, (IntegrityError, DuplicateKeyError)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+@contextmanager
+def atomic_unless_mongo(model):
+    """
+    Run a write in a transaction, except on MongoDB.
+
+    On a SQL database a refused write inside ``transaction.atomic()`` is
+    rolled back to the savepoint and the connection stays usable. Djongo has
+    no transactions: its rollback raises, and Django then closes the
+    connection, which closes the ``MongoClient`` and the pool shared by the
+    whole process. On MongoDB the single write needs no rollback, so the
+    block runs bare and the caller handles the error, see
+    ``is_duplicate_key``.
+
+    Args:
+        model (Model): The model the block writes to.
+
+    Yields:
+        None: The block runs in a transaction on SQL databases only.
+    """
+    if is_mongo(model):
+        context = nullcontext()
+    else:
+        context = transaction.atomic(using=router.db_for_write(model))
+    with context:
+        yield
+
+
+# pylint: disable=W0613
+class PoolStats(monitoring.ConnectionPoolListener):
+    """
+    Counts the connection pool events of the MongoDB clients of this process.
+
+    Attributes:
+        counters (dict): The number of each counted event since the
+            process started or was forked.
+    """
+    EVENTS = ("created", "closed", "check_out_started", "checked_out",
+              "check_out_failed", "checked_in", "pools_cleared", "pools_closed")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(self.EVENTS, 0)
+
+    def count(self, name):
+        """Add one to a counter."""
+        with self.lock:
+            self.counters[name] += 1
+
+    def reset(self):
+        """Zero the counters, e.g. in a forked child."""
+        with self.lock:
+            self.counters = dict.fromkeys(self.EVENTS, 0)
+
+    def pool_created(self, event):
+        """A pool was created for a server."""
+
+    def pool_cleared(self, event):
+        """A pool dropped its connections, e.g. after a network error."""
+        self.count("pools_cleared")
+
+    def pool_closed(self, event):
+        """A pool was closed with its client, e.g. by closing a Djongo connection."""
+        self.count("pools_closed")
+
+    def connection_created(self, event):
+        """A connection was opened."""
+        self.count("created")
+
+    def connection_ready(self, event):
+        """A connection finished its handshake."""
+
+    def connection_closed(self, event):
+        """A connection was closed."""
+        self.count("closed")
+
+    def connection_check_out_started(self, event):
+        """A thread asked the pool for a connection."""
+        self.count("check_out_started")
+
+    def connection_check_out_failed(self, event):
+        """A thread gave up waiting for a connection, or could not open one."""
+        self.count("check_out_failed")
+
+    def connection_checked_out(self, event):
+        """A thread got a connection."""
+        self.count("checked_out")
+
+    def connection_checked_in(self, event):
+        """A thread returned its connection."""
+        self.count("checked_in")
+
+    def snapshot(self):
+        """
+        Return the state of the pools of this process.
+
+        Returns:
+            dict: The open, in-use and waiting connections, and the totals
+            of checkouts, failed checkouts, cleared pools and closed pools.
+        """
+        with self.lock:
+            counters = dict(self.counters)
+        return {
+            "open": counters["created"] - counters["closed"],
+            "in_use": counters["checked_out"] - counters["checked_in"],
+            "waiting": (counters["check_out_started"] - counters["checked_out"]
+                        - counters["check_out_failed"]),
+            "checkouts": counters["checked_out"],
+            "checkout_failures": counters["check_out_failed"],
+            "pools_cleared": counters["pools_cleared"],
+            "pools_closed": counters["pools_closed"],
+        }
+
+
+POOL_STATS = PoolStats() # Pool events of this process, registered by install_process_hooks
+
+
+def forget_clients():
+    """
+    Drop the MongoDB clients inherited from the parent of a forked process.
+
+    The clients are not closed: their sockets belong to the parent, which
+    keeps using them. The next query of the child creates a new client.
+    """
+    djongo_database.clients.clear()
+    for connection in connections.all(initialized_only=True):
+        if connection.vendor == "djongo":
+            connection.connection = None
+            connection.client_connection = None
+            connection.djongo_connection = None
+    POOL_STATS.reset()
+
+
+def check_mongo_transactions():
+    """
+    Refuse request transactions on the Djongo databases.
+
+    With ``ATOMIC_REQUESTS`` every failed request would roll back, which
+    Djongo cannot do, and close the shared client, see the module docstring.
+
+    Raises:
+        ImproperlyConfigured: If a Djongo database sets ``ATOMIC_REQUESTS``.
+    """
+    for alias, database in settings.DATABASES.items():
+        if database.get("ENGINE") == "djongo" and database.get("ATOMIC_REQUESTS"):
+            raise ImproperlyConfigured(f"DATABASES[{alias!r}] uses Djongo, which cannot roll "
+                                       "back; ATOMIC_REQUESTS must be False.")
+
+
+def install_process_hooks():
+    """
+    Count the pool events and give forked worker processes their own client.
+
+    Called once at startup, before the first client is created.
+    """
+    monitoring.register(POOL_STATS)
+    os.register_at_fork(after_in_child=forget_clients)
+
+
+def pool_stats():
+    """
+    Return the connection pool statistics of this worker process.
+
+    Every worker has its own pool, so the connections a deployment opens to
+    the cluster are about ``workers x max_pool_size``, plus one monitoring
+    connection per server and worker.
+
+    Returns:
+        dict: The process id, the configured pool bounds and the current
+        pool counters, see ``PoolStats.snapshot``.
+    """
+    options = getattr(settings, "MONGO_CLIENT_OPTIONS", {})
+    return {
+        "pid": os.getpid(),
+        "max_pool_size": options.get("maxPoolSize"),
+        "min_pool_size": options.get("minPoolSize"),
+        **POOL_STATS.snapshot(),
+    }
@@ -0,0 +1,307 @@
+"""
+Pagination classes for the 'service' list endpoints.
+
+List endpoints return bounded pages instead of the whole collection. Each
+page carries the exact number of matching documents together with the
+estimated size of the whole collection, which MongoDB answers from the
+collection metadata without scanning.
+
+Offset pages get slower the deeper a client scrolls, because MongoDB has to
+skip every document before the requested page. ``KeysetPagination`` offers
+an opaque-cursor mode instead: the cursor remembers the sort key and id of
+the last document that was returned, and the next page is fetched with a
+range query on that key, so page N costs the same as page 1.
+"""
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from django.core.exceptions import ValidationError as DjangoValidationError  # pylint: disable=E0401
+from django.db.models import Q  # pylint: disable=E0401
+from rest_framework.exceptions import ValidationError  # pylint: disable=E0401
+from rest_framework.pagination import BasePagination  # pylint: disable=E0401
+from rest_framework.pagination import PageNumberPagination  # pylint: disable=E0401
+from rest_framework.response import Response  # pylint: disable=E0401
+from rest_framework.utils.urls import replace_query_param  # pylint: disable=E0401
+from .mongo import estimated_count
+
+
+class ReviewsPagination(PageNumberPagination):
+    """
+    Page-number pagination for the review listing.
+
+    Query parameters:
+        page (int): The 1-based page number.
+        page_size (int): The number of reviews per page, capped at
+            ``max_page_size``.
+    """
+    page_size = 20 # Default number of reviews per page
+    page_size_query_param = "page_size" # Allow the client to pick the page size
+    max_page_size = 100 # Upper bound on the page size
+
+    def get_paginated_response(self, data):
+        """
+        Build the paginated response envelope.
+
+        Args:
+            data (list): The serialized reviews of the current page.
+
+        Returns:
+            Response: The page with its counts and navigation links.
+        """
+        model = self.page.paginator.object_list.model
+        return Response(OrderedDict([
+            ("count", self.page.paginator.count), # Number of matching reviews
+            ("estimated_count", estimated_count(model)), # Size of the whole collection
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque-cursor (keyset) pagination on an indexed sort key.
+
+    The mode is opt-in: it is used when the request carries the ``cursor``
+    query parameter (send it empty to fetch the first page). Requests without
+    it are handed to ``fallback_class``, or left unpaginated when no fallback
+    is configured, so existing clients keep their current responses.
+
+    The view chooses the keys it can be sorted on with ``keyset_fields``
+    (defaults to ``("id",)``); the client picks one with the ``ordering``
+    query parameter, prefixed with ``-`` for descending order. Ties on the
+    sort key are broken by ``id``. Sorting on a nullable key, such as the
+    parsed pay, leaves out the items that have no value for it.
+
+    Query parameters:
+        cursor (str): The cursor returned as ``next`` by the previous page.
+        ordering (str): The sort key, e.g. ``rating`` or ``-created_at``.
+        page_size (int): The number of items per page.
+    """
+    cursor_query_param = "cursor" # Query parameter holding the opaque cursor
+    ordering_query_param = "ordering" # Query parameter selecting the sort key
+    page_size_query_param = "page_size" # Allow the client to pick the page size
+    page_size = 20 # Default number of items per page
+    max_page_size = 100 # Upper bound on the page size
+    fallback_class = None # Pagination used when the request has no cursor
+
+    def __init__(self):
+        self.fallback = None
+        self.request = None
+        self.next_cursor = None
+
+    @staticmethod
+    def encode_cursor(ordering, value, pk):
+        """
+        Encode the position after an item as an opaque cursor.
+
+        Args:
+            ordering (str): The ordering the cursor belongs to, e.g. ``-rating``.
+            value (str): The serialized sort key of the last returned item.
+            pk (int): The id of the last returned item.
+
+        Returns:
+            str: A URL-safe cursor string.
+        """
+        payload = json.dumps({"o": ordering, "v": value, "id": pk}, separators=(",", ":"))
+        return urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        Decode a cursor produced by ``encode_cursor``.
+
+        Args:
+            cursor (str): The cursor sent by the client.
+
+        Raises:
+            ValidationError: If the cursor cannot be decoded or its fields do
+                not have the types ``encode_cursor`` writes.
+
+        Returns:
+            tuple: The ordering, serialized sort key and id stored in the cursor.
+        """
+        try:
+            payload = json.loads(urlsafe_b64decode(cursor.encode("ascii")))
+            position = payload["o"], payload["v"], payload["id"]
+        except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError) as e:
+            raise ValidationError({"cursor": "Invalid cursor."}) from e
+        ordering, value, pk = position
+        if (not isinstance(ordering, str) or not isinstance(value, str)
+                or not isinstance(pk, int) or isinstance(pk, bool)):
+            raise ValidationError({"cursor": "Invalid cursor."})
+        return position
+
+    def get_page_size(self, request):
+        """
+        Read the requested page size, capped at ``max_page_size``.
+
+        Args:
+            request (Request): The incoming request.
+
+        Returns:
+            int: The number of items to return.
+        """
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, request, view, cursor_ordering=None):
+        """
+        Determine the sort key for the request.
+
+        Args:
+            request (Request): The incoming request.
+            view (APIView): The view being paginated.
+            cursor_ordering (str, optional): The ordering stored in the cursor.
+
+        Raises:
+            ValidationError: If the ordering is not allowed by the view or
+                does not match the cursor.
+
+        Returns:
+            str: The ordering, e.g. ``id`` or ``-rating``.
+        """
+        allowed = getattr(view, "keyset_fields", ("id",))
+        ordering = request.query_params.get(self.ordering_query_param) or cursor_ordering
+        ordering = ordering or allowed[0]
+        if ordering.lstrip("-") not in allowed:
+            raise ValidationError(
+                {self.ordering_query_param: f"Ordering must be one of {allowed}."})
+        if cursor_ordering is not None and ordering != cursor_ordering:
+            raise ValidationError(
+                {self.cursor_query_param: "Cursor does not match the ordering."})
+        return ordering
+
+    def filter_after(self, queryset, field, ordering, position):
+        """
+        Keep the items that come after a cursor position in the ordering.
+
+        Args:
+            queryset (QuerySet): The queryset to filter.
+            field (Field): The model field of the sort key.
+            ordering (str): The ordering, e.g. ``-rating``.
+            position (tuple): The decoded cursor, see ``decode_cursor``.
+
+        Raises:
+            ValidationError: If the sort key of the cursor is not a valid
+                value of the field.
+
+        Returns:
+            QuerySet: The items after the position.
+        """
+        try:
+            value, pk = field.to_python(position[1]), position[2]
+        except (DjangoValidationError, ValueError, TypeError) as e:
+            raise ValidationError({self.cursor_query_param: "Invalid cursor."}) from e
+        lookup = "lt" if ordering.startswith("-") else "gt"
+        if field.name in ("id", "pk"):
+            return queryset.filter(**{f"pk__{lookup}": pk})
+        return queryset.filter(
+            Q(**{f"{field.name}__{lookup}": value}) |
+            Q(**{field.name: value, f"pk__{lookup}": pk})
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return one page of the queryset after the position in the cursor.
+
+        Args:
+            queryset (QuerySet): The filtered queryset to paginate.
+            request (Request): The incoming request.
+            view (APIView, optional): The view being paginated.
+
+        Returns:
+            list or None: The items of the page, or None if the request is
+            not using cursor pagination and there is no fallback.
+        """
+        if self.cursor_query_param not in request.query_params:
+            if self.fallback_class is None:
+                return None
+            self.fallback = self.fallback_class() # pylint: disable=E1102
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        cursor = request.query_params[self.cursor_query_param]
+        position = self.decode_cursor(cursor) if cursor else None
+        ordering = self.get_ordering(request, view, position[0] if position else None)
+        field_name = ordering.lstrip("-")
+        field = queryset.model._meta.get_field(field_name) # pylint: disable=W0212
+        if field.null: # A missing value has no place in a range query
+            queryset = queryset.filter(**{f"{field_name}__isnull": False})
+        if position is not None:
+            queryset = self.filter_after(queryset, field, ordering, position)
+
+        prefix = "-" if ordering.startswith("-") else ""
+        order = [ordering] if field_name in ("id", "pk") else [ordering, f"{prefix}pk"]
+        size = self.get_page_size(request)
+        # Fetch one extra item to learn whether there is a next page
+        items = list(queryset.order_by(*order)[:size + 1])
+        page = items[:size]
+
+        self.next_cursor = None
+        if len(items) > size:
+            last = page[-1]
+            self.next_cursor = self.encode_cursor(ordering, field.value_to_string(last), last.pk)
+        return page
+
+    def get_next_link(self):
+        """
+        Build the URL of the next page.
+
+        Returns:
+            str or None: The next page URL, or None on the last page.
+        """
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        """
+        Build the paginated response envelope.
+
+        Args:
+            data (list): The serialized items of the current page.
+
+        Returns:
+            Response: The page with the link to the next page.
+        """
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("results", data),
+        ]))
+
+    @property
+    def display_page_controls(self):
+        """Whether the browsable API shows the page controls of the fallback."""
+        return getattr(self.fallback, "display_page_controls", False)
+
+    def to_html(self):
+        """
+        Render the page controls of the browsable API.
+
+        Cursor pages have no controls besides the ``next`` link of the body;
+        numbered pages render those of the fallback.
+
+        Returns:
+            str: The HTML of the controls.
+        """
+        if self.fallback is not None:
+            return self.fallback.to_html()
+        return ""
+
+
+class ReviewsKeysetPagination(KeysetPagination):
+    """
+    Review listing pagination: cursor mode when a cursor is sent, numbered
+    pages otherwise.
+    """
+    fallback_class = ReviewsPagination
@@ -0,0 +1,42 @@
+"""
+Parsing of the free-form pay strings of reviews and vacancies.
+
+``Reviews.hourly_pay`` and ``Vacancies.jobPayRate`` are typed by people and
+scraped from postings ("15", "$15.50/hr", "$12.00 - $14.00 per hour"), so
+they cannot be sorted or compared in the database. The models store the
+amount parsed by ``parse_pay_cents`` next to the original text, as an
+integer number of cents, and that field is what the pay filters and the
+pay ordering of the list endpoints use.
+"""
+import re
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+# An amount such as "15", "15.5", "1,250.00" or ".50"
+AMOUNT_RE = re.compile(r"\d[\d,]*(?:\.\d+)?|\.\d+")
+
+MAX_PAY_CENTS = 2 ** 31 - 1 # Largest amount the integer pay fields hold
+
+
+def parse_pay_cents(text):
+    """
+    Parse a pay string into an amount of cents.
+
+    The first amount of the string is used, so a range ("$12 - $14")
+    gives its lower bound, the pay the posting guarantees.
+
+    Args:
+        text (str): The pay as entered, e.g. ``"$15.50/hr"``.
+
+    Returns:
+        int or None: The amount in cents, or None if the string holds no
+        amount (e.g. ``"Negotiable"``) or one too large to store.
+    """
+    match = AMOUNT_RE.search(str(text or ""))
+    if match is None:
+        return None
+    try:
+        amount = Decimal(match.group().replace(",", ""))
+    except InvalidOperation:
+        return None
+    cents = int((amount * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+    return cents if cents <= MAX_PAY_CENTS else None
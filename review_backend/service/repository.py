@@ -0,0 +1,264 @@
+"""
+Direct pymongo reads for the hot 'service' list endpoints.
+
+Djongo answers every ORM query by parsing the SQL Django generates and
+translating it into a MongoDB command, which costs more than the query
+itself for the simple reads behind the listings. The helpers in this module
+build the MongoDB filter, sort and projection of those reads directly and
+run them on the pymongo collection of the model (``objects.mongo_find``), so
+they go straight to the indexes without the translation layer:
+
+- the review listing and its filters (``review_query``),
+- the comments of a review (``comment_query``),
+- the vacancy listing and its pay filters (``vacancy_query``).
+
+Each returns a ``MongoQuery``, a lazy read that supports what the list views
+and ``Paginator`` need from a queryset (``count()``, slicing and iteration)
+and yields model instances. The views use it on MongoDB for the numbered
+pages, unpaginated lists and streamed exports; cursor pages and other
+backends keep the ORM. The filters are validated by the same functions as the ORM filters, so both
+paths accept and reject the same query parameters.
+"""
+import re
+from datetime import timezone
+from django.conf import settings  # pylint: disable=E0401
+from django.db import models as django_models  # pylint: disable=E0401
+from django.db import router  # pylint: disable=E0401
+from django.utils.timezone import is_naive, make_aware  # pylint: disable=E0401
+from .filters import REVIEW_TEXT_FILTERS, parse_pay, parse_rating
+from .models import Comment, Reviews, Vacancies
+from .mongo import is_mongo
+
+
+def uses_repository(model, request):
+    """
+    Check whether a list request can be served by the repository.
+
+    Args:
+        model (Model): The model being listed.
+        request (Request): The list request.
+
+    Returns:
+        bool: True on MongoDB for requests that are not in cursor mode.
+    """
+    return is_mongo(model) and "cursor" not in request.query_params
+
+
+def range_filter(field, low, high):
+    """
+    Return the filter of an inclusive range, or an empty dict without bounds.
+
+    Args:
+        field (str): The field to compare.
+        low (int or None): The lower bound.
+        high (int or None): The upper bound.
+
+    Returns:
+        dict: The filter on the field.
+    """
+    bounds = {}
+    if low is not None:
+        bounds["$gte"] = low
+    if high is not None:
+        bounds["$lte"] = high
+    return {field: bounds} if bounds else {}
+
+
+def review_filter(params):
+    """
+    Translate the review list filters into a MongoDB filter.
+
+    The text filters are case-insensitive substring matches, as with
+    ``filter_reviews``.
+
+    Args:
+        params (QueryDict): The request query parameters.
+
+    Raises:
+        ValidationError: If a rating or pay bound is invalid.
+
+    Returns:
+        dict: The MongoDB filter.
+    """
+    query = {}
+    for field in REVIEW_TEXT_FILTERS:
+        value = params.get(field, "").strip()
+        if value:
+            query[field] = {"$regex": re.escape(value), "$options": "i"}
+    query.update(range_filter("rating", parse_rating(params, "min_rating"),
+                              parse_rating(params, "max_rating")))
+    query.update(range_filter("hourly_pay_cents", parse_pay(params, "min_pay"),
+                              parse_pay(params, "max_pay")))
+    return query
+
+
+def vacancy_filter(params):
+    """
+    Translate the vacancy list filters into a MongoDB filter.
+
+    Args:
+        params (QueryDict): The request query parameters.
+
+    Raises:
+        ValidationError: If a pay bound is invalid.
+
+    Returns:
+        dict: The MongoDB filter.
+    """
+    return range_filter("payRateCents", parse_pay(params, "min_pay"),
+                        parse_pay(params, "max_pay"))
+
+
+def to_instance(model, document):
+    """
+    Build a model instance from a document read by the repository.
+
+    Args:
+        model (Model): The model class of the document.
+        document (dict): The projected document.
+
+    Returns:
+        Model: The instance, marked as loaded from the database.
+    """
+    fields = model._meta.concrete_fields # pylint: disable=W0212
+    values = []
+    for field in fields:
+        value = document.get(field.column)
+        # MongoDB stores UTC datetimes without a time zone
+        if (settings.USE_TZ and isinstance(field, django_models.DateTimeField)
+                and value is not None and is_naive(value)):
+            value = make_aware(value, timezone.utc)
+        values.append(value)
+    return model.from_db(router.db_for_read(model), [field.attname for field in fields], values)
+
+
+class MongoQuery:
+    """
+    A lazy pymongo read of model instances.
+
+    Offers the part of the queryset interface used by the list views,
+    ``Paginator`` and ``stream_json_array``.
+
+    Attributes:
+        model (Model): The model of the documents.
+        filter (dict): The MongoDB filter.
+        sort (list): The ``(field, direction)`` sort keys, matching an index.
+        projection (dict): The columns read, every concrete field of the
+            model and not ``_id``.
+    """
+    ordered = True # Always sorted, so Paginator does not warn
+
+    def __init__(self, model, query, sort):
+        self.model = model
+        self.filter = query
+        self.sort = sort
+        self.projection = {field.column: 1
+                           for field in model._meta.concrete_fields} # pylint: disable=W0212
+        self.projection["_id"] = 0
+        self._count = None
+
+    def fetch(self, skip=0, limit=0):
+        """
+        Read the documents in a window of the sorted results.
+
+        Args:
+            skip (int): The number of documents to skip.
+            limit (int): The number of documents to read, 0 for all.
+
+        Returns:
+            list: The model instances.
+        """
+        # pylint: disable=E1101
+        cursor = self.model.objects.mongo_find(self.filter, self.projection)
+        cursor = cursor.sort(self.sort).skip(skip).limit(limit)
+        return [to_instance(self.model, document) for document in cursor]
+
+    def iterator(self, chunk_size=2000):
+        """
+        Yield every matching instance, reading the cursor in batches.
+
+        Args:
+            chunk_size (int): The number of documents per cursor batch.
+
+        Yields:
+            Model: The instances, in order.
+        """
+        # pylint: disable=E1101
+        cursor = self.model.objects.mongo_find(self.filter, self.projection)
+        for document in cursor.sort(self.sort).batch_size(chunk_size):
+            yield to_instance(self.model, document)
+
+    def count(self):
+        """
+        Count the matching documents, once.
+
+        Returns:
+            int: The number of documents matching the filter.
+        """
+        if self._count is None:
+            self._count = self.model.objects.mongo_count_documents( # pylint: disable=E1101
+                self.filter)
+        return self._count
+
+    def __getitem__(self, item):
+        """Read a slice of the results, or one result by position."""
+        if isinstance(item, slice):
+            if item.step is not None:
+                raise ValueError("MongoQuery slices do not support a step.")
+            start, stop = item.start or 0, item.stop
+            if stop is not None and stop <= start:
+                return []
+            return self.fetch(start, 0 if stop is None else stop - start)
+        found = self.fetch(item, 1)
+        if not found:
+            raise IndexError("MongoQuery index out of range")
+        return found[0]
+
+    def __iter__(self):
+        """Read every matching document in order."""
+        return self.iterator()
+
+    def __len__(self):
+        """Return the number of matching documents."""
+        return self.count()
+
+
+def review_query(params):
+    """
+    Return the read of the review listing for the request filters.
+
+    Args:
+        params (QueryDict): The request query parameters.
+
+    Returns:
+        MongoQuery: The matching reviews, ordered by id.
+    """
+    return MongoQuery(Reviews, review_filter(params), [("id", 1)])
+
+
+def comment_query(review_id):
+    """
+    Return the read of the comments of a review.
+
+    Args:
+        review_id (int): The id of the review.
+
+    Returns:
+        MongoQuery: The comments, oldest first, on the (review, created_at,
+        id) index.
+    """
+    return MongoQuery(Comment, {"review_id": review_id},
+                      [("review_id", 1), ("created_at", 1), ("id", 1)])
+
+
+def vacancy_query(params):
+    """
+    Return the read of the vacancy listing for the request filters.
+
+    Args:
+        params (QueryDict): The request query parameters.
+
+    Returns:
+        MongoQuery: The matching vacancies, ordered by id.
+    """
+    return MongoQuery(Vacancies, vacancy_filter(params), [("id", 1)])
@@ -0,0 +1,694 @@
+"""
+In-process full-text search over review text.
+
+This module contains an inverted index with BM25 ranking over the
+``job_title``, ``job_description``, ``benefits`` and ``review`` fields of the
+Reviews model. The index is made of two segments:
+
+- a base segment in a compact binary layout, either memory-mapped from a
+  snapshot file (so a worker starts serving queries without rebuilding the
+  index) or built in memory from the Reviews collection; and
+- a small in-memory delta segment holding the reviews written (or deleted)
+  by this process since the base segment was built. Reviews that were changed
+  or deleted are hidden in the base segment by a tombstone.
+
+Each posting list of the base segment is sorted by its precomputed BM25
+impact, and every document also keeps its own list of terms (a forward
+index). Queries read the posting lists of their terms best-first and stop
+as soon as no unseen review can beat the current top results; the few
+reviews left undecided are scored exactly through the forward index. Words
+with a skewed score distribution therefore cost a few postings instead of a
+scan of every review that contains them.
+
+The snapshot is written by ``manage.py build_search_index``. Workers pick up a
+newer snapshot on their next query and keep their own delta on top of it.
+
+A worker loads or builds its index on its first search, never while saving a
+review: ``index_review_write`` only remembers the ids of the reviews written
+before then, and the first search reads those reviews again on top of the
+loaded index.
+
+Base segment layout (native byte order, recorded in the header)::
+
+    header        magic, byte order, counts, total length
+    doc_ids       uint64[doc_count]       review id of each document
+    lengths       uint32[doc_count]       number of terms in each document
+    fwd_offsets   uint32[doc_count + 1]   range of each document in fwd_*
+    fwd_terms     uint32[posting_count]   term ids of each document
+    fwd_tfs       uint32[posting_count]   term frequencies of each document
+    post_docs     uint32[posting_count]   document index of each posting
+    post_impacts  float32[posting_count]  BM25 score of each posting
+    terms         per term id: uint32 offset, uint32 df, uint16 size, utf-8
+"""
+import heapq
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+from operator import itemgetter
+from django.conf import settings  # pylint: disable=E0401
+
+# Review fields that are indexed for search
+SEARCH_FIELDS = ("job_title", "job_description", "benefits", "review")
+
+# Words too common to help ranking
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its my of on or "
+    "so that the their there they this to was were will with".split()
+)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+MAGIC = b"CJRSIDX2" # Identifies a search index snapshot
+# magic, byte order, padding, doc count, term count, posting count, total length
+HEADER = struct.Struct("=8sB3xIIIQ")
+TERM_ENTRY = struct.Struct("=IIH")
+BYTE_ORDER = 0 if sys.byteorder == "little" else 1
+# Type codes and lengths (as a function of the header counts) of the arrays
+ARRAYS = (
+    ("Q", lambda docs, postings: docs), # doc_ids
+    ("I", lambda docs, postings: docs), # lengths
+    ("I", lambda docs, postings: docs + 1), # fwd_offsets
+    ("I", lambda docs, postings: postings), # fwd_terms
+    ("I", lambda docs, postings: postings), # fwd_tfs
+    ("I", lambda docs, postings: postings), # post_docs
+    ("f", lambda docs, postings: postings), # post_impacts
+)
+BLOCK = 64 # Postings read from a list at a time
+FORWARD_LIMIT = 200 # Most documents scored through the forward index
+
+
+def tokenize(text):
+    """
+    Split text into lowercase search terms, dropping stop words.
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        list: The search terms in order of appearance.
+    """
+    if not text:
+        return []
+    return [term for term in TOKEN_RE.findall(text.lower()) if term not in STOP_WORDS]
+
+
+def split_arrays(view, doc_count, posting_count):
+    """
+    Cut the arrays of an encoded base segment out of its buffer.
+
+    Args:
+        view (memoryview): The whole segment.
+        doc_count (int): The number of documents, from the header.
+        posting_count (int): The number of postings, from the header.
+
+    Yields:
+        memoryview: Each array of ``ARRAYS`` in order, cast to its type.
+    """
+    offset = HEADER.size
+    for code, count in ARRAYS:
+        size = count(doc_count, posting_count) * array(code).itemsize
+        yield view[offset:offset + size].cast(code)
+        offset += size
+
+
+def review_text(review):
+    """
+    Concatenate the searchable fields of a review.
+
+    Args:
+        review (Reviews or dict): A review instance or a dict of its fields.
+
+    Returns:
+        str: The text to index for the review.
+    """
+    if isinstance(review, dict):
+        values = (review.get(field) for field in SEARCH_FIELDS)
+    else:
+        values = (getattr(review, field, None) for field in SEARCH_FIELDS)
+    return " ".join(value for value in values if value)
+
+
+def term_counts(text):
+    """
+    Count the search terms of a text.
+
+    Args:
+        text (str): The text to analyze.
+
+    Returns:
+        tuple: A dict of term frequencies and the number of terms.
+    """
+    counts = {}
+    tokens = tokenize(text)
+    for term in tokens:
+        counts[term] = counts.get(term, 0) + 1
+    return counts, len(tokens)
+
+
+def bm25_idf(doc_count, df):
+    """
+    Return the BM25 inverse document frequency of a term.
+
+    Args:
+        doc_count (int): The number of documents in the collection.
+        df (int): The number of documents containing the term.
+
+    Returns:
+        float: The (always positive) idf.
+    """
+    return math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+
+# pylint: disable=R0914
+def encode_segment(documents, k1, b):
+    """
+    Encode documents into the base segment layout.
+
+    Args:
+        documents (list): ``(review id, {term: tf}, length)`` tuples.
+        k1 (float): BM25 term frequency saturation.
+        b (float): BM25 document length normalization.
+
+    Returns:
+        bytes: The encoded segment, see the module docstring.
+    """
+    doc_ids, lengths = array("Q"), array("I")
+    fwd_offsets, fwd_terms, fwd_tfs = array("I", [0]), array("I"), array("I")
+    postings = {}
+    for index, (doc_id, counts, length) in enumerate(documents):
+        doc_ids.append(doc_id)
+        lengths.append(length)
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((index, tf))
+    terms = sorted(postings)
+    term_ids = {term: term_id for term_id, term in enumerate(terms)}
+    for _, counts, _ in documents:
+        # Sorted by term id, so that a term is found by bisection
+        for term_id, tf in sorted((term_ids[term], tf) for term, tf in counts.items()):
+            fwd_terms.append(term_id)
+            fwd_tfs.append(tf)
+        fwd_offsets.append(len(fwd_terms))
+
+    doc_count, total_length = len(doc_ids), sum(lengths)
+    base = k1 * (1 - b)
+    slope = k1 * b / (total_length / doc_count) if total_length else 0.0
+    post_docs, post_impacts, term_table = array("I"), array("f"), bytearray()
+    for term in terms:
+        weight = bm25_idf(doc_count, len(postings[term])) * (k1 + 1)
+        scored = sorted(
+            ((weight * tf / (tf + base + slope * lengths[index]), index)
+             for index, tf in postings[term]),
+            reverse=True,
+        )
+        encoded = term.encode("utf-8")
+        term_table += TERM_ENTRY.pack(len(post_docs), len(scored), len(encoded)) + encoded
+        for impact, index in scored:
+            post_docs.append(index)
+            post_impacts.append(impact)
+
+    parts = [HEADER.pack(MAGIC, BYTE_ORDER, doc_count, len(terms), len(post_docs), total_length)]
+    for values in (doc_ids, lengths, fwd_offsets, fwd_terms, fwd_tfs, post_docs, post_impacts):
+        parts.append(values.tobytes())
+    parts.append(bytes(term_table))
+    return b"".join(parts)
+
+
+# pylint: disable=R0902
+class SearchIndex:
+    """
+    Inverted index over review text with BM25 ranking.
+
+    All public methods are thread-safe.
+
+    Attributes:
+        k1 (float): BM25 term frequency saturation.
+        b (float): BM25 document length normalization.
+        path (str): The snapshot file the base segment was loaded from.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, buffer=None):
+        self._lock = threading.RLock()
+        self.path = None
+        self.mtime = None
+        # Delta segment, written by this process
+        self._delta_postings = {} # term -> {review id: tf}
+        self._delta_docs = {} # review id -> ({term: tf}, length)
+        self._deleted = set() # review ids deleted by this process
+        self._set_base(buffer if buffer is not None else encode_segment([], self.k1, self.b))
+
+    def __len__(self):
+        return self._doc_count
+
+    @classmethod
+    def build(cls, reviews):
+        """
+        Build an index from an iterable of reviews.
+
+        Args:
+            reviews (iterable): Review instances or dicts with an ``id`` key
+                and the fields in ``SEARCH_FIELDS``.
+
+        Returns:
+            SearchIndex: The populated index, with every review in its base
+            segment.
+        """
+        documents = []
+        for review in reviews:
+            doc_id = review["id"] if isinstance(review, dict) else review.pk
+            counts, length = term_counts(review_text(review))
+            documents.append((doc_id, counts, length))
+        return cls(encode_segment(documents, cls.k1, cls.b))
+
+    @classmethod
+    def build_from_database(cls):
+        """
+        Build an index from the Reviews collection.
+
+        Returns:
+            SearchIndex: The populated index.
+        """
+        from .models import Reviews  # pylint: disable=C0415
+        # pylint: disable=E1101
+        reviews = Reviews.objects.values("id", *SEARCH_FIELDS).iterator()
+        return cls.build(reviews)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Open a snapshot written by ``save``.
+
+        The arrays of the snapshot stay in the memory-mapped file; only the
+        term dictionary and the review id lookup are built in memory.
+
+        Args:
+            path (str): The snapshot file to open.
+
+        Raises:
+            ValueError: If the file is not a compatible snapshot.
+
+        Returns:
+            SearchIndex: The index, with the snapshot as its base segment.
+        """
+        mapped, mtime = cls._map(path)
+        index = cls(mapped)
+        index.path, index.mtime = path, mtime
+        return index
+
+    @staticmethod
+    def _map(path):
+        """Memory-map a snapshot file and return it with its mtime."""
+        with open(path, "rb") as snapshot:
+            mtime = os.fstat(snapshot.fileno()).st_mtime
+            return mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ), mtime
+
+    def _set_base(self, buffer):
+        """
+        Replace the base segment, then re-apply the delta segment on top.
+
+        Args:
+            buffer (bytes or mmap): An encoded base segment.
+
+        Raises:
+            ValueError: If the buffer is not a compatible segment.
+        """
+        magic, byte_order, doc_count, term_count, posting_count, total_length = \
+            HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or byte_order != BYTE_ORDER:
+            raise ValueError("Not a compatible search index snapshot")
+
+        view = memoryview(buffer)
+        (ids, lengths, fwd_offsets, fwd_terms, fwd_tfs, post_docs,
+         post_impacts) = arrays = tuple(split_arrays(view, doc_count, posting_count))
+        offset = HEADER.size + sum(part.nbytes for part in arrays)
+        terms, term_names = {}, []
+        for term_id in range(term_count):
+            start, df, size = TERM_ENTRY.unpack_from(buffer, offset)
+            offset += TERM_ENTRY.size
+            name = bytes(view[offset:offset + size]).decode("utf-8")
+            terms[name] = (term_id, start, df)
+            term_names.append(name)
+            offset += size
+
+        with self._lock:
+            delta, deleted = list(self._delta_docs.items()), list(self._deleted)
+            self._buffer = buffer
+            self._ids, self._lengths, self._fwd_offsets = ids, lengths, fwd_offsets
+            self._fwd_terms, self._fwd_tfs = fwd_terms, fwd_tfs
+            self._post_docs, self._post_impacts = post_docs, post_impacts
+            self._terms, self._term_names = terms, term_names
+            self._docs = {doc_id: i for i, doc_id in enumerate(self._ids)}
+            self._tombstones = set() # Indexes of the hidden base documents
+            self._base_count, self._base_length = doc_count, total_length
+            self._delta_postings, self._delta_docs = {}, {}
+            self._doc_count, self._total_length = doc_count, total_length
+            # Re-apply the writes this process made since the previous base
+            for doc_id in deleted:
+                self._discard(doc_id)
+            for doc_id, (counts, length) in delta:
+                self._insert(doc_id, counts, length)
+
+    def add(self, doc_id, text):
+        """
+        Index a review, replacing any previous version of it.
+
+        Args:
+            doc_id (int): The review id.
+            text (str): The review text, see ``review_text``.
+        """
+        counts, length = term_counts(text)
+        with self._lock:
+            self._deleted.discard(doc_id)
+            self._insert(doc_id, counts, length)
+
+    def remove(self, doc_id):
+        """
+        Remove a review from the index.
+
+        Args:
+            doc_id (int): The review id.
+        """
+        with self._lock:
+            self._discard(doc_id)
+            self._deleted.add(doc_id)
+
+    def _insert(self, doc_id, counts, length):
+        """Add a document to the delta segment, hiding older versions."""
+        self._discard(doc_id)
+        for term, tf in counts.items():
+            self._delta_postings.setdefault(term, {})[doc_id] = tf
+        self._delta_docs[doc_id] = (counts, length)
+        self._doc_count += 1
+        self._total_length += length
+
+    def _discard(self, doc_id):
+        """Hide the current version of a review from both segments."""
+        if doc_id in self._delta_docs:
+            counts, length = self._delta_docs.pop(doc_id)
+            for term in counts:
+                postings = self._delta_postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self._delta_postings[term]
+        elif doc_id in self._docs and self._docs[doc_id] not in self._tombstones:
+            length = self._lengths[self._docs[doc_id]]
+            self._tombstones.add(self._docs[doc_id])
+        else:
+            return
+        self._doc_count -= 1
+        self._total_length -= length
+
+    def search(self, query, limit=20):
+        """
+        Rank the reviews matching a query with BM25.
+
+        Scores use the collection statistics of the base segment, so that
+        the precomputed impacts and the delta segment stay comparable.
+
+        Args:
+            query (str): The search query.
+            limit (int): The maximum number of results.
+
+        Returns:
+            list: ``(review id, score)`` pairs, best first.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            doc_count = max(self._base_count, 1)
+            avgdl = (self._base_length / self._base_count) if self._base_length else 1.0
+            base, slope = self.k1 * (1 - self.b), self.k1 * self.b / avgdl
+            weights, lists = {}, {} # Keyed by term id, for the base segment
+            delta_weights = {} # Keyed by term, for the delta segment
+            for term in terms:
+                term_id, offset, df = self._terms.get(term, (None, 0, 0))
+                if df:
+                    weights[term_id] = bm25_idf(doc_count, df) * (self.k1 + 1)
+                    lists[term_id] = [offset, offset + df]
+                if term in self._delta_postings:
+                    # Terms new since the base segment count as rare ones
+                    delta_weights[term] = bm25_idf(doc_count, max(df, 1)) * (self.k1 + 1)
+
+            hits = self._search_base(lists, weights, base, slope, limit)
+            hits.extend(self._score_delta(delta_weights, base, slope))
+        return heapq.nlargest(limit, hits, key=itemgetter(1))
+
+    # pylint: disable=R0913
+    def _search_base(self, lists, weights, base, slope, limit):
+        """
+        Return the top documents of the base segment.
+
+        Postings are read best-first, always from the list with the highest
+        remaining impact, and added to the partial score of their document.
+        A document that was not seen yet can score at most the sum of the
+        next impacts of every list, so the scan stops once that sum drops to
+        the ``limit``-th best partial score. The documents that can still
+        reach that score are then scored exactly through the forward index.
+
+        Args:
+            lists (dict): ``[start, end]`` posting ranges by query term id.
+            weights (dict): ``idf * (k1 + 1)`` of each query term id.
+            base (float): ``k1 * (1 - b)``.
+            slope (float): ``k1 * b / avgdl``.
+            limit (int): The number of documents to return.
+
+        Returns:
+            list: Up to ``limit`` ``(review id, score)`` pairs.
+        """
+        post_docs, post_impacts, dead = self._post_docs, self._post_impacts, self._tombstones
+        scores, read, next_check = {}, 0, limit
+        heads = {term_id: post_impacts[start] for term_id, (start, _) in lists.items()}
+        while heads:
+            term_id = max(heads, key=heads.get)
+            start, end = lists[term_id]
+            stop = min(start + BLOCK, end)
+            block = zip(post_docs[start:stop], post_impacts[start:stop])
+            if dead:
+                block = ((index, impact) for index, impact in block if index not in dead)
+            for index, impact in block:
+                scores[index] = scores.get(index, 0.0) + impact
+            lists[term_id][0] = stop
+            if stop < end:
+                heads[term_id] = post_impacts[stop]
+            else:
+                del heads[term_id]
+            read += stop - start
+            # The threshold costs a pass over the scores, so check it sparingly
+            if read >= next_check and len(scores) >= limit:
+                next_check = 2 * read
+                if self._threshold(scores, limit) >= sum(heads.values()):
+                    break
+
+        # No other document can enter the results. The documents already seen
+        # are either resolved by reading the rest of their lists (cheap per
+        # posting), or scored exactly when few of them are left.
+        for term_id in sorted(heads, key=heads.get, reverse=True):
+            # Impacts are stored as float32, so leave some room for rounding
+            threshold = (self._threshold(scores, limit) - sum(heads.values())) * (1 - 1e-5)
+            candidates = [index for index, score in scores.items() if score >= threshold]
+            if len(candidates) <= FORWARD_LIMIT:
+                break
+            start, end = lists[term_id]
+            for index, impact in zip(post_docs[start:end], post_impacts[start:end]):
+                if index in scores:
+                    scores[index] += impact
+            del heads[term_id]
+        else:
+            # Every list was read, so the partial scores are exact
+            top = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+            return [(self._ids[index], score) for index, score in top]
+
+        top = heapq.nlargest(
+            limit,
+            ((index, self._score_document(index, weights, base, slope)) for index in candidates),
+            key=itemgetter(1),
+        )
+        return [(self._ids[index], score) for index, score in top]
+
+    @staticmethod
+    def _threshold(scores, limit):
+        """Return the ``limit``-th best partial score (0 if there are fewer)."""
+        if len(scores) < limit:
+            return 0.0
+        return heapq.nlargest(limit, scores.values())[-1]
+
+    def _score_document(self, index, weights, base, slope):
+        """Score a base document through the forward index."""
+        fwd_terms, fwd_tfs = self._fwd_terms, self._fwd_tfs
+        start, end = self._fwd_offsets[index], self._fwd_offsets[index + 1]
+        length, score = self._lengths[index], 0.0
+        for term_id, weight in weights.items():
+            j = bisect_left(fwd_terms, term_id, start, end)
+            if j < end and fwd_terms[j] == term_id:
+                tf = fwd_tfs[j]
+                score += weight * tf / (tf + base + slope * length)
+        return score
+
+    def _score_delta(self, weights, base, slope):
+        """Return ``(review id, score)`` pairs for the matching delta documents."""
+        scores = {}
+        for term, weight in weights.items():
+            for doc_id, tf in self._delta_postings[term].items():
+                length = self._delta_docs[doc_id][1]
+                scores[doc_id] = scores.get(doc_id, 0.0) + \
+                    weight * tf / (tf + base + slope * length)
+        return scores.items()
+
+    def _live_documents(self):
+        """Return ``(review id, {term: tf}, length)`` for every live document."""
+        documents = []
+        for index, doc_id in enumerate(self._ids):
+            if index in self._tombstones:
+                continue
+            start, end = self._fwd_offsets[index], self._fwd_offsets[index + 1]
+            counts = {self._term_names[self._fwd_terms[j]]: self._fwd_tfs[j]
+                      for j in range(start, end)}
+            documents.append((doc_id, counts, self._lengths[index]))
+        documents.extend((doc_id, counts, length)
+                         for doc_id, (counts, length) in self._delta_docs.items())
+        return documents
+
+    def compact(self):
+        """Merge the delta segment into a new in-memory base segment."""
+        with self._lock:
+            encoded = encode_segment(self._live_documents(), self.k1, self.b)
+            self._delta_docs, self._deleted = {}, set()
+            self._set_base(encoded)
+
+    def save(self, path):
+        """
+        Write a compacted snapshot of both segments to disk.
+
+        The file is written next to ``path`` and renamed into place, so
+        workers never see a partially written snapshot.
+
+        Args:
+            path (str): The snapshot file to write.
+        """
+        with self._lock:
+            encoded = encode_segment(self._live_documents(), self.k1, self.b)
+        directory = os.path.dirname(os.path.abspath(path))
+        handle, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as out:
+                out.write(encoded)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def refresh(self):
+        """
+        Switch to a newer snapshot if the snapshot file was replaced.
+
+        Returns:
+            bool: True if a newer snapshot was loaded.
+        """
+        if self.path is None:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+        if mtime == self.mtime:
+            return False
+        mapped, self.mtime = self._map(self.path)
+        self._set_base(mapped)
+        return True
+
+
+_index = None # pylint: disable=C0103
+_index_lock = threading.Lock() # Held while the index is loaded or built
+_pending = set() # Ids of the reviews written before the index was loaded
+_pending_lock = threading.Lock() # Guards _pending and the publication of _index
+
+
+def reindex_reviews(index, doc_ids):
+    """
+    Read reviews again from the database and index their current text.
+
+    Args:
+        index (SearchIndex): The index to update.
+        doc_ids (set): The ids of the reviews; those no longer stored are
+            removed from the index.
+    """
+    from .models import Reviews  # pylint: disable=C0415
+    # pylint: disable=E1101
+    for review in Reviews.objects.filter(pk__in=doc_ids).values("id", *SEARCH_FIELDS):
+        index.add(review["id"], review_text(review))
+        doc_ids.discard(review["id"])
+    for doc_id in doc_ids:
+        index.remove(doc_id)
+
+
+def get_search_index():
+    """
+    Return the search index of this process, loading it on first use.
+
+    The index is memory-mapped from the snapshot at
+    ``settings.SEARCH_INDEX_PATH`` when it exists, and built from the
+    Reviews collection otherwise. The reviews written by this process
+    meanwhile are indexed again before the index is used.
+
+    Returns:
+        SearchIndex: The shared index.
+    """
+    global _index # pylint: disable=W0603
+    if _index is not None:
+        _index.refresh()
+        return _index
+    with _index_lock:
+        if _index is None:
+            path = settings.SEARCH_INDEX_PATH
+            if os.path.exists(path):
+                index = SearchIndex.load(path)
+            else:
+                index = SearchIndex.build_from_database()
+            while True: # Until no review was written during the last pass
+                with _pending_lock:
+                    written = set(_pending)
+                    _pending.clear()
+                    if not written:
+                        _index = index
+                        break
+                reindex_reviews(index, written)
+    return _index
+
+
+def index_review_write(doc_id, review=None):
+    """
+    Apply a saved or deleted review to the index of this process.
+
+    Before the first search of the process there is no index to update, and
+    building one here would make a save wait on the whole collection; the id
+    is remembered instead, see ``get_search_index``.
+
+    Args:
+        doc_id (int): The id of the review.
+        review (Reviews or dict, optional): The saved review; None if it
+            was deleted.
+    """
+    with _pending_lock:
+        index = _index
+        if index is None:
+            _pending.add(doc_id)
+            return
+    if review is None:
+        index.remove(doc_id)
+    else:
+        index.add(doc_id, review_text(review))
+
+
+def reset_search_index():
+    """Drop the index of this process so that the next use reloads it."""
+    global _index # pylint: disable=W0603
+    with _index_lock, _pending_lock:
+        _index = None
+        _pending.clear()
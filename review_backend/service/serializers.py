@@ -9,6 +9,9 @@ and custom validation rules for attributes such as rating and review content.
 - **VacanciesSerializer**: Serializes the Vacancies model, ensuring that critical
 fields like job title and job description are provided, and validates constraints
 on the maximum hours allowed.
+- **RatingAggregateSerializer**: Serializes the rating statistics of a job title
+or department, deriving the average rating, histogram and recommendation ratio
+from the stored counters.
 
 Functions:
 - **ReviewsSerializer.validate**: Custom validation for Reviews, ensuring the rating
@@ -18,33 +21,43 @@ job title and job description are not empty and that the maximum hours allowed i
 """
 from rest_framework import serializers  # Import Django REST framework serializers
 from .models import Reviews, Vacancies, Comment # Import models to create serializers for
+from .models import RatingAggregate # Materialized rating statistics
+from .timing import TimedSerializerMixin # Serializer time of the timed requests
 
 
 
 # pylint: disable=R0903
-class ReviewsSerializer(serializers.ModelSerializer):
+class ReviewsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the Reviews model.
 
     This serializer handles the conversion of Reviews model instances to JSON format
     and vice versa, ensuring data consistency and validation before saving.
 
+    The read-only ``comment_count`` and ``latest_comment`` show the number of
+    comments and a preview of the newest one from the fields stored on the
+    review, without reading the comments.
+
     Meta Attributes:
         model (Reviews): Specifies the Reviews model for serialization.
-        fields (str): Includes all model fields.
+        exclude (list): The stored preview fields, shown as ``latest_comment``.
         extra_kwargs (dict): Specifies required fields to enforce non-null constraints.
     """
+    latest_comment = serializers.SerializerMethodField() # Preview of the newest comment
+
     class Meta:
         """
         Meta options for the ReviewsSerializer.
 
         Attributes:
             model: The model associated with this serializer (Reviews).
-            fields: A list of fields to include in the serialization.
+            exclude: The fields left out of the serialization.
             extra_kwargs: Additional constraints for specific fields, such as
                           requiring certain fields to be present.
         """
         model = Reviews
-        fields = '__all__'  # This will include all fields from the Reviews model
+        # All model fields except the preview, which is nested in latest_comment
+        exclude = ['latest_comment_id', 'latest_comment_user', 'latest_comment_text',
+                   'latest_comment_at']
         extra_kwargs = {
             'department': {'required': True},  # Enforces non-null constraint
             'job_title': {'required': True},  # Enforces non-null constraint
@@ -57,6 +70,26 @@ class ReviewsSerializer(serializers.ModelSerializer):
             'recommendation': {'required': False},
         }
 
+    def get_latest_comment(self, review):
+        """Return the preview of the newest comment of a review.
+
+        Args:
+            review (Reviews): The review being serialized.
+
+        Returns:
+            dict or None: The id, author, start of the text and creation time
+            of the newest comment, or None if the review has no comments.
+        """
+        if review.latest_comment_id is None:
+            return None
+        return {
+            "id": review.latest_comment_id,
+            "user": review.latest_comment_user,
+            "text": review.latest_comment_text,
+            "created_at": serializers.DateTimeField().to_representation(
+                review.latest_comment_at),
+        }
+
     def validate(self, attrs):
         """Custom validation for Reviews model data.
 
@@ -72,11 +105,14 @@ class ReviewsSerializer(serializers.ModelSerializer):
         Returns:
             dict: Validated attributes.
         """
-        # Add custom validation logic here if needed
-        if attrs['rating'] < 1 or attrs['rating'] > 5:
+        # Partial updates and imported rows may leave out the optional review,
+        # so fall back to the values of the instance being updated
+        rating = attrs.get('rating', getattr(self.instance, 'rating', None))
+        review = attrs.get('review', getattr(self.instance, 'review', None))
+        if rating is None or rating < 1 or rating > 5:
             raise serializers.ValidationError(
                 "Rating must be between 1 and 5.")
-        if not attrs['review']:
+        if not review:
             raise serializers.ValidationError("Review cannot be empty.")
         return attrs
 
@@ -84,7 +120,7 @@ class ReviewsSerializer(serializers.ModelSerializer):
 # since it typically require only one or no methods.
 
 # pylint: disable=R0903
-class VacanciesSerializer(serializers.ModelSerializer):
+class VacanciesSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the Vacancies model.
 
     This serializer converts Vacancies model data to JSON format for API
@@ -92,7 +128,7 @@ class VacanciesSerializer(serializers.ModelSerializer):
 
     Meta Attributes:
         model (Vacancies): Specifies the Vacancies model for serialization.
-        fields (str): Includes all fields of the Vacancies model.
+        exclude (list): Leaves out the internal deduplication key.
     """
     class Meta:
         """
@@ -100,10 +136,10 @@ class VacanciesSerializer(serializers.ModelSerializer):
 
         Attributes:
             model: The model associated with this serializer (Vacancies).
-            fields: A list of fields to include in the serialization.
+            exclude: The fields left out of the serialization.
         """
         model = Vacancies
-        fields = '__all__'  # This will include all fields from the Vacancies model
+        exclude = ['dedupKey']  # All fields except the internal deduplication key
 
     def validate(self, attrs):
         """Custom validation for Vacancies model data.
@@ -131,7 +167,7 @@ class VacanciesSerializer(serializers.ModelSerializer):
         # Add more validation as needed
         return attrs
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the Comment model.
 
     This serializer handles the conversion of Comment model instances to JSON format
@@ -181,3 +217,45 @@ class CommentSerializer(serializers.ModelSerializer):
         if not data.get('text'):
             raise serializers.ValidationError("Text is required.")
         return data
+
+
+# pylint: disable=R0903
+class RatingAggregateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for the RatingAggregate model.
+
+    Read-only: the counters are maintained by ``service.aggregates``. The
+    response carries the derived statistics rather than the raw sums.
+
+    Meta Attributes:
+        model (RatingAggregate): Specifies the RatingAggregate model for serialization.
+        fields (list): The grouping, review count and derived statistics.
+    """
+    average_rating = serializers.SerializerMethodField()
+    histogram = serializers.SerializerMethodField()
+    recommendation_ratio = serializers.SerializerMethodField()
+
+    class Meta:
+        """
+        Meta options for the RatingAggregateSerializer.
+
+        Attributes:
+            model: The model associated with this serializer (RatingAggregate).
+            fields: A list of fields to include in the serialization.
+        """
+        model = RatingAggregate
+        fields = ['scope', 'value', 'count', 'average_rating', 'histogram',
+                  'recommendation_ratio']
+
+    def get_average_rating(self, obj):
+        """Return the mean rating, or None if there are no reviews."""
+        return round(obj.rating_sum / obj.count, 2) if obj.count else None
+
+    def get_histogram(self, obj):
+        """Return the number of reviews with each rating, keyed by rating."""
+        return {str(rating): getattr(obj, f"rating_{rating}") for rating in range(1, 6)}
+
+    def get_recommendation_ratio(self, obj):
+        """Return the mean recommendation as a share of the maximum (10)."""
+        if not obj.recommendation_count:
+            return None
+        return round(obj.recommendation_sum / (10 * obj.recommendation_count), 4)
@@ -0,0 +1,57 @@
+"""
+Signal handlers for the 'service' application.
+
+These handlers keep the in-process indexes in step with writes to the
+Reviews and Vacancies collections, so that a review becomes searchable, and
+a new job title can be matched, as soon as it is saved by this process.
+They also bump the version of the written collection, which invalidates
+its cached listings and their ETags.
+"""
+from django.db.models.signals import post_delete, post_save  # pylint: disable=E0401
+from django.dispatch import receiver  # pylint: disable=E0401
+from .cache import bump_version
+from .models import Comment, Reviews, Vacancies
+from .search import index_review_write
+from .titles import get_title_matcher
+
+
+# pylint: disable=W0613
+@receiver(post_save, sender=Reviews)
+def index_review(sender, instance, **kwargs):
+    """Index a created or updated review and invalidate the cached listings."""
+    index_review_write(instance.pk, instance)
+    get_title_matcher().add("review", instance.pk, instance.job_title)
+    bump_version("reviews")
+
+
+# pylint: disable=W0613
+@receiver(post_delete, sender=Reviews)
+def unindex_review(sender, instance, **kwargs):
+    """Unindex a deleted review and invalidate the cached listings."""
+    index_review_write(instance.pk)
+    get_title_matcher().remove("review", instance.pk)
+    bump_version("reviews")
+
+
+# pylint: disable=W0613
+@receiver(post_save, sender=Vacancies)
+def index_vacancy(sender, instance, **kwargs):
+    """Index the title of a saved vacancy and invalidate the cached listings."""
+    get_title_matcher().add("vacancy", instance.pk, instance.jobTitle)
+    bump_version("vacancies")
+
+
+# pylint: disable=W0613
+@receiver(post_delete, sender=Vacancies)
+def unindex_vacancy(sender, instance, **kwargs):
+    """Unindex the title of a deleted vacancy and invalidate the cached listings."""
+    get_title_matcher().remove("vacancy", instance.pk)
+    bump_version("vacancies")
+
+
+# pylint: disable=W0613
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    """Change the ETag of the comment list of the review a comment belongs to."""
+    bump_version(f"comments:{instance.review_id}")
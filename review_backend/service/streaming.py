@@ -0,0 +1,79 @@
+"""
+Streaming JSON output for the review listing.
+
+Clients that need every matching review at once, such as exports, used to
+get the whole list materialized in the worker: every model instance, then
+the serialized list, then the rendered bytes.
+``StreamingListMixin`` answers ``?stream=1`` requests with a
+``StreamingHttpResponse`` instead. It reads the database cursor in batches,
+serializes one batch at a time and yields the JSON array piece by piece, so
+the first bytes leave immediately and the memory of the worker is bounded
+by the batch size rather than by the size of the collection.
+"""
+from django.http import StreamingHttpResponse  # pylint: disable=E0401
+from rest_framework.utils.encoders import JSONEncoder  # pylint: disable=E0401
+
+STREAM_BATCH_SIZE = 500 # Documents read from the cursor and serialized at a time
+
+
+def stream_json_array(queryset, serializer_class, batch_size=STREAM_BATCH_SIZE):
+    """
+    Yield the serialized items of a queryset as the pieces of a JSON array.
+
+    Args:
+        queryset (QuerySet): The items to serialize, in output order.
+        serializer_class (Serializer): The serializer of one item.
+        batch_size (int): The number of items read and serialized at a time.
+
+    Yields:
+        bytes: Consecutive pieces of the JSON array.
+    """
+    encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    yield b"["
+    batch, first = [], True
+    for item in queryset.iterator(chunk_size=batch_size):
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield _encode_batch(encoder, serializer_class, batch, first)
+            batch, first = [], False
+    if batch:
+        yield _encode_batch(encoder, serializer_class, batch, first)
+    yield b"]"
+
+
+def _encode_batch(encoder, serializer_class, batch, first):
+    """Serialize a batch and encode it as comma-separated array items."""
+    data = serializer_class(batch, many=True).data
+    body = ",".join(encoder.encode(item) for item in data)
+    return (body if first else "," + body).encode("utf-8")
+
+
+# pylint: disable=R0903
+class StreamingListMixin:
+    """
+    Stream the ``list`` action of a view when the request asks for it.
+
+    ``?stream=1`` returns every item matching the filters as one JSON
+    array, without pagination and without going through the response
+    cache; other requests are handled as before.
+    """
+    stream_query_param = "stream" # Query parameter enabling the streaming mode
+    stream_batch_size = STREAM_BATCH_SIZE # Documents serialized at a time
+
+    def list(self, request, *args, **kwargs):
+        """
+        Return a streamed JSON array, or the regular listing.
+
+        Args:
+            request (Request): The listing request.
+
+        Returns:
+            StreamingHttpResponse or Response: The listing.
+        """
+        if request.query_params.get(self.stream_query_param) not in ("1", "true"):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            stream_json_array(queryset, self.get_serializer_class(), self.stream_batch_size))
+        response["Content-Type"] = "application/json" # JsonResponse would buffer the array
+        return response
@@ -0,0 +1,15 @@
+"""
+Data shared by the test modules of the 'service' application.
+
+The test modules are split by feature; the review they all start from is
+defined once here, and each test case overrides the fields it is about.
+"""
+
+# The fields of a valid review, as posted to the API
+REVIEW_DATA = {
+    "department": "IT",
+    "job_title": "Engineer",
+    "hourly_pay": "30",
+    "review": "Good work environment",
+    "rating": 4,
+}
@@ -0,0 +1,100 @@
+"""
+Module for testing the rating statistics of the 'service' application.
+
+This module contains test cases for the statistics maintained by the review
+endpoints and for their rebuild from the reviews.
+"""
+from unittest.mock import MagicMock, patch
+from django.contrib.auth import get_user_model  # pylint: disable=E0401
+from django.urls import reverse  # pylint: disable=E0401
+from rest_framework import status  # pylint: disable=E0401
+from rest_framework.test import APITestCase  # pylint: disable=E0401
+from .aggregates import rebuild_aggregates
+from .models import RatingAggregate
+
+User = get_user_model()
+
+
+class RatingStatsTests(APITestCase):
+    """Test cases for the rating statistics maintained by the review endpoints."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Authenticate and create reviews through the API."""
+        self.user = User.objects.create_user("stats", "stats@example.com", "password")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("rating-stats")
+        self.valid_data = {
+            "department": "Libraries",
+            "job_title": "Library Assistant",
+            "hourly_pay": "12",
+            "review": "Quiet shifts",
+            "rating": 4,
+            "recommendation": 8,
+        }
+        self.ids = [
+            self.client.post("/service/reviews/", {**self.valid_data, **extra},
+                             format="json").data["id"]
+            for extra in ({}, {"rating": 2, "recommendation": 4},
+                          {"job_title": "Shelver", "rating": 5, "recommendation": 10})
+        ]
+
+    def stats(self, **params):
+        """Return the statistics for the query parameters."""
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_stats_follow_creates(self):
+        """Test that created reviews are counted per job title and per department."""
+        stats = self.stats(job_title="Library Assistant")
+        self.assertEqual(stats["count"], 2)
+        self.assertEqual(stats["average_rating"], 3.0)
+        self.assertEqual(stats["histogram"], {"1": 0, "2": 1, "3": 0, "4": 1, "5": 0})
+        self.assertEqual(stats["recommendation_ratio"], 0.6)
+        self.assertEqual(self.stats(department="Libraries")["count"], 3)
+
+    def test_stats_follow_updates_and_deletes(self):
+        """Test that a review moves between groups and deleted reviews are removed."""
+        self.client.put(f"/service/reviews/{self.ids[0]}/",
+                        {**self.valid_data, "job_title": "Shelver"}, format="json")
+        self.client.delete(f"/service/reviews/{self.ids[1]}/")
+        shelver = self.stats(job_title="Shelver")
+        self.assertEqual((shelver["count"], shelver["average_rating"]), (2, 4.5))
+        response = self.client.get(self.url, {"job_title": "Library Assistant"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.stats(department="Libraries")["histogram"]["2"], 0)
+
+    def test_rebuild_matches_incremental_counts(self):
+        """Test that rebuilding from the reviews gives the same documents."""
+        self.client.put(f"/service/reviews/{self.ids[2]}/",
+                        {**self.valid_data, "job_title": "Shelver", "department": "Dining"},
+                        format="json")
+        def documents():
+            # pylint: disable=E1101
+            return {aggregate.key: self.stats(**{aggregate.scope: aggregate.value})
+                    for aggregate in RatingAggregate.objects.filter(count__gt=0)}
+        incremental = documents()
+        self.assertEqual(rebuild_aggregates(), 4)
+        self.assertEqual(documents(), incremental)
+
+    def test_rebuild_upserts_on_mongo(self):
+        """Test that the MongoDB rebuild replaces the documents, then deletes stale ones."""
+        manager = MagicMock()
+        with patch("service.aggregates.is_mongo", return_value=True), \
+                patch.object(RatingAggregate, "objects", manager):
+            self.assertEqual(rebuild_aggregates(), 3)
+        keys = ["department:Libraries", "job_title:Library Assistant", "job_title:Shelver"]
+        operations = manager.mongo_bulk_write.call_args.args[0]
+        self.assertEqual(sorted(operation._filter["key"] # pylint: disable=W0212
+                                for operation in operations), keys)
+        manager.mongo_delete_many.assert_called_once()
+        self.assertEqual(sorted(manager.mongo_delete_many.call_args.args[0]["key"]["$nin"]), keys)
+        manager.all.assert_not_called()
+
+    def test_stats_require_one_scope(self):
+        """Test that exactly one of job_title and department is accepted."""
+        self.assertEqual(self.client.get(self.url).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {"job_title": "Shelver", "department": "Libraries"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
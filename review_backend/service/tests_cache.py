@@ -0,0 +1,127 @@
+"""
+Module for testing the cached listings of the 'service' application.
+
+This module contains test cases for the versioned response cache and the
+conditional requests of the listings.
+"""
+from django.contrib.auth import get_user_model  # pylint: disable=E0401
+from django.urls import reverse  # pylint: disable=E0401
+from rest_framework import status  # pylint: disable=E0401
+from rest_framework.test import APITestCase  # pylint: disable=E0401
+from .cache import get_cache, reset_cache_stats
+from .models import Comment, Reviews, Vacancies
+from .testing import REVIEW_DATA
+
+User = get_user_model()
+
+
+class ResponseCacheTests(APITestCase):
+    """Test cases for the versioned response cache of the listings."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Start from an empty cache and create a review and a vacancy."""
+        get_cache().clear()
+        reset_cache_stats()
+        self.valid_data = dict(REVIEW_DATA)
+        self.vacancy_data = {"jobTitle": "Cashier", "jobDescription": "Register",
+                             "jobLocation": "Dining Hall", "jobPayRate": "12",
+                             "maxHoursAllowed": 20}
+        # pylint: disable=E1101
+        Reviews.objects.create(**self.valid_data)
+        Vacancies.objects.create(**self.vacancy_data)
+
+    def test_repeated_listing_is_served_from_cache(self):
+        """Test that the same request is a hit and other parameters a miss."""
+        first = self.client.get(reverse("get-reviews"), {"page_size": 5, "department": "IT"})
+        second = self.client.get(reverse("get-reviews"), {"department": "IT", "page_size": 5})
+        other = self.client.get(reverse("get-reviews"), {"page_size": 6})
+        self.assertEqual((first["X-Cache"], second["X-Cache"], other["X-Cache"]),
+                         ("MISS", "HIT", "MISS"))
+        self.assertEqual(second.data, first.data)
+
+    def test_review_write_invalidates_listing(self):
+        """Test that saving or deleting a review drops the cached pages."""
+        self.client.get(reverse("get-reviews"))
+        review = Reviews.objects.create(**self.valid_data) # pylint: disable=E1101
+        response = self.client.get(reverse("get-reviews"))
+        self.assertEqual((response["X-Cache"], response.data["count"]), ("MISS", 2))
+        review.delete()
+        self.assertEqual(self.client.get(reverse("get-reviews")).data["count"], 1)
+
+    def test_vacancy_write_invalidates_listing(self):
+        """Test that a vacancy created through the API drops the cached list."""
+        self.client.get("/service/vacancies/")
+        self.client.post("/service/vacancies/", {**self.vacancy_data, "jobLocation": "Talley"},
+                         format="json")
+        response = self.client.get("/service/vacancies/")
+        self.assertEqual((response["X-Cache"], len(response.data)), ("MISS", 2))
+        self.assertEqual(self.client.get("/service/vacancies/")["X-Cache"], "HIT")
+
+    def test_cache_stats_for_staff(self):
+        """Test that the hit and miss counters are only shown to staff users."""
+        self.client.get(reverse("get-reviews"))
+        self.client.get(reverse("get-reviews"))
+        self.assertNotEqual(self.client.get(reverse("cache-stats")).status_code,
+                            status.HTTP_200_OK)
+        staff = User.objects.create_superuser("staff", "staff@example.com", "password")
+        self.client.force_authenticate(user=staff)
+        response = self.client.get(reverse("cache-stats"))
+        self.assertEqual(response.data, {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+
+
+class ConditionalRequestTests(APITestCase):
+    """Test cases for the ETag and Last-Modified validators of the listings."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Start from an empty cache and create a review with a comment."""
+        get_cache().clear()
+        self.user = User.objects.create_user("reader", "reader@example.com", "password")
+        self.client.force_authenticate(user=self.user)
+        # pylint: disable=E1101
+        self.review = Reviews.objects.create(department="IT", job_title="Engineer",
+                                             hourly_pay="30", review="Good", rating=4)
+        Comment.objects.create(review=self.review, user=self.user, text="Agreed")
+        self.comments_url = reverse("comments", args=[self.review.pk])
+
+    def test_current_etag_is_not_modified(self):
+        """Test that every listing answers a current ETag with an empty 304."""
+        for url in (reverse("get-reviews"), "/service/reviews/", "/service/vacancies/",
+                    self.comments_url):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn("no-cache", response["Cache-Control"])
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED, url)
+            self.assertEqual(response.content, b"")
+
+    def test_write_changes_etag(self):
+        """Test that writing a review or comment invalidates the matching ETags."""
+        reviews = self.client.get(reverse("get-reviews"))["ETag"]
+        comments = self.client.get(self.comments_url)["ETag"]
+        self.client.post(self.comments_url, {"text": "Same here"}, format="json")
+        response = self.client.get(self.comments_url, HTTP_IF_NONE_MATCH=comments)
+        self.assertEqual((response.status_code, len(response.data)), (status.HTTP_200_OK, 2))
+        # The listing shows the comment count of each review
+        response = self.client.get(reverse("get-reviews"), HTTP_IF_NONE_MATCH=reviews)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        reviews = response["ETag"]
+        self.assertEqual(self.client.get(reverse("get-reviews"), HTTP_IF_NONE_MATCH=reviews)
+                         .status_code, status.HTTP_304_NOT_MODIFIED)
+        self.review.save()
+        self.assertEqual(self.client.get(reverse("get-reviews"), HTTP_IF_NONE_MATCH=reviews)
+                         .status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_query(self):
+        """Test that another page of the same listing has another ETag."""
+        first = self.client.get(reverse("get-reviews"))["ETag"]
+        response = self.client.get(reverse("get-reviews"), {"page_size": 1},
+                                   HTTP_IF_NONE_MATCH=first)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_if_modified_since(self):
+        """Test that Last-Modified is honoured when no ETag is sent."""
+        modified = self.client.get("/service/vacancies/")["Last-Modified"]
+        response = self.client.get("/service/vacancies/", HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
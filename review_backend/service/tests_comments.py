@@ -0,0 +1,235 @@
+"""
+Module for testing the comments of the 'service' application.
+
+This module contains test cases for the batched comment reads, the comment
+counts and previews stored on the reviews, and the comment digest emails.
+"""
+import io
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+from django.contrib.auth import get_user_model  # pylint: disable=E0401
+from django.core.management import call_command  # pylint: disable=E0401
+from django.urls import reverse  # pylint: disable=E0401
+from pymongo.errors import OperationFailure  # pylint: disable=E0401
+from rest_framework import status  # pylint: disable=E0401
+from rest_framework.test import APITestCase  # pylint: disable=E0401
+from auth_review.models import OutboxEmail
+from .cache import get_cache
+from .comments import comments_for_reviews
+from .digests import DIGEST_COMMENTS_PER_REVIEW, send_comment_digests
+from .models import Comment, Reviews
+
+User = get_user_model()
+
+
+class CommentBatchTests(APITestCase):
+    """Test cases for the batched comment endpoint."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Create two reviews with three and one comments."""
+        self.user = User.objects.create_user("reader", "reader@example.com", "password")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("comments-batch")
+        # pylint: disable=E1101
+        self.first, self.second, self.empty = (
+            Reviews.objects.create(department="IT", job_title=title, hourly_pay="15",
+                                   review="Fine", rating=4)
+            for title in ("Help Desk", "Lab Monitor", "Tutor"))
+        for text in ("One", "Two", "Three"):
+            Comment.objects.create(review=self.first, user=self.user, text=text)
+        Comment.objects.create(review=self.second, user=self.user, text="Only")
+
+    def test_comments_grouped_by_review(self):
+        """Test that every requested review gets its first comments and a more link."""
+        ids = f"{self.first.pk},{self.second.pk},{self.empty.pk}"
+        response = self.client.get(self.url, {"review_ids": ids, "limit": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([c["text"] for c in response.data[str(self.first.pk)]["results"]],
+                         ["One", "Two"])
+        self.assertEqual([c["text"] for c in response.data[str(self.second.pk)]["results"]],
+                         ["Only"])
+        self.assertEqual(response.data[str(self.empty.pk)], {"next": None, "results": []})
+        self.assertIsNone(response.data[str(self.second.pk)]["next"])
+        more = self.client.get(response.data[str(self.first.pk)]["next"])
+        self.assertEqual([c["text"] for c in more.data["results"]], ["Three"])
+
+    def test_newest_first(self):
+        """Test that the comments can be read newest first."""
+        response = self.client.get(self.url, {"review_ids": self.first.pk, "limit": 1,
+                                              "ordering": "-created_at"})
+        self.assertEqual([c["text"] for c in response.data[str(self.first.pk)]["results"]],
+                         ["Three"])
+        more = self.client.get(response.data[str(self.first.pk)]["next"])
+        self.assertEqual([c["text"] for c in more.data["results"]], ["Two"])
+
+    def test_mongo_keeps_limit_plus_one_per_review(self):
+        """Test that MongoDB groups at most limit + 1 comments of each review."""
+        documents = [{"_id": "x", "id": pk, "review_id": self.first.pk, "user_id": self.user.pk,
+                      "text": text} for pk, text in ((9, "Newest"), (8, "Newer"))]
+        aggregate = MagicMock(return_value=[{"_id": self.first.pk, "comments": documents}])
+        with patch("service.comments.is_mongo", return_value=True), \
+                patch.object(Comment.objects, "mongo_aggregate", aggregate, create=True):
+            grouped = comments_for_reviews([self.first.pk, self.empty.pk], 1, "-created_at")
+        self.assertEqual([comment.text for comment in grouped[self.first.pk]],
+                         ["Newest", "Newer"])
+        self.assertEqual(grouped[self.empty.pk], [])
+        group = aggregate.call_args.args[0][-1]["$group"]
+        self.assertEqual(group["comments"]["$topN"]["n"], 2)
+        self.assertEqual(group["comments"]["$topN"]["sortBy"], {"created_at": -1, "id": -1})
+
+    def test_mongo_before_top_n(self):
+        """Test that a server without $topN gets sorted, pushed and sliced groups."""
+        created = datetime(2024, 5, 1, 12, 0)
+        document = {"_id": "x", "id": 9, "review_id": self.first.pk, "user_id": self.user.pk,
+                    "text": "Newest", "created_at": created}
+        refused = OperationFailure("unknown group operator '$topN'", 15952)
+        aggregate = MagicMock(side_effect=[refused, [{"_id": self.first.pk,
+                                                      "comments": [document]}]])
+        with patch("service.comments.is_mongo", return_value=True), \
+                patch.dict("service.comments._server", {"top_n": True}), \
+                patch.object(Comment.objects, "mongo_aggregate", aggregate, create=True):
+            grouped = comments_for_reviews([self.first.pk], 1, "-created_at")
+        self.assertEqual(grouped[self.first.pk][0].created_at,
+                         created.replace(tzinfo=timezone.utc))
+        pipeline = aggregate.call_args.args[0]
+        self.assertEqual(pipeline[1]["$sort"], {"review_id": 1, "created_at": -1, "id": -1})
+        self.assertEqual(pipeline[-1]["$project"]["comments"]["$slice"], ["$comments", 2])
+
+    def test_invalid_parameters(self):
+        """Test that missing or malformed ids and limits are rejected."""
+        for params in ({}, {"review_ids": "1,x"}, {"review_ids": "1", "limit": 0},
+                       {"review_ids": ",".join(map(str, range(1, 102)))},
+                       {"review_ids": "1", "ordering": "text"}):
+            self.assertEqual(self.client.get(self.url, params).status_code,
+                             status.HTTP_400_BAD_REQUEST)
+
+
+class CommentCountTests(APITestCase):
+    """Test cases for the comment count and preview stored on the reviews."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Start from an empty cache and create a review without comments."""
+        get_cache().clear()
+        self.user = User.objects.create_user("commenter", "commenter@example.com", "password")
+        self.client.force_authenticate(user=self.user)
+        # pylint: disable=E1101
+        self.review = Reviews.objects.create(department="IT", job_title="Engineer",
+                                             hourly_pay="30", review="Good", rating=4)
+        self.comments_url = reverse("comments", args=[self.review.pk])
+
+    def listed_review(self):
+        """Return the review as shown by the listing."""
+        return self.client.get(reverse("get-reviews")).data["results"][0]
+
+    def test_comment_views_maintain_count_and_preview(self):
+        """Test that creating and deleting comments updates the listed review."""
+        self.assertEqual((self.listed_review()["comment_count"],
+                          self.listed_review()["latest_comment"]), (0, None))
+        first = self.client.post(self.comments_url, {"text": "First"}, format="json").data
+        second = self.client.post(self.comments_url, {"text": "x" * 300}, format="json").data
+        review = self.listed_review()
+        self.assertEqual(review["comment_count"], 2)
+        self.assertEqual((review["latest_comment"]["id"], review["latest_comment"]["user"],
+                          len(review["latest_comment"]["text"])), (second["id"], "commenter", 120))
+        self.client.delete(reverse("delete-comment", args=[self.review.pk, second["id"]]))
+        review = self.listed_review()
+        self.assertEqual((review["comment_count"], review["latest_comment"]["text"]),
+                         (1, first["text"]))
+        self.client.delete(reverse("delete-comment", args=[self.review.pk, first["id"]]))
+        self.assertEqual((self.listed_review()["comment_count"],
+                          self.listed_review()["latest_comment"]), (0, None))
+
+    def test_comment_keeps_cached_pages(self):
+        """Test that a comment changes the listing's ETag but not its cached page."""
+        first = self.client.get(reverse("get-reviews"))
+        self.client.post(self.comments_url, {"text": "First"}, format="json")
+        second = self.client.get(reverse("get-reviews"))
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        self.assertEqual((second.data["results"][0]["comment_count"],
+                          second.data["results"][0]["latest_comment"]["text"]), (1, "First"))
+
+    def test_reconcile_repairs_drift(self):
+        """Test that the command recounts comments written around the views."""
+        # pylint: disable=E1101
+        Comment.objects.create(review=self.review, user=self.user, text="Old")
+        newest = Comment.objects.create(review=self.review, user=self.user, text="New")
+        out = io.StringIO()
+        call_command("reconcile_comment_counts", dry_run=True, stdout=out)
+        self.assertIn("Found 1 drifted reviews", out.getvalue())
+        call_command("reconcile_comment_counts", stdout=out)
+        self.assertIn("Repaired 1 drifted reviews", out.getvalue())
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.comment_count, self.review.latest_comment_id),
+                         (2, newest.pk))
+        call_command("reconcile_comment_counts", stdout=out)
+        self.assertIn("Repaired 0 drifted reviews", out.getvalue())
+
+
+class CommentDigestTests(APITestCase):
+    """Test cases for the digest emails of the comments on each author's reviews."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Create two review authors and a commenter."""
+        self.author = User.objects.create_user("author", "author@example.com", "password")
+        self.other = User.objects.create_user("other", "other@example.com", "password")
+        self.reader = User.objects.create_user("reader", "reader@example.com", "password")
+        # pylint: disable=E1101
+        self.reviews = [Reviews.objects.create(department="IT", job_title=f"Job {i}",
+                                               hourly_pay="15", rating=4,
+                                               reviewed_by="author")
+                        for i in range(2)]
+        self.other_review = Reviews.objects.create(department="IT", job_title="Cashier",
+                                                   hourly_pay="12", rating=3,
+                                                   reviewed_by="other")
+
+    def comment(self, user, review, text):
+        """Post a comment through the API."""
+        self.client.force_authenticate(user=user)
+        response = self.client.post(reverse("comments", args=[review.pk]), {"text": text},
+                                    format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_comments_are_coalesced_per_author(self):
+        """Test that one run queues one email per author and clears the comments."""
+        for i in range(DIGEST_COMMENTS_PER_REVIEW + 1):
+            self.comment(self.reader, self.reviews[0], f"Comment {i}")
+        self.comment(self.reader, self.reviews[1], "<b>Nice</b>")
+        self.comment(self.reader, self.other_review, "Agreed")
+        self.comment(self.author, self.reviews[1], "Thanks") # Not sent to its own author
+
+        with self.assertNumQueries(4): # Comments, emails, outbox insert, clear
+            result = send_comment_digests()
+        self.assertEqual((result["comments"], result["digests"]), (7, 2))
+        emails = {email.to_email: email for email in OutboxEmail.objects.all()}
+        self.assertEqual(set(emails), {"author@example.com", "other@example.com"})
+        body = emails["author@example.com"].html_content
+        self.assertIn("5 new comments", body)
+        self.assertIn("and 1 more", body)
+        self.assertNotIn("Comment 0", body) # Only the newest are quoted
+        self.assertIn("&lt;b&gt;Nice&lt;/b&gt;", body)
+        self.assertNotIn("Thanks", body)
+
+        # The comments are sent once
+        self.assertEqual(send_comment_digests()["comments"], 0)
+        self.assertEqual(OutboxEmail.objects.count(), 2)
+
+    def test_command_dry_run_and_unknown_authors(self):
+        """Test that a dry run queues nothing and authors without an account are skipped."""
+        self.comment(self.reader, self.reviews[0], "Hello")
+        Reviews.objects.filter(pk=self.other_review.pk).update( # pylint: disable=E1101
+            reviewed_by="gone")
+        self.comment(self.reader, self.other_review, "Hello")
+        Comment.objects.create(review=self.reviews[0], user=self.reader, # pylint: disable=E1101
+                               text="Imported") # Not written through the API
+        out = io.StringIO()
+        call_command("send_comment_digests", "--dry-run", stdout=out)
+        self.assertIn("Would queue 1 digests of 2 comments", out.getvalue())
+        self.assertIn("No email address for: gone", out.getvalue())
+        self.assertFalse(OutboxEmail.objects.exists())
+        call_command("send_comment_digests", stdout=io.StringIO())
+        self.assertEqual(OutboxEmail.objects.get().to_email, "author@example.com")
+        self.assertEqual(send_comment_digests()["comments"], 0)
@@ -0,0 +1,266 @@
+"""
+Module for testing the batched writes of the 'service' application.
+
+This module contains test cases for the bulk review endpoint and import
+command, and for the vacancy feed endpoint and ingestion command.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from django.contrib.auth import get_user_model  # pylint: disable=E0401
+from django.core.management import CommandError, call_command  # pylint: disable=E0401
+from django.db import IntegrityError  # pylint: disable=E0401
+from django.test import override_settings  # pylint: disable=E0401
+from django.urls import reverse  # pylint: disable=E0401
+from pymongo.errors import BulkWriteError  # pylint: disable=E0401
+from rest_framework import status  # pylint: disable=E0401
+from rest_framework.test import APITestCase  # pylint: disable=E0401
+from .ingest import backfill_vacancy_keys, update_or_create, upsert_vacancies, validate_rows
+from .models import Reviews, Vacancies
+from .search import reset_search_index
+from .titles import reset_title_matcher
+
+User = get_user_model()
+
+
+@override_settings(SEARCH_INDEX_PATH=os.path.join(tempfile.gettempdir(), "missing-index.bin"))
+class BulkImportTests(APITestCase):
+    """Test cases for the bulk review endpoint and import command."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Authenticate and start from empty in-process indexes."""
+        reset_search_index()
+        reset_title_matcher()
+        self.user = User.objects.create_user("importer", "importer@example.com", "password")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("reviews-bulk")
+        self.valid_data = {
+            "department": "Libraries",
+            "job_title": "Library Assistant",
+            "hourly_pay": "$12.50",
+            "review": "Quiet evening shifts",
+            "rating": 4,
+        }
+
+    def tearDown(self):
+        """Drop the indexes built for the test database."""
+        reset_search_index()
+        reset_title_matcher()
+
+    def test_bulk_create_reports_invalid_rows(self):
+        """Test that valid rows are inserted and invalid ones reported by position."""
+        rows = [self.valid_data, {**self.valid_data, "rating": 9},
+                {**self.valid_data, "job_title": "Shelver"}, {"department": "IT"}]
+        response = self.client.post(self.url, rows, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [1, 3])
+        self.assertIn("job_title", response.data["errors"][1]["errors"])
+        # pylint: disable=E1101
+        imported = Reviews.objects.order_by("id")
+        self.assertEqual([review.reviewed_by for review in imported], ["importer"] * 2)
+        self.assertEqual(imported[0].hourly_pay_cents, 1250)
+
+    def test_bulk_create_updates_derived_data(self):
+        """Test that imported reviews are counted, searchable and listed."""
+        listing = self.client.get(reverse("get-reviews"))["ETag"]
+        self.client.post(self.url, [self.valid_data] * 3, format="json")
+        stats = self.client.get(reverse("rating-stats"), {"department": "Libraries"})
+        self.assertEqual(stats.data["count"], 3)
+        search = self.client.get(reverse("search-reviews"), {"q": "evening"})
+        self.assertEqual(len(search.data["results"]), 3)
+        response = self.client.get(reverse("get-reviews"), HTTP_IF_NONE_MATCH=listing)
+        self.assertEqual(response.data["count"], 3)
+
+    def test_bulk_create_rejects_bad_bodies(self):
+        """Test that a body that is not a non-empty array, or all-invalid rows, are rejected."""
+        self.assertEqual(self.client.post(self.url, self.valid_data, format="json").status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, [{"rating": 3}], format="json")
+        self.assertEqual((response.status_code, response.data["created"]),
+                         (status.HTTP_400_BAD_REQUEST, 0))
+
+    def test_import_command_reads_csv(self):
+        """Test that the command imports a CSV file in batches and reports bad rows."""
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False,
+                                         encoding="utf-8") as handle:
+            handle.write("department,job_title,hourly_pay,review,rating,recommendation\n")
+            handle.write("IT,Help Desk,15,Busy mornings,5,\n")
+            handle.write("IT,Help Desk,15,,3,7\n")
+            handle.write("IT,Lab Monitor,14,Quiet,2,4\n")
+        self.addCleanup(os.remove, handle.name)
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_reviews", handle.name, batch_size=2, reviewed_by="archive",
+                     stdout=out, stderr=err)
+        self.assertIn("Imported 2 reviews, skipped 1 invalid rows", out.getvalue())
+        self.assertIn("Row 2:", err.getvalue())
+        # pylint: disable=E1101
+        self.assertEqual(sorted(Reviews.objects.values_list("job_title", "recommendation")),
+                         [("Help Desk", None), ("Lab Monitor", 4)])
+
+    def test_import_command_reports_rows_before_a_broken_line(self):
+        """Test that the command prints what it imported before an unreadable line."""
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False,
+                                         encoding="utf-8") as handle:
+            handle.write("department,job_title,hourly_pay,review,rating\n")
+            handle.write("IT,Help Desk,15,Busy mornings,5\n")
+            handle.write("IT,Help Desk,15,,3\n")
+            handle.write(f"IT,Tutor,14,{'x' * (csv.field_size_limit() + 1)},2\n")
+        self.addCleanup(os.remove, handle.name)
+        out, err = io.StringIO(), io.StringIO()
+        with self.assertRaisesMessage(CommandError, "Invalid CSV after line 3"):
+            call_command("import_reviews", handle.name, batch_size=10, stdout=out, stderr=err)
+        self.assertIn("Imported 1 reviews, skipped 1 invalid rows", out.getvalue())
+        self.assertIn("Row 2:", err.getvalue())
+        self.assertEqual(Reviews.objects.count(), 1) # pylint: disable=E1101
+
+
+class VacancyIngestTests(APITestCase):
+    """Test cases for the vacancy feed endpoint and ingestion command."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Authenticate as staff and start from an empty title matcher."""
+        reset_title_matcher()
+        self.user = User.objects.create_superuser("feeds", "feeds@example.com", "password")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("vacancies-ingest")
+        self.valid_data = {
+            "jobTitle": "Library Assistant",
+            "jobDescription": "Shelve books",
+            "jobLocation": "Hill Library",
+            "jobPayRate": "$12.50",
+            "maxHoursAllowed": 20,
+        }
+
+    def tearDown(self):
+        """Drop the title matcher built for the test database."""
+        reset_title_matcher()
+
+    def test_ingest_upserts_on_title_and_location(self):
+        """Test that repeated postings are folded and stored ones updated."""
+        Vacancies.objects.create(**self.valid_data) # pylint: disable=E1101
+        rows = [{**self.valid_data, "jobTitle": "library  assistant", "jobPayRate": "$14"},
+                {**self.valid_data, "jobLocation": "Hunt Library"},
+                {**self.valid_data, "jobLocation": "Hunt Library", "jobPayRate": "$13"},
+                {**self.valid_data, "maxHoursAllowed": 0}]
+        response = self.client.post(self.url, rows, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data["created"], response.data["updated"],
+                          response.data["repeated"]), (1, 1, 1))
+        self.assertEqual([error["row"] for error in response.data["errors"]], [3])
+        # pylint: disable=E1101
+        self.assertEqual(sorted(Vacancies.objects.values_list("jobLocation", "payRateCents")),
+                         [("Hill Library", 1400), ("Hunt Library", 1300)])
+
+    def test_ingest_reads_csv_body(self):
+        """Test that a CSV feed is read from the request body."""
+        body = ("jobTitle,jobDescription,jobLocation,jobPayRate,maxHoursAllowed\n"
+                "Lab Monitor,Watch the lab,Engineering,15,10\n"
+                "Help Desk,Answer calls,Library,14,\n")
+        response = self.client.generic("POST", self.url, body, content_type="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 1)
+        self.assertIn("maxHoursAllowed", response.data["errors"][0]["errors"])
+
+    def test_ingest_reports_rows_written_before_a_broken_line(self):
+        """Test that an unreadable CSV line stops the feed with a 400 and a report."""
+        body = ("jobTitle,jobDescription,jobLocation,jobPayRate,maxHoursAllowed\n"
+                "Lab Monitor,Watch the lab,Engineering,15,10\n"
+                f"Help Desk,{'x' * (csv.field_size_limit() + 1)},Library,14,10\n"
+                "Tutor,Teach,Library,16,10\n")
+        response = self.client.generic("POST", self.url, body, content_type="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["created"], 1)
+        self.assertIn("Invalid CSV after line 2", response.data["detail"])
+        # pylint: disable=E1101
+        self.assertEqual(list(Vacancies.objects.values_list("jobTitle", flat=True)),
+                         ["Lab Monitor"])
+
+    def test_ingest_requires_staff(self):
+        """Test that only staff users can ingest feeds."""
+        self.client.force_authenticate(
+            user=User.objects.create_user("student", "student@example.com", "password"))
+        response = self.client.post(self.url, [self.valid_data], format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_create_rejects_duplicate_posting(self):
+        """Test that a vacancy with the title and location of another is rejected."""
+        url = reverse("vacancies-list")
+        self.assertEqual(self.client.post(url, self.valid_data, format="json").status_code,
+                         status.HTTP_201_CREATED)
+        duplicate = {**self.valid_data, "jobTitle": "LIBRARY ASSISTANT"}
+        self.assertEqual(self.client.post(url, duplicate, format="json").status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_create_refused_by_the_unique_key(self):
+        """Test that a posting created concurrently is rejected by its unique key."""
+        url = reverse("vacancies-list")
+        self.client.post(url, self.valid_data, format="json")
+        with patch("django.db.models.query.QuerySet.exists", return_value=False):
+            response = self.client.post(url, self.valid_data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Vacancies.objects.count(), 1) # pylint: disable=E1101
+
+    def test_upsert_retries_refused_batch(self):
+        """Test that a batch refused by the unique key is written again as updates."""
+        calls = []
+
+        def race(batch):
+            calls.append(batch)
+            if len(calls) == 1: # Inserted by another ingestion after the first read
+                raise IntegrityError("UNIQUE constraint failed: dedupKey")
+            return update_or_create(batch)
+
+        Vacancies.objects.create(**self.valid_data) # pylint: disable=E1101
+        vacancies, _, _ = validate_rows([{**self.valid_data, "jobPayRate": "$14"}])
+        with patch("service.ingest.update_or_create", side_effect=race):
+            self.assertEqual(upsert_vacancies(vacancies), [])
+        self.assertEqual(len(calls), 2)
+        # pylint: disable=E1101
+        self.assertEqual(list(Vacancies.objects.values_list("payRateCents", flat=True)), [1400])
+
+    def test_mongo_upsert_retries_refused_operations(self):
+        """Test that the upserts refused by the unique key are retried alone."""
+        vacancies, _, _ = validate_rows([self.valid_data,
+                                         {**self.valid_data, "jobLocation": "Hunt Library"}])
+        refused = BulkWriteError({"writeErrors": [{"index": 1, "code": 11000}],
+                                  "upserted": [{"index": 0, "_id": "a"}]})
+        write = MagicMock(side_effect=[refused, SimpleNamespace(upserted_ids={})])
+        with patch("service.ingest.is_mongo", return_value=True), \
+                patch("service.ingest.reserve_ids", return_value=range(7, 9)), \
+                patch.object(Vacancies.objects, "mongo_bulk_write", write, create=True):
+            created = upsert_vacancies(vacancies)
+        self.assertEqual([vacancy.pk for vacancy in created], [7])
+        retried = write.call_args_list[1].args[0]
+        self.assertEqual([op._filter for op in retried], # pylint: disable=W0212
+                         [{"dedupKey": list(vacancies)[1]}])
+
+    def test_backfill_skips_repeated_postings(self):
+        """Test that a legacy posting repeating another keeps no key."""
+        # pylint: disable=E1101
+        Vacancies.objects.create(**self.valid_data)
+        Vacancies.objects.update(dedupKey=None)
+        Vacancies.objects.create(**{**self.valid_data, "jobDescription": "Other"})
+        Vacancies.objects.update(dedupKey=None)
+        self.assertEqual(backfill_vacancy_keys(), 1)
+        self.assertEqual(Vacancies.objects.filter(dedupKey__isnull=True).count(), 1)
+
+    def test_ingest_command_reads_jsonl(self):
+        """Test that the command upserts a JSONL feed in batches."""
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False,
+                                         encoding="utf-8") as handle:
+            for location in ("Hill Library", "Hunt Library", "Hill Library"):
+                handle.write(json.dumps({**self.valid_data, "jobLocation": location}) + "\n")
+            handle.write("\n")
+        self.addCleanup(os.remove, handle.name)
+        out = io.StringIO()
+        call_command("ingest_vacancies", handle.name, batch_size=2, stdout=out)
+        self.assertIn("Created 2 and updated 1 vacancies, folded 0 repeated rows",
+                      out.getvalue())
+        self.assertEqual(Vacancies.objects.count(), 2) # pylint: disable=E1101
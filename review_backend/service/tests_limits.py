@@ -0,0 +1,99 @@
+"""
+Module for testing the request limits of the 'service' application.
+
+This module contains test cases for the rate limits and the load shedding.
+"""
+import threading
+import time
+from django.contrib.auth import get_user_model  # pylint: disable=E0401
+from django.core.cache import caches  # pylint: disable=E0401
+from django.test import override_settings  # pylint: disable=E0401
+from django.urls import reverse  # pylint: disable=E0401
+from rest_framework import status  # pylint: disable=E0401
+from rest_framework.test import APITestCase  # pylint: disable=E0401
+from .cache import get_cache
+from .loadshedding import ConcurrencyLimiter, get_limiter
+
+User = get_user_model()
+
+
+class ThrottleTests(APITestCase):
+    """Test cases for the per-endpoint rate limits."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Forget the requests counted by the other tests."""
+        caches["default"].clear()
+        get_cache().clear()
+
+    @override_settings(THROTTLE_RATES={"reviews": "2/min", "search": ""})
+    def test_rate_per_scope(self):
+        """Test that a scope is refused past its rate and other scopes are not."""
+        url = reverse("get-reviews")
+        for _ in range(2):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+        # An empty rate, or a scope without one, is not limited
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse("search-reviews"), {"q": "x"}).status_code,
+                             status.HTTP_200_OK)
+            self.assertEqual(self.client.get(reverse("rating-stats"),
+                                             {"department": "IT"}).status_code,
+                             status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(LOAD_SHEDDING_MAX_ACTIVE=1, LOAD_SHEDDING_MAX_WAITING=0)
+class LoadSheddingTests(APITestCase):
+    """Test cases for the concurrency limit and its wait queue."""
+
+    def test_limiter_queues_then_sheds(self):
+        """Test that a request waits for a slot until the deadline, then is shed."""
+        limiter = ConcurrencyLimiter(1, 1, 0.05)
+        self.assertIsNone(limiter.acquire())
+        self.assertEqual(limiter.acquire(), "timeout")
+
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(limiter.acquire()))
+        limiter.timeout = 5
+        waiter.start()
+        while not limiter.snapshot()["waiting"]:
+            time.sleep(0.001)
+        self.assertEqual(limiter.acquire(), "queue_full") # The only queue place is taken
+        limiter.release()
+        waiter.join()
+        self.assertEqual(results, [None])
+        self.assertEqual(limiter.snapshot(), {
+            "max_active": 1, "max_waiting": 1, "queue_timeout": 5, "active": 1, "waiting": 0,
+            "admitted": 2, "queued": 1, "shed_queue_full": 1, "shed_timeout": 1, "shed": 2})
+
+    def test_busy_worker_answers_503(self):
+        """Test that a request finding every slot taken gets a 503 with Retry-After."""
+        self.client.get(reverse("load-stats")) # Exempt; loads the middleware
+        limiter = get_limiter()
+        limiter.acquire() # Another request holds the only slot
+        response = self.client.get(reverse("get-reviews"))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+        limiter.release()
+        self.assertEqual(self.client.get(reverse("get-reviews")).status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(
+            user=User.objects.create_superuser("admin", "admin@example.com", "password"))
+        stats = self.client.get(reverse("load-stats")).data
+        self.assertEqual((stats["enabled"], stats["active"], stats["admitted"], stats["shed"]),
+                         (True, 0, 2, 1))
+
+    def test_stream_holds_slot_until_sent(self):
+        """Test that a streamed listing releases its slot once its body is sent."""
+        response = self.client.get(reverse("get-reviews"), {"stream": "1"})
+        self.assertEqual(get_limiter().snapshot()["active"], 1)
+        self.assertEqual(b"".join(response.streaming_content), b"[]")
+        self.assertEqual(get_limiter().snapshot()["active"], 0)
+
+    @override_settings(LOAD_SHEDDING_MAX_ACTIVE=0)
+    def test_disabled(self):
+        """Test that a limit of 0 turns the middleware off."""
+        self.client.get(reverse("get-reviews"))
+        self.assertIsNone(get_limiter())
@@ -0,0 +1,156 @@
+"""
+Module for testing the request metrics of the 'service' application.
+
+This module contains test cases for the Prometheus request metrics and the
+per-request query timing.
+"""
+import threading
+from types import SimpleNamespace
+from django.contrib.auth import get_user_model  # pylint: disable=E0401
+from django.core.cache import caches  # pylint: disable=E0401
+from django.db import connection  # pylint: disable=E0401
+from django.test import override_settings  # pylint: disable=E0401
+from django.urls import reverse  # pylint: disable=E0401
+from rest_framework import status  # pylint: disable=E0401
+from rest_framework.test import APITestCase  # pylint: disable=E0401
+from .cache import get_cache
+from .metrics import BUCKETS, collect, observe, reset_metrics
+from .metrics import _shards as metrics_shards
+from .models import Comment, Reviews
+from .serializers import ReviewsSerializer
+from .timing import MONGO_COMMANDS, current_timing, track_request
+
+User = get_user_model()
+
+
+class MetricsTests(APITestCase):
+    """Test cases for the request metrics and their Prometheus exposition."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Zero the metrics and the rate counts."""
+        reset_metrics()
+        caches["default"].clear()
+        get_cache().clear()
+
+    def scrape(self, **headers):
+        """Return the lines of /metrics."""
+        response = self.client.get(reverse("metrics"), **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return response.content.decode().splitlines()
+
+    def test_requests_counted_per_view(self):
+        """Test that requests are counted and timed per URL name and status."""
+        self.client.get(reverse("get-reviews"))
+        self.client.get(reverse("get-reviews"))
+        self.client.post(reverse("get-reviews"), {}, format="json")
+        self.client.get("/no/such/page/")
+        lines = self.scrape()
+        self.assertIn('http_requests_total{view="get-reviews",method="GET",status="200"} 2', lines)
+        self.assertIn('http_requests_total{view="get-reviews",method="POST",status="405"} 1',
+                      lines)
+        self.assertIn('http_requests_total{view="<unresolved>",method="GET",status="404"} 1',
+                      lines)
+        self.assertIn('http_request_duration_seconds_bucket'
+                      '{view="get-reviews",method="GET",le="+Inf"} 2', lines)
+        self.assertIn('http_request_duration_seconds_count{view="get-reviews",method="GET"} 2',
+                      lines)
+        # The scrape itself is exempt from the concurrency limit
+        self.assertIn('load_shedding_requests_total{outcome="admitted"} 4', lines)
+        self.assertIn('load_shedding_requests{state="active"} 0', lines)
+
+    def test_histogram_buckets(self):
+        """Test that a latency is counted in the first bucket at least as large."""
+        observe("view", "GET", 200, BUCKETS[0])
+        observe("view", "GET", 200, BUCKETS[1] + 0.001)
+        observe("view", "GET", 200, BUCKETS[-1] * 2)
+        series = collect()[("view", "GET", 200)]
+        self.assertEqual(series[:3], [1, 0, 1])
+        self.assertEqual(series[len(BUCKETS)], 1) # Above every bucket
+        self.assertAlmostEqual(series[-1], BUCKETS[0] + BUCKETS[1] + 0.001 + BUCKETS[-1] * 2)
+
+    def test_shards_of_threads_are_summed(self):
+        """Test that each thread records in its own shard and the scrape sums them."""
+        def record():
+            for _ in range(100):
+                observe("view", "GET", 200, 0.001)
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        live = len(metrics_shards)
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(collect()[("view", "GET", 200)][:-1]), 400)
+        # The shards of the ended threads were folded into the retired series
+        self.assertEqual(len(metrics_shards), live)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token(self):
+        """Test that a configured token is required to scrape."""
+        self.assertEqual(self.client.get(reverse("metrics")).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get(reverse("metrics"),
+                                         HTTP_AUTHORIZATION="Bearer wrong").status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.scrape(HTTP_AUTHORIZATION="Bearer secret")
+
+
+@override_settings(REQUEST_TIMING=True)
+class RequestTimingTests(APITestCase):
+    """Test cases for the query accounting and the Server-Timing header."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Create reviews with comments."""
+        get_cache().clear()
+        caches["default"].clear()
+        self.user = User.objects.create_user("student", "student@example.com", "password")
+        # pylint: disable=E1101
+        self.review = Reviews.objects.create(department="IT", job_title="Engineer",
+                                             hourly_pay="15", review="Fine", rating=4)
+        for i in range(3):
+            Comment.objects.create(review=self.review, user=self.user, text=f"Comment {i}")
+
+    def test_server_timing_and_log(self):
+        """Test that the queries are counted in the header and the log record."""
+        self.client.force_authenticate(user=self.user)
+        url = reverse("comments", kwargs={"id": self.review.id})
+        with self.assertLogs("service.timing", "INFO") as logs:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        record = logs.records[0]
+        self.assertEqual((record.view, record.method, record.status),
+                         ("comments", "GET", 200))
+        self.assertGreater(record.db_queries, 0)
+        self.assertIn(f'db;dur={record.db_ms:.2f};desc="{record.db_queries} queries"',
+                      response["Server-Timing"])
+        self.assertIn("serializer;dur=", response["Server-Timing"])
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+    @override_settings(REQUEST_TIMING_MAX_QUERIES=0)
+    def test_many_queries_logged_as_warning(self):
+        """Test that a request over the query budget is logged as a warning."""
+        with self.assertLogs("service.timing", "WARNING"):
+            self.client.get(reverse("get-reviews"))
+
+    @override_settings(REQUEST_TIMING=False)
+    def test_disabled(self):
+        """Test that nothing is recorded or added when the flag is off."""
+        response = self.client.get(reverse("get-reviews"))
+        self.assertNotIn("Server-Timing", response)
+        self.assertIsNone(current_timing())
+
+    def test_counters(self):
+        """Test the queries, commands and nested serializers of a tracked block."""
+        with track_request() as timing:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            MONGO_COMMANDS.succeeded(SimpleNamespace(duration_micros=1500))
+            data = ReviewsSerializer(Reviews.objects.all(), many=True).data # pylint: disable=E1101
+        self.assertEqual(len(data), 1)
+        self.assertEqual((timing.queries, timing.mongo_commands, timing.mongo_seconds),
+                         (2, 1, 0.0015))
+        self.assertGreater(timing.serializer_seconds, 0)
+        self.assertEqual(timing.serializer_depth, 0)
+        self.assertIsNone(current_timing())
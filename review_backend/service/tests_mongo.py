@@ -0,0 +1,273 @@
+"""
+Module for testing the MongoDB helpers of the 'service' application.
+
+This module contains test cases for the pymongo read repository, on the
+test database and on a mocked collection, for the connection pool
+statistics and for the index declarations.
+"""
+import os
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from django.contrib.auth import get_user_model  # pylint: disable=E0401
+from django.core.exceptions import ImproperlyConfigured  # pylint: disable=E0401
+from django.core.paginator import Paginator  # pylint: disable=E0401
+from django.http import QueryDict  # pylint: disable=E0401
+from django.test import override_settings  # pylint: disable=E0401
+from django.urls import reverse  # pylint: disable=E0401
+from djongo import database as djongo_database  # pylint: disable=E0401
+from rest_framework import status  # pylint: disable=E0401
+from rest_framework.exceptions import ValidationError  # pylint: disable=E0401
+from rest_framework.test import APITestCase  # pylint: disable=E0401
+from .indexes import declared_indexes, existing_indexes, plan_changes, plan_stages
+from .models import Comment, Reviews, Vacancies
+from .mongo import POOL_STATS, atomic_unless_mongo, check_mongo_transactions, forget_clients
+from .mongo import to_document
+from .repository import review_filter, to_instance, vacancy_filter, vacancy_query
+from .serializers import CommentSerializer
+
+User = get_user_model()
+
+
+class RepositoryTests(APITestCase):
+    """Test cases for the filters and documents of the pymongo read repository."""
+
+    def test_review_filter_matches_orm_filters(self):
+        """Test that the list parameters become an equivalent MongoDB filter."""
+        params = QueryDict("department=IT (Help)&min_rating=2&max_rating=4&min_pay=12.5")
+        self.assertEqual(review_filter(params), {
+            "department": {"$regex": r"IT\ \(Help\)", "$options": "i"},
+            "rating": {"$gte": 2, "$lte": 4},
+            "hourly_pay_cents": {"$gte": 1250},
+        })
+        self.assertEqual(vacancy_filter(QueryDict("max_pay=20")),
+                         {"payRateCents": {"$lte": 2000}})
+        self.assertEqual(review_filter(QueryDict()), {})
+
+    def test_review_filter_rejects_invalid_bounds(self):
+        """Test that the repository rejects the bounds the ORM filters reject."""
+        for params in ("min_rating=9", "max_pay=abc"):
+            with self.assertRaises(ValidationError):
+                review_filter(QueryDict(params))
+
+    def test_documents_become_loaded_instances(self):
+        """Test that projected documents serialize like ORM instances."""
+        document = {"id": 3, "review_id": 7, "user_id": "reader", "text": "Agreed",
+                    "created_at": datetime(2024, 11, 25, 6, 36, 59)}
+        comment = to_instance(Comment, document)
+        self.assertFalse(comment._state.adding) # pylint: disable=W0212
+        self.assertEqual(CommentSerializer(comment).data,
+                         {"id": 3, "review": 7, "user": "reader", "text": "Agreed",
+                          "created_at": "2024-11-25T06:36:59Z"})
+
+
+class FakeCursor:
+    """A pymongo cursor over a list of documents, recording how it was read."""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.calls = {}
+
+    def sort(self, keys):
+        """Record the sort keys."""
+        self.calls["sort"] = keys
+        return self
+
+    def skip(self, count):
+        """Record and apply the skip."""
+        self.calls["skip"] = count
+        return self
+
+    def limit(self, count):
+        """Record and apply the limit, 0 for none."""
+        self.calls["limit"] = count
+        return self
+
+    def batch_size(self, count):
+        """Record the batch size."""
+        self.calls["batch_size"] = count
+        return self
+
+    def __iter__(self):
+        start = self.calls.get("skip", 0)
+        stop = start + self.calls["limit"] if self.calls.get("limit") else None
+        return iter(self.documents[start:stop])
+
+
+class MongoQueryTests(APITestCase):
+    """Test cases for the lazy pymongo reads of the repository, on a mocked collection."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Serve five vacancies from a mocked collection."""
+        self.documents = [{"id": pk, "jobTitle": f"Job {pk}", "jobDescription": "Work",
+                           "jobLocation": "Library", "jobPayRate": "15", "payRateCents": 1500,
+                           "dedupKey": None, "maxHoursAllowed": 10} for pk in range(1, 6)]
+        self.cursors = []
+
+        def find(query, projection):
+            self.assertEqual(query, {"payRateCents": {"$gte": 1000}})
+            self.assertEqual(projection["_id"], 0)
+            self.cursors.append(FakeCursor(self.documents))
+            return self.cursors[-1]
+
+        self.find = MagicMock(side_effect=find)
+        self.count = MagicMock(return_value=len(self.documents))
+        for name, mock in (("mongo_find", self.find), ("mongo_count_documents", self.count)):
+            patcher = patch.object(Vacancies.objects, name, mock, create=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.query = vacancy_query(QueryDict("min_pay=10"))
+
+    def test_count_is_read_once(self):
+        """Test that the count is asked of the collection once per query."""
+        self.assertEqual(self.query.count(), 5)
+        self.assertEqual(len(self.query), 5)
+        self.count.assert_called_once_with({"payRateCents": {"$gte": 1000}})
+
+    def test_slices_become_skip_and_limit(self):
+        """Test that slices and positions read a window of the sorted documents."""
+        self.assertEqual([vacancy.pk for vacancy in self.query[1:3]], [2, 3])
+        self.assertEqual(self.cursors[-1].calls, {"sort": [("id", 1)], "skip": 1, "limit": 2})
+        self.assertEqual([vacancy.pk for vacancy in self.query[3:]], [4, 5])
+        self.assertEqual(self.cursors[-1].calls["limit"], 0)
+        self.assertEqual(to_document(self.query[4])["jobTitle"], "Job 5")
+        self.assertEqual(self.cursors[-1].calls, {"sort": [("id", 1)], "skip": 4, "limit": 1})
+        self.assertEqual(self.query[2:2], [])
+        self.assertEqual(len(self.cursors), 3) # An empty slice reads nothing
+        with self.assertRaises(IndexError):
+            self.query[7] # pylint: disable=W0104
+        with self.assertRaises(ValueError):
+            self.query[::2] # pylint: disable=W0104
+
+    def test_iteration_reads_in_batches(self):
+        """Test that iterating reads every document in order, in cursor batches."""
+        vacancies = list(self.query)
+        self.assertEqual([vacancy.pk for vacancy in vacancies], [1, 2, 3, 4, 5])
+        self.assertFalse(vacancies[0]._state.adding) # pylint: disable=W0212
+        self.assertEqual(self.cursors[-1].calls, {"sort": [("id", 1)], "batch_size": 2000})
+
+    def test_paginator_reads_one_page(self):
+        """Test that Django's Paginator counts once and reads only its page."""
+        page = Paginator(self.query, 2).page(2)
+        self.assertEqual([vacancy.pk for vacancy in page.object_list], [3, 4])
+        self.assertTrue(page.has_next())
+        self.assertEqual(self.cursors[-1].calls, {"sort": [("id", 1)], "skip": 2, "limit": 2})
+        self.assertEqual((self.find.call_count, self.count.call_count), (1, 1))
+
+
+class MongoPoolStatsTests(APITestCase):
+    """Test cases for the connection pool statistics of the worker."""
+
+    def tearDown(self):
+        """Zero the counters changed by the test."""
+        POOL_STATS.reset()
+
+    def test_pool_counters(self):
+        """Test that the pool events add up to open, in-use and waiting connections."""
+        for event in ("connection_created", "connection_created", "connection_check_out_started",
+                      "connection_checked_out", "connection_check_out_started"):
+            getattr(POOL_STATS, event)(None)
+        self.assertEqual(POOL_STATS.snapshot(), {"open": 2, "in_use": 1, "waiting": 1,
+                                                 "checkouts": 1, "checkout_failures": 0,
+                                                 "pools_cleared": 0, "pools_closed": 0})
+
+    def test_forked_child_forgets_clients(self):
+        """Test that a forked process drops the inherited clients and counters."""
+        djongo_database.clients["inherited"] = object()
+        POOL_STATS.connection_created(None)
+        forget_clients()
+        self.assertEqual((djongo_database.clients, POOL_STATS.snapshot()["open"]), ({}, 0))
+
+    def test_request_transactions_refused_on_djongo(self):
+        """Test that ATOMIC_REQUESTS is refused on a database Djongo cannot roll back."""
+        databases = {"default": {"ENGINE": "djongo", "ATOMIC_REQUESTS": True}}
+        with override_settings(DATABASES=databases):
+            with self.assertRaises(ImproperlyConfigured):
+                check_mongo_transactions()
+        check_mongo_transactions()
+
+    def test_no_transaction_on_mongo(self):
+        """Test that writes to MongoDB skip atomic(), whose rollback closes the client."""
+        with patch("service.mongo.transaction.atomic") as atomic:
+            with patch("service.mongo.is_mongo", return_value=True):
+                with atomic_unless_mongo(Reviews):
+                    pass
+            atomic.assert_not_called()
+            with atomic_unless_mongo(Reviews):
+                pass
+            atomic.assert_called_once_with(using="default")
+
+    def test_stats_for_staff(self):
+        """Test that only staff users can read the pool statistics."""
+        url = reverse("mongo-pool-stats")
+        self.client.force_authenticate(
+            user=User.objects.create_user("student", "student@example.com", "password"))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(
+            user=User.objects.create_superuser("admin", "admin@example.com", "password"))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["pid"], os.getpid())
+        self.assertIn("max_pool_size", response.data)
+
+
+class IndexTests(APITestCase):
+    """Test cases for the declared indexes and their sync plan."""
+
+    def test_declared_indexes_follow_query_shapes(self):
+        """Test that the compound indexes are declared and free text is not indexed."""
+        keys = {spec.keys: spec.unique for spec in declared_indexes(Reviews)}
+        self.assertEqual(keys[(("id", 1),)], True)
+        self.assertIn((("department", 1), ("rating", 1)), keys)
+        self.assertIn((("job_title", 1), ("rating", 1)), keys)
+        self.assertIn((("reviewed_by", 1),), keys)
+        self.assertNotIn((("benefits", 1),), keys)
+        comment_keys = [spec.keys for spec in declared_indexes(Comment)]
+        self.assertIn((("review_id", 1), ("created_at", 1), ("id", 1)), comment_keys)
+        self.assertNotIn((("review_id", 1),), comment_keys)
+
+    def test_plan_changes_matches_on_keys(self):
+        """Test that indexes are kept by keys, whatever their name, and others dropped."""
+        existing = existing_indexes({
+            "_id_": {"key": [("_id", 1)]},
+            "__primary_key__": {"key": [("id", 1)], "unique": True},
+            "service_rev_benefit_idx": {"key": [("benefits", 1)]},
+        })
+        changes = plan_changes(declared_indexes(Reviews), existing)
+        self.assertEqual([spec.name for spec in changes.keep], ["__primary_key__"])
+        self.assertEqual([spec.name for spec in changes.drop], ["service_rev_benefit_idx"])
+        self.assertIn((("department", 1), ("rating", 1)),
+                      [spec.keys for spec in changes.create])
+
+    def test_special_index_directions_are_kept(self):
+        """Test that text, geospatial and hashed indexes are read without failing."""
+        existing = existing_indexes({
+            "text_idx": {"key": [("review", "text"), ("_fts", "text")]},
+            "hashed_idx": {"key": [("department", "hashed")]},
+            "rating_1": {"key": [("rating", 1.0)]},
+        })
+        self.assertEqual([spec.keys for spec in existing],
+                         [(("review", "text"), ("_fts", "text")), (("department", "hashed"),),
+                          (("rating", 1),)])
+
+    def test_nullable_unique_key_is_partial(self):
+        """Test that the vacancy key is unique among the documents that have one."""
+        spec = next(spec for spec in declared_indexes(Vacancies)
+                    if spec.keys == (("dedupKey", 1),))
+        self.assertEqual((spec.unique, spec.partial), (True, "string"))
+        existing = existing_indexes({
+            "dedupKey_1": {"key": [("dedupKey", 1)]},
+            "dedupKey_partial": {"key": [("dedupKey", 1)], "unique": True,
+                                 "partialFilterExpression": {"dedupKey": {"$type": "string"}}},
+        })
+        changes = plan_changes([spec], existing)
+        self.assertEqual([index.name for index in changes.keep], ["dedupKey_partial"])
+        self.assertEqual([index.name for index in changes.drop], ["dedupKey_1"])
+        self.assertEqual(changes.create, [])
+
+    def test_plan_stages(self):
+        """Test that an explained plan is summarized from the root stage down."""
+        plan = {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {
+            "stage": "IXSCAN", "indexName": "department_1_rating_1"}}}
+        self.assertEqual(plan_stages({"queryPlan": plan}),
+                         "LIMIT > FETCH > IXSCAN department_1_rating_1")
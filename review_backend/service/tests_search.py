@@ -0,0 +1,150 @@
+"""
+Module for testing the in-process indexes of the 'service' application.
+
+This module contains test cases for the full-text review search and the
+fuzzy job title lookup used by the browser extension.
+"""
+import os
+import tempfile
+from unittest.mock import patch
+from django.test import override_settings  # pylint: disable=E0401
+from django.urls import reverse  # pylint: disable=E0401
+from rest_framework import status  # pylint: disable=E0401
+from rest_framework.test import APITestCase  # pylint: disable=E0401
+from .models import Reviews, Vacancies
+from .search import SearchIndex, reset_search_index
+from .testing import REVIEW_DATA
+from .titles import reset_title_matcher
+
+
+@override_settings(SEARCH_INDEX_PATH=os.path.join(tempfile.gettempdir(), "missing-index.bin"))
+class ReviewSearchTests(APITestCase):
+    """Test cases for the full-text review search."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Start from an empty index and create reviews with different texts."""
+        reset_search_index()
+        self.url = reverse("search-reviews")
+        self.valid_data = dict(REVIEW_DATA)
+        # pylint: disable=E1101
+        self.library = Reviews.objects.create(**{
+            **self.valid_data, "job_title": "Library Assistant",
+            "review": "Quiet library shifts, shelving books between classes",
+        })
+        self.dining = Reviews.objects.create(**{
+            **self.valid_data, "job_title": "Dining Hall Cashier",
+            "benefits": "Free meals", "review": "Busy lunch rush",
+        })
+
+    def tearDown(self):
+        """Drop the index built for the test database."""
+        reset_search_index()
+
+    def test_search_ranks_matching_reviews(self):
+        """Test that only matching reviews are returned, best first."""
+        response = self.client.get(self.url, {"q": "library books"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual([review["id"] for review in results], [self.library.id])
+        self.assertGreater(results[0]["score"], 0)
+
+    def test_search_requires_query(self):
+        """Test that a missing query is rejected."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_follows_saves_and_deletes(self):
+        """Test that updated and deleted reviews are reindexed through the signals."""
+        self.dining.review = "Library catering for book fairs"
+        self.dining.save()
+        response = self.client.get(self.url, {"q": "library"})
+        self.assertEqual(len(response.data["results"]), 2)
+
+        self.library.delete()
+        response = self.client.get(self.url, {"q": "library"})
+        self.assertEqual([review["id"] for review in response.data["results"]],
+                         [self.dining.id])
+
+    def test_save_does_not_build_index(self):
+        """Test that saving a review before any search leaves the index unbuilt."""
+        with patch.object(SearchIndex, "build_from_database") as build:
+            self.dining.save()
+        build.assert_not_called()
+
+    def test_writes_before_first_search_apply_to_snapshot(self):
+        """Test that reviews saved before the snapshot is loaded are still found."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "search_index.bin")
+            SearchIndex.build_from_database().save(path)
+            with override_settings(SEARCH_INDEX_PATH=path):
+                greenhouse = Reviews.objects.create(**{ # pylint: disable=E1101
+                    **self.valid_data, "review": "Watering the greenhouse"})
+                self.library.delete()
+                response = self.client.get(self.url, {"q": "greenhouse library"})
+                self.assertEqual([review["id"] for review in response.data["results"]],
+                                 [greenhouse.id])
+                reset_search_index() # Drops the index of the temporary snapshot
+
+    def test_snapshot_round_trip(self):
+        """Test that a saved snapshot answers queries like the index it came from."""
+        index = SearchIndex.build_from_database()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "search_index.bin")
+            index.save(path)
+            loaded = SearchIndex.load(path)
+            self.assertEqual(len(loaded), 2)
+            self.assertEqual(loaded.search("free meals"), index.search("free meals"))
+            loaded.remove(self.dining.id)
+            self.assertEqual(loaded.search("free meals"), [])
+            del loaded
+
+
+class JobTitleMatchTests(APITestCase):
+    """Test cases for the fuzzy job title lookup used by the browser extension."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Start from an empty matcher and create reviews and vacancies."""
+        reset_title_matcher()
+        self.url = reverse("match-job-titles")
+        self.valid_data = {**REVIEW_DATA, "job_title": "Library Assistant"}
+        # pylint: disable=E1101
+        self.review = Reviews.objects.create(**self.valid_data)
+        Reviews.objects.create(**{**self.valid_data, "job_title": "library assistant"})
+        Reviews.objects.create(**{**self.valid_data, "job_title": "Dining Hall Cashier"})
+        Vacancies.objects.create(jobTitle="Library Assistant", jobDescription="Shelving",
+                                 jobLocation="Hill Library", jobPayRate="12",
+                                 maxHoursAllowed=20)
+
+    def tearDown(self):
+        """Drop the matcher built for the test database."""
+        reset_title_matcher()
+
+    def test_match_posting_title(self):
+        """Test that a posting title maps to the closest known title with its counts."""
+        response = self.client.get(self.url, {"title": "Student Library Assistant II"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        best = response.data["results"][0]
+        self.assertEqual(best["job_title"].lower(), "library assistant")
+        self.assertEqual((best["reviews"], best["vacancies"]), (2, 1))
+        self.assertTrue(0 < best["score"] < 1)
+        self.assertNotIn("Dining Hall Cashier",
+                         [match["job_title"] for match in response.data["results"]])
+
+    def test_match_requires_title(self):
+        """Test that a missing title is rejected."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_matcher_follows_title_changes(self):
+        """Test that renamed and deleted records update the matched titles."""
+        # pylint: disable=E1101
+        Reviews.objects.exclude(pk=self.review.pk).filter(
+            job_title__icontains="library").delete()
+        Vacancies.objects.all().delete()
+        self.review.job_title = "Research Assistant"
+        self.review.save()
+        response = self.client.get(self.url, {"title": "Library Assistant"})
+        self.assertEqual([match["job_title"] for match in response.data["results"]],
+                         ["Research Assistant"])
@@ -0,0 +1,236 @@
+"""
+Module for testing the review and vacancy listings of the 'service' application.
+
+This module contains test cases for the review listing endpoint, covering
+the server-side filters, the numbered and cursor pages, the parsed pay
+filters and ordering, and the streamed mode of the listings.
+"""
+import io
+import json
+from django.core.management import call_command  # pylint: disable=E0401
+from django.urls import reverse  # pylint: disable=E0401
+from rest_framework import status  # pylint: disable=E0401
+from rest_framework.test import APITestCase  # pylint: disable=E0401
+from .cache import get_cache
+from .models import Reviews, Vacancies
+from .pagination import KeysetPagination
+from .pay import parse_pay_cents
+from .serializers import ReviewsSerializer
+from .streaming import stream_json_array
+from .testing import REVIEW_DATA
+
+
+class ReviewsViewTests(APITestCase):
+    """Test cases for filtering and paginating the review listing."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Create a small set of reviews with different departments and ratings."""
+        self.url = reverse("get-reviews")
+        self.valid_data = {**REVIEW_DATA, "locations": "Raleigh",
+                           "job_description": "Handles IT infrastructure",
+                           "benefits": "Health insurance", "recommendation": 1}
+        # pylint: disable=E1101
+        Reviews.objects.create(**self.valid_data)
+        Reviews.objects.create(**{**self.valid_data, "department": "Library", "rating": 2})
+        Reviews.objects.create(**{**self.valid_data, "job_title": "Manager", "rating": 5,
+                                  "locations": "Durham"})
+
+    def test_list_returns_paginated_envelope(self):
+        """Test that the listing returns counts and a page of results."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(response.data["estimated_count"], 3)
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertIsNone(response.data["next"])
+
+    def test_page_size_bounds_results(self):
+        """Test that page_size limits the number of returned reviews."""
+        response = self.client.get(self.url, {"page_size": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_filter_by_department_case_insensitive(self):
+        """Test that department filters match case-insensitive substrings."""
+        response = self.client.get(self.url, {"department": "libr"})
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["department"], "Library")
+
+    def test_filter_by_rating_range(self):
+        """Test that min_rating and max_rating bound the ratings."""
+        response = self.client.get(self.url, {"min_rating": 3, "max_rating": 4})
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["rating"], 4)
+
+    def test_invalid_rating_filter(self):
+        """Test that a non-numeric rating filter is rejected."""
+        response = self.client.get(self.url, {"min_rating": "high"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class KeysetPaginationTests(APITestCase):
+    """Test cases for the opaque-cursor pagination mode."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Create reviews with repeated ratings so that ties must be broken by id."""
+        self.url = reverse("get-reviews")
+        self.valid_data = dict(REVIEW_DATA)
+        # pylint: disable=E1101
+        for rating in (5, 3, 4, 3, 5, 1, 3):
+            Reviews.objects.create(**{**self.valid_data, "rating": rating})
+
+    def walk(self, params):
+        """Follow the cursor links from the first page and collect every review."""
+        collected = []
+        response = self.client.get(self.url, {**params, "cursor": ""})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            collected.extend(response.data["results"])
+            if response.data["next"] is None:
+                return collected
+            response = self.client.get(response.data["next"])
+
+    def test_browsable_api_page_controls(self):
+        """Test that the browsable API renders cursor pages and numbered pages."""
+        response = self.client.get(self.url, {"cursor": "", "page_size": 2},
+                                   HTTP_ACCEPT="text/html")
+        self.assertNotContains(response, 'class="pagination"')
+        response = self.client.get(self.url, {"page": 1, "page_size": 2},
+                                   HTTP_ACCEPT="text/html")
+        self.assertContains(response, 'class="pagination"')
+
+    def test_cursor_pages_cover_all_reviews_once(self):
+        """Test that cursor pages ordered by id return every review exactly once."""
+        reviews = self.walk({"page_size": 2})
+        ids = [review["id"] for review in reviews]
+        self.assertEqual(ids, sorted(Reviews.objects.values_list("id", flat=True)))
+
+    def test_cursor_pages_ordered_by_rating_descending(self):
+        """Test that ties on the rating are broken by id without skipping reviews."""
+        reviews = self.walk({"page_size": 2, "ordering": "-rating"})
+        keys = [(-review["rating"], -review["id"]) for review in reviews]
+        self.assertEqual(len(reviews), 7)
+        self.assertEqual(keys, sorted(keys))
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected."""
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_with_wrong_types(self):
+        """Test that a decodable cursor with tampered fields is rejected, not a 500."""
+        for ordering, value, pk in (("rating", "high", 1), ("rating", "3", "1"),
+                                    ("rating", None, 1), ("rating", "3", None),
+                                    (["rating"], "3", 1), ("rating", "3", True)):
+            cursor = KeysetPagination.encode_cursor(ordering, value, pk)
+            response = self.client.get(self.url, {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, cursor)
+            self.assertEqual(response.data, {"cursor": "Invalid cursor."})
+
+    def test_ordering_not_allowed(self):
+        """Test that only the indexed sort keys can be used for cursor pages."""
+        response = self.client.get(self.url, {"cursor": "", "ordering": "department"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PayTests(APITestCase):
+    """Test cases for the parsed pay and the pay filters and ordering."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Create reviews and vacancies with differently written pay."""
+        self.valid_data = {
+            "department": "IT",
+            "job_title": "Engineer",
+            "review": "Good work environment",
+            "rating": 4,
+        }
+        # pylint: disable=E1101
+        for pay in ("$15.50/hr", "9", "1,200", "DOE"):
+            Reviews.objects.create(**self.valid_data, hourly_pay=pay)
+        for pay, location in (("$12.00 - $14.00 per hour", "Dining Hall"),
+                              ("Negotiable", "Bookstore")):
+            Vacancies.objects.create(jobTitle="Cashier", jobDescription="Register",
+                                     jobLocation=location, jobPayRate=pay,
+                                     maxHoursAllowed=20)
+
+    def test_parse_pay_cents(self):
+        """Test that the first amount of a pay string is parsed into cents."""
+        self.assertEqual(parse_pay_cents("$15.50/hr"), 1550)
+        self.assertEqual(parse_pay_cents("12.005"), 1201)
+        self.assertEqual(parse_pay_cents("$12 - $14"), 1200)
+        self.assertIsNone(parse_pay_cents("Negotiable"))
+        self.assertIsNone(parse_pay_cents(None))
+
+    def test_filter_reviews_by_pay_range(self):
+        """Test that min_pay and max_pay bound the parsed pay, in dollars."""
+        response = self.client.get(reverse("get-reviews"), {"min_pay": "9.5", "max_pay": 1000})
+        self.assertEqual([review["hourly_pay"] for review in response.data["results"]],
+                         ["$15.50/hr"])
+        self.assertEqual(response.data["results"][0]["hourly_pay_cents"], 1550)
+
+    def test_invalid_pay_filter(self):
+        """Test that a pay bound that is not an amount is rejected."""
+        response = self.client.get(reverse("get-reviews"), {"min_pay": "-3"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sort_reviews_by_pay(self):
+        """Test that cursor pages sort on the parsed pay and skip unparsed pay."""
+        response = self.client.get(reverse("get-reviews"),
+                                   {"cursor": "", "ordering": "-hourly_pay_cents"})
+        self.assertEqual([review["hourly_pay_cents"] for review in response.data["results"]],
+                         [120000, 1550, 900])
+
+    def test_filter_vacancies_by_pay(self):
+        """Test that the vacancy listing filters on the lower bound of a pay range."""
+        response = self.client.get("/service/vacancies/", {"max_pay": 12})
+        self.assertEqual([vacancy["payRateCents"] for vacancy in response.data], [1200])
+
+    def test_backfill_pay(self):
+        """Test that the backfill command parses documents written without the field."""
+        # pylint: disable=E1101
+        Reviews.objects.update(hourly_pay_cents=None)
+        Vacancies.objects.update(payRateCents=None)
+        call_command("backfill_pay", batch_size=2, stdout=io.StringIO())
+        self.assertEqual(sorted(Reviews.objects.exclude(hourly_pay_cents=None)
+                                .values_list("hourly_pay_cents", flat=True)),
+                         [900, 1550, 120000])
+        self.assertEqual(list(Vacancies.objects.exclude(payRateCents=None)
+                              .values_list("payRateCents", flat=True)), [1200])
+
+
+class StreamingListTests(APITestCase):
+    """Test cases for the streamed JSON array of the review listing."""
+
+    # pylint: disable=C0103
+    def setUp(self):
+        """Create reviews in two departments."""
+        get_cache().clear()
+        # pylint: disable=E1101
+        for i in range(5):
+            Reviews.objects.create(department="IT" if i % 2 else "Library",
+                                   job_title=f"Job {i}", hourly_pay="15",
+                                   review="Fine", rating=i + 1)
+
+    def test_stream_returns_filtered_array(self):
+        """Test that stream=1 returns every matching review as one array."""
+        response = self.client.get(reverse("get-reviews"), {"stream": "1", "department": "it"})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/json")
+        reviews = json.loads(b"".join(response.streaming_content))
+        self.assertEqual([review["job_title"] for review in reviews], ["Job 1", "Job 3"])
+
+    def test_stream_batches_join_into_valid_json(self):
+        """Test that batches smaller than the collection still form one array."""
+        queryset = Reviews.objects.order_by("id") # pylint: disable=E1101
+        chunks = list(stream_json_array(queryset, ReviewsSerializer, batch_size=2))
+        self.assertEqual(len(chunks), 5) # "[", three batches, "]"
+        self.assertEqual(json.loads(b"".join(chunks)),
+                         json.loads(json.dumps(ReviewsSerializer(queryset, many=True).data)))
+
+    def test_stream_of_nothing_is_empty_array(self):
+        """Test that no matching review streams an empty array."""
+        response = self.client.get(reverse("get-reviews"), {"stream": "1", "job_title": "none"})
+        self.assertEqual(b"".join(response.streaming_content), b"[]")
@@ -0,0 +1,70 @@
+"""
+Per-endpoint rate limits of the API.
+
+``EndpointRateThrottle`` is the default throttle of ``REST_FRAMEWORK``. Each
+view names the group of endpoints it belongs to in ``throttle_scope``
+(``reviews``, ``search``, ``comments``...), and the rate of each scope is
+read from ``settings.THROTTLE_RATES`` on every request, e.g. ``600/min``.
+A scope without a rate, or with an empty one, is not limited.
+
+Requests are counted per user when authenticated and per client IP
+otherwise, in the ``default`` cache. That cache is local to each process
+unless a shared backend is configured, so with several workers a client
+gets at most the rate of each worker it reaches. A refused request gets a
+429 with a ``Retry-After`` header before its view runs.
+
+Other throttles can be plugged in per view with ``throttle_classes``, as
+the email-sending views do with ``auth_review.throttling.EmailSendThrottle``,
+or for every view in ``REST_FRAMEWORK["DEFAULT_THROTTLE_CLASSES"]``. Plain
+Django views, such as the asynchronous login, call ``throttled_response``.
+"""
+from django.conf import settings  # pylint: disable=E0401
+from django.http import JsonResponse  # pylint: disable=E0401
+from rest_framework.exceptions import Throttled  # pylint: disable=E0401
+from rest_framework.throttling import ScopedRateThrottle  # pylint: disable=E0401
+
+
+class EndpointRateThrottle(ScopedRateThrottle):
+    """
+    Limit the requests per ``throttle_scope`` of the views.
+
+    Methods:
+        get_rate(): returns the rate of the scope of the view.
+    """
+
+    def get_rate(self):
+        """
+        Return the rate of the scope of the view.
+
+        Unlike ``ScopedRateThrottle``, the rates are read from the settings
+        on each request and a scope without one is not an error.
+
+        Returns:
+            str or None: The rate, e.g. ``600/min``, or None for no limit.
+        """
+        return settings.THROTTLE_RATES.get(self.scope) or None
+
+
+def throttled_response(request, view):
+    """
+    Apply ``EndpointRateThrottle`` to a view that is not a DRF view.
+
+    It reads ``request.user``, which may query the session, so an
+    asynchronous view calls it through ``sync_to_async``.
+
+    Args:
+        request (HttpRequest): The request.
+        view: The view, whose ``throttle_scope`` names its rate.
+
+    Returns:
+        JsonResponse or None: The 429 that DRF would answer, with its
+        ``Retry-After`` header, or None if the request is allowed.
+    """
+    throttle = EndpointRateThrottle()
+    if throttle.allow_request(request, view):
+        return None
+    exc = Throttled(throttle.wait())
+    response = JsonResponse({"detail": exc.detail}, status=exc.status_code)
+    if exc.wait is not None:
+        response["Retry-After"] = str(exc.wait)
+    return response
@@ -0,0 +1,299 @@
+"""
+Per-request accounting of the database and serializer work.
+
+With ``settings.REQUEST_TIMING`` on, ``request_timing_middleware`` records
+for every request:
+
+- the ORM queries and their total time, through an execute wrapper that
+  every database connection gets when it opens (``add_execute_wrapper``);
+- on MongoDB, the commands Djongo and the pymongo repository send and their
+  total server round trip time, through a pymongo command listener
+  (``MONGO_COMMANDS``). Djongo reads query results in batches, so one ORM
+  query can cost several commands;
+- the time spent in ``to_representation`` of the serializers that use
+  ``TimedSerializerMixin``, counted once for nested serializers.
+
+It adds them to the response as a ``Server-Timing`` header, which browser
+developer tools display, and logs them on the ``service.timing`` logger
+with one structured field each (``extra``). A request making more than
+``REQUEST_TIMING_MAX_QUERIES`` queries is logged as a warning, so that an
+N+1 pattern, such as reading the comments of each review of a page, shows
+up at once.
+
+Work done after the view returned, such as the batches of a streamed
+listing, is not counted. With ``REQUEST_TIMING`` off, the middleware is
+left out of the chain, the command listener is not registered and each
+query or serialized object only checks that no request is being timed.
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings  # pylint: disable=E0401
+from django.db.backends.signals import connection_created  # pylint: disable=E0401
+from django.utils.decorators import sync_and_async_middleware  # pylint: disable=E0401
+from pymongo import monitoring  # pylint: disable=E0401
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTiming:
+    """
+    The database and serializer work of one request.
+
+    Attributes:
+        queries (int): ORM queries executed.
+        db_seconds (float): Time spent executing them.
+        mongo_commands (int): MongoDB commands sent.
+        mongo_seconds (float): Their round trip time.
+        serializer_seconds (float): Time spent serializing objects.
+        serializer_depth (int): Serializers currently running, so that
+            nested ones are not counted twice.
+    """
+    __slots__ = ("queries", "db_seconds", "mongo_commands", "mongo_seconds",
+                 "serializer_seconds", "serializer_depth")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.mongo_commands = 0
+        self.mongo_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+
+    def server_timing(self, total_seconds):
+        """
+        Build the ``Server-Timing`` header value.
+
+        Args:
+            total_seconds (float): The time the request took.
+
+        Returns:
+            str: One metric per kind of work, durations in milliseconds.
+        """
+        metrics = [f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} queries"']
+        if self.mongo_commands:
+            metrics.append(f'mongo;dur={self.mongo_seconds * 1000:.2f};'
+                           f'desc="{self.mongo_commands} commands"')
+        metrics.append(f"serializer;dur={self.serializer_seconds * 1000:.2f}")
+        metrics.append(f"total;dur={total_seconds * 1000:.2f}")
+        return ", ".join(metrics)
+
+    def log_fields(self, total_seconds):
+        """
+        Return the fields of the log record.
+
+        Args:
+            total_seconds (float): The time the request took.
+
+        Returns:
+            dict: The counts and the durations in milliseconds.
+        """
+        return {"db_queries": self.queries,
+                "db_ms": round(self.db_seconds * 1000, 2),
+                "mongo_commands": self.mongo_commands,
+                "mongo_ms": round(self.mongo_seconds * 1000, 2),
+                "serializer_ms": round(self.serializer_seconds * 1000, 2),
+                "total_ms": round(total_seconds * 1000, 2)}
+
+
+_current = ContextVar("request_timing", default=None) # The RequestTiming of this request
+
+
+def current_timing():
+    """
+    Return the timing of the request being handled.
+
+    Returns:
+        RequestTiming or None: None outside a timed request.
+    """
+    return _current.get()
+
+
+@contextmanager
+def track_request():
+    """
+    Record the work done in the block, e.g. by a request or a benchmark.
+
+    Yields:
+        RequestTiming: The counters, updated until the block exits.
+    """
+    timing = RequestTiming()
+    token = _current.set(timing)
+    try:
+        yield timing
+    finally:
+        _current.reset(token)
+
+
+def time_execute(execute, sql, params, many, context):
+    """
+    Execute a query, counting it for the request being timed.
+
+    Installed on every connection by ``add_execute_wrapper``.
+
+    Args:
+        execute (callable): The next wrapper, or the cursor's execute.
+        sql (str): The query.
+        params: Its parameters.
+        many (bool): Whether it is an ``executemany``.
+        context (dict): The connection and cursor.
+
+    Returns:
+        The result of ``execute``.
+    """
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.queries += 1
+        timing.db_seconds += time.perf_counter() - start
+
+
+def add_execute_wrapper(sender, connection, **kwargs): # pylint: disable=W0613
+    """
+    Install ``time_execute`` on a connection that was just opened.
+
+    Connected to ``connection_created``; the wrapper stays on the
+    connection object when it reconnects, so it is only added once.
+
+    Args:
+        sender: The database wrapper class.
+        connection (BaseDatabaseWrapper): The connection.
+    """
+    if time_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_execute)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """
+    Counts the MongoDB commands of the request being timed.
+
+    pymongo calls the listener on the thread that sent the command, so the
+    request is found through the context variable.
+    """
+
+    def started(self, event):
+        """A command was sent."""
+
+    def succeeded(self, event):
+        """A command returned."""
+        self.count(event)
+
+    def failed(self, event):
+        """A command failed."""
+        self.count(event)
+
+    @staticmethod
+    def count(event):
+        """Add a finished command to the timing of the request."""
+        timing = _current.get()
+        if timing is not None:
+            timing.mongo_commands += 1
+            timing.mongo_seconds += event.duration_micros / 1_000_000
+
+
+MONGO_COMMANDS = MongoCommandTimer() # Registered by install_timing_hooks when enabled
+
+
+def install_timing_hooks():
+    """
+    Time the queries of every connection and, when enabled, the MongoDB commands.
+
+    Called once at startup, before the first connection and client are
+    created.
+    """
+    connection_created.connect(add_execute_wrapper, dispatch_uid="service.timing")
+    if settings.REQUEST_TIMING:
+        monitoring.register(MONGO_COMMANDS)
+
+
+class TimedSerializerMixin:
+    """
+    Count the time a serializer spends building representations.
+
+    Methods:
+        to_representation(instance): times the representation of an object.
+    """
+
+    def to_representation(self, instance):
+        """
+        Time the representation of an object for the request being timed.
+
+        Args:
+            instance: The object to serialize.
+
+        Returns:
+            dict: The representation.
+        """
+        timing = _current.get()
+        if timing is None or timing.serializer_depth:
+            return super().to_representation(instance)
+        timing.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timing.serializer_seconds += time.perf_counter() - start
+            timing.serializer_depth -= 1
+
+
+def report(request, response, timing, total_seconds):
+    """
+    Add the ``Server-Timing`` header and log the timing of a request.
+
+    Args:
+        request (HttpRequest): The request.
+        response (HttpResponse): Its response.
+        timing (RequestTiming): The recorded work.
+        total_seconds (float): The time the request took.
+
+    Returns:
+        HttpResponse: The response.
+    """
+    response["Server-Timing"] = timing.server_timing(total_seconds)
+    match = request.resolver_match
+    fields = {"view": match.view_name if match else None, "method": request.method,
+              "path": request.path, "status": response.status_code,
+              **timing.log_fields(total_seconds)}
+    level = (logging.WARNING if timing.queries > settings.REQUEST_TIMING_MAX_QUERIES
+             else logging.INFO)
+    logger.log(level, "%(method)s %(path)s %(status)s: %(db_queries)s queries in "
+               "%(db_ms)s ms, %(mongo_commands)s commands in %(mongo_ms)s ms, "
+               "serializers %(serializer_ms)s ms, total %(total_ms)s ms", fields, extra=fields)
+    return response
+
+
+@sync_and_async_middleware
+def request_timing_middleware(get_response):
+    """
+    Build the middleware that times the database and serializer work.
+
+    Args:
+        get_response (callable): The rest of the middleware chain.
+
+    Returns:
+        callable: The middleware, or ``get_response`` itself when
+        ``settings.REQUEST_TIMING`` is off.
+    """
+    if not settings.REQUEST_TIMING:
+        return get_response
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            start = time.perf_counter()
+            with track_request() as timing:
+                response = await get_response(request)
+            return report(request, response, timing, time.perf_counter() - start)
+    else:
+        def middleware(request):
+            start = time.perf_counter()
+            with track_request() as timing:
+                response = get_response(request)
+            return report(request, response, timing, time.perf_counter() - start)
+
+    return middleware
@@ -0,0 +1,359 @@
+"""
+In-memory fuzzy matcher for job titles.
+
+The browser extension scrapes the title of a JazzHR posting, which rarely
+matches our ``Reviews.job_title`` and ``Vacancies.jobTitle`` values exactly
+("Student Library Assistant II" vs "Library Assistant"). This module keeps
+the distinct titles of both collections in a trigram index, so that a
+posting title is mapped to the closest known titles with one in-memory
+lookup instead of a collection scan.
+
+Similarity is the share of trigrams two titles have in common (shared
+trigrams over the trigrams of either title), as in PostgreSQL's pg_trgm.
+The index is built from the database on first use and kept up to date by
+the save and delete signals of both models.
+"""
+import heapq
+import threading
+from collections import OrderedDict
+from .dedup import normalize_title
+
+DEFAULT_THRESHOLD = 0.3 # Minimum similarity of a match
+CACHE_SIZE = 1024 # Rankings kept for titles that are looked up again
+
+
+def trigrams(normalized):
+    """
+    Return the trigrams of a normalized title.
+
+    Each word is padded with two leading spaces and one trailing space, so
+    that word beginnings weigh more than word endings.
+
+    Args:
+        normalized (str): A title returned by ``normalize_title``.
+
+    Returns:
+        set: The trigrams of the title.
+    """
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class Ranking:
+    """
+    The best matches of one query, while the titles are ranked.
+
+    Attributes:
+        query (int): The trigram mask of the query.
+        size (int): The number of trigrams of the query.
+        limit (int): The maximum number of matches.
+        threshold (float): The minimum similarity.
+        best (list): Min-heap of ``(similarity, title id)``.
+    """
+
+    def __init__(self, query, size, limit, threshold):
+        self.query, self.size = query, size
+        self.limit, self.threshold = limit, threshold
+        self.best = []
+
+    def floor(self):
+        """Return the similarity a title needs to enter the results."""
+        return self.best[0][0] if len(self.best) == self.limit else self.threshold
+
+
+# pylint: disable=R0902
+class TitleMatcher:
+    """
+    Trigram index over the distinct job titles of reviews and vacancies.
+
+    Titles are short and share most of their words ("Library Assistant",
+    "Student Library Assistant II"), so trigrams point to the distinct words
+    of the titles and each word to the titles that use it. A lookup only
+    compares the query with the words it shares a trigram with, instead of
+    walking a long trigram posting list per title. Rankings are cached until
+    the set of distinct titles changes, since the extension looks up the
+    same postings over and over.
+
+    Every indexed record is tracked by a ``(source, id)`` key, e.g.
+    ``("review", 42)``, so that a record whose title changes is moved to its
+    new title and titles disappear once no record uses them. All public
+    methods are thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {} # (source, id) -> title id
+        # title id -> [display title, (trigram mask, trigram count), {source: count}, words]
+        self._titles = []
+        self._title_ids = {} # normalized title -> title id
+        self._free = [] # title ids that can be reused
+        self._words = {} # word -> (trigram mask, set of title ids)
+        self._postings = {} # trigram -> set of words
+        self._gram_bits = {} # trigram -> bit of the trigram in the masks
+        # (normalized title, limit, threshold) -> ranking, valid until the
+        # set of distinct titles changes
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return len(self._title_ids)
+
+    @classmethod
+    def build_from_database(cls):
+        """
+        Build a matcher from the Reviews and Vacancies collections.
+
+        Returns:
+            TitleMatcher: The populated matcher.
+        """
+        from .models import Reviews, Vacancies  # pylint: disable=C0415
+        matcher = cls()
+        # pylint: disable=E1101
+        for pk, title in Reviews.objects.values_list("id", "job_title").iterator():
+            matcher.add("review", pk, title)
+        for pk, title in Vacancies.objects.values_list("id", "jobTitle").iterator():
+            matcher.add("vacancy", pk, title)
+        return matcher
+
+    def add(self, source, pk, title):
+        """
+        Index the title of a record, replacing its previous title.
+
+        Args:
+            source (str): The kind of record, ``review`` or ``vacancy``.
+            pk (int): The id of the record.
+            title (str): The job title of the record.
+        """
+        normalized = normalize_title(title)
+        with self._lock:
+            self._discard((source, pk))
+            if not normalized:
+                return
+            title_id = self._title_ids.get(normalized)
+            if title_id is None:
+                title_id = self._insert_title(normalized, title.strip())
+            sources = self._titles[title_id][2]
+            sources[source] = sources.get(source, 0) + 1
+            self._records[(source, pk)] = title_id
+
+    def remove(self, source, pk):
+        """
+        Stop indexing the title of a record.
+
+        Args:
+            source (str): The kind of record, ``review`` or ``vacancy``.
+            pk (int): The id of the record.
+        """
+        with self._lock:
+            self._discard((source, pk))
+
+    def _insert_title(self, normalized, display):
+        """Add a new distinct title to the index and return its id."""
+        words = frozenset(normalized.split())
+        grams = trigrams(normalized)
+        entry = [display, (self._mask(grams), len(grams)), {}, words]
+        if self._free:
+            title_id = self._free.pop()
+            self._titles[title_id] = entry
+        else:
+            title_id = len(self._titles)
+            self._titles.append(entry)
+        self._title_ids[normalized] = title_id
+        self._cache.clear()
+        for word in words:
+            if word not in self._words:
+                grams = trigrams(word)
+                self._words[word] = (self._mask(grams), set())
+                for gram in grams:
+                    self._postings.setdefault(gram, set()).add(word)
+            self._words[word][1].add(title_id)
+        return title_id
+
+    def _mask(self, grams):
+        """Return the trigrams as a bit mask, so that overlaps are counted in C."""
+        mask = 0
+        for gram in grams:
+            bit = self._gram_bits.get(gram)
+            if bit is None:
+                bit = self._gram_bits[gram] = 1 << len(self._gram_bits)
+            mask |= bit
+        return mask
+
+    def _discard(self, key):
+        """Drop a record, and its title once no other record uses it."""
+        title_id = self._records.pop(key, None)
+        if title_id is None:
+            return
+        display, _, sources, words = self._titles[title_id]
+        sources[key[0]] -= 1
+        if not sources[key[0]]:
+            del sources[key[0]]
+        if sources:
+            return
+        for word in words:
+            title_ids = self._words[word][1]
+            title_ids.discard(title_id)
+            if title_ids:
+                continue
+            del self._words[word]
+            for gram in trigrams(word):
+                self._postings[gram].discard(word)
+                if not self._postings[gram]:
+                    del self._postings[gram]
+        del self._title_ids[normalize_title(display)]
+        self._titles[title_id] = None
+        self._free.append(title_id)
+        self._cache.clear()
+
+    def match(self, title, limit=5, threshold=DEFAULT_THRESHOLD):
+        """
+        Find the known job titles most similar to a title.
+
+        Args:
+            title (str): The title to look up, e.g. a scraped posting title.
+            limit (int): The maximum number of matches.
+            threshold (float): The minimum similarity, between 0 and 1.
+
+        Returns:
+            list: ``(title, similarity, {source: number of records})``
+            tuples, most similar first.
+        """
+        normalized = normalize_title(title)
+        key = (normalized, limit, threshold)
+        with self._lock:
+            best = self._cache.get(key)
+            if best is None:
+                best = self._best(trigrams(normalized), limit, threshold)
+                self._cache[key] = best
+                if len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(key)
+            return [(self._titles[title_id][0], similarity, dict(self._titles[title_id][2]))
+                    for similarity, title_id in best]
+
+    def _best(self, grams, limit, threshold):
+        """
+        Rank the titles most similar to the trigrams of a query.
+
+        Args:
+            grams (set): The trigrams of the query.
+            limit (int): The maximum number of matches.
+            threshold (float): The minimum similarity.
+
+        Returns:
+            list: ``(similarity, title id)`` pairs, most similar first.
+        """
+        words = set()
+        for gram in grams:
+            words.update(self._postings.get(gram, ()))
+        if not words:
+            return []
+        # Trigrams of the query that no title has cannot match, but they
+        # still count in the similarity
+        ranking = Ranking(sum(self._gram_bits.get(gram, 0) for gram in grams), len(grams),
+                          limit, threshold)
+        overlaps = sorted(((ranking.query & self._words[word][0], word) for word in words),
+                          key=lambda overlap: overlap[0].bit_count())
+        # Start from the titles of the word that matches best, so that
+        # the similarity floor is known before collecting candidates
+        seen = self._words[overlaps[-1][1]][1]
+        self._rank(ranking, [(ranking.size, title_id) for title_id in seen])
+        self._rank(ranking, self._candidates(ranking, overlaps, seen))
+        ranking.best.sort(reverse=True)
+        return ranking.best
+
+    def _candidates(self, ranking, overlaps, seen):
+        """
+        Collect the titles that can still enter the results.
+
+        Words are taken from the weakest match up while the trigrams they
+        share with the query, all together, cannot reach the floor. A title
+        made only of such words cannot enter the results, so candidates are
+        only collected from the other words.
+
+        Args:
+            ranking (Ranking): The ranking of the query so far.
+            overlaps (list): ``(shared trigram mask, word)`` pairs of the
+                words of the query, weakest first.
+            seen (set): The ids of the titles already ranked.
+
+        Returns:
+            list: ``(bound, title id)`` pairs, by decreasing bound of the
+            trigrams the title shares with the query.
+        """
+        weak = 0
+        for i, (overlap, _) in enumerate(overlaps):
+            if (weak | overlap).bit_count() >= ranking.floor() * ranking.size:
+                overlaps = overlaps[i:]
+                break
+            weak |= overlap
+        else:
+            overlaps = []
+        # Upper bound of the trigrams each candidate shares with the
+        # query: its other words share at most the weak trigrams
+        weak = weak.bit_count()
+        shared = {}
+        for overlap, word in overlaps:
+            common = overlap.bit_count()
+            for title_id in self._words[word][1] - seen:
+                shared[title_id] = shared.get(title_id, weak) + common
+        return sorted(((bound, title_id) for title_id, bound in shared.items()), reverse=True)
+
+    def _rank(self, ranking, candidates):
+        """
+        Add the candidates that are similar enough to the ranking.
+
+        The similarity of a title is at most its shared trigrams over the
+        trigrams of the query, so the candidates, sorted by decreasing bound
+        of their shared trigrams, are checked until no remaining one can
+        enter the results.
+
+        Args:
+            ranking (Ranking): The ranking of the query, updated in place.
+            candidates (list): ``(bound, title id)`` pairs, by decreasing bound.
+        """
+        size, best = ranking.size, ranking.best
+        floor = ranking.floor() * size
+        for bound, title_id in candidates:
+            if bound < floor:
+                return
+            title_mask, title_size = self._titles[title_id][1]
+            common = (ranking.query & title_mask).bit_count()
+            similarity = common / (size + title_size - common)
+            if similarity < ranking.threshold:
+                continue
+            if len(best) < ranking.limit:
+                heapq.heappush(best, (similarity, title_id))
+            elif similarity > best[0][0]:
+                heapq.heapreplace(best, (similarity, title_id))
+            if len(best) == ranking.limit:
+                floor = best[0][0] * size
+
+
+_matcher = None # pylint: disable=C0103
+_matcher_lock = threading.Lock()
+
+
+def get_title_matcher():
+    """
+    Return the title matcher of this process, building it on first use.
+
+    Returns:
+        TitleMatcher: The shared matcher.
+    """
+    global _matcher # pylint: disable=W0603
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = TitleMatcher.build_from_database()
+    return _matcher
+
+
+def reset_title_matcher():
+    """Drop the matcher of this process so that the next use rebuilds it."""
+    global _matcher # pylint: disable=W0603
+    with _matcher_lock:
+        _matcher = None
@@ -13,6 +13,8 @@ from django.urls import include, path # Import 'include' and 'path' for URL conf
 from rest_framework.routers import DefaultRouter # Import DefaultRouter for automated URL routing
 # Local application imports
 from .views import ReviewsViewSet, VacanciesViewSet, ReviewsView, CommentViewSet
+from .views import ReviewSearchView, JobTitleMatchView, RatingStatsView, CacheStatsView
+from .views import CommentBatchView, MongoPoolStatsView, LoadStatsView
 
 # Initialize the default router for automatically handling URLs for viewsets
 router = DefaultRouter()
@@ -22,7 +24,10 @@ router.register(r'vacancies', VacanciesViewSet) # Register 'vacancies' endpoint
 
 # Define URL patterns for the service application
 urlpatterns = [
+    # Declared before the router so that it is not taken for a review id
+    path('reviews/search/', ReviewSearchView.as_view(), name='search-reviews'),
     path('', include(router.urls)), # Include router-generated URLs for registered viewsets
+    path('comments/batch/', CommentBatchView.as_view(), name='comments-batch'),
     path(
         'comments/<int:id>/', 
          CommentViewSet.as_view({'get': 'list', 'post': 'create'}),
@@ -33,5 +38,10 @@ urlpatterns = [
         CommentViewSet.as_view({'delete': 'destroy'}),
         name='delete-comment'
     ),
-    path('all_reviews/', ReviewsView.as_view(), name='get-reviews')
+    path('all_reviews/', ReviewsView.as_view(), name='get-reviews'),
+    path('job_titles/match/', JobTitleMatchView.as_view(), name='match-job-titles'),
+    path('stats/', RatingStatsView.as_view(), name='rating-stats'),
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('mongo/stats/', MongoPoolStatsView.as_view(), name='mongo-pool-stats'),
+    path('load/stats/', LoadStatsView.as_view(), name='load-stats'),
 ]
@@ -9,10 +9,18 @@ logic and provide the appropriate responses to the client.
 # from django.shortcuts import render
 from rest_framework import viewsets # Import viewsets for creating API views
 from rest_framework import generics # Import generics for generic API views
+from rest_framework.views import APIView # Import APIView for custom API views
 from rest_framework.response import Response # Import Response for HTTP responses
 from rest_framework import status # Import status codes for HTTP responses
+from rest_framework.decorators import action # Extra routes on the viewsets
 from rest_framework.permissions import IsAuthenticated # Import authentication permissions
+from rest_framework.permissions import IsAdminUser # Restrict views to staff users
+from rest_framework.utils.urls import replace_query_param # Add the cursor to a link
 from django.shortcuts import get_object_or_404 # Helper function for fetching objects safely
+from django.db import DatabaseError # Refused inserts of the vacancy creation
+from django.http import HttpResponse # Plain-text response of the metrics
+from django.views import View # Plain Django view, without the DRF machinery
+from django.urls import reverse # Build the links to the comment pages
 from .models import Reviews # Import Reviews model for review-related views
 from .serializers import ReviewsSerializer # Import serializer for Reviews
 
@@ -21,9 +29,33 @@ from .serializers import VacanciesSerializer # Import serializer for Vacancies
 
 from .models import Comment # Import Vacancies model for comment-related views
 from .serializers import CommentSerializer # Import serializer for Comment
+from .serializers import RatingAggregateSerializer # Import serializer for rating statistics
+
+from .filters import filter_reviews # Query-parameter filters for the review listing
+from .filters import filter_vacancies # Query-parameter filters for the vacancy listing
+from .pagination import KeysetPagination # Opt-in cursor pagination for list actions
+from .pagination import ReviewsKeysetPagination # Cursor or numbered pages for the review listing
+from .search import get_search_index # In-process full-text index over review text
+from .titles import get_title_matcher # In-memory fuzzy matcher for job titles
+from .aggregates import AGGREGATE_SCOPES, apply_review, get_aggregate, snapshot
+from .cache import CachedListMixin, cache_stats # Versioned cache of the list responses
+from .conditional import ConditionalListMixin # ETag and 304 responses for the listings
+from .streaming import StreamingListMixin # Streamed JSON array of a whole listing
+from .bulk import import_reviews # Batched validation and insertion of reviews
+from .feeds import FEED_CONTENT_TYPES, FeedError, decode_lines, read_feed # Uploaded feeds
+from .ingest import ingest_vacancies # Batched upserts of vacancy feeds
+from .dedup import vacancy_key # Deduplication key of a vacancy posting
+from .comments import COMMENT_ORDERINGS, MAX_BATCH_REVIEWS, comments_for_reviews
+from .comments import comment_added, comment_removed # Comment counts and previews
+from .comments import comment_summary_fields # Current counts and previews of cached reviews
+from .repository import comment_query, review_query, vacancy_query # Direct pymongo reads
+from .repository import uses_repository # Whether a list request can skip the ORM
+from .mongo import atomic_unless_mongo, is_duplicate_key, pool_stats # Unique keys, pool
+from .loadshedding import load_stats # Admitted and shed requests of this worker
+from .metrics import CONTENT_TYPE, is_authorized, render_metrics # Prometheus exposition
 
 # pylint: disable=R0901
-class ReviewsViewSet(viewsets.ModelViewSet):
+class ReviewsViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     """
     A viewset for managing Reviews.
 
@@ -32,9 +64,16 @@ class ReviewsViewSet(viewsets.ModelViewSet):
     authenticated users and handles the associated business logic.
     """
     permission_classes = (IsAuthenticated,) # Restrict access to authenticated users only
+    throttle_scope = "reviews" # Rate of THROTTLE_RATES["reviews"]
     # pylint: disable=E1101
     queryset = Reviews.objects.all()   # Get all Review objects from the database
     serializer_class = ReviewsSerializer  # Specify the serializer for data conversion
+    pagination_class = KeysetPagination # Cursor pages when the client sends ?cursor=
+    # Indexed keys the cursor pages can be sorted on
+    keyset_fields = ("id", "rating", "hourly_pay_cents")
+    cache_collection = "reviews" # The list's ETag changes when a review is written
+    related_collections = ("comments",) # ... or a comment, which the reviews count
+    max_bulk_size = 5000 # Upper bound on the reviews of one bulk request
 
     # pylint: disable=W0107,W0221
     def retrieve(self, request, pk=None):
@@ -62,6 +101,7 @@ class ReviewsViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():  # Check if the serialized data is valid
             # print(serializer.data)
             serializer.save()  # Save data to the database if valid
+            apply_review(new=serializer.instance) # Count the review in the rating statistics
             return Response(
                 serializer.data,
                 status=status.HTTP_201_CREATED) # Return success response with serialized data
@@ -69,38 +109,378 @@ class ReviewsViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST)  # Return error response if data is invalid
 
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """
+        Create many reviews in one request.
+
+        The body is a JSON array of reviews. Rows are validated with the
+        same rules as ``create`` and the valid ones are inserted in bulk;
+        invalid rows are skipped and reported by their position.
+
+        Args:
+            request (Request): The HTTP request containing the reviews.
+
+        Returns:
+            Response: The number of created reviews and the errors of the
+            invalid rows; 201 if any review was created, 400 otherwise.
+        """
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({"detail": "Expected a non-empty array of reviews."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.max_bulk_size:
+            return Response({"detail": f"At most {self.max_bulk_size} reviews per request."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        created, errors = import_reviews(rows, reviewed_by=request.user.username)
+        return Response({"created": created, "errors": errors},
+                        status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+    def perform_update(self, serializer):
+        """
+        Save an updated review and move it between rating statistics.
 
-class ReviewsView(generics.ListAPIView):
+        Args:
+            serializer (ReviewsSerializer): The validated serializer.
+        """
+        old = snapshot(serializer.instance) # Values the statistics counted so far
+        serializer.save()
+        apply_review(old=old, new=serializer.instance)
+
+    def perform_destroy(self, instance):
+        """
+        Delete a review and remove it from the rating statistics.
+
+        Args:
+            instance (Reviews): The review to delete.
+        """
+        old = snapshot(instance)
+        instance.delete()
+        apply_review(old=old)
+
+
+class ReviewsView(ConditionalListMixin, StreamingListMixin, CachedListMixin,
+                  generics.ListAPIView):
     """
-    A view for fetching all Reviews.
+    A view for fetching Reviews one page at a time.
+
+    Accepts the optional query parameters ``department``, ``locations``,
+    ``job_title`` (case-insensitive substring matches), ``min_rating``,
+    ``max_rating``, ``min_pay`` and ``max_pay`` (dollars), plus ``page`` and
+    ``page_size`` for pagination. Sending
+    ``cursor`` (and optionally ``ordering``) switches to cursor pagination.
+    Pages are served from the versioned response cache until a review is
+    written, and answered with 304 Not Modified when the client's ETag is
+    current. ``stream=1`` returns every matching review as one JSON array,
+    streamed in batches instead of paginated. Comment writes leave the
+    cached pages in place; their comment counts and previews are read again
+    on every hit.
     """
     # permission_classes = (IsAuthenticated)
     serializer_class = ReviewsSerializer # Use the Reviews serializer for data representation
+    throttle_scope = "reviews" # Rate of THROTTLE_RATES["reviews"]
+    pagination_class = ReviewsKeysetPagination # Cursor or numbered pages, never the whole list
+    # Indexed keys the cursor pages can be sorted on
+    keyset_fields = ("id", "rating", "hourly_pay_cents")
+    cache_collection = "reviews" # Cached pages are dropped when a review is written
+    related_collections = ("comments",) # Comment writes only change the ETag
+
+    def refresh_cached(self, data):
+        """
+        Set the comment counts and previews of a cached page to the stored ones.
+
+        Comment writes do not drop the cached pages, so these fields are read
+        again, with one query on the ids of the page.
+
+        Args:
+            data (dict): The cached page.
+
+        Returns:
+            dict: The page with current comment counts and previews.
+        """
+        serializer = self.get_serializer()
+        stored = comment_summary_fields([review["id"] for review in data["results"]])
+        for review in data["results"]:
+            if review["id"] in stored: # Skip reviews deleted since the page was cached
+                current = stored[review["id"]]
+                review["comment_count"] = current.comment_count
+                review["latest_comment"] = serializer.get_latest_comment(current)
+        return data
 
     def get_queryset(self):
         """
-        Retrieve a list of all Review instances.
+        Retrieve the Review instances matching the request filters.
+
+        On MongoDB, requests that are not in cursor mode are read through
+        the pymongo repository instead of the ORM.
 
         Returns:
-            QuerySet: A queryset of all Review instances.
+            QuerySet or MongoQuery: The filtered Review instances, ordered by id.
         """
+        if uses_repository(Reviews, self.request): # Numbered pages and streams on MongoDB
+            return review_query(self.request.query_params)
         # pylint: disable=E1101
         queryset = Reviews.objects.all() # get all reviews
-        return queryset
+        queryset = filter_reviews(queryset, self.request.query_params) # filter in the database
+        return queryset.order_by("id") # stable order so pages do not overlap
+
+
+class ReviewSearchView(APIView):
+    """
+    A view for full-text search over reviews.
+
+    Ranks reviews by BM25 relevance of their job title, job description,
+    benefits and review text to the ``q`` query parameter. ``limit`` caps
+    the number of results (default 20, maximum 100).
+    """
+    throttle_scope = "search" # Rate of THROTTLE_RATES["search"]
+    default_limit = 20 # Number of results when no limit is given
+    max_limit = 100 # Upper bound on the number of results
+
+    def get(self, request):
+        """
+        Search the reviews.
+
+        Args:
+            request (Request): The HTTP request containing the search query.
+
+        Returns:
+            Response: The matching reviews with their scores, best first.
+        """
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"q": "A search query is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get("limit", self.default_limit)),
+                        self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+
+        hits = get_search_index().search(query, max(limit, 1))
+        # pylint: disable=E1101
+        reviews = Reviews.objects.in_bulk([doc_id for doc_id, _ in hits])
+        results = []
+        for doc_id, score in hits:
+            if doc_id in reviews: # Skip reviews deleted by another process
+                data = ReviewsSerializer(reviews[doc_id]).data
+                data["score"] = round(score, 4)
+                results.append(data)
+        return Response({"results": results})
+
+
+class JobTitleMatchView(APIView):
+    """
+    A view for mapping an arbitrary job title to the known job titles.
+
+    Used by the browser extension to find the reviews and vacancies of the
+    posting being viewed. ``limit`` caps the number of matches (default 5,
+    maximum 20).
+    """
+    throttle_scope = "search" # Rate of THROTTLE_RATES["search"]
+    default_limit = 5 # Number of matches when no limit is given
+    max_limit = 20 # Upper bound on the number of matches
+
+    def get(self, request):
+        """
+        Match a job title against the titles of reviews and vacancies.
+
+        Args:
+            request (Request): The HTTP request containing the ``title``
+                query parameter.
+
+        Returns:
+            Response: The most similar job titles with their similarity
+            and number of reviews and vacancies, best first.
+        """
+        title = request.query_params.get("title", "").strip()
+        if not title:
+            return Response({"title": "A job title is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get("limit", self.default_limit)),
+                        self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+
+        matches = get_title_matcher().match(title, max(limit, 1))
+        return Response({"results": [
+            {
+                "job_title": job_title,
+                "score": round(similarity, 4),
+                "reviews": sources.get("review", 0),
+                "vacancies": sources.get("vacancy", 0),
+            }
+            for job_title, similarity, sources in matches
+        ]})
+
+
+class RatingStatsView(APIView):
+    """
+    A view for the rating statistics of a job title or department.
+
+    Exactly one of the ``job_title`` and ``department`` query parameters
+    selects the statistics, which are read from the materialized
+    RatingAggregate document instead of being computed from the reviews.
+    """
+    throttle_scope = "stats" # Rate of THROTTLE_RATES["stats"]
 
+    def get(self, request):
+        """
+        Read the rating statistics.
+
+        Args:
+            request (Request): The HTTP request with a ``job_title`` or
+                ``department`` query parameter.
+
+        Returns:
+            Response: The review count, average rating, rating histogram and
+            recommendation ratio.
+        """
+        given = [scope for scope in AGGREGATE_SCOPES if request.query_params.get(scope)]
+        if len(given) != 1:
+            return Response({"detail": "Give exactly one of job_title or department."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        aggregate = get_aggregate(given[0], request.query_params[given[0]])
+        if aggregate is None or not aggregate.count:
+            return Response({"detail": "No reviews found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(RatingAggregateSerializer(aggregate).data)
+
+
+class CacheStatsView(APIView):
+    """
+    A view for the hit and miss counters of the response cache.
+
+    The counters belong to the worker process that answers the request.
+    Restricted to staff users.
+    """
+    permission_classes = (IsAdminUser,) # Only staff users can read the counters
+
+    def get(self, request):
+        """
+        Read the response cache counters.
+
+        Args:
+            request (Request): The HTTP request.
+
+        Returns:
+            Response: The number of hits and misses and the hit ratio.
+        """
+        return Response(cache_stats())
 
 
-class VacanciesViewSet(viewsets.ModelViewSet):
+class MongoPoolStatsView(APIView):
+    """
+    A view for the MongoDB connection pool of the worker process.
+
+    Each worker has its own pool; sampling the view across workers shows
+    whether ``MONGO_MAX_POOL_SIZE`` and the number of workers fit the
+    connection limit of the cluster. Restricted to staff users.
+    """
+    permission_classes = (IsAdminUser,) # Only staff users can read the counters
+
+    def get(self, request):
+        """
+        Read the connection pool statistics.
+
+        Args:
+            request (Request): The HTTP request.
+
+        Returns:
+            Response: The process id, the pool bounds and the open, in-use
+            and waiting connections.
+        """
+        return Response(pool_stats())
+
+
+class LoadStatsView(APIView):
+    """
+    A view for the concurrency limit of the worker process.
+
+    Shows how many requests run and wait now, and how many were admitted,
+    admitted after queueing, or shed with a 503 since the worker started.
+    The path is exempt from the limit, so it answers during an overload.
+    Restricted to staff users.
+    """
+    permission_classes = (IsAdminUser,) # Only staff users can read the counters
+
+    def get(self, request):
+        """
+        Read the load shedding counters.
+
+        Args:
+            request (Request): The HTTP request.
+
+        Returns:
+            Response: The limits, the running and waiting requests and the
+            admitted and shed counters.
+        """
+        return Response(load_stats())
+
+
+class MetricsView(View):
+    """
+    A view for the request metrics of the worker process, for Prometheus.
+
+    A plain Django view, so that a scrape does not go through the DRF
+    authentication and throttles. Requires the ``METRICS_TOKEN`` bearer
+    token when one is set.
+    """
+
+    def get(self, request):
+        """
+        Render the metrics.
+
+        Args:
+            request (HttpRequest): The scrape request.
+
+        Returns:
+            HttpResponse: The metrics in the Prometheus text format, or 401
+            without the right token.
+        """
+        if not is_authorized(request):
+            return HttpResponse("Unauthorized\n", status=401, content_type="text/plain")
+        return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
+
+
+class VacanciesViewSet(ConditionalListMixin, CachedListMixin, viewsets.ModelViewSet):
     """
     A viewset for managing Vacancies.
 
     This viewset provides standard actions for creating, retrieving,
     updating, and deleting Vacancy instances. It manages vacancy data
-    and handles the associated business logic.
+    and handles the associated business logic. The list accepts the
+    ``min_pay`` and ``max_pay`` filters, in dollars, and is served from the
+    versioned response cache until a vacancy is written, or with 304 Not
+    Modified when the client's ETag is current. Postings are unique by
+    normalized job title and location; feeds are upserted through
+    ``ingest``.
     """
     # pylint: disable=E1101
     queryset = Vacancies.objects.all()  # Get all Vacancy objects from the database
     serializer_class = VacanciesSerializer   # Specify the serializer for data conversion
+    throttle_scope = "vacancies" # Rate of THROTTLE_RATES["vacancies"]
+    pagination_class = KeysetPagination # Cursor pages when the client sends ?cursor=
+    keyset_fields = ("id", "payRateCents") # Indexed keys the cursor pages can be sorted on
+    cache_collection = "vacancies" # Cached lists are dropped when a vacancy is written
+
+    def get_queryset(self):
+        """
+        Retrieve the Vacancy instances, filtered by pay for the list action.
+
+        On MongoDB, lists that are not in cursor mode are read through the
+        pymongo repository instead of the ORM.
+
+        Returns:
+            QuerySet or MongoQuery: The Vacancy instances.
+        """
+        if self.action == "list" and uses_repository(Vacancies, self.request):
+            return vacancy_query(self.request.query_params) # Skip the ORM on MongoDB
+        queryset = super().get_queryset()
+        if self.action == "list":
+            queryset = filter_vacancies(queryset, self.request.query_params)
+        return queryset
+
     # pylint: disable=W0613
     def create(self, request, *args, **kwargs):
         """
@@ -120,7 +500,20 @@ class VacanciesViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(
             data=request.data)   # Serialize incoming data
         if serializer.is_valid():  # Check if the serialized data is valid
-            serializer.save()  # Save data to the database if valid
+            key = vacancy_key(serializer.validated_data['jobTitle'],
+                              serializer.validated_data['jobLocation'])
+            duplicate = Response(
+                {"detail": "A vacancy with this job title and location already exists."},
+                status=status.HTTP_400_BAD_REQUEST)
+            if Vacancies.objects.filter(dedupKey=key).exists(): # Same title and location
+                return duplicate
+            try:
+                with atomic_unless_mongo(Vacancies): # Keeps the request usable if refused
+                    serializer.save()  # Save data to the database if valid
+            except DatabaseError as e:
+                if is_duplicate_key(e): # Created concurrently, refused by the unique key
+                    return duplicate
+                raise
             return Response(
                 serializer.data,
                 status=status.HTTP_201_CREATED)  # Return success response with serialized data
@@ -128,32 +521,86 @@ class VacanciesViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST)   # Return error response if data is invalid
 
-class CommentViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=["post"], url_path="ingest",
+            permission_classes=[IsAdminUser])
+    def ingest(self, request):
+        """
+        Upsert a feed of vacancies.
+
+        The body is a JSON array of vacancies, or a CSV (``text/csv``) or
+        JSONL (``application/x-ndjson``) feed, which is read from the
+        request as it is ingested. Postings are deduplicated on their
+        normalized job title and location; stored postings are updated.
+
+        Args:
+            request (Request): The HTTP request containing the feed.
+
+        Returns:
+            Response: The number of created and updated postings, of
+            repeated rows and the errors of the invalid rows; 400 when no
+            row was written, or with a ``detail`` when the feed could not be
+            read to its end.
+        """
+        content_type = request.content_type.split(";")[0].strip()
+        feed_format = FEED_CONTENT_TYPES.get(content_type)
+        if feed_format is not None:
+            rows = read_feed(decode_lines(request.stream or ()), feed_format)
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            return Response({"detail": "Expected a JSON array, CSV or JSONL feed."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report = ingest_vacancies(rows)
+        except FeedError as e: # What was written before the broken line, and why it stopped
+            return Response({**(e.report or {}), "detail": str(e)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        written = report["created"] + report["updated"]
+        return Response(report,
+                        status=status.HTTP_201_CREATED if written else status.HTTP_400_BAD_REQUEST)
+
+class CommentViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     """
     A viewset for managing Comments related to Reviews.
 
     This viewset provides standard actions for creating, retrieving,
     updating, and deleting Comment instances. Comments are associated
-    with specific reviews and users.
+    with specific reviews and users. The list of a review's comments is
+    answered with 304 Not Modified while none of them changed.
     """
     permission_classes = [IsAuthenticated] # Restrict access to authenticated users only
+    throttle_scope = "comments" # Rate of THROTTLE_RATES["comments"]
     queryset = Comment.objects.all() # Get all Comment objects from the database
     serializer_class = CommentSerializer # Specify the serializer for data conversion
+    pagination_class = KeysetPagination # Cursor pages when the client sends ?cursor=
+    keyset_fields = ("id", "created_at") # Indexed keys the cursor pages can be sorted on
+
+    def get_version_collection(self):
+        """
+        Return the version of the comments of the review in the URL.
+
+        Returns:
+            str: The version name, bumped when a comment of the review is written.
+        """
+        return f"comments:{self.kwargs.get('id')}"
 
     def get_queryset(self):
         """
         Retrieve comments related to a specific review.
 
         This method retrieves comments filtered by the review ID provided
-        in the URL.
+        in the URL. On MongoDB, lists that are not in cursor mode are read
+        through the pymongo repository, oldest comment first.
 
         Args:
             request (Request): The HTTP request containing the review ID.
 
         Returns:
-            QuerySet: A queryset of filtered Comment instances.
+            QuerySet or MongoQuery: The filtered Comment instances.
         """
         review_id = self.kwargs.get('id')  # Get review ID from URL
+        if self.action == "list" and uses_repository(Comment, self.request):
+            return comment_query(review_id) # Skip the ORM on MongoDB
         return Comment.objects.filter(review_id=review_id)  # Filter comments by review_id
 
     def perform_create(self, serializer):
@@ -172,7 +619,9 @@ class CommentViewSet(viewsets.ModelViewSet):
         review_id = self.kwargs.get('id') # Extract the review_id from the URL
         review = get_object_or_404(Reviews, id=review_id)  # Get the review object
         user = self.request.user #Get the current user
-        serializer.save(review=review, user=user)  # Assign the review to the comment
+        # Assign the review to the comment; its author hears of it in the next digest
+        serializer.save(review=review, user=user, digest_pending=True)
+        comment_added(serializer.instance) # Count it and preview it on the review
 
     # pylint: disable=W0613
     def destroy(self, request, *args, **kwargs):
@@ -204,5 +653,72 @@ class CommentViewSet(viewsets.ModelViewSet):
         #     raise PermissionDenied("You are not allowed to delete this comment.")
 
         comment.delete()
+        comment_removed(comment) # Uncount it and preview the newest remaining comment
         return Response({'detail': 'Comment deleted successfully.'},
                         status=status.HTTP_204_NO_CONTENT)
+
+
+class CommentBatchView(APIView):
+    """
+    A view for the first comments of several reviews at once.
+
+    A page of review cards reads the comments of all its reviews with one
+    request and one query instead of one of each per review. Each review
+    comes with a ``next`` link to the cursor pages of its comments when it
+    has more than ``limit``.
+    """
+    permission_classes = [IsAuthenticated] # Restrict access to authenticated users only
+    throttle_scope = "comments" # Rate of THROTTLE_RATES["comments"]
+    default_limit = 5 # Default number of comments per review
+    max_limit = KeysetPagination.max_page_size # Upper bound on the comments per review
+
+    def get(self, request):
+        """
+        Read the first comments of the requested reviews.
+
+        Args:
+            request (Request): The HTTP request with the ``review_ids``
+                (comma-separated), ``limit`` and ``ordering`` query
+                parameters.
+
+        Returns:
+            Response: ``{review id: {"next": link, "results": [...]}}`` for
+            every requested review, or 400 if a parameter is invalid.
+        """
+        try:
+            review_ids = list(dict.fromkeys(
+                int(value) for values in request.query_params.getlist("review_ids")
+                for value in values.split(",") if value.strip()))
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            return Response({"detail": "review_ids and limit must be integers."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < len(review_ids) <= MAX_BATCH_REVIEWS:
+            return Response({"detail": f"Give 1 to {MAX_BATCH_REVIEWS} review_ids."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < limit <= self.max_limit:
+            return Response({"detail": f"limit must be between 1 and {self.max_limit}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        ordering = request.query_params.get("ordering", COMMENT_ORDERINGS[0])
+        if ordering not in COMMENT_ORDERINGS:
+            return Response({"detail": f"ordering must be one of {COMMENT_ORDERINGS}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        created_at = Comment._meta.get_field("created_at") # pylint: disable=W0212
+        grouped = comments_for_reviews(review_ids, limit, ordering)
+        data = {}
+        for review_id, comments in grouped.items():
+            next_link = None
+            if len(comments) > limit: # The extra comment: the review has more
+                last = comments[limit - 1]
+                cursor = KeysetPagination.encode_cursor(
+                    ordering, created_at.value_to_string(last), last.pk)
+                next_link = request.build_absolute_uri(reverse("comments", args=[review_id]))
+                for name, value in (("cursor", cursor), ("ordering", ordering),
+                                    ("page_size", limit)):
+                    next_link = replace_query_param(next_link, name, value)
+            data[str(review_id)] = {
+                "next": next_link,
+                "results": CommentSerializer(comments[:limit], many=True).data,
+            }
+        return Response(data)
@@ -1,13 +1,12 @@
 import React, { useState, useEffect } from "react";
 import NavBar from "./Navbar";
 import { useNavigate } from "react-router-dom";
-import { send_otp_url, unprotected_api_call } from "../api/api";
+import { send_otp_url, verify_otp_url, unprotected_api_call } from "../api/api";
 
 const ForgotPassword = () => {
     const [otpSent, setOtpSent] = useState(false);
     const [email, setEmail] = useState("");
     const [otp, setOtp] = useState("");
-    const [generatedOtp, setGeneratedOtp] = useState("");
     const [isLoading, setIsLoading] = useState(false);
     const [timeLeft, setTimeLeft] = useState(600); // 10 minutes in seconds
 
@@ -15,11 +14,9 @@ const ForgotPassword = () => {
 
     const handleClick = async () => {
         if (!otpSent) {
-            const newOtp = Math.floor(100000 + Math.random() * 900000).toString();
-            setGeneratedOtp(newOtp);
+            // the otp is generated and checked by the server
             const requestData = {
                 email: email,
-                generated_otp: newOtp,
             };
 
             console.log("Sending OTP...");
@@ -34,11 +31,18 @@ const ForgotPassword = () => {
                 setTimeLeft(600); // Reset timer to 10 minutes
             } else if (response.status === 400) {
                 alert("Bad request! The entered email id does not exist.");
+            } else if (response.status === 429) {
+                alert("Too many requests! Please wait before requesting another OTP.");
             }
         } else {
-            console.log("Entered OTP: " + otp);
-            if (otp === generatedOtp && timeLeft > 0) {
-                navigate("/new-password", { state: { email: email }})
+            setIsLoading(true);
+
+            let response = await unprotected_api_call(verify_otp_url, { email: email, otp: otp });
+
+            setIsLoading(false);
+
+            if (response.ok && timeLeft > 0) {
+                navigate("/new-password", { state: { email: email, otp: otp }})
             } else {
                 alert("OTP entered is not valid. Try again.");
             }
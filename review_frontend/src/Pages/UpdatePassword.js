@@ -17,7 +17,7 @@ const UpdatePassword = () => {
 
     const handleSubmit = async (e) => {
         console.log("submitted");
-        const { email } = location.state || {};
+        const { email, otp } = location.state || {};
 
         console.log("email : " + email);
 
@@ -25,6 +25,7 @@ const UpdatePassword = () => {
             console.log("passwords match");
             const requestData = {
                 "email": email,
+                "otp": otp,
                 "password": newPassword
             };
     
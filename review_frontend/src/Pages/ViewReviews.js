@@ -144,6 +144,8 @@ class Reviews extends React.Component {
    /**
    * @state
    * @property {Array<Object>} jobs - Array of job review objects
+   * @property {number} count - Number of job reviews matching the filters
+   * @property {string|null} next - URL of the next page of job reviews
    * @property {Object} formData - Filter criteria for reviews
    * @property {string} formData.department - Filter by department name
    * @property {string} formData.locations - Filter by job location
@@ -152,8 +154,9 @@ class Reviews extends React.Component {
    * @property {string} formData.max_rating - Maximum rating filter
    */
   state = {
-    allJobs: [],
     jobs: [],
+    count: 0,
+    next: null,
     formData: {
       department: "",
       locations: "",
@@ -169,16 +172,46 @@ class Reviews extends React.Component {
    * @async
    */
   componentDidMount = async () => {
-    let response = await unprotected_api_call(all_reviews_url, {}, "GET");
+    await this.fetchReviews(all_reviews_url);
+  };
+
+  /**
+   * Builds the review listing URL for the given filters
+   * @method
+   * @param {Object} formData - Filter criteria for reviews
+   * @returns {string} The listing URL with the non-empty filters as query parameters
+   */
+  buildReviewsUrl = (formData) => {
+    const params = new URLSearchParams();
+    for (let key in formData) {
+      if (formData[key] !== "") {
+        params.append(key, formData[key]);
+      }
+    }
+    const query = params.toString();
+    return query ? `${all_reviews_url}?${query}` : all_reviews_url;
+  };
+
+  /**
+   * Fetches one page of job reviews from the server
+   * @method
+   * @async
+   * @param {string} url - The listing URL to fetch
+   * @param {boolean} [append=false] - Whether to append the page to the current list
+   */
+  fetchReviews = async (url, append = false) => {
+    let response = await unprotected_api_call(url, {}, "GET");
     if (response.status === 200) {
       let data = await response.json();
-      this.setState({ allJobs: data, jobs: data });
-      console.log("Data: ", data);
+      this.setState({
+        jobs: append ? [...this.state.jobs, ...data.results] : data.results,
+        count: data.count,
+        next: data.next,
+      });
     } else {
       alert("Server Error");
     }
   };
-  
 
   /**
    * Handles changes to filter form inputs
@@ -200,38 +233,28 @@ class Reviews extends React.Component {
    * Handles filter form submsision and updates job listings
    * @method
    * @param {Object} e - Form submission event
-   * @description Creates a new job list initiated to the origina list and filters out the unrequired jobs
+   * @description Requests the first page of job reviews matching the filters from the server
    */
   handleSubmit = async (e) => {
     e.preventDefault();
+    await this.fetchReviews(this.buildReviewsUrl(this.state.formData));
+  }
 
-    // get the original list of all job reviews
-    const jobs = this.state.allJobs;
-
-    // a copy of the original list which will contain the filtered job reviews
-    let updatedList = jobs;
-
-    for (let key in this.state.formData) {
-      if (this.state.formData[key] !== "") {
-        if (key == "department" || key == "locations" || key == "job_title"){
-          updatedList = [...updatedList].filter((job) => String(job[key]).toLowerCase().includes(this.state.formData[key].toLowerCase()));
-        } else if (key == "min_rating") {
-          updatedList = [...updatedList].filter((job) => job.rating >= Number(this.state.formData[key]));
-        } else {
-          updatedList = [...updatedList].filter((job) => job.rating <= Number(this.state.formData[key]));
-        }
-      }
+  /**
+   * Loads the next page of job reviews for the current filters
+   * @method
+   */
+  handleLoadMore = async () => {
+    if (this.state.next) {
+      await this.fetchReviews(this.state.next, true);
     }
-
-    this.setState({ jobs: updatedList })
-  }
+  };
 
   /**
    * Handles resetting the filters
    * @method
    */
-  handleReset = () => {
-    const allJobs = this.state.allJobs;
+  handleReset = async () => {
     // Reset the form fields
     this.setState(
       {
@@ -242,10 +265,9 @@ class Reviews extends React.Component {
           min_rating: "",
           max_rating: "",
         },
-
-        jobs:allJobs,
       },
     );
+    await this.fetchReviews(all_reviews_url);
   };
 
   render() {
@@ -361,6 +383,16 @@ class Reviews extends React.Component {
                   currentUser={currentUser}
                 />
               ))}
+              {/* Load the next page of reviews */}
+              {this.state.next && (
+                <button
+                  type="button"
+                  onClick={this.handleLoadMore}
+                  className="bg-blue-500 text-white py-3 px-6 rounded-lg"
+                >
+                  Load more
+                </button>
+              )}
             </div>
           </div>
         </div>
@@ -22,6 +22,12 @@ export let login_url = base_url + "auth/token/";
  */
 export let send_otp_url = base_url + "auth/send-otp/"
 
+/**
+ * URL endpoint for checking the otp sent to the user's email
+ * @constant {string}
+ */
+export let verify_otp_url = base_url + "auth/verify-otp/"
+
 /**
  * URL endpoing for updating password of an existing user
  * @constant {string}
@@ -191,6 +191,11 @@ describe("Login Component", () => {
       ok: true,
       status: 200,
     })
+    // the server refuses the entered otp
+    unprotected_api_call.mockResolvedValueOnce({
+      ok: false,
+      status: 400,
+    })
     
     // Render the component wrapped in a MemoryRouter
     render(
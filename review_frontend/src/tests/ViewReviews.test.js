@@ -92,13 +92,16 @@ describe("ViewReview Component", () => {
     }
 
 
+    // Builds a mocked response holding one page of job reviews
+    const mockPage = (results) => ({
+        status: 200,
+        json: async () => ({ count: results.length, next: null, results: results }),
+    });
+
     beforeEach(() => {
         jest.clearAllMocks();
 
-        unprotected_api_call.mockResolvedValueOnce({
-            status: 200,
-            json: async () => mockJobReviews,
-        });
+        unprotected_api_call.mockResolvedValueOnce(mockPage(mockJobReviews));
 
         protected_api_call.mockResolvedValueOnce({
             status: 200,
@@ -162,10 +165,18 @@ describe("ViewReview Component", () => {
         const departmentInput = screen.getByPlaceholderText("Department");
         fireEvent.change(departmentInput, { target: { value: "IT" } });
 
+        // The server returns only the matching job reviews
+        unprotected_api_call.mockResolvedValueOnce(mockPage([mockJobReviews[0]]));
+
         // Apply filter
         fireEvent.click(screen.getByText("Filter"));
 
+        // Check that the filter is sent to the server
+        await waitFor(() => expect(unprotected_api_call).toHaveBeenLastCalledWith(
+            "mock_reviews_url?department=IT", {}, "GET"));
+
         // Check the filtered result
+        await waitFor(() => expect(screen.queryByText(/Data Scientist/i)).not.toBeInTheDocument());
         expect(screen.queryByText(/Software Engineer/i)).toBeInTheDocument();
         expect(screen.queryByText(/Data Scientist/i)).not.toBeInTheDocument();
         expect(screen.queryByText(/Product Manager/i)).not.toBeInTheDocument();
@@ -181,9 +192,18 @@ describe("ViewReview Component", () => {
         const locationInput = screen.getByPlaceholderText("Location");
         fireEvent.change(locationInput, { target: { value: "Raleigh" } });
 
+        // The server returns only the matching job reviews
+        unprotected_api_call.mockResolvedValueOnce(
+            mockPage([mockJobReviews[0], mockJobReviews[3]]));
+
         fireEvent.click(screen.getByText("Filter"));
 
+        // Check that the filter is sent to the server
+        await waitFor(() => expect(unprotected_api_call).toHaveBeenLastCalledWith(
+            "mock_reviews_url?locations=Raleigh", {}, "GET"));
+
         // Check the filtered result
+        await waitFor(() => expect(screen.queryByText(/Data Scientist/i)).not.toBeInTheDocument());
         expect(screen.queryByText(/Software Engineer/i)).toBeInTheDocument();
         expect(screen.queryByText(/Data Scientist/i)).not.toBeInTheDocument();
         expect(screen.queryByText(/Product Manager/i)).not.toBeInTheDocument();
@@ -198,10 +218,17 @@ describe("ViewReview Component", () => {
         const jobTitleInput = screen.getByPlaceholderText("Job Title");
         fireEvent.change(jobTitleInput, { target: { value: "Mana" } });
 
+        // The server returns only the matching job reviews
+        unprotected_api_call.mockResolvedValueOnce(mockPage([mockJobReviews[2]]));
+
         fireEvent.click(screen.getByText("Filter"));
 
+        // Check that the filter is sent to the server
+        await waitFor(() => expect(unprotected_api_call).toHaveBeenLastCalledWith(
+            "mock_reviews_url?job_title=Mana", {}, "GET"));
+
         // Check the filtered result (should contain jobs with job titles containing 'mana')
-        expect(screen.queryByText(/Software Engineer/i)).not.toBeInTheDocument();
+        await waitFor(() => expect(screen.queryByText(/Software Engineer/i)).not.toBeInTheDocument());
         expect(screen.queryByText(/Data Scientist/i)).not.toBeInTheDocument();
         expect(screen.queryByText(/Product Manager/i)).toBeInTheDocument();
         expect(screen.queryByText(/UX Designer/i)).not.toBeInTheDocument();
@@ -217,10 +244,17 @@ describe("ViewReview Component", () => {
             target: { value: 3 },
         })
 
+        // The server returns only the matching job reviews
+        unprotected_api_call.mockResolvedValueOnce(
+            mockPage([mockJobReviews[2], mockJobReviews[3]]));
+
         // click on the filter button
         fireEvent.click(screen.getByText("Filter"));
 
-        expect(screen.queryByText(/Software Engineer/i)).not.toBeInTheDocument();
+        await waitFor(() => expect(unprotected_api_call).toHaveBeenLastCalledWith(
+            "mock_reviews_url?min_rating=3", {}, "GET"));
+
+        await waitFor(() => expect(screen.queryByText(/Software Engineer/i)).not.toBeInTheDocument());
         expect(screen.queryByText(/Data Scientist/i)).not.toBeInTheDocument();
         expect(screen.queryByText(/Product Manager/i)).toBeInTheDocument();
         expect(screen.queryByText(/UX Designer/i)).toBeInTheDocument();
@@ -236,9 +270,17 @@ describe("ViewReview Component", () => {
             target: { value: 3 },
         })
 
+        // The server returns only the matching job reviews
+        unprotected_api_call.mockResolvedValueOnce(
+            mockPage([mockJobReviews[0], mockJobReviews[1]]));
+
         // click on the filter button
         fireEvent.click(screen.getByText("Filter"));
 
+        await waitFor(() => expect(unprotected_api_call).toHaveBeenLastCalledWith(
+            "mock_reviews_url?max_rating=3", {}, "GET"));
+
+        await waitFor(() => expect(screen.queryByText(/Product Manager/i)).not.toBeInTheDocument());
         expect(screen.queryByText(/Software Engineer/i)).toBeInTheDocument();
         expect(screen.queryByText(/Data Scientist/i)).toBeInTheDocument();
         expect(screen.queryByText(/Product Manager/i)).not.toBeInTheDocument();
@@ -259,20 +301,32 @@ describe("ViewReview Component", () => {
             target: { value: 3 },
         });
 
+         // The server returns only the matching job reviews
+         unprotected_api_call.mockResolvedValueOnce(mockPage([mockJobReviews[3]]));
+
          // click on the filter button
          fireEvent.click(screen.getByText("Filter"));
 
+         await waitFor(() => expect(unprotected_api_call).toHaveBeenLastCalledWith(
+             "mock_reviews_url?locations=Raleigh&min_rating=3", {}, "GET"));
+
          // check the filtered list
-         expect(screen.queryByText(/Software Engineer/i)).not.toBeInTheDocument();
+         await waitFor(() => expect(screen.queryByText(/Software Engineer/i)).not.toBeInTheDocument());
          expect(screen.queryByText(/Data Scientist/i)).not.toBeInTheDocument();
          expect(screen.queryByText(/Product Manager/i)).not.toBeInTheDocument();
          expect(screen.queryByText(/UX Designer/i)).toBeInTheDocument();
 
+         // The server returns all the job reviews again
+         unprotected_api_call.mockResolvedValueOnce(mockPage(mockJobReviews));
+
          // click on the reset button
          fireEvent.click(screen.getByText("Reset"));
 
+         await waitFor(() => expect(unprotected_api_call).toHaveBeenLastCalledWith(
+             "mock_reviews_url", {}, "GET"));
+
          // check if all the job reviews are rendered again
-         expect(screen.queryByText(/Software Engineer/i)).toBeInTheDocument();
+         expect(await screen.findByText(/Software Engineer/i)).toBeInTheDocument();
          expect(screen.queryByText(/Data Scientist/i)).toBeInTheDocument();
          expect(screen.queryByText(/Product Manager/i)).toBeInTheDocument();
          expect(screen.queryByText(/UX Designer/i)).toBeInTheDocument();